@@ -2,19 +2,147 @@
 """
 CallVault Backend API Testing Script
 Tests all health check, diagnostic, and WebRTC endpoints
+
+With --bench, drives the same endpoints concurrently over keep-alive
+sessions and writes per-endpoint requests/sec and latency histograms as
+JSON; --compare diffs a run against an earlier report.
+
+Both modes scrape the server's /metrics endpoint before and after the run and
+print what changed: request counts and mean/p99 latency per HTTP route and WS
+message type, counter increments, and gauge values (open sockets, send
+buffers, event-loop lag, DB pool).
+
+--bench-call-tokens measures call session token throughput. It mints tokens
+for --duration seconds, then verifies (consumes) each of them once, then checks
+that replaying a sample is rejected. The report records the server's
+CALL_TOKEN_MODE. Run it once per mode and pass the first report to --compare
+to see stateless vs database minting and verification side by side.
 """
 
+import argparse
+import itertools
+import re
 import requests
 import json
 import sys
 import time
 import websocket
 import threading
+from collections import Counter
 from datetime import datetime
 
+from bench_stats import latency_summary
+
+# (name, method, path, json body) driven by the benchmark mode
+BENCHMARK_ENDPOINTS = [
+    ("root", "GET", "/", None),
+    ("health", "GET", "/health", None),
+    ("api_health", "GET", "/api/health", None),
+    ("version", "GET", "/api/version", None),
+    ("diagnostics", "GET", "/api/diagnostics", None),
+    ("ice_verify", "GET", "/api/ice-verify", None),
+    ("turn_config", "GET", "/api/turn-config", None),
+    ("ice", "GET", "/api/ice", None),
+    ("server_time", "GET", "/api/server-time", None),
+    ("call_session_token", "POST", "/api/call-session-token", {"address": "test-address-123"}),
+    ("contacts", "GET", "/api/contacts/test-address-123", None),
+]
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+
+def latency_histogram(samples_ms):
+    counts = Counter()
+    for value in samples_ms:
+        for bound in HISTOGRAM_BUCKETS_MS:
+            if value <= bound:
+                counts[f"le_{bound}ms"] += 1
+                break
+        else:
+            counts["gt_2500ms"] += 1
+    labels = [f"le_{bound}ms" for bound in HISTOGRAM_BUCKETS_MS] + ["gt_2500ms"]
+    return {label: counts[label] for label in labels}
+
+PROM_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(.*)\})?\s+(\S+)$')
+PROM_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_prometheus(text):
+    """Prometheus text format -> ({metric: type}, [(name, labels dict, value)])"""
+    types = {}
+    samples = []
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ", 3)
+            types[name] = kind
+            continue
+        match = PROM_SAMPLE.match(line)
+        if not match:
+            continue
+        name, _, labels, value = match.groups()
+        samples.append((name, dict(PROM_LABEL.findall(labels or "")), float(value)))
+    return types, samples
+
+
+def _series_label(labels):
+    return ",".join(f"{k}={v}" for k, v in sorted(labels.items())) or "-"
+
+
+def metrics_delta(before_text, after_text):
+    """What changed between two /metrics scrapes, grouped by metric type"""
+    before_types, before_samples = parse_prometheus(before_text or "")
+    types, after_samples = parse_prometheus(after_text)
+    before = {(name, _series_label(labels)): value for name, labels, value in before_samples}
+
+    histograms, counters, gauges = {}, {}, {}
+    for name, labels, value in after_samples:
+        base = re.sub(r"_(bucket|sum|count)$", "", name)
+        if types.get(base) == "histogram":
+            le = labels.pop("le", None)
+            series = histograms.setdefault(base, {}).setdefault(_series_label(labels), {"buckets": [], "sum": 0, "count": 0})
+            key = dict(labels, **({"le": le} if le is not None else {}))
+            delta = value - before.get((name, _series_label(key)), 0)
+            if name.endswith("_bucket"):
+                series["buckets"].append((float(le), delta))
+            elif name.endswith("_sum"):
+                series["sum"] = delta
+            else:
+                series["count"] = delta
+        elif types.get(name) == "counter":
+            delta = value - before.get((name, _series_label(labels)), 0)
+            if delta:
+                counters.setdefault(name, {})[_series_label(labels)] = delta
+        else:
+            gauges.setdefault(name, {})[_series_label(labels)] = {
+                "before": before.get((name, _series_label(labels))),
+                "after": value,
+            }
+
+    latency = {}
+    for name, series_map in histograms.items():
+        for label, series in series_map.items():
+            if not series["count"]:
+                continue
+            buckets = sorted(series["buckets"])
+
+            def quantile(q):
+                target = q * series["count"]
+                return next((bound for bound, cumulative in buckets if cumulative >= target), None)
+
+            latency.setdefault(name, {})[label] = {
+                "count": int(series["count"]),
+                "mean_ms": round(series["sum"] / series["count"] * 1000, 3),
+                "p50_le_ms": round(quantile(0.5) * 1000, 3) if quantile(0.5) not in (None, float("inf")) else None,
+                "p99_le_ms": round(quantile(0.99) * 1000, 3) if quantile(0.99) not in (None, float("inf")) else None,
+            }
+    return {"histograms": latency, "counters": counters, "gauges": gauges}
+
+
 class CallVaultAPITester:
-    def __init__(self, base_url="http://localhost:3000"):
+    def __init__(self, base_url="http://localhost:3000", metrics_token=None):
         self.base_url = base_url
+        self.metrics_token = metrics_token
         self.tests_run = 0
         self.tests_passed = 0
         self.failed_tests = []
@@ -160,6 +288,11 @@ class CallVaultAPITester:
         if success and isinstance(response, dict):
             self.log(f"   ICE Status: {response.get('status', 'N/A')}")
             self.log(f"   TURN Servers: {response.get('configuration', {}).get('turnServersCount', 0)}")
+            cache = response.get('cache') or {}
+            for profile, entry in cache.get('profiles', {}).items():
+                self.log(f"   ICE cache {profile}: mode={entry.get('mode')} age={entry.get('ageMs')}ms")
+            self.log(f"   ICE cache hit rate: {cache.get('hitRate', 'N/A')} "
+                     f"({cache.get('hits', 0)} hits, {cache.get('misses', 0)} misses)")
             issues = response.get('issues', [])
             if issues:
                 self.log(f"   Issues found: {len(issues)}")
@@ -191,6 +324,20 @@ class CallVaultAPITester:
             self.log(f"   STUN servers: {stun_count}")
             self.log(f"   TURN servers: {turn_count}")
         
+        # Test /api/ice endpoint
+        success, response = self.run_test(
+            "ICE Endpoint",
+            "GET",
+            "/api/ice",
+            200,
+            "iceServers"
+        )
+        if success and isinstance(response, dict):
+            self.log(f"   ICE Servers count: {len(response.get('iceServers', []))}")
+            self.log(f"   Mode: {response.get('mode', 'N/A')}")
+
+        self.test_ice_cache_headers()
+
         # Test /api/server-time endpoint
         success, response = self.run_test(
             "Server Time Endpoint", 
@@ -207,6 +354,33 @@ class CallVaultAPITester:
             self.log(f"   Client time: {client_time}")
             self.log(f"   Time difference: {time_diff}ms")
     
+    def test_ice_cache_headers(self):
+        """ICE lists are cacheable by the client only; diagnostics and tokens are never cached"""
+        expected = {
+            "/api/turn-config": "private",
+            "/api/ice": "private",
+            "/api/ice-verify": "no-store",
+        }
+        self.tests_run += 1
+        self.log("🔍 Testing ICE Cache-Control headers...")
+        wrong = []
+        try:
+            for path, directive in expected.items():
+                header = requests.get(f"{self.base_url}{path}", timeout=10).headers.get("Cache-Control", "")
+                self.log(f"   {path}: {header or '(none)'}")
+                if directive not in header or (directive == "private" and "max-age=" not in header):
+                    wrong.append(path)
+        except requests.exceptions.RequestException as e:
+            self.log(f"❌ Error: {type(e).__name__}")
+            self.failed_tests.append(f"ICE Cache-Control: {type(e).__name__}")
+            return
+        if wrong:
+            self.log(f"❌ Unexpected Cache-Control on {', '.join(wrong)}")
+            self.failed_tests.append(f"ICE Cache-Control: {', '.join(wrong)}")
+        else:
+            self.log("✅ Cache-Control headers as expected")
+            self.tests_passed += 1
+
     def test_call_session_token(self):
         """Test call session token endpoint"""
         self.log("\n=== CALL SESSION TOKEN ENDPOINT ===")
@@ -217,6 +391,7 @@ class CallVaultAPITester:
         
         self.log("🔍 Testing Call Session Token Endpoint...")
         self.log(f"   URL: {url}")
+        token = None
         
         try:
             # Test data as specified in the review request
@@ -245,6 +420,7 @@ class CallVaultAPITester:
                     
                     if not missing_fields:
                         self.log("✅ All required fields present (token, nonce, iceServers)")
+                        self.log(f"   Token mode: {response_json.get('tokenMode', 'N/A')}")
                         self.log(f"   Token: {response_json.get('token', 'N/A')[:20]}...")
                         self.log(f"   Nonce: {response_json.get('nonce', 'N/A')[:20]}...")
                         self.log(f"   ICE Servers: {len(response_json.get('iceServers', []))}")
@@ -252,6 +428,7 @@ class CallVaultAPITester:
                         self.log(f"   Allow TURN: {response_json.get('allowTurn', 'N/A')}")
                         self.log(f"   Allow Video: {response_json.get('allowVideo', 'N/A')}")
                         self.tests_passed += 1
+                        token = response_json['token']
                     else:
                         self.log(f"❌ Missing required fields: {missing_fields}")
                         self.failed_tests.append(f"Call Session Token: Missing fields {missing_fields}")
@@ -277,6 +454,28 @@ class CallVaultAPITester:
         except Exception as e:
             self.log(f"❌ Error: {str(e)}")
             self.failed_tests.append(f"Call Session Token: {str(e)}")
+
+        if token:
+            self.test_call_session_token_verify(token)
+
+    def test_call_session_token_verify(self, token):
+        """A minted token verifies once and is then rejected as a replay"""
+        url = f"{self.base_url}/api/call-session-token/verify"
+        self.tests_run += 1
+        self.log("🔍 Testing Call Session Token Verify + Replay...")
+        try:
+            first = requests.post(url, json={"token": token, "markUsed": True}, timeout=10)
+            replay = requests.post(url, json={"token": token, "markUsed": True}, timeout=10)
+            replay_reason = replay.json().get("reason") if replay.status_code == 401 else None
+            if first.status_code == 200 and first.json().get("valid") and replay_reason == "token_replay":
+                self.log("✅ First verify accepted, replay rejected (token_replay)")
+                self.tests_passed += 1
+            else:
+                self.log(f"❌ Verify returned {first.status_code}, replay returned {replay.status_code} ({replay_reason})")
+                self.failed_tests.append(f"Call Session Token Verify: {first.status_code} then {replay.status_code}")
+        except requests.exceptions.RequestException as e:
+            self.log(f"❌ Error: {type(e).__name__}")
+            self.failed_tests.append(f"Call Session Token Verify: {type(e).__name__}")
     
     def test_websocket_endpoint(self):
         """Test WebSocket endpoint functionality"""
@@ -384,12 +583,285 @@ class CallVaultAPITester:
             self.tests_run += 1
             self.failed_tests.append(f"Server binding: {str(e)}")
     
+    def scrape_metrics(self):
+        """Raw /metrics text, or None if the endpoint isn't available"""
+        headers = {"Authorization": f"Bearer {self.metrics_token}"} if self.metrics_token else {}
+        try:
+            response = requests.get(f"{self.base_url}/metrics", headers=headers, timeout=10)
+        except requests.exceptions.RequestException as e:
+            self.log(f"⚠️  Could not scrape /metrics: {type(e).__name__}")
+            return None
+        if response.status_code != 200:
+            self.log(f"⚠️  /metrics returned HTTP {response.status_code}")
+            return None
+        return response.text
+
+    def report_metrics_delta(self, before_text):
+        """Scrape /metrics again and log what changed since `before_text`"""
+        after_text = self.scrape_metrics()
+        if before_text is None or after_text is None:
+            return None
+        delta = metrics_delta(before_text, after_text)
+        self.log("\n=== SERVER METRICS DELTA ===")
+        for name, series_map in delta["histograms"].items():
+            self.log(f"   {name}")
+            for label, stats in sorted(series_map.items(), key=lambda item: -item[1]["count"]):
+                self.log(f"      {label:<60} n={stats['count']:<7} mean={stats['mean_ms']}ms "
+                         f"p50<={stats['p50_le_ms']}ms p99<={stats['p99_le_ms']}ms")
+        for name, series_map in delta["counters"].items():
+            for label, value in series_map.items():
+                self.log(f"   {name}{{{label}}} +{value:g}")
+        for name, series_map in delta["gauges"].items():
+            for label, values in series_map.items():
+                self.log(f"   {name}{{{label}}} {values['before']} -> {values['after']:g}")
+        return delta
+
+    def _bench_worker(self, method, url, body, deadline, latencies, statuses, lock):
+        """One keep-alive connection issuing requests back to back until the deadline"""
+        session = requests.Session()
+        local_latencies = []
+        local_statuses = Counter()
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = session.request(method, url, json=body, timeout=10)
+                    response.content  # Read the body so the connection goes back to the pool
+                    local_statuses[str(response.status_code)] += 1
+                except requests.exceptions.RequestException as e:
+                    local_statuses[type(e).__name__] += 1
+                    continue
+                local_latencies.append((time.perf_counter() - start) * 1000)
+        finally:
+            session.close()
+            with lock:
+                latencies.extend(local_latencies)
+                statuses.update(local_statuses)
+
+    def benchmark_endpoint(self, name, method, path, body, concurrency, duration):
+        """Drive one endpoint with `concurrency` pooled connections for `duration` seconds"""
+        url = f"{self.base_url}{path}"
+        latencies = []
+        statuses = Counter()
+        lock = threading.Lock()
+        start = time.perf_counter()
+        deadline = start + duration
+        workers = [
+            threading.Thread(target=self._bench_worker, args=(method, url, body, deadline, latencies, statuses, lock))
+            for _ in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        total = sum(statuses.values())
+        ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+        result = {
+            "method": method,
+            "path": path,
+            "requests": total,
+            "ok": ok,
+            "statuses": dict(statuses),
+            "requests_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0,
+            "latency_ms": latency_summary(latencies),
+            "histogram": latency_histogram(latencies),
+        }
+        self.log(
+            f"   {name:<20} {result['requests_per_sec']:>9} req/s  "
+            f"p50={result['latency_ms']['p50']}ms p99={result['latency_ms']['p99']}ms  "
+            f"non-2xx={total - ok}"
+        )
+        return result
+
+    def run_benchmark(self, concurrency=16, duration=10.0, only=None, report_path=None, compare_path=None, max_regression=20.0):
+        """Benchmark every known endpoint in turn and emit a JSON report"""
+        self.log("🚀 Starting CallVault HTTP benchmark")
+        self.log(f"   Base URL: {self.base_url}")
+        self.log(f"   Concurrency: {concurrency}, {duration}s per endpoint")
+
+        endpoints = [e for e in BENCHMARK_ENDPOINTS if not only or e[0] in only]
+        metrics_before = self.scrape_metrics()
+        report = {
+            "benchmark": "http",
+            "base_url": self.base_url,
+            "concurrency": concurrency,
+            "duration_seconds": duration,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "endpoints": {},
+        }
+        for name, method, path, body in endpoints:
+            report["endpoints"][name] = self.benchmark_endpoint(name, method, path, body, concurrency, duration)
+        report["server_metrics"] = self.report_metrics_delta(metrics_before)
+
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"Report written to {report_path}")
+        else:
+            print(output)
+
+        if compare_path:
+            with open(compare_path) as f:
+                baseline = json.load(f)
+            return self.compare_reports(baseline, report, max_regression)
+        return 0
+
+    def _token_worker(self, url, bodies, deadline, latencies, statuses, results, lock):
+        """Post each body from the shared iterator until it runs out or the deadline passes"""
+        session = requests.Session()
+        local_latencies = []
+        local_statuses = Counter()
+        local_results = []
+        try:
+            while deadline is None or time.perf_counter() < deadline:
+                with lock:
+                    body = next(bodies, None)
+                if body is None:
+                    break
+                start = time.perf_counter()
+                try:
+                    response = session.post(url, json=body, timeout=10)
+                    payload = response.json()
+                    local_statuses[str(response.status_code)] += 1
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    local_statuses[type(e).__name__] += 1
+                    continue
+                local_latencies.append((time.perf_counter() - start) * 1000)
+                local_results.append((response.status_code, payload))
+        finally:
+            session.close()
+            with lock:
+                latencies.extend(local_latencies)
+                statuses.update(local_statuses)
+                results.extend(local_results)
+
+    def _token_phase(self, name, path, bodies, concurrency, duration=None):
+        """Drive one token endpoint; returns (benchmark result, [(status, json)])"""
+        url = f"{self.base_url}{path}"
+        latencies, statuses, results = [], Counter(), []
+        lock = threading.Lock()
+        start = time.perf_counter()
+        deadline = start + duration if duration else None
+        workers = [
+            threading.Thread(target=self._token_worker, args=(url, bodies, deadline, latencies, statuses, results, lock))
+            for _ in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        total = sum(statuses.values())
+        ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+        result = {
+            "method": "POST",
+            "path": path,
+            "requests": total,
+            "ok": ok,
+            "statuses": dict(statuses),
+            "requests_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0,
+            "latency_ms": latency_summary(latencies),
+            "histogram": latency_histogram(latencies),
+        }
+        self.log(
+            f"   {name:<20} {result['requests_per_sec']:>9} req/s  "
+            f"p50={result['latency_ms']['p50']}ms p99={result['latency_ms']['p99']}ms  "
+            f"non-2xx={total - ok}"
+        )
+        return result, results
+
+    def run_call_token_benchmark(self, concurrency=16, duration=10.0, replay_sample=200, report_path=None,
+                                 compare_path=None, max_regression=20.0):
+        """Mint, verify and replay call session tokens; report throughput for the server's token mode"""
+        self.log("🚀 Starting CallVault call session token benchmark")
+        self.log(f"   Base URL: {self.base_url}")
+        self.log(f"   Concurrency: {concurrency}, minting for {duration}s")
+
+        metrics_before = self.scrape_metrics()
+        mint_bodies = ({"address": f"bench-token-{i % 64}"} for i in itertools.count())
+        mint, minted = self._token_phase("call_token_mint", "/api/call-session-token", mint_bodies,
+                                         concurrency, duration)
+        tokens = [payload["token"] for status, payload in minted if status == 200 and "token" in payload]
+        modes = Counter(payload.get("tokenMode", "unknown") for status, payload in minted if status == 200)
+        token_mode = modes.most_common(1)[0][0] if modes else "unknown"
+        self.log(f"   Server token mode: {token_mode}, {len(tokens)} tokens minted")
+
+        verify, verified = self._token_phase("call_token_verify", "/api/call-session-token/verify",
+                                             iter([{"token": t, "markUsed": True} for t in tokens]), concurrency)
+        accepted = sum(1 for status, payload in verified if status == 200 and payload.get("valid"))
+
+        sample = tokens[:replay_sample]
+        _, replayed = self._token_phase("call_token_replay", "/api/call-session-token/verify",
+                                        iter([{"token": t, "markUsed": True} for t in sample]), concurrency)
+        replay_reasons = Counter(payload.get("reason", str(status)) for status, payload in replayed)
+        rejected = replay_reasons.get("token_replay", 0)
+        if accepted < len(tokens) or rejected < len(sample):
+            self.log(f"❌ {len(tokens) - accepted} token(s) failed to verify, "
+                     f"{len(sample) - rejected} replay(s) not rejected: {dict(replay_reasons)}")
+        else:
+            self.log(f"✅ All {accepted} tokens verified once; {rejected} replays rejected")
+
+        report = {
+            "benchmark": "call-tokens",
+            "base_url": self.base_url,
+            "token_mode": token_mode,
+            "concurrency": concurrency,
+            "duration_seconds": duration,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "endpoints": {"call_token_mint": mint, "call_token_verify": verify},
+            "verify": {"tokens": len(tokens), "accepted": accepted},
+            "replay": {"sampled": len(sample), "rejected": rejected, "reasons": dict(replay_reasons)},
+        }
+        report["server_metrics"] = self.report_metrics_delta(metrics_before)
+
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"Report written to {report_path}")
+        else:
+            print(output)
+
+        status = 0 if accepted == len(tokens) and rejected == len(sample) else 1
+        if compare_path:
+            with open(compare_path) as f:
+                baseline = json.load(f)
+            self.log(f"   Baseline token mode: {baseline.get('token_mode', 'unknown')}")
+            status = max(status, self.compare_reports(baseline, report, max_regression))
+        return status
+
+    def compare_reports(self, baseline, current, max_regression):
+        """Print per-endpoint deltas; fail if req/s drops or p99 grows by more than max_regression %"""
+        self.log("\n=== COMPARISON WITH BASELINE ===")
+        regressions = []
+        for name, result in current["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(name)
+            if not before:
+                self.log(f"   {name:<20} (not in baseline)")
+                continue
+            rps_delta = _pct_change(before["requests_per_sec"], result["requests_per_sec"])
+            p99_delta = _pct_change(before["latency_ms"]["p99"], result["latency_ms"]["p99"])
+            self.log(f"   {name:<20} req/s {_fmt_pct(rps_delta):>8}   p99 {_fmt_pct(p99_delta):>8}")
+            if (rps_delta is not None and rps_delta < -max_regression) or (p99_delta is not None and p99_delta > max_regression):
+                regressions.append(name)
+        if regressions:
+            self.log(f"💥 Regressions over {max_regression}%: {', '.join(regressions)}")
+            return 1
+        self.log("🎉 No regressions")
+        return 0
+
     def run_all_tests(self):
         """Run all backend tests"""
         self.log("🚀 Starting CallVault Backend API Tests")
         self.log(f"   Base URL: {self.base_url}")
         self.log(f"   Test time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         
+        metrics_before = self.scrape_metrics()
+
         # Run all test suites
         self.test_health_endpoints()
         self.test_diagnostic_endpoints()
@@ -397,6 +869,7 @@ class CallVaultAPITester:
         self.test_call_session_token()
         self.test_websocket_endpoint()
         self.test_server_binding()
+        self.report_metrics_delta(metrics_before)
         
         # Print summary
         self.log("\n" + "="*50)
@@ -421,9 +894,59 @@ class CallVaultAPITester:
             self.log("💥 Backend tests FAILED!")
             return 1
 
+def _pct_change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def _fmt_pct(value):
+    return "n/a" if value is None else f"{value:+.1f}%"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CallVault backend API tests")
+    parser.add_argument("--url", default="http://localhost:3000", help="Server base URL")
+    parser.add_argument("--bench", action="store_true", help="Run the HTTP benchmark instead of functional tests")
+    parser.add_argument("--concurrency", type=int, default=16, help="Pooled connections per endpoint")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to drive each endpoint")
+    parser.add_argument("--endpoints", default=None,
+                        help="Comma-separated endpoint names to benchmark (default: all of "
+                             + ", ".join(e[0] for e in BENCHMARK_ENDPOINTS) + ")")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", default=None, help="Baseline JSON report to diff against")
+    parser.add_argument("--max-regression", type=float, default=20.0,
+                        help="Percent req/s drop or p99 increase that fails --compare")
+    parser.add_argument("--metrics-token", default=None, help="Bearer token for /metrics if METRICS_TOKEN is set")
+    parser.add_argument("--bench-call-tokens", action="store_true",
+                        help="Benchmark call session token mint/verify throughput and replay rejection")
+    parser.add_argument("--replay-sample", type=int, default=200,
+                        help="Consumed tokens to replay in --bench-call-tokens")
+    return parser.parse_args(argv)
+
+
 def main():
     """Main test runner"""
-    tester = CallVaultAPITester()
+    args = parse_args()
+    tester = CallVaultAPITester(args.url, metrics_token=args.metrics_token)
+    if args.bench_call_tokens:
+        return tester.run_call_token_benchmark(
+            concurrency=args.concurrency,
+            duration=args.duration,
+            replay_sample=args.replay_sample,
+            report_path=args.report,
+            compare_path=args.compare,
+            max_regression=args.max_regression,
+        )
+    if args.bench:
+        return tester.run_benchmark(
+            concurrency=args.concurrency,
+            duration=args.duration,
+            only=set(args.endpoints.split(",")) if args.endpoints else None,
+            report_path=args.report,
+            compare_path=args.compare,
+            max_regression=args.max_regression,
+        )
     return tester.run_all_tests()
 
 if __name__ == "__main__":
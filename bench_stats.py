@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Latency and throughput statistics shared by the CallVault test harness scripts
+
+Kept free of third-party imports so any harness can use it without pulling in
+the WebSocket or signing dependencies of the others.
+"""
+
+import math
+import time
+from collections import Counter
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def latency_summary(samples_ms):
+    """Summarize latency samples (ms) as p50/p95/p99/max/mean"""
+    values = sorted(samples_ms)
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None, "mean": None}
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+        "mean": round(sum(values) / len(values), 3),
+    }
+
+
+class PhaseStats:
+    """Per-phase counters collected by the load generator"""
+
+    def __init__(self, name):
+        self.name = name
+        self.attempted = 0
+        self.succeeded = 0
+        self.errors = Counter()
+        self.latencies_ms = []
+        self.first_at = None
+        self.last_at = None
+
+    def record_success(self, latency_ms):
+        now = time.monotonic()
+        self.attempted += 1
+        self.succeeded += 1
+        self.latencies_ms.append(latency_ms)
+        self.first_at = self.first_at or now
+        self.last_at = now
+
+    def record_error(self, error):
+        self.attempted += 1
+        self.errors[type(error).__name__ if isinstance(error, BaseException) else str(error)] += 1
+
+    def report(self):
+        elapsed = (self.last_at - self.first_at) if self.first_at and self.last_at else 0
+        return {
+            "attempted": self.attempted,
+            "succeeded": self.succeeded,
+            "failed": sum(self.errors.values()),
+            "errors": dict(self.errors),
+            "duration_s": round(elapsed, 3),
+            "rate_per_s": round(self.succeeded / elapsed, 2) if elapsed > 0 else None,
+            "latency_ms": latency_summary(self.latencies_ms),
+        }
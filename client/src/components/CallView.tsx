@@ -147,7 +147,8 @@ export function CallView({
       // Buffer WebRTC signaling messages if peer connection isn't ready yet
       const isWebRTCMessage = message.type === 'webrtc:offer' || 
                               message.type === 'webrtc:answer' || 
-                              message.type === 'webrtc:ice';
+                              message.type === 'webrtc:ice' ||
+                              message.type === 'webrtc:ice_batch';
       
       if (isWebRTCMessage && !peerConnectionReadyRef.current) {
         console.log('[CallView] Buffering early message:', message.type);
@@ -445,6 +446,12 @@ export function CallView({
         await handleIceCandidate(message.candidate);
         break;
 
+      case 'webrtc:ice_batch':
+        for (const candidate of message.candidates) {
+          await handleIceCandidate(candidate);
+        }
+        break;
+
       case 'webrtc:peer_offline':
         // Peer went offline during signaling
         console.log(`[CallView] Peer offline during ${(message as any).signalType}`);
@@ -738,11 +745,12 @@ export function CallView({
     };
 
     pc.onicecandidate = (event) => {
-      if (event.candidate && ws && remoteAddressRef.current) {
+      if (ws && remoteAddressRef.current) {
+        // A null candidate is end-of-candidates; the server uses it to flush its ICE batch
         ws.send(JSON.stringify({
           type: 'webrtc:ice',
           to_address: remoteAddressRef.current,
-          candidate: event.candidate.toJSON()
+          candidate: event.candidate ? event.candidate.toJSON() : null
         }));
       }
     };
@@ -917,8 +925,8 @@ export function CallView({
     }
   };
 
-  const handleIceCandidate = async (candidate: RTCIceCandidateInit) => {
-    if (peerConnectionRef.current) {
+  const handleIceCandidate = async (candidate: RTCIceCandidateInit | null) => {
+    if (peerConnectionRef.current && candidate) {
       await peerConnectionRef.current.addIceCandidate(new RTCIceCandidate(candidate));
     }
   };
@@ -37,15 +37,14 @@ export function useGroupCall(ws: WebSocket | null, myAddress: string) {
     const pc = await createPeerConnectionWithICE();
 
     pc.onicecandidate = (event) => {
-      if (event.candidate) {
-        ws.send(JSON.stringify({
-          type: 'mesh:ice',
-          room_id: roomId,
-          to_peer: peerAddress,
-          from_peer: myAddress,
-          candidate: event.candidate.toJSON()
-        } as WSMessage));
-      }
+      // A null candidate is end-of-candidates; the server uses it to flush its ICE batch
+      ws.send(JSON.stringify({
+        type: 'mesh:ice',
+        room_id: roomId,
+        to_peer: peerAddress,
+        from_peer: myAddress,
+        candidate: event.candidate ? event.candidate.toJSON() : null
+      } as WSMessage));
     };
 
     pc.ontrack = (event) => {
@@ -143,6 +142,14 @@ export function useGroupCall(ws: WebSocket | null, myAddress: string) {
     }
   }, []);
 
+  const handleMeshIceBatch = useCallback(async (message: any) => {
+    const peerData = peerConnections.current.get(message.from_peer);
+    if (!peerData) return;
+    for (const candidate of message.candidates) {
+      await peerData.connection.addIceCandidate(new RTCIceCandidate(candidate));
+    }
+  }, []);
+
   const handleMessage = useCallback((message: WSMessage) => {
     switch (message.type) {
       case 'room:created':
@@ -214,8 +221,12 @@ export function useGroupCall(ws: WebSocket | null, myAddress: string) {
       case 'mesh:ice':
         handleMeshIce(message);
         break;
+
+      case 'mesh:ice_batch':
+        handleMeshIceBatch(message);
+        break;
     }
-  }, [myAddress, createPeerConnection, handleMeshOffer, handleMeshAnswer, handleMeshIce]);
+  }, [myAddress, createPeerConnection, handleMeshOffer, handleMeshAnswer, handleMeshIce, handleMeshIceBatch]);
 
   const cleanup = useCallback(() => {
     peerConnections.current.forEach(peer => {
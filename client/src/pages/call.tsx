@@ -382,7 +382,7 @@ export default function CallPage() {
       wsHasBeenConnected.current = true;
       wsReconnectAttempt.current = 0;
       wsLastPong.current = Date.now();
-      websocket.send(JSON.stringify({ type: 'register', address: storedIdentity.address }));
+      websocket.send(JSON.stringify({ type: 'register', address: storedIdentity.address, batch: true, ice_batch: true }));
       
       // Start client-side heartbeat to detect dead connections fast
       wsHeartbeatInterval.current = setInterval(() => {
@@ -415,6 +415,14 @@ export default function CallPage() {
         return;
       }
       
+      // Queued messages replayed on register arrive in batches
+      if (message.type === 'msg:batch') {
+        for (const msg of message.messages) {
+          wsMessageHandlerRef.current?.({ type: 'msg:incoming', message: msg, from_pubkey: '' });
+        }
+        return;
+      }
+      
       // Use ref to always call the latest handler (avoids stale closure)
       if (wsMessageHandlerRef.current) {
         wsMessageHandlerRef.current(message);
@@ -527,6 +535,11 @@ export default function CallPage() {
       });
     }
     
+    // The server ended a call that was still ringing (ringing timeout)
+    if (message.type === 'call:end' && message.from_address) {
+      setIncomingCall(prev => (prev?.from_address === message.from_address ? null : prev));
+    }
+    
     if (message.type === 'call:blocked') {
       toast.error(message.reason);
       pendingCallRef.current = null;
@@ -135,6 +135,33 @@ export function ChatPage({ identity, ws, onBack, convo, onStartCall, isFounder =
         }
       }
 
+      if (data.type === 'msg:batch') {
+        const batch = data.messages.filter(m => m.convo_id === convo.id);
+        if (batch.length > 0) {
+          batch.forEach(saveLocalMessage);
+          setMessages(prev => [...prev, ...batch]);
+
+          if (privacySettings.readReceipts) {
+            ws.send(JSON.stringify({
+              type: 'msg:read',
+              message_ids: batch.map(m => m.id),
+              convo_id: convo.id,
+              reader_address: identity.address
+            }));
+          }
+        }
+      }
+
+      if (data.type === 'msg:delivered_batch') {
+        const ids = data.receipts.filter(r => r.convo_id === convo.id).map(r => r.message_id);
+        ids.forEach(id => updateLocalMessageStatus(id, 'delivered'));
+        if (ids.length > 0) {
+          setMessages(prev => prev.map(m =>
+            ids.includes(m.id) ? { ...m, status: 'delivered', delivered_at: data.delivered_at } : m
+          ));
+        }
+      }
+
       if (data.type === 'msg:delivered' && data.convo_id === convo.id) {
         updateLocalMessageStatus(data.message_id, 'delivered');
         setMessages(prev => prev.map(m => 
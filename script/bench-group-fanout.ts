@@ -0,0 +1,176 @@
+/**
+ * Group fan-out benchmark
+ *
+ * Measures what one msg:typing, msg:reaction or msg:incoming costs the server
+ * to deliver to a --sizes member group where every member has --devices open
+ * sockets. The sockets are in-memory stand-ins that only measure the frame they
+ * are handed, so the numbers are serialization plus loop overhead, without
+ * kernel writes. Two modes run in fresh child processes:
+ *
+ *   legacy  - the previous loop: a fresh object per participant, each passed to
+ *             broadcastToAddress and stringified again
+ *   fanout  - createFanOut() from server/wsFanOut.ts: stringify once, write the
+ *             same string to every socket, skip the sender's devices
+ *
+ * Usage: tsx script/bench-group-fanout.ts [--sizes 10,100,1000] [--devices 2] [--iterations 2000]
+ */
+
+import { fork } from "child_process";
+import { fileURLToPath } from "url";
+import { summarize } from "./bench-utils";
+
+function parseArgs() {
+  const args = process.argv.slice(2);
+  const get = (name: string, fallback: string) => {
+    const idx = args.indexOf(`--${name}`);
+    return idx >= 0 && args[idx + 1] ? args[idx + 1] : fallback;
+  };
+  return {
+    sizes: get("sizes", "10,100,1000").split(",").map(s => parseInt(s, 10)),
+    devices: parseInt(get("devices", "2"), 10),
+    iterations: parseInt(get("iterations", "2000"), 10),
+    mode: get("mode", "fanout"),
+    child: args.includes("--child"),
+  };
+}
+
+// Stands in for a ws WebSocket: OPEN, and send() only looks at the frame's size
+class FakeSocket {
+  readyState = 1;
+  bytes = 0;
+  frames = 0;
+  send(data: string | Buffer) {
+    this.bytes += typeof data === "string" ? Buffer.byteLength(data) : data.length;
+    this.frames++;
+  }
+}
+
+function member(i: number) {
+  return `call:bench_member_${String(i).padStart(6, "0")}`;
+}
+
+function frames(convoId: string, from: string) {
+  const message = {
+    id: "bench_msg_0001",
+    convo_id: convoId,
+    from_address: from,
+    to_address: convoId,
+    timestamp: 1_700_000_000_000,
+    type: "text",
+    content: "Synthetic group message ".padEnd(600, "x"),
+    nonce: "bench_nonce_0001",
+    status: "sent",
+    seq: 1,
+    server_timestamp: 1_700_000_000_000,
+  };
+  return {
+    "msg:typing": () => ({ type: "msg:typing", convo_id: convoId, from_address: from, is_typing: true }),
+    "msg:reaction": () => ({ type: "msg:reaction", message_id: message.id, convo_id: convoId, emoji: "👍", from_address: from }),
+    "msg:incoming": () => ({ type: "msg:incoming", message, from_pubkey: "BenchPubKey1111111111111111111111111111111111" }),
+  };
+}
+
+async function runChild(opts: ReturnType<typeof parseArgs>) {
+  const { createFanOut, wireFrame } = await import("../server/wsFanOut");
+  const results: any[] = [];
+
+  for (const size of opts.sizes) {
+    const participants = Array.from({ length: size }, (_, i) => member(i));
+    const connections = new Map<string, { ws: any; connectionId: string }[]>();
+    for (const address of participants) {
+      connections.set(address, Array.from({ length: opts.devices }, (_, d) => ({ ws: new FakeSocket(), connectionId: `${address}#${d}` })));
+    }
+    const from = participants[0];
+    const convoId = `bench_group_${size}`;
+
+    // The pre-fan-out broadcastToAddress, minus cluster forwarding
+    const broadcastToAddress = (address: string, message: any) => {
+      const conns = connections.get(address);
+      if (!conns) return 0;
+      const frame = wireFrame(message);
+      let sent = 0;
+      for (const conn of conns) {
+        if (conn.ws.readyState === 1) {
+          conn.ws.send(frame.for(conn.ws));
+          sent++;
+        }
+      }
+      return sent;
+    };
+    const fanOut = createFanOut({ connectionsFor: address => connections.get(address) });
+
+    for (const [kind, build] of Object.entries(frames(convoId, from))) {
+      const samples: number[] = [];
+      let sockets = 0;
+      const run = () => {
+        if (opts.mode === "legacy") {
+          for (const address of participants) {
+            if (address !== from) sockets += broadcastToAddress(address, build());
+          }
+        } else {
+          sockets += fanOut(participants, build(), from).sockets;
+        }
+      };
+      for (let i = 0; i < Math.min(100, opts.iterations); i++) run(); // Warm up
+      sockets = 0;
+      const iterations = Math.max(10, Math.round(opts.iterations * 10 / size));
+      for (let i = 0; i < iterations; i++) {
+        const t0 = performance.now();
+        run();
+        samples.push((performance.now() - t0) * 1000);
+      }
+      const stats = summarize(samples);
+      results.push({
+        size,
+        kind,
+        ...stats,
+        nsPerSocket: Math.round((stats.meanUs * 1000) / (sockets / iterations)),
+        socketsPerFanOut: sockets / iterations,
+      });
+    }
+  }
+
+  process.send!({ results });
+}
+
+async function runParent() {
+  const opts = parseArgs();
+  const scriptPath = fileURLToPath(import.meta.url);
+  const byMode: Record<string, any[]> = {};
+
+  for (const mode of ["legacy", "fanout"]) {
+    const child = fork(scriptPath, [
+      "--child", "--mode", mode,
+      "--sizes", opts.sizes.join(","), "--devices", String(opts.devices), "--iterations", String(opts.iterations),
+    ], { stdio: ["ignore", "inherit", "inherit", "ipc"] });
+    const result = await new Promise<any>((resolve, reject) => {
+      child.once("message", resolve);
+      child.once("exit", code => (code ? reject(new Error(`child exited with ${code}`)) : undefined));
+    });
+    child.kill();
+    byMode[mode] = result.results;
+  }
+
+  for (const row of byMode.fanout) {
+    const legacy = byMode.legacy.find(r => r.size === row.size && r.kind === row.kind);
+    console.log(
+      `${String(row.size).padStart(5)} members  ${row.kind.padEnd(13)} ` +
+      `legacy mean=${legacy.meanUs}us p99=${legacy.p99Us}us  fanout mean=${row.meanUs}us p99=${row.p99Us}us  ` +
+      `(${row.socketsPerFanOut} sockets, ${legacy.nsPerSocket} -> ${row.nsPerSocket} ns/socket)`
+    );
+  }
+
+  console.log(JSON.stringify({ benchmark: "group-fanout", devices: opts.devices, results: byMode }, null, 2));
+}
+
+if (parseArgs().child) {
+  runChild(parseArgs()).catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+} else {
+  runParent().catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+}
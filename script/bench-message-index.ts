@@ -0,0 +1,214 @@
+/**
+ * Message store lookup micro-benchmark
+ *
+ * Compares the previous linear scans (Object.values(...).find/.some over every
+ * conversation) with the indexed messageStore for hasMessage() dedup checks and
+ * updateMessageStatus() read receipts at several corpus sizes, and the previous
+ * filter/sort/reduce paging with the bisecting getMessagesSinceSeq(),
+ * getLatestSeq() and getMessages(before) on the first conversation, and the
+ * previous substring scan with the inverted index for global searchMessages().
+ * Raise --messages-per-convo to measure paging on long conversations.
+ *
+ * Usage: tsx script/bench-message-index.ts [--sizes 10,1000,100000,1000000] [--budget-ms 2000]
+ *                                          [--messages-per-convo 500]
+ */
+
+import { fork } from "child_process";
+import * as fs from "fs";
+import * as os from "os";
+import * as path from "path";
+import { fileURLToPath } from "url";
+import type { Message } from "@shared/types";
+import { generateCorpus, MESSAGES_PER_CONVO } from "./bench-utils";
+
+function parseArgs() {
+  const args = process.argv.slice(2);
+  const get = (name: string, fallback: string) => {
+    const idx = args.indexOf(`--${name}`);
+    return idx >= 0 && args[idx + 1] ? args[idx + 1] : fallback;
+  };
+  return {
+    sizes: get("sizes", "10,1000,100000,1000000").split(",").map(Number),
+    budgetMs: parseInt(get("budget-ms", "2000"), 10),
+    messagesPerConvo: parseInt(get("messages-per-convo", String(MESSAGES_PER_CONVO)), 10),
+    child: args.includes("--child"),
+  };
+}
+
+// The pre-index implementations, kept here as the baseline
+function legacyHasMessage(messages: Record<string, Message[]>, messageId: string, nonce: string): boolean {
+  for (const convoMessages of Object.values(messages)) {
+    if (convoMessages.some(m => m.id === messageId || m.nonce === nonce)) {
+      return true;
+    }
+  }
+  return false;
+}
+
+function legacyUpdateMessageStatus(messages: Record<string, Message[]>, messageId: string, status: Message["status"]): void {
+  for (const convoMessages of Object.values(messages)) {
+    const message = convoMessages.find(m => m.id === messageId);
+    if (message) {
+      message.status = status;
+      return;
+    }
+  }
+}
+
+function legacyGetMessagesSinceSeq(convoMessages: Message[], sinceSeq: number, limit: number): Message[] {
+  return convoMessages
+    .filter(m => (m.seq || 0) > sinceSeq)
+    .sort((a, b) => (a.seq || 0) - (b.seq || 0))
+    .slice(0, limit);
+}
+
+function legacyGetLatestSeq(convoMessages: Message[]): number {
+  return convoMessages.reduce((max, m) => Math.max(max, m.seq || 0), 0);
+}
+
+function legacyGetMessages(convoMessages: Message[], limit: number, before: number): Message[] {
+  return convoMessages.filter(m => m.timestamp < before).slice(-limit);
+}
+
+function legacySearchMessages(messages: Record<string, Message[]>, query: string, limit: number): Message[] {
+  const searchLower = query.toLowerCase().trim();
+  const results: Message[] = [];
+  for (const convoMessages of Object.values(messages)) {
+    for (const msg of convoMessages) {
+      if (msg.content && msg.content.toLowerCase().includes(searchLower)) {
+        results.push(msg);
+        if (results.length >= limit) break;
+      }
+    }
+    if (results.length >= limit) break;
+  }
+  return results.sort((a, b) => b.timestamp - a.timestamp).slice(0, limit);
+}
+
+// Run `op` repeatedly until the time budget or 100k iterations; returns mean ns/op
+function timeOp(budgetMs: number, op: (i: number) => void): { ops: number; nsPerOp: number } {
+  const budgetNs = BigInt(budgetMs) * 1_000_000n;
+  const start = process.hrtime.bigint();
+  let ops = 0;
+  while (ops < 100_000 && process.hrtime.bigint() - start < budgetNs) {
+    op(ops);
+    ops++;
+  }
+  return { ops, nsPerOp: Math.round(Number(process.hrtime.bigint() - start) / ops) };
+}
+
+async function runChild(budgetMs: number) {
+  const legacyMessages: Record<string, Message[]> = JSON.parse(
+    fs.readFileSync(path.join(process.cwd(), "data", "messages.json"), "utf-8")
+  );
+  const messageStore = await import("../server/messageStore");
+
+  const ids = Object.values(legacyMessages).flatMap(list => list.map(m => m.id));
+  const pickId = (i: number) => ids[(i * 7919) % ids.length];
+
+  // Paging runs against one conversation: a reconnect a few messages behind,
+  // and a history page from the middle of the conversation
+  const convoId = Object.keys(legacyMessages)[0];
+  const convoMessages = legacyMessages[convoId];
+  const latestSeq = legacyGetLatestSeq(convoMessages);
+  const resumeSeq = Math.max(0, latestSeq - 20);
+  const before = convoMessages[Math.floor(convoMessages.length / 2)].timestamp;
+
+  const results = {
+    hasMessageMiss: {
+      legacy: timeOp(budgetMs, i => legacyHasMessage(legacyMessages, `missing_${i}`, `missing_nonce_${i}`)),
+      indexed: timeOp(budgetMs, i => messageStore.hasMessage(`missing_${i}`, `missing_nonce_${i}`)),
+    },
+    updateMessageStatus: {
+      legacy: timeOp(budgetMs, i => legacyUpdateMessageStatus(legacyMessages, pickId(i), "read")),
+      indexed: timeOp(budgetMs, i => messageStore.updateMessageStatus(pickId(i), "read")),
+    },
+    getMessagesSinceSeq: {
+      legacy: timeOp(budgetMs, () => legacyGetMessagesSinceSeq(convoMessages, resumeSeq, 100)),
+      indexed: timeOp(budgetMs, () => messageStore.getMessagesSinceSeq(convoId, resumeSeq, 100)),
+    },
+    getLatestSeq: {
+      legacy: timeOp(budgetMs, () => legacyGetLatestSeq(convoMessages)),
+      indexed: timeOp(budgetMs, () => messageStore.getLatestSeq(convoId)),
+    },
+    getMessagesBefore: {
+      legacy: timeOp(budgetMs, () => legacyGetMessages(convoMessages, 50, before)),
+      indexed: timeOp(budgetMs, () => messageStore.getMessages(convoId, 50, before)),
+    },
+    // Every synthetic message contains "benchmark"; nothing contains "zebra"
+    searchCommonWord: {
+      legacy: timeOp(budgetMs, () => legacySearchMessages(legacyMessages, "benchmark", 50)),
+      indexed: timeOp(budgetMs, () => messageStore.searchMessages("benchmark", {}, { limit: 50 })),
+    },
+    searchNoMatch: {
+      legacy: timeOp(budgetMs, () => legacySearchMessages(legacyMessages, "zebra", 50)),
+      indexed: timeOp(budgetMs, () => messageStore.searchMessages("zebra", {}, { limit: 50 })),
+    },
+  };
+  messageStore.flushMessageStore();
+  process.send!(results);
+}
+
+async function runParent() {
+  const opts = parseArgs();
+  const scriptPath = fileURLToPath(import.meta.url);
+  const rows: any[] = [];
+
+  for (const size of opts.sizes) {
+    const workDir = fs.mkdtempSync(path.join(os.tmpdir(), "cv-msgindex-bench-"));
+    const corpusMessages = await generateCorpus(path.join(workDir, "data"), Infinity, size, opts.messagesPerConvo);
+
+    const child = fork(scriptPath, ["--child", "--budget-ms", String(opts.budgetMs)], {
+      cwd: workDir,
+      execArgv: [...process.execArgv, "--max-old-space-size=8192"],
+      env: {
+        ...process.env,
+        // WAL mode keeps updateMessageStatus persistence O(1) so only the lookup is measured
+        MESSAGE_STORE_MODE: "wal",
+        MESSAGE_WAL_FSYNC: "never",
+        MESSAGE_WAL_COMPACT_BYTES: String(Number.MAX_SAFE_INTEGER),
+      },
+      stdio: ["ignore", "ignore", "inherit", "ipc"],
+    });
+    const results = await new Promise<any>((resolve, reject) => {
+      child.once("message", resolve);
+      child.once("exit", code => (code ? reject(new Error(`child exited with ${code}`)) : undefined));
+    });
+    child.kill();
+    fs.rmSync(workDir, { recursive: true, force: true });
+
+    for (const [op, byVersion] of Object.entries<any>(results)) {
+      const row = {
+        op,
+        corpusMessages,
+        legacyNsPerOp: byVersion.legacy.nsPerOp,
+        indexedNsPerOp: byVersion.indexed.nsPerOp,
+        speedup: +(byVersion.legacy.nsPerOp / Math.max(1, byVersion.indexed.nsPerOp)).toFixed(1),
+      };
+      rows.push(row);
+      console.log(
+        `${op.padEnd(20)} messages=${String(corpusMessages).padStart(9)} ` +
+        `legacy=${String(row.legacyNsPerOp).padStart(12)}ns indexed=${String(row.indexedNsPerOp).padStart(8)}ns ` +
+        `speedup=${row.speedup}x`
+      );
+    }
+  }
+
+  console.log(JSON.stringify({
+    benchmark: "message-store-index",
+    messagesPerConvo: opts.messagesPerConvo,
+    results: rows,
+  }, null, 2));
+}
+
+if (parseArgs().child) {
+  runChild(parseArgs().budgetMs).catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+} else {
+  runParent().catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+}
@@ -0,0 +1,111 @@
+/**
+ * Message store write benchmark
+ *
+ * Measures per-message addMessage() cost (including persistence) for the
+ * 'snapshot' and 'wal' persistence modes as data/messages.json grows.
+ * Each (mode, size) pair runs in a fresh child process against a generated
+ * corpus in a temporary directory so module state never leaks between runs.
+ *
+ * Usage: tsx script/bench-message-store.ts [--sizes 1,10,100,300] [--messages 200] [--fsync interval]
+ */
+
+import { fork } from "child_process";
+import * as fs from "fs";
+import * as os from "os";
+import * as path from "path";
+import { fileURLToPath } from "url";
+import { generateCorpus, summarize } from "./bench-utils";
+
+function parseArgs() {
+  const args = process.argv.slice(2);
+  const get = (name: string, fallback: string) => {
+    const idx = args.indexOf(`--${name}`);
+    return idx >= 0 && args[idx + 1] ? args[idx + 1] : fallback;
+  };
+  return {
+    sizesMb: get("sizes", "1,10,100,300").split(",").map(Number),
+    messages: parseInt(get("messages", "200"), 10),
+    snapshotMessages: parseInt(get("snapshot-messages", "20"), 10),
+    fsync: get("fsync", "interval"),
+    child: args.includes("--child"),
+  };
+}
+
+async function runChild(messages: number) {
+  const messageStore = await import("../server/messageStore");
+  const samples: number[] = [];
+  for (let i = 0; i < messages; i++) {
+    const start = process.hrtime.bigint();
+    messageStore.addMessage({
+      id: `bench_new_${i}`,
+      convo_id: "bench_live",
+      from_address: "call:bench_live_a",
+      to_address: "call:bench_live_b",
+      timestamp: Date.now(),
+      type: "text",
+      content: "live benchmark message",
+      nonce: `bench_live_nonce_${i}`,
+    });
+    // WAL writes are flushed on the next tick - include that in the sample
+    await new Promise(resolve => setImmediate(resolve));
+    samples.push(Number(process.hrtime.bigint() - start) / 1000);
+  }
+  messageStore.flushMessageStore();
+  process.send!(summarize(samples));
+}
+
+async function runParent() {
+  const opts = parseArgs();
+  const scriptPath = fileURLToPath(import.meta.url);
+  const results: any[] = [];
+
+  for (const sizeMb of opts.sizesMb) {
+    const workDir = fs.mkdtempSync(path.join(os.tmpdir(), "cv-msgstore-bench-"));
+    const corpusMessages = await generateCorpus(path.join(workDir, "data"), sizeMb * 1024 * 1024);
+    const corpusBytes = fs.statSync(path.join(workDir, "data", "messages.json")).size;
+
+    for (const mode of ["wal", "snapshot"]) {
+      const messages = mode === "snapshot" ? Math.min(opts.messages, opts.snapshotMessages) : opts.messages;
+      const child = fork(scriptPath, ["--child", "--messages", String(messages)], {
+        cwd: workDir,
+        execArgv: [...process.execArgv, "--max-old-space-size=8192"],
+        env: {
+          ...process.env,
+          MESSAGE_STORE_MODE: mode,
+          MESSAGE_WAL_FSYNC: opts.fsync,
+          MESSAGE_WAL_COMPACT_BYTES: String(Number.MAX_SAFE_INTEGER),
+        },
+        stdio: ["ignore", "ignore", "inherit", "ipc"],
+      });
+      const summary = await new Promise<any>((resolve, reject) => {
+        child.once("message", resolve);
+        child.once("exit", code => (code ? reject(new Error(`child exited with ${code}`)) : undefined));
+      });
+      child.kill();
+      // Drop the log so the next mode starts from the same corpus
+      fs.rmSync(path.join(workDir, "data", "messages.wal"), { force: true });
+
+      const row = { mode, corpusMb: +(corpusBytes / 1024 / 1024).toFixed(1), corpusMessages, ...summary };
+      results.push(row);
+      console.log(
+        `${mode.padEnd(8)} corpus=${String(row.corpusMb).padStart(7)}MB ` +
+        `mean=${String(row.meanUs).padStart(9)}us p50=${String(row.p50Us).padStart(9)}us p99=${String(row.p99Us).padStart(9)}us`
+      );
+    }
+    fs.rmSync(workDir, { recursive: true, force: true });
+  }
+
+  console.log(JSON.stringify({ benchmark: "message-store-write", fsync: opts.fsync, results }, null, 2));
+}
+
+if (parseArgs().child) {
+  runChild(parseArgs().messages).catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+} else {
+  runParent().catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+}
@@ -0,0 +1,204 @@
+/**
+ * Policy store mutation-burst stress test
+ *
+ * Fires a burst of savePolicy / addToBlocklist / saveRoutingRules calls (what a
+ * flood of policy:update, block:add and routing:update WS frames does) against a
+ * pre-populated store and samples event-loop lag with a 10ms probe timer before,
+ * during and after the burst. Two modes run in fresh child processes:
+ *
+ *   sync       - flushPolicyStoreSync() after every mutation, i.e. the previous
+ *                synchronous whole-map write per update
+ *   coalesced  - the default dirty-tracking + delayed async write
+ *
+ * The coalesced run then verifies the files on disk contain every mutation.
+ *
+ * The sync run is capped at --sync-mutations since each one rewrites a whole file.
+ *
+ * Usage: tsx script/bench-policy-store.ts [--entries 20000] [--rate 2000] [--duration 3] [--sync-mutations 300]
+ */
+
+import { fork } from "child_process";
+import * as fs from "fs";
+import * as os from "os";
+import * as path from "path";
+import { fileURLToPath } from "url";
+import { summarize } from "./bench-utils";
+
+const PROBE_INTERVAL_MS = 10;
+
+function parseArgs() {
+  const args = process.argv.slice(2);
+  const get = (name: string, fallback: string) => {
+    const idx = args.indexOf(`--${name}`);
+    return idx >= 0 && args[idx + 1] ? args[idx + 1] : fallback;
+  };
+  return {
+    entries: parseInt(get("entries", "20000"), 10),
+    rate: parseInt(get("rate", "2000"), 10),
+    durationS: parseFloat(get("duration", "3")),
+    syncMutations: parseInt(get("sync-mutations", "300"), 10),
+    mode: get("mode", "coalesced"),
+    child: args.includes("--child"),
+  };
+}
+
+function owner(i: number) {
+  return `call:bench_owner_${i}`;
+}
+
+function writeFixtures(dataDir: string, entries: number) {
+  const policies: Record<string, unknown> = {};
+  const blocklist: Record<string, unknown[]> = {};
+  const routing: Record<string, unknown[]> = {};
+  for (let i = 0; i < entries; i++) {
+    const address = owner(i);
+    policies[address] = {
+      owner_address: address,
+      allow_calls_from: "contacts",
+      unknown_caller_behavior: "request",
+      max_rings_per_sender: 5,
+      ring_window_minutes: 10,
+      auto_block_after_rejections: 5,
+      updated_at: Date.now(),
+    };
+    blocklist[address] = [{ owner_address: address, blocked_address: `call:bench_spammer_${i}`, blocked_at: Date.now() }];
+    routing[address] = [{ id: `rule_${i}`, owner_address: address, trigger: "missed_call", enabled: true, auto_message: "Call you back soon" }];
+  }
+  fs.mkdirSync(dataDir, { recursive: true });
+  fs.writeFileSync(path.join(dataDir, "policies.json"), JSON.stringify(policies));
+  fs.writeFileSync(path.join(dataDir, "blocklist.json"), JSON.stringify(blocklist));
+  fs.writeFileSync(path.join(dataDir, "routing.json"), JSON.stringify(routing));
+}
+
+// Sample how late a PROBE_INTERVAL_MS timer fires
+function startLagProbe() {
+  const samples: number[] = [];
+  let last = performance.now();
+  const timer = setInterval(() => {
+    const now = performance.now();
+    samples.push(Math.max(0, now - last - PROBE_INTERVAL_MS) * 1000);
+    last = now;
+  }, PROBE_INTERVAL_MS);
+  return {
+    take: () => samples.splice(0, samples.length),
+    stop: () => clearInterval(timer),
+  };
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+async function runChild(opts: ReturnType<typeof parseArgs>) {
+  const policyStore = await import("../server/policyStore");
+  const probe = startLagProbe();
+
+  await sleep(500);
+  const idle = summarize(probe.take());
+
+  let total = Math.round(opts.rate * opts.durationS);
+  if (opts.mode === "sync") {
+    total = Math.min(total, opts.syncMutations);
+  }
+  const perTick = Math.max(1, Math.round(opts.rate / 1000));
+  let issued = 0;
+  const burstStart = performance.now();
+  await new Promise<void>(resolve => {
+    const tick = setInterval(() => {
+      for (let n = 0; n < perTick && issued < total; n++, issued++) {
+        const address = owner(issued % opts.entries);
+        switch (issued % 3) {
+          case 0:
+            policyStore.savePolicy({ ...policyStore.getDefaultPolicy(), owner_address: address, allow_calls_from: "anyone", updated_at: Date.now() });
+            break;
+          case 1:
+            policyStore.addToBlocklist({ owner_address: address, blocked_address: `call:burst_${issued}`, blocked_at: Date.now() });
+            break;
+          case 2:
+            policyStore.saveRoutingRules(address, [{ id: `burst_${issued}`, owner_address: address, trigger: "busy", enabled: true }]);
+            break;
+        }
+        if (opts.mode === "sync") {
+          policyStore.flushPolicyStoreSync();
+        }
+      }
+      if (issued >= total) {
+        clearInterval(tick);
+        resolve();
+      }
+    }, 1);
+  });
+  const burstMs = performance.now() - burstStart;
+  const burst = summarize(probe.take());
+
+  const flushStart = performance.now();
+  await policyStore.flushPolicyStore();
+  const flushMs = performance.now() - flushStart;
+  await sleep(300);
+  const after = summarize(probe.take());
+  probe.stop();
+
+  // Every mutation must be on disk after the final flush
+  const dataDir = path.join(process.cwd(), "data");
+  const policies = JSON.parse(fs.readFileSync(path.join(dataDir, "policies.json"), "utf-8"));
+  const blocklist = JSON.parse(fs.readFileSync(path.join(dataDir, "blocklist.json"), "utf-8"));
+  const routing = JSON.parse(fs.readFileSync(path.join(dataDir, "routing.json"), "utf-8"));
+  let missing = 0;
+  for (let i = 0; i < total; i++) {
+    const address = owner(i % opts.entries);
+    if (i % 3 === 0 && policies[address]?.allow_calls_from !== "anyone") missing++;
+    if (i % 3 === 1 && !blocklist[address]?.some((b: any) => b.blocked_address === `call:burst_${i}`)) missing++;
+    // Later bursts may legitimately replace an owner's rules
+    if (i % 3 === 2 && !routing[address]?.[0]?.id.startsWith("burst_")) missing++;
+  }
+
+  process.send!({
+    mutations: total,
+    achievedRate: Math.round(total / (burstMs / 1000)),
+    finalFlushMs: Math.round(flushMs),
+    missingOnDisk: missing,
+    lagUs: { idle, burst, after },
+  });
+}
+
+async function runParent() {
+  const opts = parseArgs();
+  const scriptPath = fileURLToPath(import.meta.url);
+  const results: any[] = [];
+
+  for (const mode of ["sync", "coalesced"]) {
+    const workDir = fs.mkdtempSync(path.join(os.tmpdir(), "cv-policy-bench-"));
+    writeFixtures(path.join(workDir, "data"), opts.entries);
+    const child = fork(scriptPath, [
+      "--child", "--mode", mode,
+      "--entries", String(opts.entries), "--rate", String(opts.rate), "--duration", String(opts.durationS),
+      "--sync-mutations", String(opts.syncMutations),
+    ], { cwd: workDir, stdio: ["ignore", "inherit", "inherit", "ipc"] });
+    const result = await new Promise<any>((resolve, reject) => {
+      child.once("message", resolve);
+      child.once("exit", code => (code ? reject(new Error(`child exited with ${code}`)) : undefined));
+    });
+    child.kill();
+    fs.rmSync(workDir, { recursive: true, force: true });
+
+    results.push({ mode, ...result });
+    console.log(
+      `${mode.padEnd(10)} mutations=${result.mutations} rate=${result.achievedRate}/s ` +
+      `lag idle p99=${result.lagUs.idle.p99Us}us burst p50=${result.lagUs.burst.p50Us}us ` +
+      `p99=${result.lagUs.burst.p99Us}us max=${result.lagUs.burst.maxUs}us ` +
+      `final flush=${result.finalFlushMs}ms missing=${result.missingOnDisk}`
+    );
+  }
+
+  console.log(JSON.stringify({ benchmark: "policy-store-burst", entries: opts.entries, results }, null, 2));
+}
+
+if (parseArgs().child) {
+  runChild(parseArgs()).catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+} else {
+  runParent().catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+}
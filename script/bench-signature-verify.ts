@@ -0,0 +1,229 @@
+/**
+ * Ed25519 signature verification benchmark
+ *
+ * Verifies a stream of signed msg:send payloads from a small set of senders
+ * (chatty clients resend the same pubkey) while a 10ms probe timer samples
+ * event-loop lag, i.e. how long other sockets' signaling would be held up.
+ * Each mode runs in a fresh child process:
+ *
+ *   legacy    - bs58.decode the pubkey + nacl.sign.detached.verify per frame
+ *   inline    - cached decoded key + verifyDetached()
+ *   batched   - verifyQueued(), one batch per event-loop tick
+ *   workers   - verifyQueued() batches split across --workers threads
+ *
+ * Reports verifications/sec and verifications/sec per core in use. Every
+ * --invalid-every'th signature is corrupted and must be rejected.
+ *
+ * Usage: tsx script/bench-signature-verify.ts [--duration 3] [--senders 100] [--inflight 256] [--workers 4]
+ */
+
+import { fork } from "child_process";
+import * as os from "os";
+import { fileURLToPath } from "url";
+import nacl from "tweetnacl";
+import bs58 from "bs58";
+import { summarize } from "./bench-utils";
+
+const PROBE_INTERVAL_MS = 10;
+const MODES = ["legacy", "inline", "batched", "workers"] as const;
+
+function parseArgs() {
+  const args = process.argv.slice(2);
+  const get = (name: string, fallback: string) => {
+    const idx = args.indexOf(`--${name}`);
+    return idx >= 0 && args[idx + 1] ? args[idx + 1] : fallback;
+  };
+  return {
+    durationS: parseFloat(get("duration", "3")),
+    senders: parseInt(get("senders", "100"), 10),
+    inflight: parseInt(get("inflight", "256"), 10),
+    workers: parseInt(get("workers", String(Math.max(1, os.cpus().length - 1))), 10),
+    invalidEvery: parseInt(get("invalid-every", "50"), 10),
+    mode: get("mode", "inline"),
+    child: args.includes("--child"),
+  };
+}
+
+interface Frame {
+  bytes: Uint8Array;
+  signature: string;
+  pubkey: string;
+  valid: boolean;
+}
+
+// Pre-signed frames so the timed loop only verifies
+function buildFrames(senders: number, invalidEvery: number): Frame[] {
+  const frames: Frame[] = [];
+  const keys = Array.from({ length: senders }, () => nacl.sign.keyPair());
+  for (let i = 0; i < 4096; i++) {
+    const key = keys[i % senders];
+    const pubkey = bs58.encode(key.publicKey);
+    const message = {
+      id: `bench_${i}`,
+      convo_id: `dm_bench_${i % senders}`,
+      from_address: `call:${pubkey}:bench`,
+      to_address: "call:bench_receiver",
+      timestamp: Date.now(),
+      type: "text",
+      content: `Signature benchmark message ${i} `.padEnd(160, "x"),
+      nonce: `nonce_${i}`,
+    };
+    const bytes = new TextEncoder().encode(JSON.stringify(message, Object.keys(message).sort()));
+    const signature = nacl.sign.detached(bytes, key.secretKey);
+    const valid = invalidEvery <= 0 || i % invalidEvery !== invalidEvery - 1;
+    if (!valid) signature[0] ^= 0xff;
+    frames.push({ bytes, signature: bs58.encode(signature), pubkey, valid });
+  }
+  return frames;
+}
+
+// Sample how late a PROBE_INTERVAL_MS timer fires
+function startLagProbe() {
+  const samples: number[] = [];
+  let last = performance.now();
+  const timer = setInterval(() => {
+    const now = performance.now();
+    samples.push(Math.max(0, now - last - PROBE_INTERVAL_MS) * 1000);
+    last = now;
+  }, PROBE_INTERVAL_MS);
+  return {
+    take: () => samples.splice(0, samples.length),
+    stop: () => clearInterval(timer),
+  };
+}
+
+const tick = () => new Promise<void>(resolve => setImmediate(resolve));
+
+async function runChild(opts: ReturnType<typeof parseArgs>) {
+  const verifier = await import("../server/signatureVerifier");
+  const frames = buildFrames(opts.senders, opts.invalidEvery);
+  const mode = opts.mode;
+  if (mode !== "legacy") {
+    verifier.configureVerifier({ mode: mode as "inline" | "batched" | "workers", workers: opts.workers });
+  }
+
+  let verified = 0;
+  let wrong = 0;
+  const check = (frame: Frame, valid: boolean) => {
+    verified++;
+    if (valid !== frame.valid) wrong++;
+  };
+
+  // Warm the key cache and worker threads outside the timed window
+  await Promise.all(frames.slice(0, opts.senders).map(f => verifier.verifyQueued(f.bytes, f.signature, f.pubkey)));
+
+  const probe = startLagProbe();
+  const deadline = performance.now() + opts.durationS * 1000;
+  const start = performance.now();
+  let next = 0;
+
+  if (mode === "legacy" || mode === "inline") {
+    // Synchronous checks, one --inflight sized burst of frames per tick
+    while (performance.now() < deadline) {
+      for (let n = 0; n < opts.inflight; n++) {
+        const frame = frames[next++ % frames.length];
+        let valid: boolean;
+        try {
+          valid = mode === "legacy"
+            ? nacl.sign.detached.verify(frame.bytes, bs58.decode(frame.signature), bs58.decode(frame.pubkey))
+            : verifier.verifyDetached(frame.bytes, frame.signature, frame.pubkey);
+        } catch {
+          valid = false;
+        }
+        check(frame, valid);
+      }
+      await tick();
+    }
+  } else {
+    // Keep --inflight verifications outstanding, like that many busy sockets
+    await new Promise<void>(resolve => {
+      let outstanding = 0;
+      const launch = () => {
+        while (outstanding < opts.inflight && performance.now() < deadline) {
+          const frame = frames[next++ % frames.length];
+          outstanding++;
+          verifier.verifyQueued(frame.bytes, frame.signature, frame.pubkey).then(valid => {
+            outstanding--;
+            check(frame, valid);
+            if (performance.now() < deadline) {
+              launch();
+            } else if (outstanding === 0) {
+              resolve();
+            }
+          });
+        }
+      };
+      launch();
+    });
+  }
+
+  const elapsedS = (performance.now() - start) / 1000;
+  const lag = summarize(probe.take());
+  probe.stop();
+  const cores = mode === "workers" ? Math.min(opts.workers, os.cpus().length) : 1;
+  verifier.shutdownVerifier();
+
+  process.send!({
+    verified,
+    wrong,
+    cores,
+    perSecond: Math.round(verified / elapsedS),
+    perSecondPerCore: Math.round(verified / elapsedS / cores),
+    lagUs: lag,
+    stats: verifier.getVerifierStats(),
+  });
+}
+
+async function runParent() {
+  const opts = parseArgs();
+  const scriptPath = fileURLToPath(import.meta.url);
+  const results: any[] = [];
+
+  for (const mode of MODES) {
+    const child = fork(scriptPath, [
+      "--child", "--mode", mode,
+      "--duration", String(opts.durationS), "--senders", String(opts.senders),
+      "--inflight", String(opts.inflight), "--workers", String(opts.workers),
+      "--invalid-every", String(opts.invalidEvery),
+    ], { stdio: ["ignore", "inherit", "inherit", "ipc"] });
+    const result = await new Promise<any>((resolve, reject) => {
+      child.once("message", resolve);
+      child.once("exit", code => (code ? reject(new Error(`child exited with ${code}`)) : undefined));
+    });
+    child.kill();
+
+    results.push({ mode, ...result });
+    console.log(
+      `${mode.padEnd(8)} ${String(result.perSecond).padStart(8)} verify/s ` +
+      `(${result.perSecondPerCore}/s per core, ${result.cores} core(s)) ` +
+      `lag p50=${result.lagUs.p50Us}us p99=${result.lagUs.p99Us}us max=${result.lagUs.maxUs}us ` +
+      `wrong=${result.wrong}`
+    );
+  }
+
+  const legacy = results[0].perSecond;
+  for (const r of results) {
+    r.speedupVsLegacy = Math.round((r.perSecond / legacy) * 100) / 100;
+  }
+  console.log(JSON.stringify({
+    benchmark: "signature-verify",
+    cpus: os.cpus().length,
+    durationS: opts.durationS,
+    senders: opts.senders,
+    inflight: opts.inflight,
+    workers: opts.workers,
+    results,
+  }, null, 2));
+}
+
+if (parseArgs().child) {
+  runChild(parseArgs()).catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+} else {
+  runParent().catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+}
@@ -0,0 +1,70 @@
+/**
+ * Shared helpers for the server benchmarks in this directory
+ */
+
+import * as fs from "fs";
+import * as path from "path";
+
+export const MESSAGES_PER_CONVO = 500;
+
+export function syntheticMessage(convoId: string, seq: number) {
+  return {
+    id: `bench_${convoId}_${seq}`,
+    convo_id: convoId,
+    from_address: `call:bench_sender_${convoId}`,
+    to_address: `call:bench_receiver_${convoId}`,
+    timestamp: 1_700_000_000_000 + seq,
+    type: "text",
+    content: `Synthetic benchmark message ${seq} `.padEnd(160, "x"),
+    nonce: `nonce_${convoId}_${seq}`,
+    status: "delivered",
+    seq,
+    server_timestamp: 1_700_000_000_000 + seq,
+  };
+}
+
+// Stream a messages.json of roughly `targetBytes` (or `maxMessages`) without holding it in memory
+export async function generateCorpus(
+  dataDir: string,
+  targetBytes: number,
+  maxMessages = Infinity,
+  messagesPerConvo = MESSAGES_PER_CONVO,
+): Promise<number> {
+  fs.mkdirSync(dataDir, { recursive: true });
+  const out = fs.createWriteStream(path.join(dataDir, "messages.json"));
+  let written = 0;
+  let count = 0;
+  let convo = 0;
+  const write = async (chunk: string) => {
+    written += Buffer.byteLength(chunk);
+    if (!out.write(chunk)) await new Promise<void>(resolve => out.once("drain", () => resolve()));
+  };
+
+  await write("{");
+  while (written < targetBytes && count < maxMessages) {
+    const convoId = `bench_convo_${convo}`;
+    const batch = [];
+    const perConvo = Math.min(messagesPerConvo, maxMessages - count);
+    for (let seq = 1; seq <= perConvo; seq++) batch.push(syntheticMessage(convoId, seq));
+    await write(`${convo > 0 ? "," : ""}${JSON.stringify(convoId)}:${JSON.stringify(batch)}`);
+    count += batch.length;
+    convo++;
+  }
+  await write("}");
+  out.end();
+  await new Promise<void>(resolve => out.on("finish", () => resolve()));
+  fs.writeFileSync(path.join(dataDir, "conversations.json"), "[]");
+  return count;
+}
+
+export function summarize(samplesUs: number[]) {
+  const sorted = [...samplesUs].sort((a, b) => a - b);
+  const pick = (p: number) => sorted[Math.min(sorted.length - 1, Math.ceil((p / 100) * sorted.length) - 1)];
+  return {
+    count: sorted.length,
+    meanUs: Math.round(sorted.reduce((a, b) => a + b, 0) / sorted.length),
+    p50Us: Math.round(pick(50)),
+    p99Us: Math.round(pick(99)),
+    maxUs: Math.round(sorted[sorted.length - 1]),
+  };
+}
@@ -0,0 +1,136 @@
+/**
+ * Call deadline scheduler soak test
+ *
+ * Drives server/deadlineScheduler.ts the way the call-state code in
+ * server/routes.ts does, on a simulated clock: --calls calls are started with
+ * ringing, inactivity and duration deadlines, activity keeps pushing the
+ * inactivity deadline back, and some calls are ended early. Every expiry
+ * handler ends its call, which cancels the call's other deadlines (often
+ * siblings due in the same tick) and schedules an expunge.
+ *
+ * Each deadline is checked against a plain Map model: it must fire exactly
+ * once, no earlier than its time and at most one tick late, and never after
+ * being cancelled. The scheduler's pending count must match the model at the
+ * end of every tick.
+ *
+ * Usage: tsx script/soak-deadline-scheduler.ts [--calls 200000] [--tick-ms 250] [--seed 1]
+ */
+
+import { DeadlineScheduler } from "../server/deadlineScheduler";
+
+type Kind = "ringing" | "inactive" | "duration" | "expunge";
+
+function parseArgs() {
+  const args = process.argv.slice(2);
+  const get = (name: string, fallback: string) => {
+    const idx = args.indexOf(`--${name}`);
+    return idx >= 0 && args[idx + 1] ? args[idx + 1] : fallback;
+  };
+  return {
+    calls: parseInt(get("calls", "200000"), 10),
+    tickMs: parseInt(get("tick-ms", "250"), 10),
+    seed: parseInt(get("seed", "1"), 10),
+  };
+}
+
+// Small deterministic PRNG so failures can be replayed with --seed
+function mulberry32(seed: number) {
+  return () => {
+    seed = (seed + 0x6d2b79f5) | 0;
+    let t = Math.imul(seed ^ (seed >>> 15), 1 | seed);
+    t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+function main() {
+  const opts = parseArgs();
+  const random = mulberry32(opts.seed);
+  const model = new Map<string, number>(); // `${id}|${kind}` -> due
+  const errors: string[] = [];
+  let now = Date.now(); // The scheduler starts its wheel at the real clock
+  let fired = 0;
+  let siblingCancels = 0;
+
+  const fail = (message: string) => {
+    if (errors.length < 20) errors.push(message);
+  };
+
+  const endCall = (id: string) => {
+    for (const kind of ["ringing", "inactive", "duration"] as Kind[]) {
+      if (model.delete(`${id}|${kind}`)) siblingCancels++;
+    }
+    scheduler.cancel(id);
+    model.set(`${id}|expunge`, now + 5_000);
+    scheduler.schedule(id, "expunge", now + 5_000);
+  };
+
+  const scheduler = new DeadlineScheduler<Kind>((id, kind, at) => {
+    const key = `${id}|${kind}`;
+    const due = model.get(key);
+    if (due === undefined) return fail(`${key} fired after it was cancelled or already fired`);
+    if (due !== at) fail(`${key} fired with at=${at}, expected ${due}`);
+    if (now < due) fail(`${key} fired ${due - now}ms early`);
+    if (now - due >= opts.tickMs * 2) fail(`${key} fired ${now - due}ms late`);
+    model.delete(key);
+    fired++;
+    if (kind !== "expunge") endCall(id);
+  }, { tickMs: opts.tickMs, autoAdvance: false });
+  scheduler.advance(now);
+
+  const set = (id: string, kind: Kind, at: number) => {
+    model.set(`${id}|${kind}`, at);
+    scheduler.schedule(id, kind, at);
+  };
+
+  const active: string[] = [];
+  const wallStart = performance.now();
+  for (let i = 0; i < opts.calls; i++) {
+    const id = `call_${i}`;
+    // Whole-tick offsets so ringing, inactivity and duration often share a tick
+    const base = now + Math.floor(random() * 8) * opts.tickMs;
+    set(id, "ringing", base + 30_000);
+    set(id, "inactive", base + (random() < 0.5 ? 30_000 : 120_000));
+    if (random() < 0.5) set(id, "duration", base + (random() < 0.5 ? 30_000 : 3_600_000));
+    active.push(id);
+
+    // Activity on a random live call pushes its inactivity deadline back
+    const other = active[Math.floor(random() * active.length)];
+    if (model.has(`${other}|inactive`) && scheduler.extend(other, "inactive", now + 120_000)) {
+      model.set(`${other}|inactive`, now + 120_000);
+    }
+    // A few calls are hung up before anything fires
+    if (random() < 0.05 && model.has(`${other}|ringing`)) endCall(other);
+
+    if (i % 50 === 0) {
+      now += opts.tickMs;
+      scheduler.advance(now);
+      const live = Array.from(model.keys()).length;
+      if (scheduler.size !== live) fail(`t=${now}: scheduler has ${scheduler.size} pending, model has ${live}`);
+    }
+  }
+
+  // Drain
+  const drainUntil = now + 2 * 3_600_000;
+  while (now < drainUntil && model.size > 0) {
+    now += opts.tickMs;
+    scheduler.advance(now);
+  }
+  if (model.size > 0) fail(`${model.size} deadlines never fired, e.g. ${Array.from(model.keys())[0]}`);
+  if (scheduler.size !== 0) fail(`scheduler still reports ${scheduler.size} pending after drain`);
+
+  const result = {
+    benchmark: "deadline-scheduler-soak",
+    calls: opts.calls,
+    seed: opts.seed,
+    fired,
+    siblingCancels,
+    wallSeconds: Math.round((performance.now() - wallStart) / 100) / 10,
+    stats: scheduler.stats(),
+    errors,
+  };
+  console.log(JSON.stringify(result, null, 2));
+  if (errors.length > 0) process.exit(1);
+}
+
+main();
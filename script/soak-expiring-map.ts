@@ -0,0 +1,182 @@
+/**
+ * Nonce / rate-limit expiry soak test
+ *
+ * Replays what checkRateLimit() and the signed-frame nonce checks in
+ * server/routes.ts do for a stream of --senders unique addresses arriving at
+ * --rate per second, on a simulated clock so hours of traffic run in seconds.
+ * Each sender makes one rate-limited call carrying a fresh nonce. Two modes run
+ * in fresh child processes:
+ *
+ *   legacy  - plain Maps: nonces scanned in full every 30s, rate-limit records
+ *             never removed
+ *   wheel   - ExpiringMap timing wheels swept once per simulated second
+ *
+ * Heap (after a forced GC) and entry counts are sampled every --sample-every
+ * senders; the worst single cleanup pause is reported too. With the wheel the
+ * heap should level off once the nonce TTL (15 min) has elapsed.
+ *
+ * Usage: tsx script/soak-expiring-map.ts [--senders 3000000] [--rate 1000] [--sample-every 250000]
+ */
+
+import { fork } from "child_process";
+import { fileURLToPath } from "url";
+
+const NONCE_EXPIRY = 15 * 60 * 1000;
+const RATE_LIMIT_WINDOW = 60 * 1000;
+const LEGACY_CLEANUP_MS = 30 * 1000;
+
+function parseArgs() {
+  const args = process.argv.slice(2);
+  const get = (name: string, fallback: string) => {
+    const idx = args.indexOf(`--${name}`);
+    return idx >= 0 && args[idx + 1] ? args[idx + 1] : fallback;
+  };
+  return {
+    senders: parseInt(get("senders", "3000000"), 10),
+    rate: parseInt(get("rate", "1000"), 10),
+    sampleEvery: parseInt(get("sample-every", "250000"), 10),
+    mode: get("mode", "wheel"),
+    child: args.includes("--child"),
+  };
+}
+
+interface Store {
+  hasNonce(nonce: string, now: number): boolean;
+  addNonce(nonce: string, now: number): void;
+  checkRateLimit(address: string, now: number): boolean;
+  tick(now: number): void;
+  sizes(): { nonces: number; rateLimits: number };
+}
+
+function legacyStore(): Store {
+  const recentNonces = new Map<string, number>();
+  const rateLimitMap = new Map<string, { count: number; resetTime: number }>();
+  let nextCleanup = 0;
+  return {
+    hasNonce: nonce => recentNonces.has(nonce),
+    addNonce: (nonce, now) => void recentNonces.set(nonce, now),
+    checkRateLimit(address, now) {
+      const record = rateLimitMap.get(address);
+      if (!record || now > record.resetTime) {
+        rateLimitMap.set(address, { count: 1, resetTime: now + RATE_LIMIT_WINDOW });
+        return true;
+      }
+      record.count++;
+      return true;
+    },
+    tick(now) {
+      if (now < nextCleanup) return;
+      nextCleanup = now + LEGACY_CLEANUP_MS;
+      for (const [nonce, timestamp] of Array.from(recentNonces.entries())) {
+        if (now - timestamp > NONCE_EXPIRY) recentNonces.delete(nonce);
+      }
+    },
+    sizes: () => ({ nonces: recentNonces.size, rateLimits: rateLimitMap.size }),
+  };
+}
+
+async function wheelStore(): Promise<Store> {
+  const { ExpiringMap } = await import("../server/expiringMap");
+  const recentNonces = new ExpiringMap<number>({ ttlMs: NONCE_EXPIRY, autoSweep: false });
+  const rateLimitMap = new ExpiringMap<{ count: number; resetTime: number }>({ ttlMs: RATE_LIMIT_WINDOW, autoSweep: false });
+  return {
+    hasNonce: (nonce, now) => recentNonces.has(nonce, now),
+    addNonce: (nonce, now) => void recentNonces.set(nonce, now, NONCE_EXPIRY, now),
+    checkRateLimit(address, now) {
+      const record = rateLimitMap.get(address, now);
+      if (!record || now > record.resetTime) {
+        rateLimitMap.set(address, { count: 1, resetTime: now + RATE_LIMIT_WINDOW }, RATE_LIMIT_WINDOW, now);
+        return true;
+      }
+      record.count++;
+      return true;
+    },
+    tick(now) {
+      recentNonces.sweep(now);
+      rateLimitMap.sweep(now);
+    },
+    sizes: () => ({ nonces: recentNonces.size, rateLimits: rateLimitMap.size }),
+  };
+}
+
+function heapMb() {
+  (globalThis as any).gc?.();
+  return Math.round((process.memoryUsage().heapUsed / (1024 * 1024)) * 10) / 10;
+}
+
+async function runChild(opts: ReturnType<typeof parseArgs>) {
+  const store = opts.mode === "legacy" ? legacyStore() : await wheelStore();
+  const samples: { senders: number; simulatedMin: number; heapMb: number; nonces: number; rateLimits: number }[] = [];
+  const start = Date.now();
+  let now = start;
+  let maxPauseMs = 0;
+  let replaysMissed = 0;
+  const wallStart = performance.now();
+
+  for (let i = 0; i < opts.senders; i++) {
+    if (i > 0 && i % opts.rate === 0) {
+      now += 1000;
+      const t0 = performance.now();
+      store.tick(now);
+      maxPauseMs = Math.max(maxPauseMs, performance.now() - t0);
+    }
+    const address = `call:soak_sender_${i}`;
+    const nonce = `nonce_${i}`;
+    store.checkRateLimit(address, now);
+    store.addNonce(nonce, now);
+    // A replay of a nonce seen a second ago must still be caught
+    if (i >= opts.rate && !store.hasNonce(`nonce_${i - opts.rate}`, now)) replaysMissed++;
+
+    if ((i + 1) % opts.sampleEvery === 0) {
+      samples.push({ senders: i + 1, simulatedMin: Math.round((now - start) / 6000) / 10, heapMb: heapMb(), ...store.sizes() });
+    }
+  }
+
+  process.send!({
+    wallSeconds: Math.round((performance.now() - wallStart) / 100) / 10,
+    maxCleanupPauseMs: Math.round(maxPauseMs * 10) / 10,
+    replaysMissed,
+    samples,
+  });
+}
+
+async function runParent() {
+  const opts = parseArgs();
+  const scriptPath = fileURLToPath(import.meta.url);
+  const results: any[] = [];
+
+  for (const mode of ["legacy", "wheel"]) {
+    const child = fork(scriptPath, [
+      "--child", "--mode", mode,
+      "--senders", String(opts.senders), "--rate", String(opts.rate), "--sample-every", String(opts.sampleEvery),
+    ], { execArgv: [...process.execArgv, "--expose-gc"], stdio: ["ignore", "inherit", "inherit", "ipc"] });
+    const result = await new Promise<any>((resolve, reject) => {
+      child.once("message", resolve);
+      child.once("exit", code => (code ? reject(new Error(`child exited with ${code}`)) : undefined));
+    });
+    child.kill();
+
+    results.push({ mode, ...result });
+    console.log(`${mode}: max cleanup pause=${result.maxCleanupPauseMs}ms replays missed=${result.replaysMissed} (${result.wallSeconds}s)`);
+    for (const s of result.samples) {
+      console.log(
+        `  ${String(s.senders).padStart(9)} senders  t=${String(s.simulatedMin).padStart(6)}min  ` +
+        `heap=${String(s.heapMb).padStart(7)}MB  nonces=${s.nonces}  rateLimits=${s.rateLimits}`
+      );
+    }
+  }
+
+  console.log(JSON.stringify({ benchmark: "expiring-map-soak", senders: opts.senders, rate: opts.rate, results }, null, 2));
+}
+
+if (parseArgs().child) {
+  runChild(parseArgs()).catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+} else {
+  runParent().catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+}
@@ -0,0 +1,291 @@
+import { createHmac, randomBytes, timingSafeEqual } from 'crypto';
+import { storage, type CallTokenIssue, type CallTokenRedemption } from './storage';
+import { ExpiringMap } from './expiringMap';
+import { counter, gauge, onCollect } from './metrics';
+
+// Call session tokens for /api/call-session-token.
+//
+// CALL_TOKEN_MODE=database (default) stores every token in call_token_nonces:
+// an insert to mint, then a select and a conditional update to verify.
+//
+// CALL_TOKEN_MODE=stateless puts the claims (address, plan, allowTurn,
+// allowVideo, expiry, nonce) in the token itself, signed with HMAC-SHA256 under
+// CALL_TOKEN_SECRET, so minting and verifying need no database round trip.
+// Replay protection comes from an in-memory filter of consumed nonces. Each
+// nonce is kept until its token expires, and at most CALL_TOKEN_REPLAY_MAX are
+// held. A full filter refuses to consume more tokens rather than forget old
+// ones. Tokens that aren't stateless (minted before the switch, or by a worker
+// still in database mode) are verified against the database as before.
+//
+// Stateless tokens are still recorded in call_token_nonces for audit, off the
+// hot path: mints and redemptions are queued and written in one batch each per
+// CALL_TOKEN_AUDIT_FLUSH_MS. At most CALL_TOKEN_AUDIT_MAX_PENDING rows wait
+// for a flush; past that, while the database is unreachable, rows are dropped
+// and counted rather than held.
+//
+// The filter is per process, so stateless mode is a configuration error with
+// cluster workers, where each worker would accept the same token once.
+
+export type CallTokenMode = 'database' | 'stateless';
+
+export interface CallTokenClaims {
+  userAddress: string;
+  targetAddress?: string;
+  plan: string;
+  allowTurn: boolean;
+  allowVideo: boolean;
+}
+
+export interface MintedCallToken {
+  token: string;
+  nonce: string;
+  issuedAt: Date;
+  expiresAt: Date;
+}
+
+export interface CallTokenVerification {
+  valid: boolean;
+  reason?: string;
+  data?: { userAddress: string; plan: string; allowTurn: boolean; allowVideo: boolean };
+}
+
+export const CALL_TOKEN_TTL_MS = 10 * 60 * 1000; // Same as storage.createCallToken
+
+const TOKEN_PREFIX = 'v1.';
+const MODE: CallTokenMode = process.env.CALL_TOKEN_MODE === 'stateless' ? 'stateless' : 'database';
+const REPLAY_MAX = parseInt(process.env.CALL_TOKEN_REPLAY_MAX || '200000', 10);
+const AUDIT_FLUSH_MS = parseInt(process.env.CALL_TOKEN_AUDIT_FLUSH_MS || '2000', 10);
+const AUDIT_MAX_PENDING = parseInt(process.env.CALL_TOKEN_AUDIT_MAX_PENDING || '50000', 10);
+
+const tokenOps = counter('callvault_call_tokens_total', 'Call session tokens minted and verified, by mode and result');
+const replayFilterSize = gauge('callvault_call_token_replay_filter_entries', 'Consumed stateless token nonces held for replay protection');
+const auditRows = counter('callvault_call_token_audit_rows_total', 'Stateless token audit rows, by kind and result');
+const auditPending = gauge('callvault_call_token_audit_pending', 'Stateless token audit rows waiting for the next flush');
+
+// Compact claim names keep the token short; it goes back and forth on every call setup
+interface TokenPayload {
+  a: string; // userAddress
+  t?: string; // targetAddress
+  p: string; // plan
+  r: 0 | 1; // allowTurn
+  v: 0 | 1; // allowVideo
+  i: number; // issuedAt (ms)
+  e: number; // expiresAt (ms)
+  n: string; // nonce
+}
+
+export class StatelessCallTokens {
+  private used = new ExpiringMap<true>({ ttlMs: CALL_TOKEN_TTL_MS });
+  private counters = { minted: 0, verified: 0, replays: 0, invalid: 0, expired: 0, filterFull: 0 };
+
+  constructor(private readonly secret: Buffer, private readonly replayMax = REPLAY_MAX) {}
+
+  mint(claims: CallTokenClaims, now = Date.now()): MintedCallToken {
+    const nonce = randomBytes(16).toString('base64url');
+    const payload: TokenPayload = {
+      a: claims.userAddress,
+      ...(claims.targetAddress ? { t: claims.targetAddress } : {}),
+      p: claims.plan,
+      r: claims.allowTurn ? 1 : 0,
+      v: claims.allowVideo ? 1 : 0,
+      i: now,
+      e: now + CALL_TOKEN_TTL_MS,
+      n: nonce,
+    };
+    const body = TOKEN_PREFIX + Buffer.from(JSON.stringify(payload)).toString('base64url');
+    this.counters.minted++;
+    return {
+      token: `${body}.${this.sign(body).toString('base64url')}`,
+      nonce,
+      issuedAt: new Date(payload.i),
+      expiresAt: new Date(payload.e),
+    };
+  }
+
+  // Same results as storage.verifyCallToken
+  verify(token: string, markUsed = true, now = Date.now()): CallTokenVerification {
+    const payload = this.open(token);
+    if (!payload) {
+      this.counters.invalid++;
+      return { valid: false, reason: 'token_not_found' };
+    }
+    if (payload.e < now) {
+      this.counters.expired++;
+      return { valid: false, reason: 'token_expired' };
+    }
+    if (this.used.has(payload.n, now)) {
+      this.counters.replays++;
+      return { valid: false, reason: 'token_replay' };
+    }
+    if (markUsed) {
+      if (this.used.size >= this.replayMax) {
+        this.counters.filterFull++;
+        return { valid: false, reason: 'replay_filter_full' };
+      }
+      this.used.set(payload.n, true, payload.e - now + 1, now);
+    }
+    this.counters.verified++;
+    return {
+      valid: true,
+      data: { userAddress: payload.a, plan: payload.p, allowTurn: payload.r === 1, allowVideo: payload.v === 1 },
+    };
+  }
+
+  static isStateless(token: string): boolean {
+    return token.startsWith(TOKEN_PREFIX);
+  }
+
+  private sign(body: string): Buffer {
+    return createHmac('sha256', this.secret).update(body).digest();
+  }
+
+  // The payload of a well-formed token with a valid signature, else undefined
+  private open(token: string): TokenPayload | undefined {
+    const dot = token.lastIndexOf('.');
+    if (!StatelessCallTokens.isStateless(token) || dot <= TOKEN_PREFIX.length) return undefined;
+    const body = token.slice(0, dot);
+    const signature = Buffer.from(token.slice(dot + 1), 'base64url');
+    const expected = this.sign(body);
+    if (signature.length !== expected.length || !timingSafeEqual(signature, expected)) return undefined;
+    try {
+      const payload = JSON.parse(Buffer.from(body.slice(TOKEN_PREFIX.length), 'base64url').toString());
+      if (typeof payload?.a !== 'string' || typeof payload.n !== 'string' || typeof payload.e !== 'number') {
+        return undefined;
+      }
+      return payload;
+    } catch {
+      return undefined;
+    }
+  }
+
+  stats() {
+    return { usedNonces: this.used.size, replayMax: this.replayMax, ...this.counters };
+  }
+}
+
+// Write-behind queue for the call_token_nonces rows of stateless tokens
+export class CallTokenAudit {
+  private issues: CallTokenIssue[] = [];
+  private redemptions: CallTokenRedemption[] = [];
+  private flushing: Promise<void> | null = null;
+  private dropped = 0;
+
+  constructor(private readonly maxPending = AUDIT_MAX_PENDING) {}
+
+  start(intervalMs = AUDIT_FLUSH_MS): void {
+    setInterval(() => void this.flush(), intervalMs).unref();
+  }
+
+  issued(issue: CallTokenIssue): void {
+    this.enqueue(this.issues, issue, 'issue');
+  }
+
+  redeemed(redemption: CallTokenRedemption): void {
+    this.enqueue(this.redemptions, redemption, 'redemption');
+  }
+
+  get pending(): number {
+    return this.issues.length + this.redemptions.length;
+  }
+
+  // Issues are written first so a token minted and redeemed within one
+  // interval has a row for its redemption to update
+  flush(): Promise<void> {
+    if (this.flushing) return this.flushing.then(() => this.flush());
+
+    const issues = this.issues;
+    const redemptions = this.redemptions;
+    this.issues = [];
+    this.redemptions = [];
+    if (issues.length === 0 && redemptions.length === 0) return Promise.resolve();
+
+    this.flushing = (async () => {
+      try {
+        await storage.recordCallTokenIssues(issues);
+        auditRows.inc({ kind: 'issue', result: 'written' }, issues.length);
+      } catch (error) {
+        console.error('[CallToken] Audit flush failed, will retry:', error);
+        issues.forEach(issue => this.enqueue(this.issues, issue, 'issue'));
+        redemptions.forEach(redemption => this.enqueue(this.redemptions, redemption, 'redemption'));
+        return;
+      }
+      try {
+        await storage.recordCallTokenRedemptions(redemptions);
+        auditRows.inc({ kind: 'redemption', result: 'written' }, redemptions.length);
+      } catch (error) {
+        console.error('[CallToken] Audit flush failed, will retry:', error);
+        redemptions.forEach(redemption => this.enqueue(this.redemptions, redemption, 'redemption'));
+      }
+    })().finally(() => {
+      this.flushing = null;
+    });
+    return this.flushing;
+  }
+
+  stats() {
+    return { auditPending: this.pending, auditDropped: this.dropped };
+  }
+
+  private enqueue<T>(queue: T[], row: T, kind: 'issue' | 'redemption'): void {
+    if (this.pending >= this.maxPending) {
+      this.dropped++;
+      auditRows.inc({ kind, result: 'dropped' });
+      return;
+    }
+    queue.push(row);
+  }
+}
+
+function loadSecret(): Buffer {
+  if (process.env.CALL_TOKEN_SECRET) return Buffer.from(process.env.CALL_TOKEN_SECRET);
+  console.warn('[CallToken] CALL_TOKEN_SECRET not set; stateless tokens are signed with a per-process key and stop verifying after a restart');
+  return randomBytes(32);
+}
+
+const stateless = MODE === 'stateless' ? new StatelessCallTokens(loadSecret()) : null;
+const audit = stateless ? new CallTokenAudit() : null;
+audit?.start();
+
+export function callTokenMode(): CallTokenMode {
+  return MODE;
+}
+
+export async function mintCallToken(claims: CallTokenClaims): Promise<MintedCallToken> {
+  if (stateless) {
+    tokenOps.inc({ mode: 'stateless', op: 'mint', result: 'ok' });
+    const minted = stateless.mint(claims);
+    audit!.issued({ ...claims, token: minted.token, nonce: minted.nonce, issuedAt: minted.issuedAt, expiresAt: minted.expiresAt });
+    return minted;
+  }
+  const minted = await storage.createCallToken(claims.userAddress, claims.targetAddress, claims.plan, claims.allowTurn, claims.allowVideo);
+  tokenOps.inc({ mode: 'database', op: 'mint', result: 'ok' });
+  return minted;
+}
+
+export async function verifyCallToken(token: string, markUsed = true, usedByIp?: string): Promise<CallTokenVerification> {
+  if (stateless && StatelessCallTokens.isStateless(token)) {
+    const result = stateless.verify(token, markUsed);
+    tokenOps.inc({ mode: 'stateless', op: 'verify', result: result.reason ?? 'ok' });
+    if (result.valid && markUsed) {
+      audit!.redeemed({ token, usedAt: new Date(), usedByIp });
+    }
+    return result;
+  }
+  const result = await storage.verifyCallToken(token, markUsed, usedByIp);
+  tokenOps.inc({ mode: 'database', op: 'verify', result: result.reason ?? 'ok' });
+  return result;
+}
+
+// Writes queued audit rows now, e.g. before shutdown
+export function flushCallTokenAudit(): Promise<void> {
+  return audit ? audit.flush() : Promise.resolve();
+}
+
+export function getCallTokenStats() {
+  return { mode: MODE, ...(stateless ? stateless.stats() : {}), ...(audit ? audit.stats() : {}) };
+}
+
+onCollect(() => {
+  if (stateless) replayFilterSize.set(stateless.stats().usedNonces);
+  if (audit) auditPending.set(audit.pending);
+});
@@ -72,6 +72,60 @@ const envSchema = z.object({
   AI_INTEGRATIONS_GEMINI_API_KEY: z.string().optional(),
   AI_INTEGRATIONS_GEMINI_BASE_URL: z.string().url().default("https://generativelanguage.googleapis.com"),
   
+  // Local data stores
+  MESSAGE_STORE_MODE: z.enum(["snapshot", "wal"]).default("snapshot"),
+  MESSAGE_WAL_FSYNC: z.enum(["always", "interval", "never"]).default("interval"),
+  MESSAGE_WAL_FSYNC_INTERVAL_MS: z.string().regex(/^\d+$/).optional(),
+  MESSAGE_WAL_COMPACT_BYTES: z.string().regex(/^\d+$/).optional(),
+  MESSAGE_WAL_COMPACT_INTERVAL_MS: z.string().regex(/^\d+$/).optional(),
+  POLICY_FLUSH_DELAY_MS: z.string().regex(/^\d+$/).optional(),
+  LOCAL_DATA_DIR: z.string().optional(),
+  
+  // WebSocket cluster
+  WS_CLUSTER_WORKERS: z.string().regex(/^(\d+|auto)?$/i).optional(),
+  WS_CLUSTER_BUS: z.enum(["ipc", "unix"]).default("ipc"),
+  WS_CLUSTER_SOCKET: z.string().optional(),
+  WS_CLUSTER_STORE_TIMEOUT_MS: z.string().regex(/^\d+$/).optional(),
+  
+  // Signature verification
+  SIGNATURE_VERIFY_MODE: z.enum(["inline", "batched", "workers"]).default("inline"),
+  SIGNATURE_VERIFY_WORKERS: z.string().regex(/^\d+$/).optional(),
+  PUBKEY_CACHE_SIZE: z.string().regex(/^\d+$/).optional(),
+  MAX_TRACKED_NONCES: z.string().regex(/^\d+$/).optional(),
+  MAX_NONCES_PER_KEY: z.string().regex(/^\d+$/).optional(),
+  MAX_RATE_LIMIT_ENTRIES: z.string().regex(/^\d+$/).optional(),
+  
+  // Logging
+  LOG_LEVEL: z.enum(["debug", "info", "warn", "error", "fatal"]).default("info"),
+  LOG_CATEGORIES: z.string().optional(),
+  LOG_SAMPLE: z.string().optional(),
+  LOG_SINK: z.enum(["buffered", "sync"]).default("buffered"),
+  METRICS_TOKEN: z.string().optional(),
+  TIER_CACHE_TTL_MS: z.string().regex(/^\d+$/).optional(),
+  USAGE_CACHE_TTL_MS: z.string().regex(/^\d+$/).optional(),
+  USAGE_FLUSH_INTERVAL_MS: z.string().regex(/^\d+$/).optional(),
+  USAGE_CACHE_MAX_USERS: z.string().regex(/^\d+$/).optional(),
+  STORAGE_CACHE_TTL_MS: z.string().regex(/^\d+$/).optional(),
+  STORAGE_CACHE_NEGATIVE_TTL_MS: z.string().regex(/^\d+$/).optional(),
+  STORAGE_CACHE_MAX_ENTRIES: z.string().regex(/^\d+$/).optional(),
+  WS_PERMESSAGE_DEFLATE: z.enum(["on", "off"]).default("on"),
+  WS_DEFLATE_THRESHOLD: z.string().regex(/^\d+$/).optional(),
+  CALL_TOKEN_MODE: z.enum(["database", "stateless"]).default("database"),
+  CALL_TOKEN_SECRET: z.string().min(32).optional(),
+  CALL_TOKEN_REPLAY_MAX: z.string().regex(/^\d+$/).optional(),
+  CALL_TOKEN_AUDIT_FLUSH_MS: z.string().regex(/^\d+$/).optional(),
+  CALL_TOKEN_AUDIT_MAX_PENDING: z.string().regex(/^\d+$/).optional(),
+  ICE_CACHE_MAX_AGE_S: z.string().regex(/^\d+$/).optional(),
+  TURN_CREDENTIAL_TTL_S: z.string().regex(/^\d+$/).optional(),
+  TURN_CREDENTIAL_POOL_SIZE: z.string().regex(/^\d+$/).optional(),
+  METERED_CACHE_TTL_MS: z.string().regex(/^\d+$/).optional(),
+  CALL_RINGING_TIMEOUT_MS: z.string().regex(/^\d+$/).optional(),
+  CALL_INACTIVITY_TIMEOUT_MS: z.string().regex(/^\d+$/).optional(),
+  CALL_DEADLINE_TICK_MS: z.string().regex(/^\d+$/).optional(),
+  STALE_CALL_SWEEP_MS: z.string().regex(/^\d+$/).optional(),
+  ICE_COALESCE_MS: z.string().regex(/^\d+$/).optional(),
+  ICE_BATCH_MAX: z.string().regex(/^\d+$/).optional(),
+  
   // Build
   BUILD_COMMIT: z.string().default("unknown"),
   BUILD_TIME: z.string().optional(),
@@ -222,6 +276,33 @@ export function validateConfig(): ValidationResult {
       info.push("Google Gemini AI integration configured");
     }
 
+    if (env.MESSAGE_STORE_MODE === "wal") {
+      info.push(`Message store using write-ahead log (fsync: ${env.MESSAGE_WAL_FSYNC})`);
+    }
+
+    if (env.WS_CLUSTER_WORKERS && env.WS_CLUSTER_WORKERS !== "0" && env.WS_CLUSTER_WORKERS !== "1") {
+      info.push(`WebSocket cluster mode: ${env.WS_CLUSTER_WORKERS} workers (bus: ${env.WS_CLUSTER_BUS}); local JSON stores are held by the primary`);
+    }
+
+    if (env.CALL_TOKEN_MODE === "stateless") {
+      info.push("Call session tokens: stateless (HMAC-signed, in-memory replay filter)");
+      const clustered = !!env.WS_CLUSTER_WORKERS && env.WS_CLUSTER_WORKERS !== "0" && env.WS_CLUSTER_WORKERS !== "1";
+      if (clustered) {
+        // The replay filter is per process, so each worker would accept the same token once
+        errors.push("CALL_TOKEN_MODE=stateless cannot be used with cluster workers (the replay filter is per worker); use CALL_TOKEN_MODE=database");
+      } else if (!env.CALL_TOKEN_SECRET) {
+        warnings.push("CALL_TOKEN_SECRET is not set; stateless call tokens use a per-process key and become invalid on restart");
+      }
+    }
+
+    if (env.ICE_COALESCE_MS && env.ICE_COALESCE_MS !== "0") {
+      info.push(`ICE candidate coalescing: ${env.ICE_COALESCE_MS}ms window for clients that register with ice_batch`);
+    }
+
+    if (env.SIGNATURE_VERIFY_MODE !== "inline") {
+      info.push(`Signature verification mode: ${env.SIGNATURE_VERIFY_MODE}`);
+    }
+
     // =============================================================================
     // SECURITY WARNINGS
     // =============================================================================
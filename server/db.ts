@@ -1,6 +1,7 @@
 import { drizzle } from "drizzle-orm/node-postgres";
 import pg from "pg";
 import * as schema from "@shared/schema";
+import { gauge, histogram, onCollect } from "./metrics";
 
 const { Pool } = pg;
 
@@ -14,6 +15,34 @@ const CONNECTION_RETRY_INTERVAL = 30000; // 30 seconds
 const MAX_CONNECTION_RETRIES = 5;
 let connectionRetryCount = 0;
 
+const poolWait = histogram('callvault_db_pool_wait_seconds', 'Time spent waiting to check out a pooled DB client');
+const poolClients = gauge('callvault_db_pool_clients', 'Pooled DB clients by state');
+
+onCollect(() => {
+  if (!pool) return;
+  poolClients.set(pool.totalCount, { state: 'total' });
+  poolClients.set(pool.idleCount, { state: 'idle' });
+  poolClients.set(pool.waitingCount, { state: 'waiting' });
+});
+
+// Time every checkout, including the implicit ones pool.query() makes
+function instrumentPool(target: pg.Pool): void {
+  const connect = target.connect.bind(target) as (...args: any[]) => any;
+  (target as any).connect = (callback?: (err: Error | undefined, client: any, done: any) => void) => {
+    const startedAt = performance.now();
+    if (typeof callback === 'function') {
+      return connect((err: Error | undefined, client: any, done: any) => {
+        poolWait.observeSince(startedAt);
+        callback(err, client, done);
+      });
+    }
+    return connect().then((client: pg.PoolClient) => {
+      poolWait.observeSince(startedAt);
+      return client;
+    });
+  };
+}
+
 // In-memory fallback storage for when database is unavailable
 // WARNING: Data is lost on server restart - only use for development/testing
 export const inMemoryStore = {
@@ -80,6 +109,8 @@ async function initializeDatabase(): Promise<void> {
       } : {})
     });
 
+    instrumentPool(pool);
+
     // Handle pool errors
     pool.on('error', (err) => {
       console.error('Unexpected database pool error:', err);
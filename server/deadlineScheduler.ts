@@ -0,0 +1,207 @@
+// Per-key deadlines (call ringing, inactivity, free-tier duration) on a
+// hierarchical timing wheel.
+//
+// Level 0 has WHEEL_SLOTS slots of tickMs each. Every level above covers
+// WHEEL_SLOTS times the span of the one below. A deadline is filed at the
+// lowest level whose window reaches it. When the clock enters a higher-level
+// slot, that slot's deadlines cascade one level down. Scheduling, cancelling
+// and firing are O(1), and a tick only visits the slots it passes, however
+// many calls are in flight.
+//
+// Pushing a deadline later (activity on a call) only updates its time. The
+// entry stays in its slot and is refiled when the slot comes up. Bringing one
+// earlier moves it. Deadlines past the top level's window wait in its farthest
+// slot and are refiled the same way.
+
+const WHEEL_SLOTS = 64;
+const WHEEL_LEVELS = 4; // 64^4 ticks: 48 days at 250ms
+
+export interface DeadlineSchedulerOptions {
+  tickMs?: number; // Wheel resolution and the most a deadline fires late (default 250ms)
+  autoAdvance?: boolean; // Advance on an unref'd interval timer (default true)
+}
+
+interface Deadline<K extends string> {
+  id: string;
+  kind: K;
+  at: number; // ms
+  level: number;
+  slot: number;
+}
+
+export class DeadlineScheduler<K extends string = string> {
+  private wheels: Set<Deadline<K>>[][];
+  private byId = new Map<string, Map<K, Deadline<K>>>();
+  private readonly tickMs: number;
+  private tick: number; // Last tick processed
+  private pending = 0;
+  private timer: NodeJS.Timeout | null = null;
+  private counters = { scheduled: 0, extended: 0, moved: 0, cancelled: 0, fired: 0, cascaded: 0 };
+
+  constructor(
+    private readonly onExpire: (id: string, kind: K, at: number) => void,
+    options: DeadlineSchedulerOptions = {},
+  ) {
+    this.tickMs = options.tickMs ?? 250;
+    this.wheels = Array.from({ length: WHEEL_LEVELS }, () =>
+      Array.from({ length: WHEEL_SLOTS }, () => new Set<Deadline<K>>()));
+    this.tick = Math.floor(Date.now() / this.tickMs);
+    if (options.autoAdvance !== false) {
+      this.timer = setInterval(() => this.advance(), this.tickMs);
+      this.timer.unref();
+    }
+  }
+
+  get size(): number {
+    return this.pending;
+  }
+
+  // Set (or replace) the `kind` deadline of `id`
+  schedule(id: string, kind: K, at: number): void {
+    const existing = this.byId.get(id)?.get(kind);
+    if (existing) {
+      if (at >= existing.at) {
+        existing.at = at;
+        this.counters.extended++;
+        return;
+      }
+      this.unfile(existing);
+      existing.at = at;
+      this.file(existing);
+      this.counters.moved++;
+      return;
+    }
+    const deadline: Deadline<K> = { id, kind, at, level: 0, slot: 0 };
+    let kinds = this.byId.get(id);
+    if (!kinds) {
+      kinds = new Map();
+      this.byId.set(id, kinds);
+    }
+    kinds.set(kind, deadline);
+    this.file(deadline);
+    this.pending++;
+    this.counters.scheduled++;
+  }
+
+  // Push an existing deadline back to `at`; no-op if `id` has no `kind` deadline
+  extend(id: string, kind: K, at: number): boolean {
+    if (!this.byId.get(id)?.has(kind)) return false;
+    this.schedule(id, kind, at);
+    return true;
+  }
+
+  has(id: string, kind: K): boolean {
+    return !!this.byId.get(id)?.has(kind);
+  }
+
+  // Cancel one deadline of `id`, or all of them without `kind`
+  cancel(id: string, kind?: K): number {
+    const kinds = this.byId.get(id);
+    if (!kinds) return 0;
+    const victims = kind === undefined ? Array.from(kinds.values()) : kinds.has(kind) ? [kinds.get(kind)!] : [];
+    for (const deadline of victims) this.drop(deadline);
+    this.counters.cancelled += victims.length;
+    return victims.length;
+  }
+
+  // Fire everything due by `now`, in tick order
+  advance(now = Date.now()): number {
+    const target = Math.floor(now / this.tickMs);
+    if (this.pending === 0) {
+      this.tick = Math.max(this.tick, target);
+      return 0;
+    }
+    let fired = 0;
+    while (this.tick < target) {
+      const tick = ++this.tick;
+      // Higher levels first: a cascade can land in a lower slot that is also due
+      for (let level = WHEEL_LEVELS - 1; level > 0; level--) {
+        const span = WHEEL_SLOTS ** level;
+        if (tick % span !== 0) continue;
+        const bucket = this.wheels[level][Math.floor(tick / span) % WHEEL_SLOTS];
+        if (bucket.size === 0) continue;
+        const entries = Array.from(bucket);
+        bucket.clear();
+        for (const deadline of entries) this.file(deadline);
+        this.counters.cascaded += entries.length;
+      }
+      const bucket = this.wheels[0][tick % WHEEL_SLOTS];
+      if (bucket.size === 0) continue;
+      const entries = Array.from(bucket);
+      bucket.clear();
+      for (const deadline of entries) {
+        // An earlier handler this tick may have cancelled or moved it
+        if (!this.isCurrent(deadline) || this.wheels[deadline.level][deadline.slot].has(deadline)) continue;
+        if (deadline.at > now) {
+          this.file(deadline); // Extended since it was filed
+          continue;
+        }
+        this.drop(deadline);
+        fired++;
+        this.counters.fired++;
+        try {
+          this.onExpire(deadline.id, deadline.kind, deadline.at);
+        } catch (error) {
+          console.error(`[Deadlines] ${deadline.kind} handler failed for ${deadline.id}:`, error);
+        }
+      }
+      if (this.pending === 0) {
+        this.tick = target;
+        break;
+      }
+    }
+    return fired;
+  }
+
+  stats() {
+    const byKind: Record<string, number> = {};
+    this.byId.forEach(kinds => kinds.forEach((_, kind) => {
+      byKind[kind] = (byKind[kind] ?? 0) + 1;
+    }));
+    return { pending: this.pending, tickMs: this.tickMs, byKind, ...this.counters };
+  }
+
+  close(): void {
+    if (this.timer) clearInterval(this.timer);
+    this.timer = null;
+  }
+
+  // File a deadline at the lowest level whose window reaches it. Anything due
+  // by the current tick goes in the next level 0 slot.
+  private file(deadline: Deadline<K>) {
+    const due = Math.max(Math.floor(deadline.at / this.tickMs), this.tick + 1);
+    for (let level = 0; level < WHEEL_LEVELS; level++) {
+      const span = WHEEL_SLOTS ** level;
+      if (Math.floor(due / span) - Math.floor(this.tick / span) < WHEEL_SLOTS) {
+        this.place(deadline, level, Math.floor(due / span) % WHEEL_SLOTS);
+        return;
+      }
+    }
+    // Beyond the top window: park in its farthest slot and refile on cascade
+    const span = WHEEL_SLOTS ** (WHEEL_LEVELS - 1);
+    this.place(deadline, WHEEL_LEVELS - 1, (Math.floor(this.tick / span) + WHEEL_SLOTS - 1) % WHEEL_SLOTS);
+  }
+
+  private place(deadline: Deadline<K>, level: number, slot: number) {
+    deadline.level = level;
+    deadline.slot = slot;
+    this.wheels[level][slot].add(deadline);
+  }
+
+  private unfile(deadline: Deadline<K>) {
+    this.wheels[deadline.level][deadline.slot].delete(deadline);
+  }
+
+  private isCurrent(deadline: Deadline<K>): boolean {
+    return this.byId.get(deadline.id)?.get(deadline.kind) === deadline;
+  }
+
+  private drop(deadline: Deadline<K>) {
+    if (!this.isCurrent(deadline)) return;
+    this.unfile(deadline);
+    const kinds = this.byId.get(deadline.id)!;
+    kinds.delete(deadline.kind);
+    if (kinds.size === 0) this.byId.delete(deadline.id);
+    this.pending--;
+  }
+}
@@ -0,0 +1,158 @@
+// Bounded key/value map whose entries expire after a TTL.
+//
+// Expiry runs on a hashed timing wheel: every entry is filed in the slot for the
+// tick its deadline falls in, and each sweep only visits the slots the clock has
+// passed since the last one, so the cost of expiring an entry is O(1) amortized
+// instead of a full scan of the map. Entries whose deadline is more than one
+// wheel revolution away stay in their slot and are skipped until their round
+// comes up. Reads also check the deadline, so an entry is never returned after
+// it expires even if its slot hasn't been swept yet.
+//
+// maxEntries caps memory. Once full, the oldest inserted entries are evicted,
+// or with whenFull: 'reject' new keys are refused instead. Use that for replay
+// filters, where evicting an unexpired key would let it be replayed.
+
+export interface ExpiringMapOptions {
+  ttlMs: number; // Default time to live for set()
+  tickMs?: number; // Wheel resolution (default 1s)
+  slots?: number; // Wheel size (default: enough ticks to cover ttlMs)
+  maxEntries?: number;
+  whenFull?: 'evict' | 'reject'; // What set() does with a new key once full (default 'evict')
+  autoSweep?: boolean; // Sweep on an unref'd interval timer (default true)
+}
+
+interface Entry<V> {
+  value: V;
+  expiresAt: number;
+  slot: number;
+}
+
+export class ExpiringMap<V> {
+  private entries = new Map<string, Entry<V>>();
+  private wheel: Set<string>[];
+  private readonly ttlMs: number;
+  private readonly tickMs: number;
+  private readonly maxEntries: number;
+  private readonly evictWhenFull: boolean;
+  private lastTick: number;
+  private timer: NodeJS.Timeout | null = null;
+  private counters = { expired: 0, evicted: 0, rejected: 0 };
+
+  constructor(options: ExpiringMapOptions) {
+    this.ttlMs = options.ttlMs;
+    this.tickMs = options.tickMs ?? 1000;
+    this.maxEntries = options.maxEntries ?? Infinity;
+    this.evictWhenFull = options.whenFull !== 'reject';
+    const slots = options.slots ?? Math.ceil(this.ttlMs / this.tickMs) + 1;
+    this.wheel = Array.from({ length: slots }, () => new Set<string>());
+    this.lastTick = Math.floor(Date.now() / this.tickMs);
+    if (options.autoSweep !== false) {
+      this.timer = setInterval(() => this.sweep(), this.tickMs);
+      this.timer.unref();
+    }
+  }
+
+  get size(): number {
+    return this.entries.size;
+  }
+
+  get(key: string, now = Date.now()): V | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) return undefined;
+    if (entry.expiresAt <= now) {
+      this.remove(key, entry);
+      this.counters.expired++;
+      return undefined;
+    }
+    return entry.value;
+  }
+
+  has(key: string, now = Date.now()): boolean {
+    return this.get(key, now) !== undefined;
+  }
+
+  // Insert `key` only if it is absent (or expired) and there is room for it
+  add(key: string, value: V, ttlMs = this.ttlMs, now = Date.now()): boolean {
+    if (this.has(key, now) || !this.hasRoom(now)) return false;
+    this.set(key, value, ttlMs, now);
+    return true;
+  }
+
+  set(key: string, value: V, ttlMs = this.ttlMs, now = Date.now()): this {
+    const existing = this.entries.get(key);
+    if (existing) {
+      this.remove(key, existing);
+    } else if (!this.evictWhenFull && !this.hasRoom(now)) {
+      return this;
+    }
+
+    const expiresAt = now + ttlMs;
+    const slot = Math.floor(expiresAt / this.tickMs) % this.wheel.length;
+    this.entries.set(key, { value, expiresAt, slot });
+    this.wheel[slot].add(key);
+
+    if (this.entries.size > this.maxEntries) {
+      const oldest = this.entries.keys().next().value!;
+      this.remove(oldest, this.entries.get(oldest)!);
+      this.counters.evicted++;
+    }
+    return this;
+  }
+
+  delete(key: string): boolean {
+    const entry = this.entries.get(key);
+    if (!entry) return false;
+    this.remove(key, entry);
+    return true;
+  }
+
+  // Expire everything whose deadline passed since the last sweep
+  sweep(now = Date.now()): number {
+    const tick = Math.floor(now / this.tickMs);
+    // After a long stall every slot is due; visit each one once
+    const ticks = Math.min(tick - this.lastTick, this.wheel.length);
+    let expired = 0;
+    for (let i = ticks - 1; i >= 0; i--) {
+      const bucket = this.wheel[(tick - i) % this.wheel.length];
+      for (const key of bucket) {
+        const entry = this.entries.get(key)!;
+        if (entry.expiresAt <= now) {
+          this.remove(key, entry);
+          expired++;
+        }
+      }
+    }
+    this.lastTick = Math.max(this.lastTick, tick);
+    this.counters.expired += expired;
+    return expired;
+  }
+
+  stats() {
+    return {
+      size: this.entries.size,
+      maxEntries: this.maxEntries,
+      slots: this.wheel.length,
+      ...this.counters,
+    };
+  }
+
+  close(): void {
+    if (this.timer) clearInterval(this.timer);
+    this.timer = null;
+  }
+
+  // In reject mode, sweep anything expired but not yet swept before refusing
+  private hasRoom(now: number): boolean {
+    if (this.entries.size < this.maxEntries) return true;
+    if (this.evictWhenFull) return true;
+    this.sweep(now);
+    if (this.entries.size < this.maxEntries) return true;
+    this.counters.rejected++;
+    return false;
+  }
+
+  private remove(key: string, entry: Entry<V>) {
+    this.entries.delete(key);
+    this.wheel[entry.slot].delete(key);
+  }
+}
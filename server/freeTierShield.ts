@@ -1,4 +1,6 @@
 import { storage } from './storage';
+import { isDatabaseAvailable } from './db';
+import { usageCache } from './usageCache';
 import type { UsageCounter, ActiveCall } from '@shared/schema';
 
 // Free tier limits
@@ -63,13 +65,12 @@ export class FreeTierShield {
     }
   ): Promise<ShieldCheckResult> {
     // Check if database is available - if not, allow all calls (demo mode)
-    const { isDatabaseAvailable } = await import('./db');
     if (!isDatabaseAvailable()) {
       console.log('[FreeTierShield] No database - allowing call in demo mode');
       return { allowed: true, maxDurationSeconds: FREE_TIER_LIMITS.MAX_CALL_DURATION_SECONDS };
     }
     
-    const tier = await storage.getUserTier(callerAddress);
+    const tier = await usageCache.getTier(callerAddress);
     
     // Admin and paid users bypass all limits
     if (tier === 'admin' || tier === 'paid') {
@@ -77,7 +78,7 @@ export class FreeTierShield {
     }
 
     // Free tier checks
-    const counter = await storage.getOrCreateUsageCounter(callerAddress);
+    const counter = await usageCache.getCounter(callerAddress);
 
     // B.3) Free users cannot join group calls
     if (options?.isGroupCall) {
@@ -145,8 +146,8 @@ export class FreeTierShield {
     }
 
     // Concurrent call check: only 1 call at a time for free users
-    const activeCalls = await storage.getActiveCallsForUser(callerAddress);
-    if (activeCalls.length >= FREE_TIER_LIMITS.MAX_CONCURRENT_CALLS) {
+    const activeCallCount = await usageCache.activeCallCount(callerAddress);
+    if (activeCallCount >= FREE_TIER_LIMITS.MAX_CONCURRENT_CALLS) {
       return {
         allowed: false,
         errorCode: 'LIMIT_DAILY_CALLS',
@@ -179,12 +180,11 @@ export class FreeTierShield {
     }
   ): Promise<ShieldCheckResult> {
     // Check if database is available - if not, allow all calls (demo mode)
-    const { isDatabaseAvailable } = await import('./db');
     if (!isDatabaseAvailable()) {
       return { allowed: true };
     }
     
-    const tier = await storage.getUserTier(calleeAddress);
+    const tier = await usageCache.getTier(calleeAddress);
     
     // Admin and paid users can receive any call
     if (tier === 'admin' || tier === 'paid') {
@@ -206,9 +206,9 @@ export class FreeTierShield {
 
   // Record call attempt (always call this before starting)
   static async recordCallAttempt(callerAddress: string): Promise<void> {
-    const tier = await storage.getUserTier(callerAddress);
+    const tier = await usageCache.getTier(callerAddress);
     if (tier === 'free') {
-      await storage.incrementCallAttempts(callerAddress);
+      await usageCache.incrementCallAttempts(callerAddress);
     }
   }
 
@@ -218,19 +218,19 @@ export class FreeTierShield {
     calleeAddress: string,
     callSessionId: string
   ): Promise<ActiveCall> {
-    const callerTier = await storage.getUserTier(callerAddress);
-    const calleeTier = await storage.getUserTier(calleeAddress);
+    const callerTier = await usageCache.getTier(callerAddress);
+    const calleeTier = await usageCache.getTier(calleeAddress);
 
     // Increment daily counter for free users
     if (callerTier === 'free') {
-      await storage.incrementCallsStarted(callerAddress);
+      await usageCache.incrementCallsStarted(callerAddress);
     }
 
     // Calculate max duration
     let maxDuration = 0; // 0 = unlimited
     if (callerTier === 'free' || calleeTier === 'free') {
-      const callerCounter = await storage.getOrCreateUsageCounter(callerAddress);
-      const calleeCounter = await storage.getOrCreateUsageCounter(calleeAddress);
+      const callerCounter = await usageCache.getCounter(callerAddress);
+      const calleeCounter = await usageCache.getCounter(calleeAddress);
       
       // Use the more restrictive limit
       let callerMax = callerTier === 'free' ? FREE_TIER_LIMITS.MAX_CALL_DURATION_SECONDS : Infinity;
@@ -250,7 +250,7 @@ export class FreeTierShield {
 
     // Create active call record
     const now = new Date();
-    return storage.createActiveCall({
+    const activeCall = await storage.createActiveCall({
       callSessionId,
       callerAddress,
       calleeAddress,
@@ -262,13 +262,15 @@ export class FreeTierShield {
       relayUsed: false,
       maxDurationSeconds: maxDuration || null,
     });
+    usageCache.callStarted(activeCall);
+    return activeCall;
   }
 
   // Record failed call start
   static async recordFailedStart(callerAddress: string): Promise<void> {
-    const tier = await storage.getUserTier(callerAddress);
+    const tier = await usageCache.getTier(callerAddress);
     if (tier === 'free') {
-      await storage.incrementFailedStarts(callerAddress);
+      await usageCache.incrementFailedStarts(callerAddress);
     }
   }
 
@@ -278,7 +280,7 @@ export class FreeTierShield {
     userAddress: string,
     isRelay?: boolean
   ): Promise<{ shouldTerminate: boolean; reason?: string; remainingSeconds?: number }> {
-    const activeCall = await storage.getActiveCall(callSessionId);
+    const activeCall = await usageCache.getActiveCall(callSessionId);
     if (!activeCall) {
       return { shouldTerminate: true, reason: 'Call not found' };
     }
@@ -286,17 +288,8 @@ export class FreeTierShield {
     const now = new Date();
     const isCaller = activeCall.callerAddress === userAddress;
     
-    // Update heartbeat
-    const updates: Partial<ActiveCall> = isCaller
-      ? { lastHeartbeatCaller: now }
-      : { lastHeartbeatCallee: now };
-
-    // Track relay usage
-    if (isRelay && !activeCall.relayUsed) {
-      updates.relayUsed = true;
-    }
-
-    await storage.updateActiveCall(callSessionId, updates);
+    // Update heartbeat and relay usage (written behind in the next batch)
+    usageCache.recordHeartbeat(activeCall, isCaller, isRelay);
 
     // Check if call should be terminated due to duration limit
     if (activeCall.maxDurationSeconds && activeCall.maxDurationSeconds > 0) {
@@ -322,43 +315,49 @@ export class FreeTierShield {
     callSessionId: string,
     durationSeconds: number
   ): Promise<void> {
+    // Read the row after pending heartbeats land: relay usage may have been
+    // reported to another worker
+    await usageCache.flush();
     const activeCall = await storage.getActiveCall(callSessionId);
     if (!activeCall) return;
 
     // Update monthly seconds for free users
     if (activeCall.callerTier === 'free') {
-      await storage.addSecondsUsed(activeCall.callerAddress, durationSeconds);
+      await usageCache.addSecondsUsed(activeCall.callerAddress, durationSeconds);
     }
     if (activeCall.calleeTier === 'free' && activeCall.calleeAddress !== activeCall.callerAddress) {
-      await storage.addSecondsUsed(activeCall.calleeAddress, durationSeconds);
+      await usageCache.addSecondsUsed(activeCall.calleeAddress, durationSeconds);
     }
 
     // Handle relay penalty (E)
     if (activeCall.relayUsed) {
       if (activeCall.callerTier === 'free') {
-        const counter = await storage.incrementRelayCalls(activeCall.callerAddress);
+        const counter = await usageCache.incrementRelayCalls(activeCall.callerAddress);
         if ((counter.relayCalls24h || 0) >= FREE_TIER_LIMITS.RELAY_CALLS_THRESHOLD_24H) {
           const penaltyEnd = new Date();
           penaltyEnd.setDate(penaltyEnd.getDate() + FREE_TIER_LIMITS.RELAY_PENALTY_DURATION_DAYS);
-          await storage.updateUsageCounter(activeCall.callerAddress, { relayPenaltyUntil: penaltyEnd });
+          await usageCache.setRelayPenalty(activeCall.callerAddress, penaltyEnd);
         }
       }
       if (activeCall.calleeTier === 'free') {
-        const counter = await storage.incrementRelayCalls(activeCall.calleeAddress);
+        const counter = await usageCache.incrementRelayCalls(activeCall.calleeAddress);
         if ((counter.relayCalls24h || 0) >= FREE_TIER_LIMITS.RELAY_CALLS_THRESHOLD_24H) {
           const penaltyEnd = new Date();
           penaltyEnd.setDate(penaltyEnd.getDate() + FREE_TIER_LIMITS.RELAY_PENALTY_DURATION_DAYS);
-          await storage.updateUsageCounter(activeCall.calleeAddress, { relayPenaltyUntil: penaltyEnd });
+          await usageCache.setRelayPenalty(activeCall.calleeAddress, penaltyEnd);
         }
       }
     }
 
     // Delete active call record
     await storage.deleteActiveCall(callSessionId);
+    usageCache.callEnded(activeCall);
   }
 
   // Check stale calls and terminate them (server-side monitoring)
   static async terminateStaleCalls(): Promise<string[]> {
+    // Buffered heartbeats must be in the table before judging staleness
+    await usageCache.flush();
     const staleCalls = await storage.getStaleActiveCalls(FREE_TIER_LIMITS.HEARTBEAT_TIMEOUT_SECONDS);
     const terminatedIds: string[] = [];
 
@@ -374,7 +373,7 @@ export class FreeTierShield {
 
   // Check if call should be terminated due to duration limit
   static async checkCallDuration(callSessionId: string): Promise<{ shouldTerminate: boolean; reason?: string }> {
-    const activeCall = await storage.getActiveCall(callSessionId);
+    const activeCall = await usageCache.getActiveCall(callSessionId);
     if (!activeCall) {
       return { shouldTerminate: true, reason: 'Call not found' };
     }
@@ -426,7 +425,7 @@ export class FreeTierShield {
     userAddress: string,
     feature: 'recording' | 'transcription' | 'media_upload' | 'analytics_export' | 'background_persistence'
   ): Promise<boolean> {
-    const tier = await storage.getUserTier(userAddress);
+    const tier = await usageCache.getTier(userAddress);
     return tier === 'free';
   }
 
@@ -439,7 +438,7 @@ export class FreeTierShield {
     hasRelayPenalty: boolean;
     maxCallDurationSeconds: number;
   }> {
-    const tier = await storage.getUserTier(userAddress);
+    const tier = await usageCache.getTier(userAddress);
     
     if (tier !== 'free') {
       return {
@@ -452,7 +451,7 @@ export class FreeTierShield {
       };
     }
 
-    const counter = await storage.getOrCreateUsageCounter(userAddress);
+    const counter = await usageCache.getCounter(userAddress);
     const hasRelayPenalty = counter.relayPenaltyUntil ? new Date(counter.relayPenaltyUntil) > new Date() : false;
 
     return {
@@ -0,0 +1,138 @@
+import { WebSocket } from 'ws';
+import { counter } from './metrics';
+
+// ICE candidate coalescing for the webrtc:ice and mesh:ice relays.
+//
+// A peer trickles its candidates as separate frames, usually a handful within
+// a few milliseconds. When ICE_COALESCE_MS is set and the recipient's socket
+// opted in (register with ice_batch: true), candidates going the same way
+// (one call or mesh peer pair, one direction) are held for up to that long
+// and relayed as a single webrtc:ice_batch / mesh:ice_batch frame. A batch is
+// flushed early when it reaches ICE_BATCH_MAX candidates or the sender
+// signals end-of-candidates (a null or empty candidate); the end marker
+// itself becomes `complete: true` on the batch.
+//
+// Recipients that didn't opt in keep getting one frame per candidate and
+// never see end markers.
+
+export type IceRelayKind = 'webrtc:ice' | 'mesh:ice';
+
+export interface IceBatch {
+  key: string;
+  kind: IceRelayKind;
+  to: string; // Recipient address
+  sender: WebSocket;
+  base: Record<string, unknown>; // Routing fields copied onto every frame (to_address, room_id, ...)
+  candidates: unknown[];
+  complete: boolean;
+}
+
+const WINDOW_MS = parseInt(process.env.ICE_COALESCE_MS || '0', 10);
+const MAX_BATCH = Math.max(1, parseInt(process.env.ICE_BATCH_MAX || '32', 10));
+
+const candidatesBatched = counter('callvault_ice_candidates_batched_total', 'ICE candidates relayed inside a batch frame, by relay');
+const batchesSent = counter('callvault_ice_batches_total', 'ICE batch frames flushed, by relay and trigger (window, end, full)');
+
+// Sockets whose client understands *_ice_batch frames
+const iceBatchSockets = new WeakSet<WebSocket>();
+
+export function acceptIceBatches(ws: WebSocket) {
+  iceBatchSockets.add(ws);
+}
+
+export function acceptsIceBatches(ws: WebSocket): boolean {
+  return iceBatchSockets.has(ws);
+}
+
+// RTCPeerConnection signals end-of-candidates with a null candidate, and
+// addIceCandidate() accepts an empty candidate string for the same thing
+export function isEndOfCandidates(candidate: any): boolean {
+  return candidate == null || candidate.candidate === '';
+}
+
+// The frame for a whole batch
+export function batchFrame(batch: IceBatch) {
+  return {
+    ...batch.base,
+    type: `${batch.kind}_batch`,
+    candidates: batch.candidates,
+    ...(batch.complete ? { complete: true } : {}),
+  };
+}
+
+// One frame per candidate, for a recipient that can't take the batch after all
+export function singleFrames(batch: IceBatch) {
+  return batch.candidates.map(candidate => ({ ...batch.base, type: batch.kind, candidate }));
+}
+
+interface Pending {
+  batch: IceBatch;
+  timer: NodeJS.Timeout;
+}
+
+export class IceCoalescer {
+  private pending = new Map<string, Pending>();
+  private counters = { candidates: 0, batches: 0, window: 0, end: 0, full: 0, dropped: 0 };
+
+  constructor(
+    private readonly deliver: (batch: IceBatch) => void,
+    readonly windowMs = WINDOW_MS,
+    private readonly maxBatch = MAX_BATCH,
+  ) {}
+
+  get enabled(): boolean {
+    return this.windowMs > 0;
+  }
+
+  // Queue one candidate (or an end marker) for `key`
+  add(key: string, kind: IceRelayKind, to: string, base: Record<string, unknown>, candidate: unknown, sender: WebSocket): void {
+    let entry = this.pending.get(key);
+    if (!entry) {
+      const batch: IceBatch = { key, kind, to, sender, base, candidates: [], complete: false };
+      entry = { batch, timer: setTimeout(() => this.flush(key, 'window'), this.windowMs) };
+      this.pending.set(key, entry);
+    }
+    if (isEndOfCandidates(candidate)) {
+      entry.batch.complete = true;
+      this.flush(key, 'end');
+      return;
+    }
+    entry.batch.candidates.push(candidate);
+    if (entry.batch.candidates.length >= this.maxBatch) this.flush(key, 'full');
+  }
+
+  flush(key: string, trigger: 'window' | 'end' | 'full' = 'window'): void {
+    const entry = this.pending.get(key);
+    if (!entry) return;
+    clearTimeout(entry.timer);
+    this.pending.delete(key);
+    const { batch } = entry;
+    if (batch.candidates.length === 0 && !batch.complete) return;
+    this.counters.batches++;
+    this.counters.candidates += batch.candidates.length;
+    this.counters[trigger]++;
+    batchesSent.inc({ relay: batch.kind, trigger });
+    candidatesBatched.inc({ relay: batch.kind }, batch.candidates.length);
+    this.deliver(batch);
+  }
+
+  // Discard what's queued for `key` (the call ended)
+  drop(key: string): void {
+    const entry = this.pending.get(key);
+    if (!entry) return;
+    clearTimeout(entry.timer);
+    this.pending.delete(key);
+    this.counters.dropped += entry.batch.candidates.length;
+  }
+
+  stats() {
+    const { candidates, batches } = this.counters;
+    return {
+      windowMs: this.windowMs,
+      maxBatch: this.maxBatch,
+      pending: this.pending.size,
+      ...this.counters,
+      candidatesPerBatch: batches > 0 ? Math.round((candidates / batches) * 100) / 100 : null,
+    };
+  }
+}
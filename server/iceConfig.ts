@@ -0,0 +1,266 @@
+import { createHmac } from 'crypto';
+import { counter } from './metrics';
+
+// ICE server lists for /api/turn-config, /api/ice and /api/call-session-token,
+// built once per endpoint profile and TURN mode and then served from memory.
+//
+// TURN_MODE and the TURN env vars don't change while the process runs, so a
+// list only needs rebuilding when one of these happens:
+// - the coturn credential pool rotates
+// - a Metered.ca list reaches METERED_CACHE_TTL_MS
+// Each list's JSON body is prebuilt too, so the GET endpoints just write a
+// string.
+//
+// coturn shared-secret credentials (TURN REST API) are minted in a pool of
+// TURN_CREDENTIAL_POOL_SIZE, each with its own expiry so usernames differ, and
+// handed out round-robin. The whole pool is replaced once a quarter of
+// TURN_CREDENTIAL_TTL_S has passed, so a client never gets a credential with
+// less than three quarters of its lifetime left.
+
+export type IceProfile = 'turn-config' | 'ice' | 'call-turn' | 'call-stun';
+
+export interface IceConfig {
+  iceServers: RTCIceServer[];
+  mode: string;
+  body: string; // JSON of { iceServers, mode }
+}
+
+const CLIENT_MAX_AGE_S = parseInt(process.env.ICE_CACHE_MAX_AGE_S || '300', 10);
+const CREDENTIAL_TTL_S = parseInt(process.env.TURN_CREDENTIAL_TTL_S || '86400', 10);
+const CREDENTIAL_POOL_SIZE = Math.max(1, parseInt(process.env.TURN_CREDENTIAL_POOL_SIZE || '4', 10));
+const METERED_TTL_MS = parseInt(process.env.METERED_CACHE_TTL_MS || '300000', 10);
+const METERED_RETRY_MS = 30 * 1000; // How long a failed Metered fetch serves the fallback
+
+const DEFAULT_STUN_URLS = ['stun:stun.l.google.com:19302', 'stun:stun1.l.google.com:19302'];
+
+// ⚠️ OpenRelay public TURN is TESTING ONLY — not for production customers
+const OPEN_RELAY_SERVERS: RTCIceServer[] = [
+  { urls: 'stun:stun.relay.metered.ca:80' },
+  { urls: 'turn:openrelay.metered.ca:80?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
+  { urls: 'turn:openrelay.metered.ca:443?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
+  { urls: 'turn:openrelay.metered.ca:443?transport=tcp', username: 'openrelayproject', credential: 'openrelayproject' }
+];
+
+const lookups = counter('callvault_ice_config_lookups_total', 'ICE configuration lookups by profile and result');
+
+interface TurnCredential {
+  username: string;
+  credential: string;
+  expiresAt: number; // ms
+}
+
+export class TurnCredentialPool {
+  private credentials: TurnCredential[] = [];
+  private mintedAt = 0;
+  private cursor = 0;
+  generation = 0;
+  rotations = 0;
+
+  constructor(
+    private readonly secret: string,
+    private readonly ttlS = CREDENTIAL_TTL_S,
+    private readonly size = CREDENTIAL_POOL_SIZE,
+  ) {}
+
+  // Replace the pool if it's due; returns the current generation
+  refresh(now = Date.now()): number {
+    if (this.credentials.length > 0 && now - this.mintedAt < (this.ttlS * 1000) / 4) return this.generation;
+    const expiry = Math.floor(now / 1000) + this.ttlS;
+    this.credentials = Array.from({ length: this.size }, (_, i) => {
+      // Username format: expiry_timestamp:user_id
+      // Credential: Base64(HMAC-SHA1(username, TURN_SECRET))
+      const username = `${expiry + i}:callvs`;
+      const credential = createHmac('sha1', this.secret).update(username).digest('base64');
+      return { username, credential, expiresAt: (expiry + i) * 1000 };
+    });
+    this.mintedAt = now;
+    if (this.generation > 0) this.rotations++;
+    this.generation++;
+    return this.generation;
+  }
+
+  all(): readonly TurnCredential[] {
+    return this.credentials;
+  }
+
+  // Round-robin slot for the next response
+  nextSlot(): number {
+    this.cursor = (this.cursor + 1) % this.credentials.length;
+    return this.cursor;
+  }
+
+  stats() {
+    return {
+      size: this.credentials.length,
+      generation: this.generation,
+      rotations: this.rotations,
+      mintedAt: this.mintedAt,
+      expiresAt: this.credentials[0]?.expiresAt ?? null,
+    };
+  }
+}
+
+interface CacheEntry {
+  mode: string;
+  variants: IceConfig[]; // One per pool credential for coturn lists, else one
+  builtAt: number;
+  expiresAt: number; // Infinity unless the list came from Metered
+  generation: number; // Pool generation the coturn variants were built from
+}
+
+function splitList(value: string | undefined): string[] {
+  return value?.split(',').map(u => u.trim()).filter(Boolean) ?? [];
+}
+
+export class IceConfigService {
+  private entries = new Map<string, CacheEntry>();
+  private builds = new Map<string, Promise<CacheEntry>>();
+  private counters = { hits: 0, misses: 0, builds: 0, meteredFetches: 0, meteredFailures: 0 };
+  private readonly turnMode = (process.env.TURN_MODE || 'public').toLowerCase();
+  private readonly stunServers: RTCIceServer[];
+  private readonly customTurn: RTCIceServer | null;
+  private readonly coturnServer = process.env.TURN_SERVER || process.env.TURN_HOST;
+  private readonly pool: TurnCredentialPool | null;
+
+  constructor() {
+    const stunUrls = process.env.STUN_URLS ? splitList(process.env.STUN_URLS) : DEFAULT_STUN_URLS;
+    this.stunServers = stunUrls.map(url => ({ urls: url }));
+    const turnUrls = splitList(process.env.TURN_URLS);
+    this.customTurn = turnUrls.length > 0 && process.env.TURN_USERNAME && process.env.TURN_CREDENTIAL
+      ? { urls: turnUrls, username: process.env.TURN_USERNAME, credential: process.env.TURN_CREDENTIAL }
+      : null;
+    this.pool = process.env.TURN_SECRET && this.coturnServer ? new TurnCredentialPool(process.env.TURN_SECRET) : null;
+  }
+
+  // Cache-Control for responses carrying a list; credentials make them private
+  get cacheControl(): string {
+    return `private, max-age=${CLIENT_MAX_AGE_S}`;
+  }
+
+  async get(profile: IceProfile, now = Date.now()): Promise<IceConfig> {
+    const generation = this.pool ? this.pool.refresh(now) : 0;
+    const entry = this.entries.get(profile);
+    if (entry && entry.expiresAt > now && entry.generation === generation) {
+      this.counters.hits++;
+      lookups.inc({ profile, result: 'hit' });
+      return this.pick(entry);
+    }
+    this.counters.misses++;
+    lookups.inc({ profile, result: 'miss' });
+
+    let build = this.builds.get(profile);
+    if (!build) {
+      build = this.build(profile, generation, now).finally(() => this.builds.delete(profile));
+      this.builds.set(profile, build);
+    }
+    const built = await build;
+    this.entries.set(profile, built);
+    return this.pick(built);
+  }
+
+  private pick(entry: CacheEntry): IceConfig {
+    if (entry.variants.length === 1 || !this.pool) return entry.variants[0];
+    return entry.variants[this.pool.nextSlot() % entry.variants.length];
+  }
+
+  private entry(mode: string, lists: RTCIceServer[][], generation: number, now: number, ttlMs = Infinity): CacheEntry {
+    this.counters.builds++;
+    return {
+      mode,
+      variants: lists.map(iceServers => ({ iceServers, mode, body: JSON.stringify({ iceServers, mode }) })),
+      builtAt: now,
+      expiresAt: now + ttlMs,
+      generation,
+    };
+  }
+
+  private coturnLists(): RTCIceServer[][] | null {
+    if (!this.pool || !this.coturnServer) return null;
+    const server = this.coturnServer;
+    // TURN URLs for UDP (3478), TCP (3478), and TLS (5349)
+    const urls = [
+      `turn:${server}:3478?transport=udp`,
+      `turn:${server}:3478?transport=tcp`,
+      `turns:${server}:5349?transport=tcp`
+    ];
+    return this.pool.all().map(({ username, credential }) => [
+      ...this.stunServers,
+      { urls: `stun:${server}:3478` },
+      { urls, username, credential }
+    ]);
+  }
+
+  private async build(profile: IceProfile, generation: number, now: number): Promise<CacheEntry> {
+    const openRelay = () => this.entry('public_openrelay', [[...this.stunServers, ...OPEN_RELAY_SERVERS]], generation, now);
+
+    if (this.turnMode === 'off' || profile === 'call-stun') {
+      console.log(`[ICE] ${profile}: TURN_MODE=${this.turnMode}, using STUN only`);
+      return this.entry('stun_only', [this.stunServers], generation, now);
+    }
+    if (this.turnMode === 'custom' && this.customTurn) {
+      console.log(`[ICE] ${profile}: TURN_MODE=custom, using custom TURN servers`);
+      return this.entry('custom', [[...this.stunServers, this.customTurn]], generation, now);
+    }
+    if (this.turnMode === 'custom' && profile !== 'call-turn') {
+      console.warn(`[ICE] ${profile}: TURN_MODE=custom but missing TURN_URLS, TURN_USERNAME, or TURN_CREDENTIAL - falling back`);
+    }
+
+    // /api/turn-config has never used coturn shared-secret auth, only Metered
+    const coturn = profile === 'turn-config' ? null : this.coturnLists();
+    if (coturn) {
+      console.log(`[ICE] ${profile}: coturn shared-secret auth for ${this.coturnServer}, ${coturn.length} credential(s)`);
+      return this.entry('coturn_shared_secret', coturn, generation, now);
+    }
+
+    if (profile !== 'ice') {
+      const metered = await this.fetchMetered();
+      if (metered) return this.entry('metered', [metered], generation, now, METERED_TTL_MS);
+      if (metered === null) {
+        // Configured but failing: retry soon rather than hold the fallback for the full TTL
+        const fallback = openRelay();
+        fallback.expiresAt = now + METERED_RETRY_MS;
+        console.log(`[ICE] ${profile}: Metered unavailable, falling back to OpenRelay`);
+        return fallback;
+      }
+    }
+
+    console.log(`[ICE] ${profile}: TURN_MODE=public, using OpenRelay free TURN (TESTING ONLY)`);
+    return openRelay();
+  }
+
+  // Metered.ca TURN list; undefined if Metered isn't configured, null if the fetch failed
+  private async fetchMetered(): Promise<RTCIceServer[] | null | undefined> {
+    const appName = (process.env.METERED_APP_NAME || '').replace(/\.metered\.live$/i, '');
+    const apiKey = process.env.METERED_SECRET_KEY;
+    if (!appName || !apiKey) return undefined;
+    this.counters.meteredFetches++;
+    try {
+      const response = await fetch(`https://${appName}.metered.live/api/v1/turn/credentials?apiKey=${apiKey}`);
+      if (!response.ok) throw new Error(`Metered API error: ${response.status}`);
+      const iceServers = await response.json();
+      console.log(`[ICE] Metered TURN credentials fetched: ${iceServers.length} servers`);
+      return iceServers;
+    } catch (error) {
+      this.counters.meteredFailures++;
+      console.error('[ICE] Metered API failed:', error);
+      return null;
+    }
+  }
+
+  stats(now = Date.now()) {
+    const lookupsTotal = this.counters.hits + this.counters.misses;
+    const profiles: Record<string, { mode: string; ageMs: number; variants: number }> = {};
+    this.entries.forEach((entry, profile) => {
+      profiles[profile] = { mode: entry.mode, ageMs: now - entry.builtAt, variants: entry.variants.length };
+    });
+    return {
+      ...this.counters,
+      hitRate: lookupsTotal > 0 ? Math.round((this.counters.hits / lookupsTotal) * 1000) / 1000 : null,
+      clientMaxAgeS: CLIENT_MAX_AGE_S,
+      profiles,
+      credentialPool: this.pool?.stats() ?? null,
+    };
+  }
+}
+
+export const iceConfig = new IceConfigService();
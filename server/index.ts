@@ -6,7 +6,12 @@ import { storage } from "./storage";
 import { performStartupValidation } from "./config";
 import { requestLogger, errorHandler, notFoundHandler } from "./middleware";
 import logger from "./logger";
+import { renderMetrics } from "./metrics";
+import { usageCache } from "./usageCache";
+import { flushCallTokenAudit } from "./callTokens";
 import errorTracker from "./errorTracker";
+import { isClusterPrimary, isClusterWorker, startClusterPrimary } from "./wsCluster";
+import { callLocalStore, loadLocalStores } from "./sharedStores";
 import path from "path";
 import fs from "fs";
 
@@ -51,6 +56,15 @@ app.get("/api/health", (_req, res) => {
   res.status(200).json({ ok: true, timestamp: Date.now() });
 });
 
+// Prometheus scrape endpoint; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+app.get("/metrics", (req, res) => {
+  const token = process.env.METRICS_TOKEN;
+  if (token && req.headers.authorization !== `Bearer ${token}`) {
+    return res.status(401).type('text/plain').send('Unauthorized');
+  }
+  res.status(200).type('text/plain; version=0.0.4').send(renderMetrics());
+});
+
 // Production diagnostic endpoint - helps verify configuration
 app.get("/api/diagnostics", (_req, res) => {
   const turnMode = process.env.TURN_MODE || 'public';
@@ -150,6 +164,8 @@ process.on('unhandledRejection', (reason, promise) => {
 // Graceful shutdown handling
 process.on('SIGTERM', () => {
   logger.info('SIGTERM received, shutting down gracefully');
+  usageCache.flush().catch(() => {});
+  flushCallTokenAudit().catch(() => {});
   // Give time for cleanup
   setTimeout(() => {
     logger.info('Exiting process');
@@ -159,6 +175,8 @@ process.on('SIGTERM', () => {
 
 process.on('SIGINT', () => {
   logger.info('SIGINT received, shutting down gracefully');
+  usageCache.flush().catch(() => {});
+  flushCallTokenAudit().catch(() => {});
   setTimeout(() => {
     logger.info('Exiting process');
     process.exit(0);
@@ -252,6 +270,11 @@ async function startServer() {
   // Create HTTP server
   const httpServer = createServer(app);
 
+  // Cluster workers use the primary's stores over the bus instead
+  if (!isClusterWorker()) {
+    await loadLocalStores();
+  }
+
   // Register all API routes and WebSocket handlers
   await registerRoutes(httpServer, app);
 
@@ -360,12 +383,26 @@ async function startServer() {
   app.use(errorHandler);
 }
 
-startServer().catch((err) => {
-  logger.fatal('Failed to start server', err as Error);
-  errorTracker.trackError(err as Error, {
-    severity: 'critical',
-    category: 'internal',
-    context: { phase: 'startup' }
+// Cluster mode: the primary forks workers, relays the /ws bus and owns the
+// local JSON stores. Config errors stop it here rather than in every worker it
+// would keep restarting.
+if (isClusterPrimary()) {
+  if (!validationResult.valid) {
+    logger.fatal('Refusing to start cluster workers with configuration errors');
+    process.exit(1);
+  }
+  loadLocalStores().then(() => startClusterPrimary(callLocalStore), (err) => {
+    logger.fatal('Failed to load local stores', err as Error);
+    process.exit(1);
   });
-  process.exit(1);
-});
\ No newline at end of file
+} else {
+  startServer().catch((err) => {
+    logger.fatal('Failed to start server', err as Error);
+    errorTracker.trackError(err as Error, {
+      severity: 'critical',
+      category: 'internal',
+      context: { phase: 'startup' }
+    });
+    process.exit(1);
+  });
+}
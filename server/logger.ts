@@ -1,4 +1,5 @@
 import { randomUUID } from 'crypto';
+import fs from 'fs';
 
 // Log levels
 export type LogLevel = 'debug' | 'info' | 'warn' | 'error' | 'fatal';
@@ -8,6 +9,7 @@ interface LogEntry {
   timestamp: string;
   level: LogLevel;
   message: string;
+  category?: string;
   context?: Record<string, any>;
   error?: Error;
   requestId?: string;
@@ -36,6 +38,117 @@ const ERROR_DEDUPLICATION_WINDOW = 5 * 60 * 1000; // 5 minutes
 const isProduction = process.env.NODE_ENV === 'production';
 const isDebug = process.env.DEBUG === 'true' || process.env.LOG_LEVEL === 'debug';
 
+const LEVEL_ORDER: Record<LogLevel, number> = { debug: 10, info: 20, warn: 30, error: 40, fatal: 50 };
+
+function parseLevel(value: string | undefined): LogLevel | undefined {
+  const level = value?.trim().toLowerCase();
+  return level && level in LEVEL_ORDER ? (level as LogLevel) : undefined;
+}
+
+// "ws=debug,broadcast=warn" / "ws=0.01,msg=0.1" style per-category settings
+function parseCategorySpec<T>(spec: string | undefined, parse: (value: string) => T | undefined): Map<string, T> {
+  const result = new Map<string, T>();
+  for (const part of (spec || '').split(',')) {
+    const [name, value] = part.split('=').map(s => s.trim());
+    const parsed = name && value ? parse(value) : undefined;
+    if (parsed !== undefined) result.set(name, parsed);
+  }
+  return result;
+}
+
+// LOG_LEVEL is the default threshold, LOG_CATEGORIES overrides it per category
+const defaultThreshold = LEVEL_ORDER[parseLevel(process.env.LOG_LEVEL) ?? (isDebug ? 'debug' : 'info')];
+const categoryThresholds = parseCategorySpec(process.env.LOG_CATEGORIES, v => {
+  const level = parseLevel(v);
+  return level && LEVEL_ORDER[level];
+});
+// LOG_SAMPLE keeps only a fraction of a category's debug/info lines
+const categorySampleRates = parseCategorySpec(process.env.LOG_SAMPLE, v => {
+  const rate = parseFloat(v);
+  return rate >= 0 && rate <= 1 ? rate : undefined;
+});
+
+/**
+ * Cheap guard for hot paths: build the log message only when this returns true
+ */
+export function isEnabled(level: LogLevel, category?: string): boolean {
+  const threshold = category === undefined ? defaultThreshold : categoryThresholds.get(category) ?? defaultThreshold;
+  return LEVEL_ORDER[level] >= threshold;
+}
+
+// ============================================================================
+// Buffered sink
+// ============================================================================
+//
+// debug/info lines are queued and written to stdout in one call per event-loop
+// turn (or sooner once MAX_BUFFERED_BYTES is reached) instead of one
+// synchronous write each. warn and above flush the queue and go straight to
+// stderr so nothing is lost on a crash. LOG_SINK=sync restores direct writes.
+
+const bufferedSink = process.env.LOG_SINK !== 'sync';
+const MAX_BUFFERED_BYTES = 64 * 1024;
+const MAX_BACKLOG_BYTES = 8 * 1024 * 1024; // Drop lines rather than grow without bound if stdout stalls
+
+let pending: string[] = [];
+let pendingBytes = 0;
+let flushScheduled = false;
+let stdoutBlocked = false;
+const sinkStats = { written: 0, sampledOut: 0, dropped: 0 };
+
+function flushLogs(): void {
+  flushScheduled = false;
+  if (pending.length === 0 || stdoutBlocked) return;
+  const chunk = pending.join('\n') + '\n';
+  pending = [];
+  pendingBytes = 0;
+  if (!process.stdout.write(chunk)) {
+    stdoutBlocked = true;
+    process.stdout.once('drain', () => {
+      stdoutBlocked = false;
+      flushLogs();
+    });
+  }
+}
+
+function writeLine(level: LogLevel, line: string): void {
+  sinkStats.written++;
+  if (LEVEL_ORDER[level] >= LEVEL_ORDER.warn || !bufferedSink) {
+    flushLogs();
+    if (level === 'warn') console.warn(line);
+    else if (LEVEL_ORDER[level] > LEVEL_ORDER.warn) console.error(line);
+    else console.log(line);
+    return;
+  }
+  if (stdoutBlocked && pendingBytes > MAX_BACKLOG_BYTES) {
+    sinkStats.dropped++;
+    return;
+  }
+  pending.push(line);
+  pendingBytes += line.length;
+  if (pendingBytes >= MAX_BUFFERED_BYTES) {
+    flushLogs();
+  } else if (!flushScheduled) {
+    flushScheduled = true;
+    setImmediate(flushLogs);
+  }
+}
+
+// Whatever is still queued at exit is written synchronously
+process.on('exit', () => {
+  if (pending.length > 0) {
+    try {
+      fs.writeSync(1, pending.join('\n') + '\n');
+    } catch {
+      // stdout already gone
+    }
+    pending = [];
+  }
+});
+
+export function getLogStats() {
+  return { ...sinkStats, buffered: pending.length, bufferedBytes: pendingBytes };
+}
+
 /**
  * Main logging function
  */
@@ -45,7 +158,18 @@ export function log(level: LogLevel, message: string, options?: {
   requestId?: string;
   userAddress?: string;
   ip?: string;
+  category?: string;
 }): void {
+  const category = options?.category;
+  if (!isEnabled(level, category)) return;
+  if (category !== undefined && LEVEL_ORDER[level] < LEVEL_ORDER.warn) {
+    const rate = categorySampleRates.get(category);
+    if (rate !== undefined && Math.random() >= rate) {
+      sinkStats.sampledOut++;
+      return;
+    }
+  }
+
   const entry: LogEntry = {
     timestamp: new Date().toISOString(),
     level,
@@ -53,25 +177,9 @@ export function log(level: LogLevel, message: string, options?: {
     ...options
   };
 
-  // Format the log output
-  const formatted = formatLogEntry(entry);
-
-  // Output based on level
-  switch (level) {
-    case 'debug':
-      if (isDebug) console.debug(formatted);
-      break;
-    case 'info':
-      console.info(formatted);
-      break;
-    case 'warn':
-      console.warn(formatted);
-      break;
-    case 'error':
-    case 'fatal':
-      console.error(formatted);
-      trackError(entry);
-      break;
+  writeLine(level, formatLogEntry(entry));
+  if (level === 'error' || level === 'fatal') {
+    trackError(entry);
   }
 }
 
@@ -84,6 +192,10 @@ function formatLogEntry(entry: LogEntry): string {
     `[${entry.level.toUpperCase()}]`
   ];
 
+  if (entry.category) {
+    parts.push(`[${entry.category}]`);
+  }
+
   if (entry.requestId) {
     parts.push(`[req:${entry.requestId.slice(0, 8)}]`);
   }
@@ -175,6 +287,17 @@ export const logger = {
     error: (message: string, error?: Error, context?: Record<string, any>) => log('error', message, { requestId, userAddress, ip, error, context }),
   }),
 
+  // Category-scoped logging, e.g. logger.category('ws'). Guard hot-path calls
+  // with isEnabled(level, category) so the message isn't built when disabled.
+  category: (category: string) => ({
+    debug: (message: string, context?: Record<string, any>) => log('debug', message, { category, context }),
+    info: (message: string, context?: Record<string, any>) => log('info', message, { category, context }),
+    warn: (message: string, context?: Record<string, any>, error?: Error) => log('warn', message, { category, context, error }),
+    error: (message: string, error?: Error, context?: Record<string, any>) => log('error', message, { category, error, context }),
+  }),
+
+  isEnabled,
+  getLogStats,
   getTrackedErrors,
   clearTrackedErrors
 };
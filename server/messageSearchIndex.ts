@@ -0,0 +1,333 @@
+import type { Message } from '@shared/types';
+
+// Incremental inverted index over message content, maintained by messageStore.
+//
+// Postings are kept per conversation so a search only touches the conversations
+// it is scoped to. Every indexed message gets a document id in arrival order and
+// posting lists are ascending doc id arrays, so newest-first results and cursors
+// are a walk back from the tail. Edits and deletes are lazy: deleted documents
+// are skipped, edited ones are re-checked against their live content, and a
+// conversation is re-indexed once its stale entries outnumber its live ones.
+// Partial words are expanded against the vocabulary through a trigram map. The
+// vocabulary counts the conversations posting each token, so words that only
+// survived in stale postings are dropped (with their trigrams) on re-index.
+
+const MAX_TOKEN_LENGTH = 32; // Longer tokens (URLs, blobs) are indexed by their prefix
+const MIN_PARTIAL_LENGTH = 3;
+const MIN_STALE_FOR_REINDEX = 64;
+
+export interface SearchOptions {
+  limit?: number;
+  cursor?: string | null; // next_cursor from the previous page
+  partial?: boolean; // Match words of 3+ characters inside longer words (default true)
+}
+
+export interface SearchPage {
+  messages: Message[];
+  next_cursor: string | null;
+}
+
+interface ConvoPostings {
+  postings: Map<string, number[]>;
+  newest: number; // Highest doc id posted, to visit conversations newest-first
+  live: number;
+  stale: number;
+}
+
+export function tokenize(text: string): string[] {
+  const tokens = new Set<string>();
+  for (const match of text.toLowerCase().matchAll(/[\p{L}\p{N}]+/gu)) {
+    tokens.add(match[0].slice(0, MAX_TOKEN_LENGTH));
+  }
+  return Array.from(tokens);
+}
+
+function trigramsOf(token: string): string[] {
+  const grams: string[] = [];
+  for (let i = 0; i + 3 <= token.length; i++) {
+    grams.push(token.slice(i, i + 3));
+  }
+  return grams;
+}
+
+// Index of the first element >= value in an ascending array
+function lowerBound(list: number[], value: number): number {
+  let lo = 0;
+  let hi = list.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (list[mid] < value) {
+      lo = mid + 1;
+    } else {
+      hi = mid;
+    }
+  }
+  return lo;
+}
+
+function inList(list: number[], docId: number): boolean {
+  const index = lowerBound(list, docId);
+  return index < list.length && list[index] === docId;
+}
+
+function wordMatches(tokens: string[], word: string, partial: boolean): boolean {
+  const substring = partial && word.length >= MIN_PARTIAL_LENGTH;
+  return tokens.some(t => t === word || (substring && t.includes(word)));
+}
+
+export class MessageSearchIndex {
+  private nextDocId = 1;
+  private docs = new Map<number, Message>();
+  private docIds = new WeakMap<Message, number>();
+  private edited = new Set<number>(); // Docs whose old postings may be stale
+  private convos = new Map<string, ConvoPostings>();
+  private vocabulary = new Map<string, number>(); // Token -> conversations with postings for it
+  private trigrams = new Map<string, Set<string>>();
+
+  clear(): void {
+    this.nextDocId = 1;
+    this.docs.clear();
+    this.docIds = new WeakMap();
+    this.edited.clear();
+    this.convos.clear();
+    this.vocabulary.clear();
+    this.trigrams.clear();
+  }
+
+  add(message: Message): void {
+    const docId = this.nextDocId++;
+    this.docs.set(docId, message);
+    this.docIds.set(message, docId);
+    const convo = this.convoPostings(message.convo_id);
+    convo.live++;
+    for (const token of tokenize(message.content || '')) {
+      this.post(convo, token, docId);
+    }
+  }
+
+  // Call after message.content has changed; postings for removed words go stale
+  update(message: Message): void {
+    const docId = this.docIds.get(message);
+    if (docId === undefined || !this.docs.has(docId)) {
+      this.add(message);
+      return;
+    }
+    const convo = this.convoPostings(message.convo_id);
+    for (const token of tokenize(message.content || '')) {
+      this.post(convo, token, docId);
+    }
+    convo.stale++;
+    this.edited.add(docId);
+    this.maybeReindex(message.convo_id, convo);
+  }
+
+  remove(message: Message): void {
+    const docId = this.docIds.get(message);
+    if (docId === undefined || !this.docs.delete(docId)) return;
+    this.edited.delete(docId);
+    const convo = this.convos.get(message.convo_id);
+    if (!convo) return;
+    convo.live--;
+    convo.stale++;
+    this.maybeReindex(message.convo_id, convo);
+  }
+
+  search(query: string, convoIds: Iterable<string>, options: SearchOptions = {}): SearchPage {
+    const limit = options.limit ?? 50;
+    const partial = options.partial ?? true;
+    const cursor = options.cursor ? parseInt(options.cursor, 10) || Infinity : Infinity;
+    const words = tokenize(query);
+    if (words.length === 0 || limit <= 0) {
+      return { messages: [], next_cursor: null };
+    }
+
+    const expansions = words.map(word => this.expand(word, partial));
+    let hits: Array<{ docId: number; message: Message }> = [];
+    let truncated = false;
+    // Once a full page is collected, older documents can't make it in
+    let floor = 0;
+
+    const scoped: Array<[string, ConvoPostings]> = [];
+    for (const convoId of convoIds) {
+      const convo = this.convos.get(convoId);
+      if (convo) scoped.push([convoId, convo]);
+    }
+    scoped.sort((a, b) => b[1].newest - a[1].newest);
+
+    for (const [convoId, convo] of scoped) {
+      if (convo.newest <= floor) {
+        truncated = true;
+        break;
+      }
+
+      // Drive from the word with the fewest postings in this conversation
+      const wordLists: number[][][] = [];
+      let driver: number[][] | null = null;
+      let driverSize = Infinity;
+      for (const tokens of expansions) {
+        const lists: number[][] = [];
+        let size = 0;
+        for (const token of tokens) {
+          const list = convo.postings.get(token);
+          if (list) {
+            lists.push(list);
+            size += list.length;
+          }
+        }
+        if (size === 0) {
+          driver = null;
+          break;
+        }
+        wordLists.push(lists);
+        if (size < driverSize) {
+          driver = lists;
+          driverSize = size;
+        }
+      }
+      if (!driver) continue;
+
+      const candidates = driver.length === 1
+        ? driver[0]
+        : Array.from(new Set(driver.flat())).sort((a, b) => a - b);
+      let found = 0;
+      let i = lowerBound(candidates, cursor) - 1;
+      for (; i >= 0 && found < limit && candidates[i] > floor; i--) {
+        const docId = candidates[i];
+        const message = this.docs.get(docId);
+        if (!message || message.convo_id !== convoId) continue;
+        if (this.edited.has(docId)) {
+          const tokens = tokenize(message.content || '');
+          if (!words.every(word => wordMatches(tokens, word, partial))) continue;
+        } else if (!wordLists.every(lists => lists === driver || lists.some(list => inList(list, docId)))) {
+          continue;
+        }
+        hits.push({ docId, message });
+        found++;
+      }
+      if (i >= 0) {
+        truncated = true;
+      }
+      if (hits.length >= limit) {
+        hits.sort((a, b) => b.docId - a.docId);
+        if (hits.length > limit) {
+          hits = hits.slice(0, limit);
+          truncated = true;
+        }
+        floor = hits[limit - 1].docId;
+      }
+    }
+
+    hits.sort((a, b) => b.docId - a.docId);
+    const page = hits.slice(0, limit);
+    return {
+      messages: page.map(h => h.message),
+      next_cursor: truncated && page.length > 0 ? String(page[page.length - 1].docId) : null,
+    };
+  }
+
+  stats() {
+    return {
+      documents: this.docs.size,
+      conversations: this.convos.size,
+      vocabulary: this.vocabulary.size,
+      trigrams: this.trigrams.size,
+    };
+  }
+
+  private convoPostings(convoId: string): ConvoPostings {
+    let convo = this.convos.get(convoId);
+    if (!convo) {
+      convo = { postings: new Map(), newest: 0, live: 0, stale: 0 };
+      this.convos.set(convoId, convo);
+    }
+    return convo;
+  }
+
+  private post(convo: ConvoPostings, token: string, docId: number): void {
+    convo.newest = Math.max(convo.newest, docId);
+    let list = convo.postings.get(token);
+    if (!list) {
+      list = [];
+      convo.postings.set(token, list);
+      this.addToVocabulary(token);
+    }
+    // New documents append; only edits of older messages insert mid-list
+    if (list.length === 0 || list[list.length - 1] < docId) {
+      list.push(docId);
+    } else {
+      const index = lowerBound(list, docId);
+      if (list[index] !== docId) {
+        list.splice(index, 0, docId);
+      }
+    }
+  }
+
+  private addToVocabulary(token: string): void {
+    const count = this.vocabulary.get(token) ?? 0;
+    this.vocabulary.set(token, count + 1);
+    if (count > 0) return;
+    for (const gram of trigramsOf(token)) {
+      let tokens = this.trigrams.get(gram);
+      if (!tokens) {
+        tokens = new Set();
+        this.trigrams.set(gram, tokens);
+      }
+      tokens.add(token);
+    }
+  }
+
+  private removeFromVocabulary(token: string): void {
+    const count = this.vocabulary.get(token) ?? 0;
+    if (count > 1) {
+      this.vocabulary.set(token, count - 1);
+      return;
+    }
+    this.vocabulary.delete(token);
+    for (const gram of trigramsOf(token)) {
+      const tokens = this.trigrams.get(gram);
+      if (!tokens) continue;
+      tokens.delete(token);
+      if (tokens.size === 0) this.trigrams.delete(gram);
+    }
+  }
+
+  // Vocabulary tokens a query word can match
+  private expand(word: string, partial: boolean): string[] {
+    if (!partial || word.length < MIN_PARTIAL_LENGTH) {
+      return [word];
+    }
+    let smallest: Set<string> | undefined;
+    for (const gram of trigramsOf(word)) {
+      const tokens = this.trigrams.get(gram);
+      if (!tokens) return [];
+      if (!smallest || tokens.size < smallest.size) {
+        smallest = tokens;
+      }
+    }
+    return Array.from(smallest!).filter(token => token.includes(word));
+  }
+
+  private maybeReindex(convoId: string, convo: ConvoPostings): void {
+    if (convo.stale < MIN_STALE_FOR_REINDEX || convo.stale < convo.live) return;
+    const docIds = new Set<number>();
+    for (const list of convo.postings.values()) {
+      for (const docId of list) {
+        if (this.docs.get(docId)?.convo_id === convoId) {
+          docIds.add(docId);
+        }
+      }
+    }
+    const rebuilt: ConvoPostings = { postings: new Map(), newest: convo.newest, live: docIds.size, stale: 0 };
+    for (const docId of Array.from(docIds).sort((a, b) => a - b)) {
+      this.edited.delete(docId);
+      for (const token of tokenize(this.docs.get(docId)!.content || '')) {
+        this.post(rebuilt, token, docId);
+      }
+    }
+    this.convos.set(convoId, rebuilt);
+    // Release the old postings' tokens after the rebuild has counted the live ones
+    for (const token of convo.postings.keys()) {
+      this.removeFromVocabulary(token);
+    }
+  }
+}
@@ -2,10 +2,38 @@ import type { Message, Conversation } from '@shared/types';
 import { generateConversationId } from '../shared/conversationId';
 import * as fs from 'fs';
 import * as path from 'path';
+import { MessageSearchIndex, type SearchOptions, type SearchPage } from './messageSearchIndex';
 
-const DATA_DIR = path.join(process.cwd(), 'data');
+const DATA_DIR = process.env.LOCAL_DATA_DIR || path.join(process.cwd(), 'data');
 const MESSAGES_FILE = path.join(DATA_DIR, 'messages.json');
 const CONVERSATIONS_FILE = path.join(DATA_DIR, 'conversations.json');
+const WAL_FILE = path.join(DATA_DIR, 'messages.wal');
+const WAL_ROTATED_FILE = `${WAL_FILE}.old`;
+
+// Persistence mode:
+// - 'snapshot' (default): rewrite messages.json / conversations.json on every mutation
+// - 'wal': append each mutation to messages.wal, replay it at startup and
+//   periodically compact it into the snapshot files
+type PersistenceMode = 'snapshot' | 'wal';
+// fsync policy for the WAL: after every write, on a timer, or left to the OS
+type WalFsyncPolicy = 'always' | 'interval' | 'never';
+
+const PERSISTENCE_MODE: PersistenceMode = process.env.MESSAGE_STORE_MODE === 'wal' ? 'wal' : 'snapshot';
+const walFsyncSetting = process.env.MESSAGE_WAL_FSYNC;
+const WAL_FSYNC: WalFsyncPolicy =
+  walFsyncSetting === 'always' || walFsyncSetting === 'never' ? walFsyncSetting : 'interval';
+const WAL_FSYNC_INTERVAL_MS = parseInt(process.env.MESSAGE_WAL_FSYNC_INTERVAL_MS || '1000', 10);
+const WAL_COMPACT_BYTES = parseInt(process.env.MESSAGE_WAL_COMPACT_BYTES || String(64 * 1024 * 1024), 10);
+const WAL_COMPACT_INTERVAL_MS = parseInt(process.env.MESSAGE_WAL_COMPACT_INTERVAL_MS || String(10 * 60 * 1000), 10);
+
+// One line of messages.wal. Every op is idempotent so replaying a log whose
+// effects are already partly contained in the snapshot is safe.
+type WalOp =
+  | { op: 'add'; m: Message }
+  | { op: 'status'; id: string; status: Message['status'] }
+  | { op: 'delete'; id: string; c: string }
+  | { op: 'edit'; id: string; content: string; edited_at: number }
+  | { op: 'convo'; c: Conversation };
 
 interface MessageStore {
   messages: Record<string, Message[]>;
@@ -19,13 +47,158 @@ let store: MessageStore = {
   seqCounters: {}
 };
 
+// Secondary indexes kept in step with store.messages so id lookups and
+// dedup checks don't scan every conversation
+const messageIndex = new Map<string, { convoId: string; message: Message }>();
+const nonceIndex = new Map<string, number>(); // nonce -> number of messages using it
+const searchIndex = new MessageSearchIndex();
+
+function indexMessage(message: Message) {
+  messageIndex.set(message.id, { convoId: message.convo_id, message });
+  if (message.nonce) {
+    nonceIndex.set(message.nonce, (nonceIndex.get(message.nonce) || 0) + 1);
+  }
+}
+
+function unindexMessage(message: Message) {
+  if (messageIndex.get(message.id)?.message === message) {
+    messageIndex.delete(message.id);
+  }
+  if (message.nonce) {
+    const count = nonceIndex.get(message.nonce) || 0;
+    if (count <= 1) {
+      nonceIndex.delete(message.nonce);
+    } else {
+      nonceIndex.set(message.nonce, count - 1);
+    }
+  }
+}
+
+// Conversation lookups: id -> slot in store.conversations, address -> ids of the
+// conversations it takes part in, and a pair key for direct chats. Conversations
+// are never removed, so slots stay valid.
+const conversationSlots = new Map<string, number>();
+const participantIndex = new Map<string, Set<string>>();
+const directIndex = new Map<string, string>();
+
+function directKey(address1: string, address2: string): string {
+  return address1 < address2 ? `${address1}|${address2}` : `${address2}|${address1}`;
+}
+
+function indexParticipant(address: string, convoId: string) {
+  let convoIds = participantIndex.get(address);
+  if (!convoIds) {
+    convoIds = new Set();
+    participantIndex.set(address, convoIds);
+  }
+  convoIds.add(convoId);
+}
+
+function unindexParticipant(address: string, convoId: string) {
+  const convoIds = participantIndex.get(address);
+  if (!convoIds) return;
+  convoIds.delete(convoId);
+  if (convoIds.size === 0) {
+    participantIndex.delete(address);
+  }
+}
+
+function indexConversation(convo: Conversation) {
+  for (const address of convo.participant_addresses) {
+    indexParticipant(address, convo.id);
+  }
+  if (convo.type === 'direct' && convo.participant_addresses.length === 2) {
+    const key = directKey(convo.participant_addresses[0], convo.participant_addresses[1]);
+    if (!directIndex.has(key)) {
+      directIndex.set(key, convo.id);
+    }
+  }
+}
+
+function unindexConversation(convo: Conversation) {
+  for (const address of convo.participant_addresses) {
+    unindexParticipant(address, convo.id);
+  }
+  if (convo.type === 'direct' && convo.participant_addresses.length === 2) {
+    const key = directKey(convo.participant_addresses[0], convo.participant_addresses[1]);
+    if (directIndex.get(key) === convo.id) {
+      directIndex.delete(key);
+    }
+  }
+}
+
+// Conversation arrays are kept ordered by seq so sync and history paging can
+// bisect, and the last element doubles as the conversation's max seq. Client
+// timestamps normally follow seq but aren't guaranteed to, so conversations
+// seen out of timestamp order fall back to a linear filter for `before` paging.
+const unorderedTimestamps = new Set<string>();
+
+const seqOf = (m: Message) => m.seq || 0;
+
+// First index for which `pred` is false; `pred` must be true then false across the array
+function partitionPoint(messages: Message[], pred: (m: Message) => boolean): number {
+  let lo = 0;
+  let hi = messages.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (pred(messages[mid])) {
+      lo = mid + 1;
+    } else {
+      hi = mid;
+    }
+  }
+  return lo;
+}
+
+function noteTimestampOrder(convoId: string, convoMessages: Message[], index: number) {
+  const message = convoMessages[index];
+  const prev = convoMessages[index - 1];
+  const next = convoMessages[index + 1];
+  if ((prev && prev.timestamp > message.timestamp) || (next && next.timestamp < message.timestamp)) {
+    unorderedTimestamps.add(convoId);
+  }
+}
+
+function rebuildIndexes() {
+  conversationSlots.clear();
+  participantIndex.clear();
+  directIndex.clear();
+  store.conversations.forEach((convo, slot) => {
+    // Lookups used to return the first match, so earlier duplicates win
+    if (conversationSlots.has(convo.id)) return;
+    conversationSlots.set(convo.id, slot);
+    indexConversation(convo);
+  });
+
+  messageIndex.clear();
+  nonceIndex.clear();
+  unorderedTimestamps.clear();
+  searchIndex.clear();
+  for (const [convoId, convoMessages] of Object.entries(store.messages)) {
+    // Older data files may have been appended out of seq order; Array.sort is stable
+    if (convoMessages.some((m, i) => i > 0 && seqOf(convoMessages[i - 1]) > seqOf(m))) {
+      convoMessages.sort((a, b) => seqOf(a) - seqOf(b));
+    }
+    for (let i = 0; i < convoMessages.length; i++) {
+      indexMessage(convoMessages[i]);
+      if (i > 0 && convoMessages[i - 1].timestamp > convoMessages[i].timestamp) {
+        unorderedTimestamps.add(convoId);
+      }
+    }
+  }
+  // Search doc ids follow arrival order across conversations
+  const arrivalOf = (m: Message) => m.server_timestamp || m.timestamp;
+  const allMessages = Object.values(store.messages).flat().sort((a, b) => arrivalOf(a) - arrivalOf(b));
+  for (const message of allMessages) {
+    searchIndex.add(message);
+  }
+}
+
 // Get next sequence number for a conversation
 function getNextSeq(convoId: string): number {
   if (!store.seqCounters[convoId]) {
     // Initialize from existing messages
-    const messages = store.messages[convoId] || [];
-    const maxSeq = messages.reduce((max, m) => Math.max(max, m.seq || 0), 0);
-    store.seqCounters[convoId] = maxSeq;
+    store.seqCounters[convoId] = getLatestSeq(convoId);
   }
   store.seqCounters[convoId]++;
   return store.seqCounters[convoId];
@@ -51,6 +224,7 @@ function loadStore() {
   } catch (error) {
     console.error('Error loading message store:', error);
   }
+  rebuildIndexes();
 }
 
 function saveMessages() {
@@ -63,12 +237,334 @@ function saveConversations() {
   fs.writeFileSync(CONVERSATIONS_FILE, JSON.stringify(store.conversations, null, 2));
 }
 
-loadStore();
+// ============================================================================
+// In-memory mutations (shared by the public API and WAL replay)
+// ============================================================================
 
-export function addMessage(message: Message): Message {
+function findMessage(messageId: string): Message | undefined {
+  return messageIndex.get(messageId)?.message;
+}
+
+function applyAdd(message: Message): void {
   if (!store.messages[message.convo_id]) {
     store.messages[message.convo_id] = [];
   }
+  const convoMessages = store.messages[message.convo_id];
+  // Almost always an append; DB-assigned seqs can arrive out of order under concurrent sends
+  let index = convoMessages.length;
+  if (index > 0 && seqOf(convoMessages[index - 1]) > seqOf(message)) {
+    index = partitionPoint(convoMessages, m => seqOf(m) <= seqOf(message));
+  }
+  convoMessages.splice(index, 0, message);
+  noteTimestampOrder(message.convo_id, convoMessages, index);
+  indexMessage(message);
+  searchIndex.add(message);
+}
+
+function applyDelete(messageId: string, convoId: string): boolean {
+  const convoMessages = store.messages[convoId];
+  if (!convoMessages) return false;
+  
+  // Search from the indexed message; fall back to an id match for duplicates
+  const indexed = messageIndex.get(messageId);
+  let index = indexed && indexed.convoId === convoId ? convoMessages.lastIndexOf(indexed.message) : -1;
+  if (index === -1) {
+    index = convoMessages.findIndex(m => m.id === messageId);
+  }
+  if (index === -1) return false;
+  
+  const [removed] = convoMessages.splice(index, 1);
+  unindexMessage(removed);
+  searchIndex.remove(removed);
+  return true;
+}
+
+function applyEdit(message: Message, content: string, edited_at: number): void {
+  message.content = content;
+  message.edited_at = edited_at;
+  searchIndex.update(message);
+}
+
+function applyConversation(convo: Conversation): void {
+  const slot = conversationSlots.get(convo.id);
+  if (slot === undefined) {
+    conversationSlots.set(convo.id, store.conversations.length);
+    store.conversations.push(convo);
+  } else {
+    const previous = store.conversations[slot];
+    if (previous === convo) return;
+    unindexConversation(previous);
+    store.conversations[slot] = convo;
+  }
+  indexConversation(convo);
+}
+
+// ============================================================================
+// Write-ahead log
+// ============================================================================
+
+let walFd: number | null = null;
+let walBytes = 0;
+let walPending: string[] = [];
+let walFlushScheduled = false;
+let walUnsynced = false;
+let walSync: Promise<void> | null = null; // Interval fdatasync in flight
+let compaction: Promise<void> | null = null;
+
+function openWal() {
+  walFd = fs.openSync(WAL_FILE, 'a');
+  walBytes = fs.fstatSync(walFd).size;
+}
+
+// Write buffered ops in one syscall (group commit for everything queued this tick)
+function flushWal() {
+  walFlushScheduled = false;
+  if (walFd === null || walPending.length === 0) return;
+  const chunk = walPending.join('\n') + '\n';
+  walPending = [];
+  fs.writeSync(walFd, chunk);
+  walBytes += Buffer.byteLength(chunk);
+  if (WAL_FSYNC === 'always') {
+    fs.fdatasyncSync(walFd);
+  } else {
+    walUnsynced = true;
+  }
+  if (walBytes >= WAL_COMPACT_BYTES && !compaction) {
+    setImmediate(() => {
+      compactMessageLog().catch(error => console.error('[messageStore] WAL compaction failed:', error));
+    });
+  }
+}
+
+function appendWal(op: WalOp) {
+  walPending.push(JSON.stringify(op));
+  if (WAL_FSYNC === 'always') {
+    flushWal();
+  } else if (!walFlushScheduled) {
+    walFlushScheduled = true;
+    setImmediate(flushWal);
+  }
+}
+
+function applyWalOp(op: WalOp) {
+  switch (op.op) {
+    case 'add':
+      if (!messageIndex.has(op.m.id)) {
+        applyAdd(op.m);
+      }
+      break;
+    case 'status': {
+      const message = findMessage(op.id);
+      if (message) message.status = op.status;
+      break;
+    }
+    case 'delete':
+      applyDelete(op.id, op.c);
+      break;
+    case 'edit': {
+      const message = findMessage(op.id);
+      if (message) applyEdit(message, op.content, op.edited_at);
+      break;
+    }
+    case 'convo':
+      applyConversation(op.c);
+      break;
+  }
+}
+
+function replayWalFile(file: string): number {
+  if (!fs.existsSync(file)) return 0;
+  const lines = fs.readFileSync(file, 'utf-8').split('\n');
+  let lastLine = lines.length - 1;
+  while (lastLine >= 0 && !lines[lastLine]) lastLine--;
+  
+  let applied = 0;
+  for (let i = 0; i <= lastLine; i++) {
+    if (!lines[i]) continue;
+    try {
+      applyWalOp(JSON.parse(lines[i]));
+      applied++;
+    } catch {
+      // A torn final line is expected after a crash mid-write; anything earlier is corruption
+      if (i < lastLine) {
+        console.error(`[messageStore] Skipping corrupt WAL entry at ${path.basename(file)}:${i + 1}`);
+      }
+    }
+  }
+  return applied;
+}
+
+const SNAPSHOT_WRITE_BYTES = 1024 * 1024; // Chunks are coalesced into writes of about this size
+
+// Write to a tmp file, make it durable, then rename it over `file`. The rename
+// itself is only durable once syncDataDir() has run.
+async function writeFileAtomic(file: string, chunks: Iterable<string>) {
+  const tmpFile = `${file}.tmp`;
+  const handle = await fs.promises.open(tmpFile, 'w');
+  try {
+    let buffered: string[] = [];
+    let bufferedBytes = 0;
+    for (const chunk of chunks) {
+      buffered.push(chunk);
+      bufferedBytes += chunk.length;
+      if (bufferedBytes >= SNAPSHOT_WRITE_BYTES) {
+        await handle.write(buffered.join(''));
+        buffered = [];
+        bufferedBytes = 0;
+      }
+    }
+    if (buffered.length > 0) {
+      await handle.write(buffered.join(''));
+    }
+    if (WAL_FSYNC !== 'never') {
+      await handle.sync();
+    }
+  } finally {
+    await handle.close();
+  }
+  await fs.promises.rename(tmpFile, file);
+}
+
+async function syncDataDir() {
+  if (WAL_FSYNC === 'never') return;
+  const dir = await fs.promises.open(DATA_DIR, 'r');
+  try {
+    await dir.sync();
+  } finally {
+    await dir.close();
+  }
+}
+
+// Serialize one conversation at a time so other work can run between them
+function* messageSnapshotChunks(): Generator<string> {
+  const convoIds = Object.keys(store.messages);
+  yield '{';
+  let first = true;
+  for (const convoId of convoIds) {
+    const convoMessages = store.messages[convoId];
+    if (!convoMessages) continue;
+    yield `${first ? '' : ','}${JSON.stringify(convoId)}:${JSON.stringify(convoMessages)}`;
+    first = false;
+  }
+  yield '}';
+}
+
+/**
+ * Fold the WAL into messages.json / conversations.json.
+ * The live log is rotated first so new mutations keep appending while the
+ * snapshot is written; the rotated log is removed once the snapshot is in place.
+ */
+export function compactMessageLog(): Promise<void> {
+  if (PERSISTENCE_MODE !== 'wal') return Promise.resolve();
+  if (compaction) return compaction;
+  
+  compaction = (async () => {
+    const started = Date.now();
+    // Don't close the log under an interval fsync
+    if (walSync) await walSync;
+    flushWal();
+    if (walFd !== null) {
+      if (walUnsynced && WAL_FSYNC !== 'never') {
+        fs.fdatasyncSync(walFd);
+      }
+      walUnsynced = false;
+      fs.closeSync(walFd);
+      walFd = null;
+    }
+    if (fs.existsSync(WAL_ROTATED_FILE)) {
+      // A previous compaction did not finish - keep its ops ahead of the current ones
+      if (fs.existsSync(WAL_FILE)) {
+        fs.appendFileSync(WAL_ROTATED_FILE, fs.readFileSync(WAL_FILE));
+        fs.unlinkSync(WAL_FILE);
+      }
+    } else if (fs.existsSync(WAL_FILE)) {
+      fs.renameSync(WAL_FILE, WAL_ROTATED_FILE);
+    }
+    openWal();
+    
+    await writeFileAtomic(MESSAGES_FILE, messageSnapshotChunks());
+    await writeFileAtomic(CONVERSATIONS_FILE, [JSON.stringify(store.conversations)]);
+    // The renames must be on disk before the rotated log, the only other copy, goes
+    await syncDataDir();
+    await fs.promises.rm(WAL_ROTATED_FILE, { force: true });
+    console.log(`[messageStore] WAL compacted in ${Date.now() - started}ms`);
+  })().finally(() => {
+    compaction = null;
+  });
+  return compaction;
+}
+
+/**
+ * Flush buffered WAL entries (and fsync them) - call before shutdown
+ */
+export function flushMessageStore(): void {
+  if (PERSISTENCE_MODE !== 'wal' || walFd === null) return;
+  flushWal();
+  if (walUnsynced) {
+    fs.fdatasyncSync(walFd);
+    walUnsynced = false;
+  }
+}
+
+function initWal() {
+  const replayed = replayWalFile(WAL_ROTATED_FILE) + replayWalFile(WAL_FILE);
+  if (replayed > 0) {
+    console.log(`[messageStore] Replayed ${replayed} WAL entries`);
+  }
+  openWal();
+  
+  if (fs.existsSync(WAL_ROTATED_FILE)) {
+    compactMessageLog().catch(error => console.error('[messageStore] WAL compaction failed:', error));
+  }
+  
+  if (WAL_FSYNC === 'interval') {
+    setInterval(() => {
+      // Compaction syncs the log itself before rotating it
+      if (walFd !== null && walUnsynced && !compaction && !walSync) {
+        walUnsynced = false;
+        const fd = walFd;
+        walSync = new Promise(resolve => {
+          fs.fdatasync(fd, error => {
+            if (error) console.error('[messageStore] WAL fsync failed:', error);
+            walSync = null;
+            resolve();
+          });
+        });
+      }
+    }, WAL_FSYNC_INTERVAL_MS).unref();
+  }
+  
+  setInterval(() => {
+    if (walBytes > 0) {
+      compactMessageLog().catch(error => console.error('[messageStore] WAL compaction failed:', error));
+    }
+  }, WAL_COMPACT_INTERVAL_MS).unref();
+  
+  process.on('exit', flushMessageStore);
+}
+
+function persistMessages(op: WalOp) {
+  if (PERSISTENCE_MODE === 'wal') {
+    appendWal(op);
+  } else {
+    saveMessages();
+  }
+}
+
+function persistConversation(convo: Conversation) {
+  if (PERSISTENCE_MODE === 'wal') {
+    appendWal({ op: 'convo', c: convo });
+  } else {
+    saveConversations();
+  }
+}
+
+loadStore();
+if (PERSISTENCE_MODE === 'wal') {
+  initWal();
+}
+
+export function addMessage(message: Message): Message {
   // Honor pre-assigned seq/server_timestamp from DB if present, otherwise assign locally
   if (!message.seq) {
     message.seq = getNextSeq(message.convo_id);
@@ -81,106 +577,93 @@ export function addMessage(message: Message): Message {
   if (!message.server_timestamp) {
     message.server_timestamp = Date.now();
   }
-  store.messages[message.convo_id].push(message);
-  saveMessages();
+  applyAdd(message);
+  persistMessages({ op: 'add', m: message });
   return message;
 }
 
 // Get messages since a specific seq for sync/resume
 export function getMessagesSinceSeq(convoId: string, sinceSeq: number, limit = 100): Message[] {
   const convoMessages = store.messages[convoId] || [];
-  return convoMessages
-    .filter(m => (m.seq || 0) > sinceSeq)
-    .sort((a, b) => (a.seq || 0) - (b.seq || 0))
-    .slice(0, limit);
+  const start = partitionPoint(convoMessages, m => seqOf(m) <= sinceSeq);
+  return convoMessages.slice(start, start + limit);
 }
 
 // Get latest seq for a conversation
 export function getLatestSeq(convoId: string): number {
-  const messages = store.messages[convoId] || [];
-  return messages.reduce((max, m) => Math.max(max, m.seq || 0), 0);
+  const messages = store.messages[convoId];
+  return messages && messages.length > 0 ? seqOf(messages[messages.length - 1]) : 0;
 }
 
 export function getMessages(convoId: string, limit = 50, before?: number): Message[] {
   const convoMessages = store.messages[convoId] || [];
-  let filtered = convoMessages;
-  if (before) {
-    filtered = convoMessages.filter(m => m.timestamp < before);
+  if (!before) {
+    return convoMessages.slice(-limit);
+  }
+  if (unorderedTimestamps.has(convoId)) {
+    return convoMessages.filter(m => m.timestamp < before).slice(-limit);
   }
-  return filtered.slice(-limit);
+  const end = partitionPoint(convoMessages, m => m.timestamp < before);
+  return convoMessages.slice(Math.max(0, end - limit), end);
 }
 
 export function getMessage(messageId: string): Message | undefined {
-  for (const convoMessages of Object.values(store.messages)) {
-    const message = convoMessages.find(m => m.id === messageId);
-    if (message) return message;
-  }
-  return undefined;
+  return findMessage(messageId);
 }
 
 export function updateMessageStatus(messageId: string, status: Message['status']): void {
-  for (const convoMessages of Object.values(store.messages)) {
-    const message = convoMessages.find(m => m.id === messageId);
-    if (message) {
-      message.status = status;
-      saveMessages();
-      return;
-    }
+  const message = findMessage(messageId);
+  if (message) {
+    message.status = status;
+    persistMessages({ op: 'status', id: messageId, status });
   }
 }
 
 export function deleteMessage(messageId: string, convoId: string): boolean {
-  const convoMessages = store.messages[convoId];
-  if (!convoMessages) return false;
-  
-  const index = convoMessages.findIndex(m => m.id === messageId);
-  if (index === -1) return false;
-  
-  convoMessages.splice(index, 1);
-  saveMessages();
+  if (!applyDelete(messageId, convoId)) return false;
+  persistMessages({ op: 'delete', id: messageId, c: convoId });
   return true;
 }
 
 export function updateMessageContent(messageId: string, newContent: string): { success: boolean; edited_at: number } {
   const edited_at = Date.now();
-  for (const convoMessages of Object.values(store.messages)) {
-    const message = convoMessages.find(m => m.id === messageId);
-    if (message) {
-      message.content = newContent;
-      message.edited_at = edited_at;
-      saveMessages();
-      return { success: true, edited_at };
-    }
+  const message = findMessage(messageId);
+  if (message) {
+    applyEdit(message, newContent, edited_at);
+    persistMessages({ op: 'edit', id: messageId, content: newContent, edited_at });
+    return { success: true, edited_at };
   }
   return { success: false, edited_at: 0 };
 }
 
 export function createConversation(convo: Conversation): Conversation {
-  const existing = store.conversations.find(c => c.id === convo.id);
+  const existing = getConversation(convo.id);
   if (existing) return existing;
-  store.conversations.push(convo);
-  saveConversations();
+  applyConversation(convo);
+  persistConversation(convo);
   return convo;
 }
 
 export function getConversation(convoId: string): Conversation | undefined {
-  return store.conversations.find(c => c.id === convoId);
+  const slot = conversationSlots.get(convoId);
+  return slot === undefined ? undefined : store.conversations[slot];
+}
+
+function getGroup(groupId: string): Conversation | undefined {
+  const convo = getConversation(groupId);
+  return convo?.type === 'group' ? convo : undefined;
 }
 
 export function getConversationsForAddress(address: string): Conversation[] {
-  return store.conversations.filter(c => 
-    c.participant_addresses.includes(address)
-  );
+  const convoIds = participantIndex.get(address);
+  if (!convoIds) return [];
+  return Array.from(convoIds, id => getConversation(id)!)
+    .sort((a, b) => conversationSlots.get(a.id)! - conversationSlots.get(b.id)!);
 }
 
 export function getOrCreateDirectConversation(address1: string, address2: string): Conversation {
-  const existing = store.conversations.find(c => 
-    c.type === 'direct' &&
-    c.participant_addresses.length === 2 &&
-    c.participant_addresses.includes(address1) &&
-    c.participant_addresses.includes(address2)
-  );
-  if (existing) return existing;
+  const existingId = directIndex.get(directKey(address1, address2));
+  if (existingId) return getConversation(existingId)!;
   
   const uniqueId = generateConversationId(address1, address2);
   
@@ -191,16 +674,16 @@ export function getOrCreateDirectConversation(address1: string, address2: string
     created_at: Date.now(),
     created_by: address1
   };
-  store.conversations.push(convo);
-  saveConversations();
+  applyConversation(convo);
+  persistConversation(convo);
   return convo;
 }
 
 export function updateConversationLastMessage(convoId: string, message: Message): void {
-  const convo = store.conversations.find(c => c.id === convoId);
+  const convo = getConversation(convoId);
   if (convo) {
     convo.last_message = message;
-    saveConversations();
+    persistConversation(convo);
   }
 }
 
@@ -217,69 +700,65 @@ export function createGroup(name: string, creatorAddress: string, participants:
     created_by: creatorAddress,
     admin_addresses: [creatorAddress]
   };
-  store.conversations.push(convo);
-  saveConversations();
+  applyConversation(convo);
+  persistConversation(convo);
   return convo;
 }
 
 export function addGroupMember(groupId: string, memberAddress: string): boolean {
-  const group = store.conversations.find(c => c.id === groupId && c.type === 'group');
+  const group = getGroup(groupId);
   if (!group) return false;
   if (!group.participant_addresses.includes(memberAddress)) {
     group.participant_addresses.push(memberAddress);
-    saveConversations();
+    indexParticipant(memberAddress, group.id);
+    persistConversation(group);
   }
   return true;
 }
 
 export function removeGroupMember(groupId: string, memberAddress: string): boolean {
-  const group = store.conversations.find(c => c.id === groupId && c.type === 'group');
+  const group = getGroup(groupId);
   if (!group) return false;
   group.participant_addresses = group.participant_addresses.filter(a => a !== memberAddress);
+  unindexParticipant(memberAddress, group.id);
   if (group.admin_addresses) {
     group.admin_addresses = group.admin_addresses.filter(a => a !== memberAddress);
   }
-  saveConversations();
+  persistConversation(group);
   return true;
 }
 
 export function isGroupAdmin(groupId: string, address: string): boolean {
-  const group = store.conversations.find(c => c.id === groupId && c.type === 'group');
+  const group = getGroup(groupId);
   return group?.admin_addresses?.includes(address) || false;
 }
 
-export function searchMessages(query: string, convoId?: string, limit = 50): Message[] {
-  const searchLower = query.toLowerCase().trim();
-  if (!searchLower) return [];
-  
-  const results: Message[] = [];
-  const conversationsToSearch = convoId 
-    ? { [convoId]: store.messages[convoId] || [] }
-    : store.messages;
-  
-  for (const [, messages] of Object.entries(conversationsToSearch)) {
-    for (const msg of messages) {
-      if (msg.content && msg.content.toLowerCase().includes(searchLower)) {
-        results.push(msg);
-        if (results.length >= limit) break;
-      }
-    }
-    if (results.length >= limit) break;
+// Newest-first word search. Scope to one conversation, or to an address's
+// conversations for a global search; with neither, every conversation is searched.
+export function searchMessages(
+  query: string,
+  scope: { convoId?: string; address?: string } = {},
+  options: SearchOptions = {}
+): SearchPage {
+  let convoIds: Iterable<string>;
+  if (scope.convoId) {
+    convoIds = [scope.convoId];
+  } else if (scope.address) {
+    convoIds = getConversationsForAddress(scope.address).map(c => c.id);
+  } else {
+    convoIds = Object.keys(store.messages);
   }
-  
-  return results.sort((a, b) => b.timestamp - a.timestamp).slice(0, limit);
+  return searchIndex.search(query, convoIds, options);
 }
 
 export function getMessagesSince(convoId: string, sinceTimestamp: number): Message[] {
   const convoMessages = store.messages[convoId] || [];
-  return convoMessages.filter(m => m.timestamp > sinceTimestamp);
+  if (unorderedTimestamps.has(convoId)) {
+    return convoMessages.filter(m => m.timestamp > sinceTimestamp);
+  }
+  return convoMessages.slice(partitionPoint(convoMessages, m => m.timestamp <= sinceTimestamp));
 }
 
 export function hasMessage(messageId: string, nonce: string): boolean {
-  for (const convoMessages of Object.values(store.messages)) {
-    if (convoMessages.some(m => m.id === messageId || m.nonce === nonce)) {
-      return true;
-    }
-  }
-  return false;
+  return messageIndex.has(messageId) || (!!nonce && nonceIndex.has(nonce));
 }
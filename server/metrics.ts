@@ -0,0 +1,203 @@
+import { monitorEventLoopDelay } from 'perf_hooks';
+
+// In-process metrics registry rendered in the Prometheus text format on
+// /metrics.
+//
+// Counters, gauges and fixed-bucket histograms keep one series per label set.
+// A metric accepts at most MAX_SERIES label sets; anything beyond that is
+// folded into a single series labelled "other" so a client sending made-up
+// message types can't grow the registry. Gauges that are cheaper to read at
+// scrape time than to keep current (socket counts, pool sizes) register a
+// collector instead.
+
+type Labels = Record<string, string>;
+
+const MAX_SERIES = 200;
+
+// Seconds; covers sub-millisecond relays up to slow DB-backed handlers
+export const LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10];
+
+function labelKey(labels: Labels | undefined): string {
+  if (!labels) return '';
+  return Object.keys(labels).sort().map(k => `${k}="${escapeLabel(labels[k])}"`).join(',');
+}
+
+function escapeLabel(value: string): string {
+  return String(value).replace(/\\/g, '\\\\').replace(/\n/g, '\\n').replace(/"/g, '\\"');
+}
+
+function overflowKey(labels: Labels): string {
+  const folded: Labels = {};
+  for (const k of Object.keys(labels)) folded[k] = 'other';
+  return labelKey(folded);
+}
+
+function formatValue(value: number): string {
+  if (value === Infinity) return '+Inf';
+  if (value === -Infinity) return '-Inf';
+  return String(value);
+}
+
+abstract class Metric {
+  constructor(readonly name: string, readonly help: string, readonly type: 'counter' | 'gauge' | 'histogram') {}
+
+  protected seriesKey(series: Map<string, unknown>, labels: Labels | undefined): string {
+    const key = labelKey(labels);
+    if (series.has(key) || series.size < MAX_SERIES || !labels) return key;
+    return overflowKey(labels);
+  }
+
+  abstract render(): string[];
+}
+
+export class Counter extends Metric {
+  private values = new Map<string, number>();
+
+  constructor(name: string, help: string) {
+    super(name, help, 'counter');
+  }
+
+  inc(labels?: Labels, value = 1): void {
+    const key = this.seriesKey(this.values, labels);
+    this.values.set(key, (this.values.get(key) ?? 0) + value);
+  }
+
+  render(): string[] {
+    return Array.from(this.values, ([key, value]) => `${this.name}${key ? `{${key}}` : ''} ${formatValue(value)}`);
+  }
+}
+
+export class Gauge extends Metric {
+  private values = new Map<string, number>();
+
+  constructor(name: string, help: string) {
+    super(name, help, 'gauge');
+  }
+
+  set(value: number, labels?: Labels): void {
+    this.values.set(this.seriesKey(this.values, labels), value);
+  }
+
+  render(): string[] {
+    return Array.from(this.values, ([key, value]) => `${this.name}${key ? `{${key}}` : ''} ${formatValue(value)}`);
+  }
+}
+
+interface HistogramSeries {
+  counts: number[]; // Per bucket, not cumulative
+  sum: number;
+  count: number;
+}
+
+export class Histogram extends Metric {
+  private series = new Map<string, HistogramSeries>();
+
+  constructor(name: string, help: string, private readonly buckets: number[] = LATENCY_BUCKETS) {
+    super(name, help, 'histogram');
+  }
+
+  observe(value: number, labels?: Labels): void {
+    const key = this.seriesKey(this.series, labels);
+    let s = this.series.get(key);
+    if (!s) {
+      s = { counts: new Array(this.buckets.length + 1).fill(0), sum: 0, count: 0 };
+      this.series.set(key, s);
+    }
+    let i = 0;
+    while (i < this.buckets.length && value > this.buckets[i]) i++;
+    s.counts[i]++;
+    s.sum += value;
+    s.count++;
+  }
+
+  // Observe elapsed seconds since a performance.now() timestamp
+  observeSince(startMs: number, labels?: Labels): void {
+    this.observe((performance.now() - startMs) / 1000, labels);
+  }
+
+  render(): string[] {
+    const lines: string[] = [];
+    for (const [key, s] of Array.from(this.series)) {
+      const prefix = key ? `${key},` : '';
+      let cumulative = 0;
+      this.buckets.forEach((bound, i) => {
+        cumulative += s.counts[i];
+        lines.push(`${this.name}_bucket{${prefix}le="${bound}"} ${cumulative}`);
+      });
+      lines.push(`${this.name}_bucket{${prefix}le="+Inf"} ${s.count}`);
+      lines.push(`${this.name}_sum${key ? `{${key}}` : ''} ${s.sum}`);
+      lines.push(`${this.name}_count${key ? `{${key}}` : ''} ${s.count}`);
+    }
+    return lines;
+  }
+}
+
+const registry = new Map<string, Metric>();
+const collectors: (() => void)[] = [];
+
+function register<T extends Metric>(metric: T): T {
+  const existing = registry.get(metric.name);
+  if (existing) return existing as T;
+  registry.set(metric.name, metric);
+  return metric;
+}
+
+export function counter(name: string, help: string): Counter {
+  return register(new Counter(name, help));
+}
+
+export function gauge(name: string, help: string): Gauge {
+  return register(new Gauge(name, help));
+}
+
+export function histogram(name: string, help: string, buckets?: number[]): Histogram {
+  return register(new Histogram(name, help, buckets));
+}
+
+// Run `fn` right before each scrape to refresh gauges
+export function onCollect(fn: () => void): void {
+  collectors.push(fn);
+}
+
+export function renderMetrics(): string {
+  for (const collect of collectors) {
+    try {
+      collect();
+    } catch (error) {
+      console.error('[metrics] Collector failed:', error);
+    }
+  }
+  const lines: string[] = [];
+  for (const metric of Array.from(registry.values())) {
+    lines.push(`# HELP ${metric.name} ${metric.help}`, `# TYPE ${metric.name} ${metric.type}`, ...metric.render());
+  }
+  return lines.join('\n') + '\n';
+}
+
+// ============================================================================
+// Process-wide metrics
+// ============================================================================
+
+const eventLoopDelay = monitorEventLoopDelay({ resolution: 10 });
+eventLoopDelay.enable();
+
+const eventLoopLag = gauge('callvault_event_loop_lag_seconds', 'Event loop delay since the previous scrape');
+const heapUsed = gauge('callvault_process_heap_used_bytes', 'V8 heap in use');
+const rss = gauge('callvault_process_resident_memory_bytes', 'Resident set size');
+const cpuSeconds = counter('callvault_process_cpu_seconds_total', 'User and system CPU time');
+let lastCpu = process.cpuUsage();
+
+onCollect(() => {
+  // monitorEventLoopDelay reports nanoseconds; reset so each scrape covers one interval
+  eventLoopLag.set(eventLoopDelay.percentile(50) / 1e9, { quantile: '0.5' });
+  eventLoopLag.set(eventLoopDelay.percentile(99) / 1e9, { quantile: '0.99' });
+  eventLoopLag.set(eventLoopDelay.max / 1e9, { quantile: '1' });
+  eventLoopDelay.reset();
+  const memory = process.memoryUsage();
+  heapUsed.set(memory.heapUsed);
+  rss.set(memory.rss);
+  const cpu = process.cpuUsage(lastCpu);
+  lastCpu = process.cpuUsage();
+  cpuSeconds.inc({ mode: 'user' }, cpu.user / 1e6);
+  cpuSeconds.inc({ mode: 'system' }, cpu.system / 1e6);
+});
@@ -1,10 +1,13 @@
 import type { Request, Response, NextFunction } from 'express';
 import { randomUUID } from 'crypto';
 import logger from './logger';
+import { histogram } from './metrics';
 
 // Request timing storage
 const requestStartTimes = new WeakMap<Request, number>();
 
+const httpRequestDuration = histogram('callvault_http_request_duration_seconds', 'HTTP request latency by route');
+
 // Sensitive headers to redact
 const SENSITIVE_HEADERS = [
   'authorization',
@@ -86,6 +89,7 @@ export function requestLogger(req: Request, res: Response, next: NextFunction):
   
   // Store start time
   requestStartTimes.set(req, Date.now());
+  const startedAt = performance.now();
   
   // Get user info if available
   const userAddress = (req as any).userAddress || req.body?.address || req.params?.address;
@@ -140,6 +144,13 @@ export function requestLogger(req: Request, res: Response, next: NextFunction):
     const startTime = requestStartTimes.get(req) || Date.now();
     const duration = Date.now() - startTime;
     
+    // Label by the matched route pattern (/api/calls/:address), not the raw path
+    httpRequestDuration.observeSince(startedAt, {
+      method: req.method,
+      route: req.route?.path ? `${req.baseUrl}${req.route.path}` : 'unmatched',
+      status: `${Math.floor(res.statusCode / 100)}xx`,
+    });
+    
     const responseLog: Record<string, any> = {
       statusCode,
       duration: `${duration}ms`
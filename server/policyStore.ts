@@ -2,7 +2,7 @@ import * as fs from 'fs';
 import * as path from 'path';
 import type { CallPolicy, ContactOverride, CallPass, BlockedUser, RoutingRule, WalletVerification, CallRequest } from '@shared/types';
 
-const DATA_DIR = path.join(process.cwd(), 'data');
+const DATA_DIR = process.env.LOCAL_DATA_DIR || path.join(process.cwd(), 'data');
 
 function ensureDataDir() {
   if (!fs.existsSync(DATA_DIR)) {
@@ -23,12 +23,6 @@ function loadJson<T>(filename: string, defaultValue: T): T {
   return defaultValue;
 }
 
-function saveJson<T>(filename: string, data: T): void {
-  ensureDataDir();
-  const filePath = path.join(DATA_DIR, filename);
-  fs.writeFileSync(filePath, JSON.stringify(data, null, 2));
-}
-
 let policies: Map<string, CallPolicy> = new Map(
   Object.entries(loadJson<Record<string, CallPolicy>>('policies.json', {}))
 );
@@ -57,6 +51,128 @@ let callRequests: Map<string, CallRequest> = new Map();
 
 let attemptCounters: Map<string, { count: number; lastAttempt: number; rejections: number }> = new Map();
 
+// ============================================================================
+// Persistence
+//
+// Mutations only mark their file dirty. Dirty files are written asynchronously
+// (temp file + rename) at most once per POLICY_FLUSH_DELAY_MS, so a burst of
+// policy/block/routing updates costs one write per file instead of a synchronous
+// whole-map write per update. Serialization is chunked so a large map doesn't
+// block signaling either; an entry changed mid-write is dirty again and lands
+// in the next flush. Anything still dirty is written synchronously on exit.
+// ============================================================================
+
+const POLICY_FLUSH_DELAY_MS = parseInt(process.env.POLICY_FLUSH_DELAY_MS || '250', 10);
+const SERIALIZE_CHUNK_ENTRIES = 500;
+
+const persistedMaps = {
+  'policies.json': () => policies,
+  'overrides.json': () => overrides,
+  'passes.json': () => passes,
+  'blocklist.json': () => blocklist,
+  'routing.json': () => routingRules,
+  'wallets.json': () => walletVerifications,
+};
+type PolicyFile = keyof typeof persistedMaps;
+
+const dirtyFiles = new Set<PolicyFile>();
+let flushTimer: NodeJS.Timeout | null = null;
+let flushInFlight: Promise<void> | null = null;
+let inFlightFiles: PolicyFile[] = [];
+
+function serialize(filename: PolicyFile): string {
+  return JSON.stringify(Object.fromEntries(persistedMaps[filename]()));
+}
+
+function markDirty(filename: PolicyFile): void {
+  dirtyFiles.add(filename);
+  scheduleFlush();
+}
+
+function scheduleFlush(): void {
+  if (flushTimer || flushInFlight) return;
+  flushTimer = setTimeout(() => {
+    flushTimer = null;
+    void flushPolicyStore();
+  }, POLICY_FLUSH_DELAY_MS);
+  flushTimer.unref();
+}
+
+async function writeJsonAtomic(filename: PolicyFile): Promise<void> {
+  const map: Map<string, unknown> = persistedMaps[filename]();
+  const keys = Array.from(map.keys());
+  const filePath = path.join(DATA_DIR, filename);
+  const tmpPath = `${filePath}.tmp`;
+  const handle = await fs.promises.open(tmpPath, 'w');
+  try {
+    let written = 0;
+    for (let i = 0; i < keys.length; i += SERIALIZE_CHUNK_ENTRIES) {
+      let chunk = i === 0 ? '{' : '';
+      for (const key of keys.slice(i, i + SERIALIZE_CHUNK_ENTRIES)) {
+        if (!map.has(key)) continue;
+        chunk += `${written++ > 0 ? ',' : ''}${JSON.stringify(key)}:${JSON.stringify(map.get(key))}`;
+      }
+      await handle.write(chunk);
+    }
+    await handle.write(keys.length === 0 ? '{}' : '}');
+  } finally {
+    await handle.close();
+  }
+  await fs.promises.rename(tmpPath, filePath);
+}
+
+// Write every dirty file now; resolves once they are on disk
+export async function flushPolicyStore(): Promise<void> {
+  if (flushTimer) {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+  }
+  while (flushInFlight) {
+    await flushInFlight;
+  }
+  if (dirtyFiles.size === 0) return;
+
+  const files = Array.from(dirtyFiles);
+  dirtyFiles.clear();
+  inFlightFiles = files;
+  flushInFlight = (async () => {
+    ensureDataDir();
+    for (const filename of files) {
+      await writeJsonAtomic(filename);
+    }
+  })()
+    .catch(error => {
+      console.error('[policyStore] Failed to persist policy data:', error);
+      files.forEach(filename => dirtyFiles.add(filename));
+    })
+    .finally(() => {
+      flushInFlight = null;
+      inFlightFiles = [];
+      if (dirtyFiles.size > 0) scheduleFlush();
+    });
+  await flushInFlight;
+}
+
+// Synchronous variant for process exit, when pending async writes can't complete
+export function flushPolicyStoreSync(): void {
+  if (flushTimer) {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+  }
+  // Files mid-write are rewritten too: their async write never finishes once we exit
+  const files = new Set([...Array.from(dirtyFiles), ...inFlightFiles]);
+  if (files.size === 0) return;
+  ensureDataDir();
+  for (const filename of Array.from(files)) {
+    const filePath = path.join(DATA_DIR, filename);
+    fs.writeFileSync(`${filePath}.exit.tmp`, serialize(filename));
+    fs.renameSync(`${filePath}.exit.tmp`, filePath);
+  }
+  dirtyFiles.clear();
+}
+
+process.on('exit', flushPolicyStoreSync);
+
 export function getDefaultPolicy(): Omit<CallPolicy, 'owner_address' | 'updated_at'> {
   return {
     allow_calls_from: 'contacts',
@@ -73,7 +189,7 @@ export function getPolicy(address: string): CallPolicy | null {
 
 export function savePolicy(policy: CallPolicy): void {
   policies.set(policy.owner_address, policy);
-  saveJson('policies.json', Object.fromEntries(policies));
+  markDirty('policies.json');
 }
 
 export function getOverrides(ownerAddress: string): ContactOverride[] {
@@ -94,7 +210,7 @@ export function saveOverride(override: ContactOverride): void {
     list.push(override);
   }
   overrides.set(override.owner_address, list);
-  saveJson('overrides.json', Object.fromEntries(overrides));
+  markDirty('overrides.json');
 }
 
 export function createPass(passData: Omit<CallPass, 'id' | 'created_at' | 'burned' | 'revoked'>): CallPass {
@@ -106,7 +222,7 @@ export function createPass(passData: Omit<CallPass, 'id' | 'created_at' | 'burne
     revoked: false
   };
   passes.set(pass.id, pass);
-  saveJson('passes.json', Object.fromEntries(passes));
+  markDirty('passes.json');
   return pass;
 }
 
@@ -153,7 +269,7 @@ export function consumePass(passId: string): void {
     }
   }
   passes.set(passId, pass);
-  saveJson('passes.json', Object.fromEntries(passes));
+  markDirty('passes.json');
 }
 
 export function revokePass(passId: string): boolean {
@@ -161,7 +277,7 @@ export function revokePass(passId: string): boolean {
   if (!pass) return false;
   pass.revoked = true;
   passes.set(passId, pass);
-  saveJson('passes.json', Object.fromEntries(passes));
+  markDirty('passes.json');
   return true;
 }
 
@@ -179,7 +295,7 @@ export function addToBlocklist(blocked: BlockedUser): void {
   if (!list.some(b => b.blocked_address === blocked.blocked_address)) {
     list.push(blocked);
     blocklist.set(blocked.owner_address, list);
-    saveJson('blocklist.json', Object.fromEntries(blocklist));
+    markDirty('blocklist.json');
   }
 }
 
@@ -187,7 +303,7 @@ export function removeFromBlocklist(ownerAddress: string, blockedAddress: string
   const list = blocklist.get(ownerAddress) || [];
   const filtered = list.filter(b => b.blocked_address !== blockedAddress);
   blocklist.set(ownerAddress, filtered);
-  saveJson('blocklist.json', Object.fromEntries(blocklist));
+  markDirty('blocklist.json');
 }
 
 export function getRoutingRules(ownerAddress: string): RoutingRule[] {
@@ -196,7 +312,7 @@ export function getRoutingRules(ownerAddress: string): RoutingRule[] {
 
 export function saveRoutingRules(ownerAddress: string, rules: RoutingRule[]): void {
   routingRules.set(ownerAddress, rules);
-  saveJson('routing.json', Object.fromEntries(routingRules));
+  markDirty('routing.json');
 }
 
 export function getWalletVerification(callAddress: string): WalletVerification | null {
@@ -205,7 +321,7 @@ export function getWalletVerification(callAddress: string): WalletVerification |
 
 export function saveWalletVerification(verification: WalletVerification): void {
   walletVerifications.set(verification.call_address, verification);
-  saveJson('wallets.json', Object.fromEntries(walletVerifications));
+  markDirty('wallets.json');
 }
 
 export function createCallRequest(request: CallRequest): void {
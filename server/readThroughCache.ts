@@ -0,0 +1,81 @@
+import { ExpiringMap } from './expiringMap';
+import { counter } from './metrics';
+
+// Bounded read-through cache for storage lookups.
+//
+// get() returns a cached value, or runs the loader once however many callers
+// ask for the same key while it is in flight. Misses are cached too ("negative"
+// entries, on a shorter TTL) so repeated lookups of unknown keys don't each
+// reach Postgres. Writers call invalidate(); a load that was already running
+// when its key was invalidated returns its result but doesn't cache it.
+//
+// Each process has its own copy, so the TTL bounds how long another cluster
+// worker's write can go unseen.
+
+export interface ReadThroughCacheOptions {
+  ttlMs: number;
+  negativeTtlMs: number;
+  maxEntries: number;
+}
+
+const lookups = counter('callvault_storage_cache_lookups_total', 'Storage read-through cache lookups by cache and result');
+
+export class ReadThroughCache<V> {
+  private entries: ExpiringMap<{ value: V | undefined }>;
+  private loads = new Map<string, Promise<V | undefined>>();
+  private staleLoads = new WeakSet<Promise<V | undefined>>(); // Invalidated while running
+  private counters = { hits: 0, negativeHits: 0, misses: 0, coalesced: 0, invalidations: 0 };
+
+  constructor(readonly name: string, private readonly options: ReadThroughCacheOptions) {
+    this.entries = new ExpiringMap({ ttlMs: options.ttlMs, maxEntries: options.maxEntries });
+  }
+
+  async get(key: string, load: () => Promise<V | undefined>): Promise<V | undefined> {
+    const cached = this.entries.get(key);
+    if (cached) {
+      const result = cached.value === undefined ? 'negative_hit' : 'hit';
+      this.counters[cached.value === undefined ? 'negativeHits' : 'hits']++;
+      lookups.inc({ cache: this.name, result });
+      return cached.value;
+    }
+
+    const inFlight = this.loads.get(key);
+    if (inFlight) {
+      this.counters.coalesced++;
+      lookups.inc({ cache: this.name, result: 'coalesced' });
+      return inFlight;
+    }
+
+    this.counters.misses++;
+    lookups.inc({ cache: this.name, result: 'miss' });
+    const promise: Promise<V | undefined> = load().then(value => {
+      if (!this.staleLoads.has(promise)) {
+        this.entries.set(key, { value }, value === undefined ? this.options.negativeTtlMs : this.options.ttlMs);
+      }
+      return value;
+    }).finally(() => {
+      if (this.loads.get(key) === promise) this.loads.delete(key);
+    });
+    this.loads.set(key, promise);
+    return promise;
+  }
+
+  // Cached value without loading or counting a lookup
+  peek(key: string): V | undefined {
+    return this.entries.get(key)?.value;
+  }
+
+  invalidate(key: string): void {
+    this.counters.invalidations++;
+    this.entries.delete(key);
+    const inFlight = this.loads.get(key);
+    if (inFlight) {
+      this.staleLoads.add(inFlight);
+      this.loads.delete(key);
+    }
+  }
+
+  stats() {
+    return { name: this.name, size: this.entries.size, maxEntries: this.options.maxEntries, ...this.counters };
+  }
+}
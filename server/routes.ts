@@ -9,8 +9,7 @@ import * as path from "path";
 import { randomUUID, createHash } from "crypto";
 import webpush from "web-push";
 import type { WSMessage, SignedCallIntent, CallIntent, SignedMessage, Message, Conversation, CallPolicy, ContactOverride, CallPass, BlockedUser, RoutingRule, WalletVerification, CallRequest, GroupCallRoom, GroupCallParticipant } from "@shared/types";
-import * as messageStore from "./messageStore";
-import * as policyStore from "./policyStore";
+import { messageStore, policyStore } from "./sharedStores";
 import { storage, db } from "./storage";
 import { teamMembers } from "@shared/schema";
 import { eq } from "drizzle-orm";
@@ -18,9 +17,20 @@ import { getUncachableStripeClient, getStripePublishableKey } from "./stripeClie
 import { FreeTierShield, FREE_TIER_LIMITS, type ShieldErrorCode } from "./freeTierShield";
 import { sendEmail, generateWelcomeEmail, generateTrialInviteEmail } from "./email";
 import { getEffectiveEntitlements } from "./entitlements";
-import logger from "./logger";
+import logger, { isEnabled } from "./logger";
 import errorTracker from "./errorTracker";
 import { asyncHandler } from "./middleware";
+import { getClusterNode } from "./wsCluster";
+import { verifyDetached, verifyQueued } from "./signatureVerifier";
+import { ExpiringMap } from "./expiringMap";
+import { counter, gauge, histogram, onCollect } from "./metrics";
+import { usageCache } from "./usageCache";
+import { MSGPACK_SUBPROTOCOL, decodeFrame } from "./wireCodec";
+import { createFanOut, sendMessage, useMsgpack, wireFrame } from "./wsFanOut";
+import { callTokenMode, getCallTokenStats, mintCallToken, verifyCallToken } from "./callTokens";
+import { iceConfig } from "./iceConfig";
+import { DeadlineScheduler } from "./deadlineScheduler";
+import { IceCoalescer, acceptIceBatches, acceptsIceBatches, batchFrame, isEndOfCandidates, singleFrames } from "./iceCoalescer";
 
 // VAPID keys for push notifications - generate once and store in env vars
 const VAPID_PUBLIC_KEY = process.env.VAPID_PUBLIC_KEY || '';
@@ -366,12 +376,45 @@ interface ClientConnection {
 
 // Multi-device support: Store array of connections per address
 const connections = new Map<string, ClientConnection[]>();
+// Total entries across `connections`, kept in step by setConnections/dropAddress
+let connectionTotal = 0;
+
+function setConnections(address: string, conns: ClientConnection[]) {
+  connectionTotal += conns.length - (connections.get(address)?.length ?? 0);
+  connections.set(address, conns);
+}
+
+// Cluster mode (WS_CLUSTER_WORKERS): this worker only holds some of the sockets,
+// relays to addresses connected elsewhere go over the cluster bus
+const clusterNode = getClusterNode();
+
+// Per-category loggers for the signaling hot paths; guard calls with isEnabled()
+// so nothing is formatted when the level is off (LOG_LEVEL / LOG_CATEGORIES)
+const wsLog = logger.category('ws');
+const broadcastLog = logger.category('broadcast');
+const callLog = logger.category('call');
+const webrtcLog = logger.category('webrtc');
+const msgLog = logger.category('msg');
+
+const wsMessageDuration = histogram('callvault_ws_message_duration_seconds', 'WebSocket frame handling time by message type');
+const wsMessageErrors = counter('callvault_ws_message_errors_total', 'WebSocket frames whose handler threw, by message type');
+const wsOpenSockets = gauge('callvault_ws_open_sockets', 'Open WebSocket connections on this process');
+const wsRegisteredConnections = gauge('callvault_ws_registered_connections', 'Connections that have sent register');
+const wsSendBuffer = gauge('callvault_ws_send_buffer_bytes', 'Bytes queued for sending across all sockets (total) and on the fullest one (max)');
+const wsFramesReceived = counter('callvault_ws_frames_received_total', 'WebSocket frames received, by wire encoding');
+const wsBytesReceived = counter('callvault_ws_received_bytes_total', 'WebSocket payload bytes received (after inflate), by wire encoding');
 
 // Helper function to add a connection for an address
 function addConnection(address: string, conn: ClientConnection) {
-  const existing = connections.get(address) || [];
-  existing.push(conn);
-  connections.set(address, existing);
+  setConnections(address, [...(connections.get(address) || []), conn]);
+  clusterNode?.announce(address, true);
+}
+
+// Forget an address once it has no live sockets left on this worker
+function dropAddress(address: string) {
+  connectionTotal -= connections.get(address)?.length ?? 0;
+  connections.delete(address);
+  clusterNode?.announce(address, false);
 }
 
 // Helper function to remove a specific connection
@@ -380,9 +423,9 @@ function removeConnection(address: string, connectionId: string) {
   if (!existing) return;
   const filtered = existing.filter(c => c.connectionId !== connectionId);
   if (filtered.length === 0) {
-    connections.delete(address);
+    dropAddress(address);
   } else {
-    connections.set(address, filtered);
+    setConnections(address, filtered);
   }
 }
 
@@ -402,10 +445,10 @@ function getConnection(address: string): ClientConnection | undefined {
   // No open connections found - clean up dead ones
   const openConns = conns.filter(c => c.ws.readyState === WebSocket.OPEN);
   if (openConns.length === 0) {
-    connections.delete(address);
+    dropAddress(address);
     console.log(`[cleanup] Removed all dead connections for ${address.slice(0, 20)}...`);
   } else {
-    connections.set(address, openConns);
+    setConnections(address, openConns);
   }
   
   return undefined;
@@ -422,9 +465,9 @@ function getAllConnections(address: string): ClientConnection[] {
   // Update stored connections if we filtered any dead ones
   if (openConns.length !== conns.length) {
     if (openConns.length === 0) {
-      connections.delete(address);
+      dropAddress(address);
     } else {
-      connections.set(address, openConns);
+      setConnections(address, openConns);
     }
   }
   
@@ -437,16 +480,29 @@ function isConnectionForAddress(address: string, ws: WebSocket): boolean {
   return conns?.some(c => c.ws === ws) ?? false;
 }
 
-// Helper to broadcast to all connections for an address
+// Group fan-out: one serialization per frame, written to every recipient's sockets
+const fanOut = createFanOut({
+  connectionsFor: address => connections.get(address),
+  forward: clusterNode ? (address, frame) => clusterNode.forward(address, frame) : undefined,
+  onDead: removeConnection,
+});
+
+// Helper to broadcast to all connections for an address, including ones held
+// by other cluster workers
 function broadcastToAddress(address: string, message: any) {
   const conns = connections.get(address);
+  const frame = wireFrame(message);
+  const forwarded = clusterNode ? clusterNode.forward(address, frame.json()) : 0;
   if (!conns || conns.length === 0) {
-    console.log(`[broadcast] No connections for ${address.slice(0, 12)}... - message not delivered`);
-    return 0;
+    if (forwarded === 0 && isEnabled('debug', 'broadcast')) {
+      broadcastLog.debug(`No connections for ${address.slice(0, 12)}... - message not delivered`);
+    }
+    return forwarded;
+  }
+  if (isEnabled('debug', 'broadcast')) {
+    const msgType = typeof message === 'object' && message.type ? message.type : 'unknown';
+    broadcastLog.debug(`Sending ${msgType} to ${address.slice(0, 12)}... (${conns.length} connection(s))`);
   }
-  const msgStr = typeof message === 'string' ? message : JSON.stringify(message);
-  const msgType = typeof message === 'object' && message.type ? message.type : 'unknown';
-  console.log(`[broadcast] Sending ${msgType} to ${address.slice(0, 12)}... (${conns.length} connection(s))`);
   
   let successCount = 0;
   const deadConnections: string[] = [];
@@ -454,35 +510,90 @@ function broadcastToAddress(address: string, message: any) {
   for (const conn of conns) {
     try {
       if (conn.ws.readyState === WebSocket.OPEN) {
-        conn.ws.send(msgStr);
+        conn.ws.send(frame.for(conn.ws));
         successCount++;
       } else {
         // Mark for cleanup
         deadConnections.push(conn.connectionId);
       }
     } catch (e: any) {
-      console.error(`[broadcast] Failed to send to ${address}:`, e.message);
+      broadcastLog.error(`Failed to send to ${address}`, e);
       deadConnections.push(conn.connectionId);
     }
   }
   
   // Clean up dead connections
   if (deadConnections.length > 0) {
-    console.log(`[broadcast] Cleaning up ${deadConnections.length} dead connection(s) for ${address.slice(0, 12)}...`);
+    if (isEnabled('info', 'broadcast')) {
+      broadcastLog.info(`Cleaning up ${deadConnections.length} dead connection(s) for ${address.slice(0, 12)}...`);
+    }
     for (const connId of deadConnections) {
       removeConnection(address, connId);
     }
   }
   
-  return successCount;
+  return successCount + forwarded;
+}
+
+// Send to the first live socket for an address, on this worker or another one
+function sendToAddress(address: string, message: any): boolean {
+  const conn = getConnection(address);
+  if (conn) {
+    return safeSend(conn.ws, message);
+  }
+  if (!clusterNode) {
+    return false;
+  }
+  const msgStr = typeof message === 'string' ? message : JSON.stringify(message);
+  return clusterNode.forward(address, msgStr, true) > 0;
+}
+
+// Whether an address has a live socket on any worker
+function isAddressOnline(address: string): boolean {
+  return !!getConnection(address) || (clusterNode?.isOnlineElsewhere(address) ?? false);
+}
+
+// Trickled ICE for recipients that opted in, relayed in batches (see server/iceCoalescer.ts)
+const iceCoalescer = new IceCoalescer(batch => {
+  const conn = getConnection(batch.to);
+  let delivered: boolean;
+  if (conn && acceptsIceBatches(conn.ws)) {
+    delivered = safeSend(conn.ws, batchFrame(batch));
+  } else {
+    // Reconnected without the opt-in while the batch was open
+    if (batch.candidates.length === 0) return;
+    delivered = singleFrames(batch).map(frame => sendToAddress(batch.to, frame)).some(Boolean);
+  }
+  if (!delivered && batch.kind === 'webrtc:ice') {
+    safeSend(batch.sender, { type: 'webrtc:peer_offline', to_address: batch.to, signalType: batch.kind });
+  }
+});
+
+// Whether ICE for `address` should be coalesced: its socket on this worker took the opt-in
+function wantsIceBatches(address: string): boolean {
+  if (!iceCoalescer.enabled) return false;
+  const conn = getConnection(address);
+  return !!conn && acceptsIceBatches(conn.ws);
 }
 
+// Frames forwarded by other workers go to this worker's sockets only
+clusterNode?.onDeliver((address, frame, first) => {
+  if (first) {
+    const conn = getConnection(address);
+    return conn && safeSend(conn.ws, frame) ? 1 : 0;
+  }
+  let sent = 0;
+  for (const conn of getAllConnections(address)) {
+    if (safeSend(conn.ws, frame)) sent++;
+  }
+  return sent;
+});
+
 // Helper to safely send a message to a specific WebSocket
 function safeSend(ws: WebSocket, message: any): boolean {
   try {
     if (ws.readyState === WebSocket.OPEN) {
-      const msgStr = typeof message === 'string' ? message : JSON.stringify(message);
-      ws.send(msgStr);
+      ws.send(wireFrame(message).for(ws));
       return true;
     }
   } catch (e: any) {
@@ -491,21 +602,88 @@ function safeSend(ws: WebSocket, message: any): boolean {
   return false;
 }
 
-// Helper to count all active WebSocket connections
-function getConnectionCount(): number {
-  let count = 0;
-  for (const conns of connections.values()) {
-    for (const conn of conns) {
-      if (conn.ws.readyState === WebSocket.OPEN) {
-        count++;
+const PENDING_BATCH_SIZE = 100; // Messages per msg:batch frame
+
+// Highest seq the client already holds for a conversation. register's last_seq
+// is a { convo_id: seq } map; seq is per conversation, so anything else
+// (including a bare number) is ignored.
+function clientLastSeq(lastSeq: unknown, convoId: string): number {
+  if (lastSeq && typeof lastSeq === 'object') {
+    const seq = (lastSeq as Record<string, unknown>)[convoId];
+    if (typeof seq === 'number') return seq;
+  }
+  return 0;
+}
+
+// Replay a reconnecting client's queued messages: anything at or below its
+// last_seq is skipped, the rest goes out in msg:batch frames (or one
+// msg:incoming each for clients that didn't ask for batches), everything is
+// marked delivered in one update, and each sender gets a single receipt.
+async function deliverPendingMessages(ws: WebSocket, address: string, lastSeq: unknown, batched: boolean): Promise<number> {
+  const pendingMsgs = await storage.getPendingMessages(address);
+  if (pendingMsgs.length === 0) return 0;
+
+  const missing: Message[] = [];
+  for (const pendingMsg of pendingMsgs) {
+    if (pendingMsg.seq !== null && pendingMsg.seq <= clientLastSeq(lastSeq, pendingMsg.convoId)) {
+      continue;
+    }
+    missing.push({
+      id: pendingMsg.id,
+      convo_id: pendingMsg.convoId,
+      from_address: pendingMsg.fromAddress,
+      to_address: pendingMsg.toAddress,
+      content: pendingMsg.content,
+      type: pendingMsg.mediaType || 'text',
+      timestamp: pendingMsg.createdAt.getTime(),
+      status: 'delivered',
+      ...(pendingMsg.seq !== null ? { seq: pendingMsg.seq } : {}),
+    } as Message);
+  }
+
+  if (batched) {
+    const batches = Math.ceil(missing.length / PENDING_BATCH_SIZE);
+    for (let i = 0; i < batches; i++) {
+      if (!safeSend(ws, {
+        type: 'msg:batch',
+        messages: missing.slice(i * PENDING_BATCH_SIZE, (i + 1) * PENDING_BATCH_SIZE),
+        batch: i + 1,
+        batches,
+      })) {
+        return 0; // Socket went away; leave everything pending for next time
       }
     }
+  } else {
+    for (const msg of missing) {
+      // Pubkey not stored for pending messages
+      if (!safeSend(ws, { type: 'msg:incoming', message: msg, from_pubkey: '' })) {
+        return 0;
+      }
+    }
+  }
+
+  await storage.markMessagesDelivered(pendingMsgs.map(m => m.id));
+
+  const deliveredAt = Date.now();
+  // Messages skipped for last_seq are already on the device, so they count as
+  // delivered too and their senders get the same receipt
+  const receipts = new Map<string, { message_id: string; convo_id: string }[]>();
+  for (const pendingMsg of pendingMsgs) {
+    const list = receipts.get(pendingMsg.fromAddress) || [];
+    list.push({ message_id: pendingMsg.id, convo_id: pendingMsg.convoId });
+    receipts.set(pendingMsg.fromAddress, list);
+  }
+  for (const [sender, list] of Array.from(receipts.entries())) {
+    broadcastToAddress(sender, { type: 'msg:delivered_batch', receipts: list, delivered_at: deliveredAt });
   }
-  return count;
+  return missing.length;
+}
+
+// Registered WebSocket connections on this worker. O(1): sockets that died
+// without a close event are counted until cleanupDeadConnections drops them.
+function getConnectionCount(): number {
+  return connectionTotal;
 }
-const recentNonces = new Map<string, number>();
-// Trial nonces are now persisted in database (trialNoncesTable) for replay protection across restarts
-const rateLimitMap = new Map<string, { count: number; resetTime: number }>();
 
 const NONCE_EXPIRY = 15 * 60 * 1000; // 15 minutes - nonce expiry (longer than token TTL for cleanup)
 const TIMESTAMP_FRESHNESS = 10 * 60 * 1000; // 10 minutes - token lifetime for signature freshness
@@ -513,17 +691,46 @@ const MAX_CLOCK_SKEW = 5 * 60 * 1000; // 5 minutes - bidirectional tolerance for
 const CALL_TOKEN_TTL = 10 * 60 * 1000; // 10 minutes - server-issued token lifetime
 const RATE_LIMIT_WINDOW = 60 * 1000;
 const RATE_LIMIT_MAX_CALLS = 60; // Allow more attempts to accommodate retries
-
-function cleanupExpiredNonces() {
-  const now = Date.now();
-  for (const [nonce, timestamp] of Array.from(recentNonces.entries())) {
-    if (now - timestamp > NONCE_EXPIRY) {
-      recentNonces.delete(nonce);
-    }
+const MAX_TRACKED_NONCES = parseInt(process.env.MAX_TRACKED_NONCES || '1000000', 10);
+const MAX_NONCES_PER_KEY = parseInt(process.env.MAX_NONCES_PER_KEY || '600', 10);
+const MAX_RATE_LIMIT_ENTRIES = parseInt(process.env.MAX_RATE_LIMIT_ENTRIES || '500000', 10);
+
+// Both expire on a timing wheel (see expiringMap.ts) instead of periodic full scans
+// Nonces are never evicted early, since an evicted nonce could be replayed.
+// Each signing key may hold MAX_NONCES_PER_KEY reservations per NONCE_EXPIRY
+// window, and that quota is where a flood is refused; the MAX_TRACKED_NONCES
+// cap on the shared filter is only a memory backstop.
+const recentNonces = new ExpiringMap<number>({ ttlMs: NONCE_EXPIRY, maxEntries: MAX_TRACKED_NONCES, whenFull: 'reject' });
+// Evicting a quota record only resets that key's count, so plain eviction is fine here
+const nonceQuotas = new ExpiringMap<{ count: number }>({ ttlMs: NONCE_EXPIRY, maxEntries: MAX_TRACKED_NONCES });
+// Trial nonces are now persisted in database (trialNoncesTable) for replay protection across restarts
+const rateLimitMap = new ExpiringMap<{ count: number; resetTime: number }>({
+  ttlMs: RATE_LIMIT_WINDOW,
+  maxEntries: MAX_RATE_LIMIT_ENTRIES,
+});
+
+type NonceRefusal = 'nonce_replay' | 'nonce_quota_exceeded' | 'replay_filter_full';
+
+// Reserve `nonce` for the signing key `pubkey`; returns why it was refused, if it was
+function reserveNonce(nonce: string, timestamp: number, pubkey: string): NonceRefusal | null {
+  if (recentNonces.has(nonce)) return 'nonce_replay';
+  const quota = nonceQuotas.get(pubkey);
+  if (quota && quota.count >= MAX_NONCES_PER_KEY) return 'nonce_quota_exceeded';
+  if (!recentNonces.add(nonce, timestamp)) return 'replay_filter_full';
+  if (quota) {
+    quota.count++;
+  } else {
+    nonceQuotas.set(pubkey, { count: 1 });
   }
+  return null;
 }
 
-setInterval(cleanupExpiredNonces, 30000);
+// Give back a reservation whose request was rejected
+function releaseNonce(nonce: string, pubkey: string) {
+  if (!recentNonces.delete(nonce)) return;
+  const quota = nonceQuotas.get(pubkey);
+  if (quota && quota.count > 0) quota.count--;
+}
 
 // Periodic cleanup of dead WebSocket connections
 // This catches connections that died without firing the 'close' event
@@ -536,9 +743,9 @@ function cleanupDeadConnections() {
     if (deadCount > 0) {
       totalCleaned += deadCount;
       if (aliveConns.length === 0) {
-        connections.delete(address);
+        dropAddress(address);
       } else {
-        connections.set(address, aliveConns);
+        setConnections(address, aliveConns);
       }
     }
   }
@@ -551,7 +758,12 @@ function cleanupDeadConnections() {
 // Run cleanup every 30 seconds
 setInterval(cleanupDeadConnections, 30000);
 
-// Server-side call monitoring: check for stale calls and terminate them
+// Safety net for free-tier call records whose heartbeats stopped and that no
+// per-call deadline ended (e.g. the process restarted mid-call, or the cluster
+// worker holding the call's deadlines exited). Duration limits and dead calls
+// are normally handled by the call deadlines in registerRoutes, so this query
+// runs rarely.
+const STALE_CALL_SWEEP_MS = parseInt(process.env.STALE_CALL_SWEEP_MS || String(5 * 60 * 1000), 10);
 setInterval(async () => {
   try {
     // Skip if database is not available
@@ -573,14 +785,14 @@ setInterval(async () => {
       console.error('Error in stale call monitoring:', error);
     }
   }
-}, FREE_TIER_LIMITS.HEARTBEAT_INTERVAL_SECONDS * 1000); // Check every heartbeat interval
+}, STALE_CALL_SWEEP_MS);
 
 function checkRateLimit(fromAddress: string): boolean {
   const now = Date.now();
-  const record = rateLimitMap.get(fromAddress);
+  const record = rateLimitMap.get(fromAddress, now);
   
   if (!record || now > record.resetTime) {
-    rateLimitMap.set(fromAddress, { count: 1, resetTime: now + RATE_LIMIT_WINDOW });
+    rateLimitMap.set(fromAddress, { count: 1, resetTime: now + RATE_LIMIT_WINDOW }, RATE_LIMIT_WINDOW, now);
     return true;
   }
   
@@ -597,7 +809,7 @@ interface VerifyResult {
   reason?: string;
 }
 
-function verifySignatureWithDetails(signedIntent: SignedCallIntent): VerifyResult {
+async function verifySignatureWithDetails(signedIntent: SignedCallIntent): Promise<VerifyResult> {
   try {
     if (!signedIntent || typeof signedIntent !== 'object') {
       return { valid: false, reason: 'invalid_structure' };
@@ -635,35 +847,47 @@ function verifySignatureWithDetails(signedIntent: SignedCallIntent): VerifyResul
       return { valid: false, reason: 'clock_skew_exceeded', serverTime: now };
     }
     
-    if (recentNonces.has(intent.nonce)) {
-      return { valid: false, reason: 'nonce_replay' };
-    }
-    
     const sortedIntent = JSON.stringify(intent, Object.keys(intent).sort());
     const message = new TextEncoder().encode(sortedIntent);
-    const signatureBytes = bs58.decode(signature);
-    const publicKeyBytes = bs58.decode(intent.from_pubkey);
-    
-    const valid = nacl.sign.detached.verify(message, signatureBytes, publicKeyBytes);
     
-    if (valid) {
-      recentNonces.set(intent.nonce, intent.timestamp);
-      return { valid: true };
+    // Reserve the nonce while the check is queued so a replay can't slip in
+    const refused = reserveNonce(intent.nonce, intent.timestamp, intent.from_pubkey);
+    if (refused) {
+      return { valid: false, reason: refused };
+    }
+    let valid = false;
+    try {
+      valid = await verifyQueued(message, signature, intent.from_pubkey);
+    } finally {
+      // Released on a rejected or failed check so the sender can retry it
+      if (!valid) releaseNonce(intent.nonce, intent.from_pubkey);
     }
     
-    return { valid: false, reason: 'signature_mismatch' };
+    return valid ? { valid: true } : { valid: false, reason: 'signature_mismatch' };
   } catch (error) {
     console.error('[verify] Exception during signature verification:', error);
     return { valid: false, reason: 'verification_exception' };
   }
 }
 
+// Queued checks (SIGNATURE_VERIFY_MODE=batched/workers) can finish out of
+// order. Each socket's results are handed back in the order its frames arrived,
+// so e.g. two msg:send frames are never relayed swapped.
+const verifyChains = new WeakMap<WebSocket, Promise<unknown>>();
+
+function inSocketOrder<T>(ws: WebSocket, check: Promise<T>): Promise<T> {
+  const previous = verifyChains.get(ws) ?? Promise.resolve();
+  const result = previous.then(() => check);
+  verifyChains.set(ws, result.catch(() => {}));
+  return result;
+}
+
 // Legacy wrapper for backward compatibility
-function verifySignature(signedIntent: SignedCallIntent): boolean {
-  return verifySignatureWithDetails(signedIntent).valid;
+async function verifySignature(signedIntent: SignedCallIntent): Promise<boolean> {
+  return (await verifySignatureWithDetails(signedIntent)).valid;
 }
 
-function verifyMessageSignature(signedMessage: SignedMessage): boolean {
+async function verifyMessageSignature(signedMessage: SignedMessage): Promise<boolean> {
   try {
     const { message, signature, from_pubkey } = signedMessage;
     const now = Date.now();
@@ -675,20 +899,21 @@ function verifyMessageSignature(signedMessage: SignedMessage): boolean {
       return false;
     }
     
-    if (recentNonces.has(message.nonce)) {
-      console.log('Message nonce already used:', message.nonce);
-      return false;
-    }
-    
     const sortedMessage = JSON.stringify(message, Object.keys(message).sort());
     const messageBytes = new TextEncoder().encode(sortedMessage);
-    const signatureBytes = bs58.decode(signature);
-    const publicKeyBytes = bs58.decode(from_pubkey);
     
-    const valid = nacl.sign.detached.verify(messageBytes, signatureBytes, publicKeyBytes);
-    
-    if (valid) {
-      recentNonces.set(message.nonce, message.timestamp);
+    // Reserve the nonce while the check is queued so a replay can't slip in
+    const refused = reserveNonce(message.nonce, message.timestamp, from_pubkey);
+    if (refused) {
+      console.log(`Message nonce refused (${refused}):`, message.nonce);
+      return false;
+    }
+    let valid = false;
+    try {
+      valid = await verifyQueued(messageBytes, signature, from_pubkey);
+    } finally {
+      // Released on a rejected or failed check so the sender can retry it
+      if (!valid) releaseNonce(message.nonce, from_pubkey);
     }
     
     return valid;
@@ -716,16 +941,18 @@ function verifyGenericSignature(payload: any, signature: string, from_pubkey: st
     
     const sortedPayload = JSON.stringify(payload, Object.keys(payload).sort());
     const messageBytes = new TextEncoder().encode(sortedPayload);
-    const signatureBytes = bs58.decode(signature);
-    const publicKeyBytes = bs58.decode(from_pubkey);
     
-    const valid = nacl.sign.detached.verify(messageBytes, signatureBytes, publicKeyBytes);
+    if (!verifyDetached(messageBytes, signature, from_pubkey)) {
+      return false;
+    }
     
-    if (valid) {
-      recentNonces.set(nonce, timestamp);
+    const refused = reserveNonce(nonce, timestamp, from_pubkey);
+    if (refused) {
+      console.log(`Nonce refused (${refused}):`, nonce);
+      return false;
     }
     
-    return valid;
+    return true;
   } catch (error) {
     console.error('Generic signature verification error:', error);
     return false;
@@ -733,10 +960,19 @@ function verifyGenericSignature(payload: any, signature: string, from_pubkey: st
 }
 
 const UPLOADS_DIR = path.join(process.cwd(), 'uploads');
+// Cluster workers each get their own tmp directory (by slot, so a restarted
+// worker clears only what it left behind)
+const UPLOADS_TMP_DIR = process.env.WS_CLUSTER_SLOT
+  ? path.join(UPLOADS_DIR, '.tmp', `worker-${process.env.WS_CLUSTER_SLOT}`)
+  : path.join(UPLOADS_DIR, '.tmp');
+const MAX_UPLOAD_BYTES = 10 * 1024 * 1024;
+const FILE_CACHE_MAX_AGE_MS = 365 * 24 * 60 * 60 * 1000;
 
 function ensureUploadsDir() {
-  if (!fs.existsSync(UPLOADS_DIR)) {
-    fs.mkdirSync(UPLOADS_DIR, { recursive: true });
+  // Partial uploads left by a crash or restart are never completed
+  fs.rmSync(UPLOADS_TMP_DIR, { recursive: true, force: true });
+  if (!fs.existsSync(UPLOADS_TMP_DIR)) {
+    fs.mkdirSync(UPLOADS_TMP_DIR, { recursive: true });
   }
 }
 
@@ -770,75 +1006,11 @@ export async function registerRoutes(
   // - "custom": Use TURN_URLS, TURN_USERNAME, TURN_CREDENTIAL env vars
   // - "off": STUN only, no TURN
   // STUN_URLS: Optional comma-separated STUN servers (defaults to Google STUN)
+  // Metered.ca (METERED_APP_NAME + METERED_SECRET_KEY) takes priority over OpenRelay.
+  // Lists are built once and served from memory (see server/iceConfig.ts).
   app.get('/api/turn-config', async (_req, res) => {
-    const turnMode = (process.env.TURN_MODE || 'public').toLowerCase();
-    
-    // Base STUN servers - configurable via STUN_URLS env var
-    const stunUrls = process.env.STUN_URLS
-      ? process.env.STUN_URLS.split(',').map(u => u.trim()).filter(Boolean)
-      : ['stun:stun.l.google.com:19302', 'stun:stun1.l.google.com:19302'];
-    const stunServers = stunUrls.map(url => ({ urls: url }));
-    
-    // TURN_MODE = "off" - STUN only
-    if (turnMode === 'off') {
-      console.log('TURN_MODE=off: Using STUN only');
-      return res.json({ iceServers: stunServers, mode: 'stun_only' });
-    }
-    
-    // TURN_MODE = "custom" - Use custom TURN servers from env vars
-    if (turnMode === 'custom') {
-      const turnUrls = process.env.TURN_URLS?.split(',').map(u => u.trim()).filter(Boolean);
-      const turnUsername = process.env.TURN_USERNAME;
-      const turnCredential = process.env.TURN_CREDENTIAL;
-      
-      if (turnUrls && turnUrls.length > 0 && turnUsername && turnCredential) {
-        const customServers = [
-          ...stunServers,
-          { urls: turnUrls, username: turnUsername, credential: turnCredential }
-        ];
-        console.log('TURN_MODE=custom: Using custom TURN servers');
-        return res.json({ iceServers: customServers, mode: 'custom' });
-      } else {
-        console.warn('TURN_MODE=custom but missing TURN_URLS, TURN_USERNAME, or TURN_CREDENTIAL - falling back to public');
-      }
-    }
-    
-    // Check for Metered.ca config first (takes priority over OpenRelay)
-    let meteredAppName = process.env.METERED_APP_NAME;
-    const meteredSecretKey = process.env.METERED_SECRET_KEY;
-    
-    if (meteredAppName && meteredSecretKey) {
-      meteredAppName = meteredAppName.replace(/\.metered\.live$/i, '');
-      
-      try {
-        const url = `https://${meteredAppName}.metered.live/api/v1/turn/credentials?apiKey=${meteredSecretKey}`;
-        console.log(`Fetching Metered TURN credentials from: ${meteredAppName}.metered.live`);
-        const response = await fetch(url);
-        if (response.ok) {
-          const iceServers = await response.json();
-          console.log('Metered TURN credentials fetched successfully:', iceServers.length, 'servers');
-          return res.json({ iceServers, mode: 'metered' });
-        } else {
-          const errorText = await response.text();
-          console.error('Metered API error:', response.status, errorText);
-        }
-      } catch (error) {
-        console.error('Failed to fetch Metered TURN credentials:', error);
-      }
-    }
-    
-    // TURN_MODE = "public" (default) - Use free OpenRelay TURN servers
-    // ⚠️ OpenRelay public TURN is TESTING ONLY — not for production customers
-    const openRelayServers = [
-      ...stunServers,
-      { urls: 'stun:stun.relay.metered.ca:80' },
-      { urls: 'turn:openrelay.metered.ca:80?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
-      { urls: 'turn:openrelay.metered.ca:443?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
-      { urls: 'turn:openrelay.metered.ca:443?transport=tcp', username: 'openrelayproject', credential: 'openrelayproject' }
-    ];
-    
-    console.log('TURN_MODE=public: Using OpenRelay free TURN (TESTING ONLY)');
-    return res.json({ iceServers: openRelayServers, mode: 'public_openrelay' });
+    const config = await iceConfig.get('turn-config');
+    res.set('Cache-Control', iceConfig.cacheControl).type('application/json').send(config.body);
   });
 
   // ICE credentials endpoint with TURN_MODE support
@@ -846,94 +1018,11 @@ export async function registerRoutes(
   // - "custom": Uses TURN_URLS, TURN_USERNAME, TURN_CREDENTIAL env vars
   // - "public": Uses free OpenRelay TURN servers (TESTING ONLY)
   // - "off": STUN only, no TURN
-  // Also supports coturn shared-secret auth via TURN_SECRET + TURN_SERVER
+  // Also supports coturn shared-secret auth via TURN_SECRET + TURN_SERVER, with
+  // credentials drawn from a pool that rotates well before expiry
   app.get('/api/ice', async (_req, res) => {
-    const turnMode = (process.env.TURN_MODE || 'public').toLowerCase();
-    
-    // Base STUN servers
-    const stunUrls = process.env.STUN_URLS
-      ? process.env.STUN_URLS.split(',').map(u => u.trim()).filter(Boolean)
-      : ['stun:stun.l.google.com:19302', 'stun:stun1.l.google.com:19302'];
-    const stunServers = stunUrls.map(url => ({ urls: url }));
-    
-    // TURN_MODE = "off" - STUN only
-    if (turnMode === 'off') {
-      console.log('[/api/ice] TURN_MODE=off: Using STUN only');
-      return res.json({ iceServers: stunServers, mode: 'stun_only' });
-    }
-    
-    // TURN_MODE = "custom" - Use custom TURN servers from env vars
-    if (turnMode === 'custom') {
-      const turnUrls = process.env.TURN_URLS?.split(',').map(u => u.trim()).filter(Boolean);
-      const turnUsername = process.env.TURN_USERNAME;
-      const turnCredential = process.env.TURN_CREDENTIAL;
-      
-      if (turnUrls && turnUrls.length > 0 && turnUsername && turnCredential) {
-        const customServers: RTCIceServer[] = [
-          ...stunServers,
-          { urls: turnUrls, username: turnUsername, credential: turnCredential }
-        ];
-        console.log('[/api/ice] TURN_MODE=custom: Using custom TURN servers');
-        return res.json({ iceServers: customServers, mode: 'custom' });
-      } else {
-        console.warn('[/api/ice] TURN_MODE=custom but missing TURN_URLS, TURN_USERNAME, or TURN_CREDENTIAL - falling back to public');
-      }
-    }
-    
-    // Check for coturn shared-secret auth (TURN_SECRET + TURN_SERVER)
-    // This takes priority over OpenRelay for non-custom modes
-    const turnSecret = process.env.TURN_SECRET;
-    const turnServer = process.env.TURN_SERVER || process.env.TURN_HOST;
-    
-    if (turnSecret && turnServer) {
-      try {
-        // Generate coturn shared-secret credentials (TURN REST API / RFC 5766)
-        // Username format: expiry_timestamp:user_id
-        // Credential: Base64(HMAC-SHA1(username, TURN_SECRET))
-        const ttl = 86400; // 24 hours credential validity
-        const expiry = Math.floor(Date.now() / 1000) + ttl;
-        const username = `${expiry}:callvs`;
-        
-        // Generate HMAC-SHA1 credential
-        const crypto = await import('crypto');
-        const hmac = crypto.createHmac('sha1', turnSecret);
-        hmac.update(username);
-        const credential = hmac.digest('base64');
-        
-        // TURN URLs for UDP (3478), TCP (3478), and TLS (5349)
-        const urls = [
-          `turn:${turnServer}:3478?transport=udp`,
-          `turn:${turnServer}:3478?transport=tcp`,
-          `turns:${turnServer}:5349?transport=tcp`
-        ];
-        
-        console.log(`[/api/ice] Generated coturn credentials for ${turnServer}, expiry: ${new Date(expiry * 1000).toISOString()}`);
-        
-        // Return in iceServers format for consistency
-        const iceServers: RTCIceServer[] = [
-          ...stunServers,
-          { urls, username, credential }
-        ];
-        
-        return res.json({ iceServers, mode: 'coturn_shared_secret' });
-      } catch (error) {
-        console.error('[/api/ice] Error generating coturn credentials:', error);
-        // Fall through to OpenRelay fallback
-      }
-    }
-    
-    // TURN_MODE = "public" (default) - Use free OpenRelay TURN servers
-    // ⚠️ OpenRelay public TURN is TESTING ONLY — not for production customers
-    console.log('[/api/ice] TURN_MODE=public: Using OpenRelay free TURN (TESTING ONLY)');
-    const openRelayServers: RTCIceServer[] = [
-      ...stunServers,
-      { urls: 'stun:stun.relay.metered.ca:80' },
-      { urls: 'turn:openrelay.metered.ca:80?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
-      { urls: 'turn:openrelay.metered.ca:443?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
-      { urls: 'turn:openrelay.metered.ca:443?transport=tcp', username: 'openrelayproject', credential: 'openrelayproject' }
-    ];
-    
-    return res.json({ iceServers: openRelayServers, mode: 'public_openrelay' });
+    const config = await iceConfig.get('ice');
+    res.set('Cache-Control', iceConfig.cacheControl).type('application/json').send(config.body);
   });
 
   // Comprehensive health check endpoint - checks all critical services
@@ -1079,10 +1168,12 @@ export async function registerRoutes(
       ]
     };
     
+    res.set('Cache-Control', 'no-store');
     res.json({
       status: issues.length === 0 ? 'ok' : 'issues_found',
       timestamp: Date.now(),
       configuration: testConfig,
+      cache: iceConfig.stats(),
       issues,
       recommendations,
       testing: testUrls,
@@ -1112,7 +1203,9 @@ export async function registerRoutes(
   }, 60 * 60 * 1000);
 
   // Call session token endpoint - mints a server-issued token with plan-based permissions
-  // Uses server time as source of truth, stored in database for replay protection
+  // Uses server time as source of truth; replay protection comes from the database
+  // or, with CALL_TOKEN_MODE=stateless, an in-memory filter (see server/callTokens.ts).
+  // Token metrics are an audit trail only, so they're written without holding up the response.
   app.post('/api/call-session-token', async (req, res) => {
     try {
       const { address, targetAddress } = req.body;
@@ -1195,17 +1288,17 @@ export async function registerRoutes(
         finalAllowTurn = allowTurn && turnConfigured;
       }
 
-      // Create database-backed token with server timestamps
+      // Create token with server timestamps (database-backed unless CALL_TOKEN_MODE=stateless)
       // If database is unavailable, create ephemeral token (for testing/dev only)
       let tokenData;
       try {
-        tokenData = await storage.createCallToken(
-          address,
+        tokenData = await mintCallToken({
+          userAddress: address,
           targetAddress,
           plan,
-          finalAllowTurn,
+          allowTurn: finalAllowTurn,
           allowVideo
-        );
+        });
       } catch (dbError: any) {
         // Database unavailable - create ephemeral token for development/testing
         // WARNING: This bypasses replay protection, only use when DATABASE_URL is not set
@@ -1221,107 +1314,20 @@ export async function registerRoutes(
       }
 
       // Record metric (may fail silently if DB unavailable)
-      try {
-        await recordTokenMetric('minted', address, userAgent, clientIp);
-      } catch (e) {
-        // Ignore metric recording failure
-      }
+      void recordTokenMetric('minted', address, userAgent, clientIp);
 
-      // Build ICE servers config based on TURN_MODE
-      let iceServers: RTCIceServer[] = [];
-      
-      // Base STUN servers
-      const stunUrls = process.env.STUN_URLS
-        ? process.env.STUN_URLS.split(',').map(u => u.trim()).filter(Boolean)
-        : ['stun:stun.l.google.com:19302', 'stun:stun1.l.google.com:19302'];
-      
-      // Check for coturn shared-secret auth
-      const turnSecret = process.env.TURN_SECRET;
-      const turnServer = process.env.TURN_SERVER || process.env.TURN_HOST;
-      
-      if (turnMode === 'off') {
-        // TURN_MODE=off: STUN only
-        iceServers = stunUrls.map(url => ({ urls: url }));
-        console.log('[TURN] TURN_MODE=off: Using STUN only');
-      } else if (turnMode === 'custom' && customTurnConfigured && finalAllowTurn) {
-        // TURN_MODE=custom: Use custom TURN servers
-        const turnUrls = process.env.TURN_URLS!.split(',').map(u => u.trim());
-        iceServers = [
-          ...stunUrls.map(url => ({ urls: url })),
-          {
-            urls: turnUrls,
-            username: process.env.TURN_USERNAME!,
-            credential: process.env.TURN_CREDENTIAL!
-          }
-        ];
-        console.log('[TURN] TURN_MODE=custom: Using custom TURN servers');
-      } else if (turnSecret && turnServer && finalAllowTurn) {
-        // Coturn shared-secret auth
-        const crypto = await import('crypto');
-        const ttl = 86400; // 24 hours
-        const expiry = Math.floor(Date.now() / 1000) + ttl;
-        const username = `${expiry}:callvs`;
-        const hmac = crypto.createHmac('sha1', turnSecret);
-        hmac.update(username);
-        const credential = hmac.digest('base64');
-        
-        iceServers = [
-          ...stunUrls.map(url => ({ urls: url })),
-          { urls: `stun:${turnServer}:3478` },
-          { urls: `turn:${turnServer}:3478?transport=udp`, username, credential },
-          { urls: `turn:${turnServer}:3478?transport=tcp`, username, credential },
-          { urls: `turns:${turnServer}:5349?transport=tcp`, username, credential }
-        ];
-        console.log(`[TURN] Using coturn shared-secret auth for ${turnServer}`);
-      } else if (meteredConfigured && finalAllowTurn) {
-        // Fetch from Metered.ca API
-        try {
-          const appName = (process.env.METERED_APP_NAME || '').replace(/\.metered\.live$/i, '');
-          const meteredResponse = await fetch(
-            `https://${appName}.metered.live/api/v1/turn/credentials?apiKey=${process.env.METERED_SECRET_KEY}`
-          );
-          if (meteredResponse.ok) {
-            const meteredServers = await meteredResponse.json();
-            iceServers = meteredServers;
-            console.log('[TURN] Using Metered.ca TURN servers');
-          } else {
-            throw new Error(`Metered API error: ${meteredResponse.status}`);
-          }
-        } catch (error) {
-          console.error('[TURN] Metered API failed:', error);
-          // Fallback to OpenRelay
-          iceServers = [
-            ...stunUrls.map(url => ({ urls: url })),
-            { urls: 'stun:stun.relay.metered.ca:80' },
-            { urls: 'turn:openrelay.metered.ca:80?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
-            { urls: 'turn:openrelay.metered.ca:443?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
-            { urls: 'turn:openrelay.metered.ca:443?transport=tcp', username: 'openrelayproject', credential: 'openrelayproject' }
-          ];
-          console.log('[TURN] Falling back to OpenRelay servers');
-        }
-      } else if (turnMode === 'public' || finalAllowTurn) {
-        // TURN_MODE=public or fallback: Use OpenRelay
-        iceServers = [
-          ...stunUrls.map(url => ({ urls: url })),
-          { urls: 'stun:stun.relay.metered.ca:80' },
-          { urls: 'turn:openrelay.metered.ca:80?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
-          { urls: 'turn:openrelay.metered.ca:443?transport=udp', username: 'openrelayproject', credential: 'openrelayproject' },
-          { urls: 'turn:openrelay.metered.ca:443?transport=tcp', username: 'openrelayproject', credential: 'openrelayproject' }
-        ];
-        console.log('[TURN] Using public OpenRelay servers (TESTING MODE)');
-      } else {
-        // Default: STUN only
-        iceServers = stunUrls.map(url => ({ urls: url }));
-        console.log('[TURN] No TURN configured: Using STUN only');
-      }
+      // ICE servers for this plan's TURN access, prebuilt per TURN_MODE
+      const { iceServers } = await iceConfig.get(finalAllowTurn ? 'call-turn' : 'call-stun');
 
       // Return with server timestamps
+      res.set('Cache-Control', 'no-store');
       res.json({
         token: tokenData.token,
         nonce: tokenData.nonce,
         issuedAt: tokenData.issuedAt.getTime(),
         expiresAt: tokenData.expiresAt.getTime(),
         serverTime: Date.now(),
+        tokenMode: callTokenMode(),
         plan,
         allowTurn: finalAllowTurn,
         allowVideo,
@@ -1345,14 +1351,14 @@ export async function registerRoutes(
         return res.status(400).json({ error: 'Token required' });
       }
 
-      const result = await storage.verifyCallToken(token, markUsed, clientIp);
+      const result = await verifyCallToken(token, markUsed, clientIp);
 
       if (!result.valid) {
         // Record failure metric with reason
         const eventType = result.reason === 'token_expired' ? 'verify_expired' 
           : result.reason === 'token_replay' ? 'verify_replay' 
           : 'verify_invalid';
-        await recordTokenMetric(eventType, result.data?.userAddress, userAgent, clientIp, result.reason);
+        void recordTokenMetric(eventType, result.data?.userAddress, userAgent, clientIp, result.reason);
 
         // Return technical error (user never sees this - client handles retry)
         const errorMessage = result.reason === 'token_expired' 
@@ -1368,7 +1374,7 @@ export async function registerRoutes(
         });
       }
 
-      await recordTokenMetric('verify_ok', result.data?.userAddress, userAgent, clientIp);
+      void recordTokenMetric('verify_ok', result.data?.userAddress, userAgent, clientIp);
 
       res.json({
         valid: true,
@@ -1394,7 +1400,7 @@ export async function registerRoutes(
 
   app.get('/api/call-session-token/:token', async (req, res) => {
     const { token } = req.params;
-    const result = await storage.verifyCallToken(token, false); // Don't mark as used
+    const result = await verifyCallToken(token, false); // Don't mark as used
     
     if (!result.valid) {
       return res.status(401).json({ 
@@ -1411,57 +1417,109 @@ export async function registerRoutes(
     });
   });
 
+  // Uploads stream straight to a temp file under uploads/.tmp (unreachable via
+  // /api/files, same filesystem for the atomic rename) and are cut off with a
+  // 413 as soon as they pass the limit.
   app.post('/api/upload', (req, res) => {
-    const chunks: Buffer[] = [];
-    const contentType = req.headers['content-type'] || 'application/octet-stream';
     const fileName = req.headers['x-filename'] as string || `file_${Date.now()}`;
-    
-    req.on('data', (chunk: Buffer) => chunks.push(chunk));
-    req.on('end', () => {
+    const tooLarge = () => {
+      res.set('Connection', 'close');
+      res.status(413).json({ error: 'File too large (max 10MB)' });
+    };
+
+    const declaredLength = parseInt(req.headers['content-length'] || '', 10);
+    if (declaredLength > MAX_UPLOAD_BYTES) {
+      tooLarge();
+      return;
+    }
+
+    const ext = path.extname(fileName) || '.bin';
+    const safeExt = ext.replace(/[^a-zA-Z0-9.]/g, '');
+    const fileId = `${Date.now()}_${Math.random().toString(36).slice(2, 10)}${safeExt}`;
+    const filePath = path.join(UPLOADS_DIR, fileId);
+    const tmpPath = path.join(UPLOADS_TMP_DIR, fileId);
+
+    const out = fs.createWriteStream(tmpPath, { flags: 'wx' });
+    let received = 0;
+    let settled = false;
+
+    const abort = (respond?: () => void) => {
+      if (settled) return;
+      settled = true;
+      req.unpipe(out);
+      out.destroy();
+      fs.promises.rm(tmpPath, { force: true }).catch(() => {});
+      if (respond && !res.headersSent) {
+        respond();
+      }
+      // Discard whatever is still in flight; Connection: close ends the socket after the response
+      req.resume();
+    };
+
+    req.on('data', (chunk: Buffer) => {
+      received += chunk.length;
+      if (received > MAX_UPLOAD_BYTES) {
+        abort(tooLarge);
+      }
+    });
+    req.on('close', () => {
+      if (!req.complete) abort();
+    });
+    out.on('error', (error) => {
+      console.error('Upload error:', error);
+      abort(() => res.status(500).json({ error: 'Upload failed' }));
+    });
+    out.on('finish', async () => {
+      if (settled) return;
+      settled = true;
       try {
-        const data = Buffer.concat(chunks);
-        const maxSize = 10 * 1024 * 1024;
-        if (data.length > maxSize) {
-          res.status(413).json({ error: 'File too large (max 10MB)' });
-          return;
-        }
-        
-        const ext = path.extname(fileName) || '.bin';
-        const safeExt = ext.replace(/[^a-zA-Z0-9.]/g, '');
-        const fileId = `${Date.now()}_${Math.random().toString(36).slice(2, 10)}${safeExt}`;
-        const filePath = path.join(UPLOADS_DIR, fileId);
-        
-        fs.writeFileSync(filePath, data);
-        
+        await fs.promises.rename(tmpPath, filePath);
         res.json({
           url: `/api/files/${fileId}`,
           name: fileName,
-          size: data.length
+          size: received
         });
       } catch (error) {
         console.error('Upload error:', error);
+        fs.promises.rm(tmpPath, { force: true }).catch(() => {});
         res.status(500).json({ error: 'Upload failed' });
       }
     });
+    req.pipe(out);
   });
 
-  app.get('/api/files/:fileId', (req, res) => {
+  // File ids are unique per upload and never rewritten, so responses can be
+  // cached forever and the id itself is a strong validator (usable in If-Range
+  // when seeking through voicemails). Range and If-None-Match are handled by sendFile.
+  app.get('/api/files/:fileId', async (req, res) => {
     const { fileId } = req.params;
     const safeName = fileId.replace(/[^a-zA-Z0-9._-]/g, '');
     const filePath = path.join(UPLOADS_DIR, safeName);
-    
-    if (!fs.existsSync(filePath)) {
+
+    const stat = await fs.promises.stat(filePath).catch(() => null);
+    if (!stat?.isFile()) {
       res.status(404).json({ error: 'File not found' });
       return;
     }
-    
-    res.sendFile(filePath);
+
+    res.setHeader('ETag', `"${safeName}-${stat.size.toString(36)}"`);
+    res.sendFile(filePath, {
+      maxAge: FILE_CACHE_MAX_AGE_MS,
+      immutable: true,
+      acceptRanges: true,
+      lastModified: true,
+    });
   });
 
-  app.get('/api/conversations/:address', (req, res) => {
-    const { address } = req.params;
-    const convos = messageStore.getConversationsForAddress(address);
-    res.json(convos);
+  app.get('/api/conversations/:address', async (req, res) => {
+    try {
+      const { address } = req.params;
+      const convos = await messageStore.getConversationsForAddress(address);
+      res.json(convos);
+    } catch (error) {
+      console.error('Error fetching conversations:', error);
+      res.status(500).json({ error: 'Failed to fetch conversations' });
+    }
   });
 
   app.get('/api/messages/:convoId', async (req, res) => {
@@ -1470,7 +1528,13 @@ export async function registerRoutes(
     const before = req.query.before ? parseInt(req.query.before as string) : undefined;
     
     // First try in-memory store
-    let messages = messageStore.getMessages(convoId, limit, before);
+    let messages: Message[];
+    try {
+      messages = await messageStore.getMessages(convoId, limit, before);
+    } catch (error) {
+      console.error('Error fetching messages:', error);
+      return res.status(500).json({ error: 'Failed to fetch messages' });
+    }
     
     // If no messages in memory, fallback to database
     if (messages.length === 0) {
@@ -1501,25 +1565,49 @@ export async function registerRoutes(
     res.json(messages);
   });
 
-  app.get('/api/messages/:convoId/search', (req, res) => {
-    const { convoId } = req.params;
+  // Both search endpoints return a plain array of messages, newest first. The
+  // cursor for the next page, if any, is in the X-Next-Cursor header.
+  const sendSearchPage = async (req: Request, res: Response, scope: { convoId?: string; address?: string }) => {
     const query = (req.query.q as string) || '';
-    const limit = parseInt(req.query.limit as string) || 50;
-    const messages = messageStore.searchMessages(query, convoId, limit);
-    res.json(messages);
+    const limit = Math.min(parseInt(req.query.limit as string) || 50, 200);
+    try {
+      const page = await messageStore.searchMessages(query, scope, {
+        limit,
+        cursor: req.query.cursor as string | undefined,
+        partial: req.query.partial !== 'false',
+      });
+      if (page.next_cursor) {
+        res.set('X-Next-Cursor', page.next_cursor);
+      }
+      res.json(page.messages);
+    } catch (error) {
+      console.error('Message search error:', error);
+      res.status(500).json({ error: 'Failed to search messages' });
+    }
+  };
+
+  app.get('/api/messages/:convoId/search', async (req, res) => {
+    await sendSearchPage(req, res, { convoId: req.params.convoId });
   });
 
-  app.get('/api/messages/search/global', (req, res) => {
-    const query = (req.query.q as string) || '';
-    const limit = parseInt(req.query.limit as string) || 50;
-    const messages = messageStore.searchMessages(query, undefined, limit);
-    res.json(messages);
+  // Searches only the conversations ?address= takes part in
+  app.get('/api/messages/search/global', async (req, res) => {
+    const address = req.query.address as string | undefined;
+    if (!address) {
+      return res.status(400).json({ error: 'Address required' });
+    }
+    await sendSearchPage(req, res, { address });
   });
 
-  app.get('/api/messages/:convoId/since/:timestamp', (req, res) => {
-    const { convoId, timestamp } = req.params;
-    const messages = messageStore.getMessagesSince(convoId, parseInt(timestamp));
-    res.json(messages);
+  app.get('/api/messages/:convoId/since/:timestamp', async (req, res) => {
+    try {
+      const { convoId, timestamp } = req.params;
+      const messages = await messageStore.getMessagesSince(convoId, parseInt(timestamp));
+      res.json(messages);
+    } catch (error) {
+      console.error('Error fetching messages:', error);
+      res.status(500).json({ error: 'Failed to fetch messages' });
+    }
   });
 
   // Sync endpoints for cross-device support (WhatsApp-like) - uses DB layer
@@ -1528,6 +1616,13 @@ export async function registerRoutes(
       const { convoId } = req.params;
       const sinceSeq = parseInt(req.query.since_seq as string) || 0;
       const limit = parseInt(req.query.limit as string) || 100;
+      const { isDatabaseAvailable } = await import('./db');
+      if (!isDatabaseAvailable()) {
+        // No DB: the local message store carries the same seq numbers
+        const messages = await messageStore.getMessagesSinceSeq(convoId, sinceSeq, limit);
+        const latestSeq = await messageStore.getLatestSeq(convoId);
+        return res.json({ messages, latest_seq: latestSeq, has_more: messages.length >= limit });
+      }
       const messages = await storage.getMessagesSinceSeq(convoId, sinceSeq, limit);
       const latestSeq = await storage.getLatestSeq(convoId);
       res.json({ messages, latest_seq: latestSeq, has_more: messages.length >= limit });
@@ -1543,6 +1638,16 @@ export async function registerRoutes(
       if (!address) {
         return res.status(400).json({ error: 'Address required' });
       }
+      const { isDatabaseAvailable } = await import('./db');
+      if (!isDatabaseAvailable()) {
+        const convos = await messageStore.getConversationsForAddress(address);
+        return res.json(await Promise.all(convos.map(async c => ({
+          convoId: c.id,
+          latestSeq: await messageStore.getLatestSeq(c.id),
+          lastMessage: c.last_message?.content || null,
+          lastMessageAt: c.last_message ? new Date(c.last_message.timestamp) : null,
+        }))));
+      }
       const conversations = await storage.getConversationsWithSeq(address);
       res.json(conversations);
     } catch (error) {
@@ -2213,8 +2318,7 @@ export async function registerRoutes(
       const onlineStatus: Record<string, boolean> = {};
       for (const address of addresses) {
         // Check if there's an active WebSocket connection for this address
-        const conn = getConnection(address);
-        onlineStatus[address] = !!conn;
+        onlineStatus[address] = isAddressOnline(address);
       }
       
       res.json(onlineStatus);
@@ -2239,7 +2343,16 @@ export async function registerRoutes(
       }
       res.json({ 
         totalAddresses: connections.size,
-        connections: result
+        connections: result,
+        cluster: clusterNode?.stats() ?? null,
+        nonces: recentNonces.stats(),
+        nonceQuotas: nonceQuotas.stats(),
+        rateLimits: rateLimitMap.stats(),
+        usageCache: usageCache.stats(),
+        callTokens: getCallTokenStats(),
+        callDeadlines: callDeadlines.stats(),
+        iceCoalescer: iceCoalescer.stats(),
+        storageCaches: storage.getCacheStats()
       });
     } catch (error) {
       console.error('Error getting debug connections:', error);
@@ -2594,7 +2707,7 @@ export async function registerRoutes(
         return res.status(400).json({ error: 'Token already paid' });
       }
 
-      const recipientWallet = policyStore.getWalletVerification(payToken.creatorAddress);
+      const recipientWallet = await policyStore.getWalletVerification(payToken.creatorAddress);
       const requiredWalletType = chain === 'solana' ? 'solana' : 'ethereum';
       
       if (!recipientWallet || recipientWallet.wallet_type !== requiredWalletType) {
@@ -2784,7 +2897,7 @@ export async function registerRoutes(
   app.get('/api/crypto/recipient-wallet/:address', async (req, res) => {
     try {
       const { chain } = req.query;
-      const wallet = policyStore.getWalletVerification(req.params.address);
+      const wallet = await policyStore.getWalletVerification(req.params.address);
       
       if (chain === 'solana') {
         if (!wallet || wallet.wallet_type !== 'solana') {
@@ -2804,7 +2917,7 @@ export async function registerRoutes(
 
   app.get('/api/crypto/recipient-wallets/:address', async (req, res) => {
     try {
-      const evmWallet = policyStore.getWalletVerification(req.params.address);
+      const evmWallet = await policyStore.getWalletVerification(req.params.address);
       res.json({
         evm: evmWallet?.wallet_type === 'ethereum' ? evmWallet.wallet_address : null,
         solana: evmWallet?.wallet_type === 'solana' ? evmWallet.wallet_address : null,
@@ -6170,12 +6283,12 @@ export async function registerRoutes(
       
       // Rate limit: max 3 test notifications per minute
       const rateKey = `push_test:${userAddress}`;
-      const existing = rateLimitMap.get(rateKey);
+      const existing = rateLimitMap.get(rateKey, now);
       if (existing && now < existing.resetTime && existing.count >= 3) {
         return res.status(429).json({ error: 'Too many test notifications. Please wait a minute.' });
       }
       if (!existing || now >= existing.resetTime) {
-        rateLimitMap.set(rateKey, { count: 1, resetTime: now + 60000 });
+        rateLimitMap.set(rateKey, { count: 1, resetTime: now + 60000 }, 60000, now);
       } else {
         existing.count++;
       }
@@ -6969,17 +7082,127 @@ export async function registerRoutes(
     iceCandidatesBuffer: Map<string, any[]>; // Buffer ICE candidates per peer
     offerSent?: boolean;
     answerSent?: boolean;
+    replicatedAt?: number; // Last time this call's state was published to other workers
   }
   
   // Active calls map: key = "caller:callee"
   const activeCalls = new Map<string, ActiveCall>();
   
-  // Call cleanup interval (30 seconds)
-  const CALL_CLEANUP_INTERVAL = 30000;
   // Max call duration without activity (5 minutes)
-  const CALL_MAX_INACTIVE_MS = 5 * 60 * 1000;
+  const CALL_MAX_INACTIVE_MS = parseInt(process.env.CALL_INACTIVITY_TIMEOUT_MS || String(5 * 60 * 1000), 10);
   // Max ringing duration (60 seconds)
-  const CALL_MAX_RINGING_MS = 60 * 1000;
+  const CALL_MAX_RINGING_MS = parseInt(process.env.CALL_RINGING_TIMEOUT_MS || String(60 * 1000), 10);
+  // Ended calls are kept this long for debugging
+  const CALL_ENDED_RETENTION_MS = 60 * 1000;
+  // Activity-only updates (ICE) are published to other workers at most this often
+  const CALL_REPLICATE_TOUCH_MS = 30 * 1000;
+  
+  // Cluster mode: caller and callee may sit on different workers, so every state
+  // change is mirrored to the other workers' activeCalls (last write wins)
+  function replicateCall(call: ActiveCall) {
+    if (!clusterNode) return;
+    call.replicatedAt = Date.now();
+    const { iceCandidatesBuffer, ...state } = call;
+    clusterNode.publishCallState(state);
+  }
+  
+  function touchCall(call: ActiveCall) {
+    call.lastActivityAt = Date.now();
+    callDeadlines.extend(call.callId, 'inactive', call.lastActivityAt + CALL_MAX_INACTIVE_MS);
+    if (call.lastActivityAt - (call.replicatedAt || 0) > CALL_REPLICATE_TOUCH_MS) {
+      replicateCall(call);
+    }
+  }
+  
+  // Each call's timeouts are deadlines on one timing wheel (keyed by callId),
+  // set on the worker where the state change happened:
+  // - ringing: from call:init until accepted
+  // - inactive: from accept, pushed back on every signaling or ICE frame
+  // - duration: the free-tier limit, once recordCallStart has the row
+  // - expunge: drops the record once the call has ended (or, for a call
+  //   mirrored from another worker, once it has gone quiet)
+  type CallDeadline = 'ringing' | 'inactive' | 'duration' | 'expunge';
+  const callDeadlines = new DeadlineScheduler<CallDeadline>(onCallDeadline, {
+    tickMs: process.env.CALL_DEADLINE_TICK_MS ? parseInt(process.env.CALL_DEADLINE_TICK_MS, 10) : undefined,
+  });
+  const callTimeouts = counter('callvault_call_timeouts_total', 'Calls ended by the server on a deadline, by reason');
+  // Seconds; ringing waits on a person, so the buckets run to the ringing timeout
+  const callSetupSeconds = histogram(
+    'callvault_call_setup_seconds',
+    'Call setup time from call state, by phase (ring: init to accept, negotiate: accept to answer relayed, total)',
+    [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+  );
+  const callDeadlinesPending = gauge('callvault_call_deadlines_pending', 'Call deadlines scheduled on this process, by kind');
+  onCollect(() => {
+    const { byKind } = callDeadlines.stats();
+    for (const kind of ['ringing', 'inactive', 'duration', 'expunge']) callDeadlinesPending.set(byKind[kind] ?? 0, { kind });
+  });
+  
+  const CALL_TIMEOUT_REASONS: Record<Exclude<CallDeadline, 'expunge'>, string> = {
+    ringing: 'ringing_timeout',
+    inactive: 'inactivity_timeout',
+    duration: 'LIMIT_CALL_DURATION',
+  };
+  
+  function onCallDeadline(callKey: string, kind: CallDeadline) {
+    const call = activeCalls.get(callKey);
+    if (!call) return;
+    const now = Date.now();
+    // Mirrored state may carry activity this worker didn't see
+    const quietUntil = call.lastActivityAt + CALL_MAX_INACTIVE_MS;
+    
+    if (kind === 'expunge') {
+      if (call.state !== 'ended' && quietUntil > now) {
+        callDeadlines.schedule(callKey, 'expunge', quietUntil);
+      } else {
+        activeCalls.delete(callKey);
+      }
+      return;
+    }
+    if (call.state === 'ended' || (kind === 'ringing' && call.state !== 'ringing')) return;
+    if (kind === 'inactive' && quietUntil > now) {
+      callDeadlines.schedule(callKey, 'inactive', quietUntil);
+      return;
+    }
+    
+    const reason = CALL_TIMEOUT_REASONS[kind];
+    console.log(`[CallState] ${reason}: ${callKey}`);
+    // recordCallStart ran with the accepter's session id
+    const callSessionId = call.calleeSessionId || call.callerSessionId;
+    endCall(call.callerAddress, call.calleeAddress, reason);
+    callTimeouts.inc({ reason });
+    for (const [to, from] of [[call.callerAddress, call.calleeAddress], [call.calleeAddress, call.callerAddress]]) {
+      sendToAddress(to, { type: 'call:end', from_address: from, to_address: to, reason, callSessionId } as WSMessage);
+    }
+    if (call.acceptedAt && call.calleeSessionId) {
+      const durationSeconds = Math.floor((now - call.acceptedAt) / 1000);
+      FreeTierShield.recordCallEnd(call.calleeSessionId, durationSeconds).catch(console.error);
+    }
+  }
+  
+  // The free-tier duration limit for an accepted call, once its row exists
+  function scheduleDurationLimit(call: ActiveCall, startedAt: Date, maxDurationSeconds: number | null) {
+    if (!maxDurationSeconds || activeCalls.get(call.callId) !== call || call.state === 'ended') return;
+    callDeadlines.schedule(call.callId, 'duration', new Date(startedAt).getTime() + maxDurationSeconds * 1000);
+  }
+  
+  clusterNode?.onCallState(state => {
+    const mirrored = state as unknown as Omit<ActiveCall, 'iceCandidatesBuffer'>;
+    const existing = activeCalls.get(mirrored.callId);
+    if (existing) {
+      Object.assign(existing, mirrored);
+    } else {
+      activeCalls.set(mirrored.callId, { ...mirrored, iceCandidatesBuffer: new Map() });
+    }
+    // The worker that made the change owns the timeouts; here the record only needs dropping eventually
+    if (mirrored.state === 'ended') {
+      callDeadlines.cancel(mirrored.callId);
+      callDeadlines.schedule(mirrored.callId, 'expunge', (mirrored.endedAt || Date.now()) + CALL_ENDED_RETENTION_MS);
+      return;
+    }
+    if (mirrored.state !== 'ringing') callDeadlines.cancel(mirrored.callId, 'ringing');
+    if (!existing) callDeadlines.schedule(mirrored.callId, 'expunge', mirrored.lastActivityAt + CALL_MAX_INACTIVE_MS);
+  });
   
   function getCallKey(addr1: string, addr2: string): string {
     // Normalize key so both directions map to same call
@@ -7010,6 +7233,9 @@ export async function registerRoutes(
     };
     
     activeCalls.set(callKey, call);
+    callDeadlines.cancel(callKey);
+    callDeadlines.schedule(callKey, 'ringing', call.initiatedAt + CALL_MAX_RINGING_MS);
+    replicateCall(call);
     console.log(`[CallState] Created call ${callKey}: ${callerAddress.slice(0, 12)}... -> ${calleeAddress.slice(0, 12)}...`);
     return call;
   }
@@ -7036,7 +7262,12 @@ export async function registerRoutes(
     call.acceptedAt = Date.now();
     call.lastActivityAt = Date.now();
     call.calleeSessionId = callSessionId;
+    callDeadlines.cancel(call.callId, 'ringing');
+    callDeadlines.cancel(call.callId, 'expunge');
+    callDeadlines.schedule(call.callId, 'inactive', call.lastActivityAt + CALL_MAX_INACTIVE_MS);
+    replicateCall(call);
     
+    callSetupSeconds.observe((call.acceptedAt - call.initiatedAt) / 1000, { phase: 'ring' });
     console.log(`[CallState] Call accepted: ${call.callId}, setup time: ${call.acceptedAt - call.initiatedAt}ms`);
     return call;
   }
@@ -7053,18 +7284,22 @@ export async function registerRoutes(
     const oldState = call.signalingState;
     call.signalingState = newState;
     call.lastActivityAt = Date.now();
+    callDeadlines.extend(call.callId, 'inactive', call.lastActivityAt + CALL_MAX_INACTIVE_MS);
     
     if (context) {
       console.log(`[CallState] Signaling ${call.callId}: ${oldState} -> ${newState} (${context})`);
     }
     
-    // Track connection establishment
-    if (newState === 'have-remote-answer' && call.state === 'connecting') {
+    // Track connection establishment: relaying the answer completes offer/answer
+    if ((newState === 'have-remote-answer' || newState === 'have-local-answer') && call.state === 'connecting') {
       call.state = 'connected';
       call.connectedAt = Date.now();
       const setupDuration = call.connectedAt - (call.acceptedAt || call.initiatedAt);
+      callSetupSeconds.observe(setupDuration / 1000, { phase: 'negotiate' });
+      callSetupSeconds.observe((call.connectedAt - call.initiatedAt) / 1000, { phase: 'total' });
       console.log(`[CallState] Call connected: ${call.callId}, total setup: ${setupDuration}ms`);
     }
+    replicateCall(call);
     
     return call;
   }
@@ -7078,6 +7313,7 @@ export async function registerRoutes(
     call.state = 'ended';
     call.signalingState = 'closed';
     call.endedAt = Date.now();
+    replicateCall(call);
     
     const duration = call.connectedAt 
       ? call.endedAt - call.connectedAt 
@@ -7085,17 +7321,20 @@ export async function registerRoutes(
     
     console.log(`[CallState] Call ended: ${callKey}, reason: ${reason}, duration: ${duration}ms`);
     
+    // Candidates still waiting for a batch are moot now
+    iceCoalescer.drop(`${callKey}|${addr1}`);
+    iceCoalescer.drop(`${callKey}|${addr2}`);
+    
     // Keep call record briefly for debugging, then remove
-    setTimeout(() => {
-      activeCalls.delete(callKey);
-    }, 60000); // Remove after 1 minute
+    callDeadlines.cancel(callKey);
+    callDeadlines.schedule(callKey, 'expunge', call.endedAt + CALL_ENDED_RETENTION_MS);
   }
   
   function bufferIceCandidate(call: ActiveCall, fromAddress: string, candidate: any): boolean {
     const buffer = call.iceCandidatesBuffer.get(fromAddress) || [];
     buffer.push(candidate);
     call.iceCandidatesBuffer.set(fromAddress, buffer);
-    call.lastActivityAt = Date.now();
+    touchCall(call);
     
     console.log(`[CallState] Buffered ICE candidate from ${fromAddress.slice(0, 12)}... (${buffer.length} total)`);
     return true;
@@ -7117,39 +7356,6 @@ export async function registerRoutes(
     return undefined;
   }
   
-  // Periodic cleanup of stale calls
-  setInterval(() => {
-    const now = Date.now();
-    let cleaned = 0;
-    
-    for (const [key, call] of activeCalls.entries()) {
-      // Clean up ended calls after 2 minutes
-      if (call.state === 'ended' && call.endedAt && (now - call.endedAt > 120000)) {
-        activeCalls.delete(key);
-        cleaned++;
-        continue;
-      }
-      
-      // Timeout ringing calls
-      if (call.state === 'ringing' && (now - call.initiatedAt > CALL_MAX_RINGING_MS)) {
-        console.log(`[CallState] Ringing timeout: ${key}`);
-        endCall(call.callerAddress, call.calleeAddress, 'ringing_timeout');
-        continue;
-      }
-      
-      // Timeout inactive calls
-      if (call.state !== 'ended' && (now - call.lastActivityAt > CALL_MAX_INACTIVE_MS)) {
-        console.log(`[CallState] Inactivity timeout: ${key}`);
-        endCall(call.callerAddress, call.calleeAddress, 'inactivity_timeout');
-        continue;
-      }
-    }
-    
-    if (cleaned > 0) {
-      console.log(`[CallState] Cleaned up ${cleaned} stale call records`);
-    }
-  }, CALL_CLEANUP_INTERVAL);
-  
   function logCallStats() {
     const calls = Array.from(activeCalls.values());
     const byState = {
@@ -7173,7 +7379,9 @@ export async function registerRoutes(
     server: httpServer,
     path: '/ws',
     // Add per-message deflate compression for better performance
-    perMessageDeflate: {
+    // Only applies to clients that offer the extension. Small frames (ICE,
+    // typing) stay uncompressed; SDP offers/answers are usually over the threshold.
+    perMessageDeflate: process.env.WS_PERMESSAGE_DEFLATE === 'off' ? false : {
       zlibDeflateOptions: {
         chunkSize: 1024,
         memLevel: 7,
@@ -7183,8 +7391,12 @@ export async function registerRoutes(
         chunkSize: 10 * 1024
       },
       // Don't compress small messages (overhead not worth it)
-      threshold: 1024
-    }
+      threshold: parseInt(process.env.WS_DEFLATE_THRESHOLD || '1024', 10)
+    },
+    // Pick MessagePack framing when offered; otherwise keep ws's default of
+    // accepting the client's first subprotocol
+    handleProtocols: (protocols: Set<string>) =>
+      protocols.has(MSGPACK_SUBPROTOCOL) ? MSGPACK_SUBPROTOCOL : (protocols.values().next().value ?? false)
   });
 
   // Keep-alive ping interval (every 30 seconds)
@@ -7197,7 +7409,10 @@ export async function registerRoutes(
   
   wss.on('connection', (ws: WebSocket, req: any) => {
     const clientIp = req.socket?.remoteAddress || 'unknown';
-    console.log(`[WebSocket] Client connected from ${clientIp} - total connections: ${getConnectionCount() + 1}`);
+    if (ws.protocol === MSGPACK_SUBPROTOCOL) {
+      useMsgpack(ws);
+    }
+    if (isEnabled('info', 'ws')) wsLog.info(`Client connected from ${clientIp} - total connections: ${getConnectionCount() + 1}`);
     let clientAddress: string | null = null;
     let isAlive = true;
     let pingTimeout: NodeJS.Timeout | null = null;
@@ -7247,7 +7462,7 @@ export async function registerRoutes(
     ws.on('close', (code: number, reason: Buffer) => {
       clearInterval(pingInterval);
       clearPingTimeout();
-      console.log(`[WebSocket] Client ${clientAddress || clientIp} disconnected (code: ${code}, reason: ${reason.toString()})`);
+      if (isEnabled('info', 'ws')) wsLog.info(`Client ${clientAddress || clientIp} disconnected (code: ${code}, reason: ${reason.toString()})`);
       if (clientAddress) {
         removeConnection(clientAddress, connectionId);
         // Store pending reconnect info
@@ -7293,27 +7508,40 @@ export async function registerRoutes(
       }
     });
 
-    ws.on('message', async (data: Buffer) => {
+    ws.on('message', async (data: Buffer, isBinary: boolean) => {
+      const handleStart = performance.now();
+      let messageType = 'invalid';
+      const wireEncoding = isBinary ? 'msgpack' : 'json';
+      wsFramesReceived.inc({ encoding: wireEncoding });
+      wsBytesReceived.inc({ encoding: wireEncoding }, data.length);
       try {
-        const message: WSMessage = JSON.parse(data.toString());
+        const message: WSMessage = isBinary ? decodeFrame(data) : JSON.parse(data.toString());
+        messageType = typeof message.type === 'string' ? message.type : 'invalid';
         
         // Log message types for debugging (but not ping/pong)
-        if (message.type !== 'ping') {
-          console.log(`[WebSocket] ${clientAddress || clientIp} -> ${message.type}`);
+        if (message.type !== 'ping' && isEnabled('debug', 'ws')) {
+          wsLog.debug(`${clientAddress || clientIp} -> ${message.type}`);
         }
 
         switch (message.type) {
           case 'ping': {
             // Respond to client ping with pong
-            ws.send(JSON.stringify({ type: 'pong' }));
+            sendMessage(ws, { type: 'pong' });
             break;
           }
           
           case 'register': {
-            const { address, session_token, last_seq } = message;
+            const { address, session_token, last_seq, batch, encoding, ice_batch } = message;
+            // Clients that can't set a subprotocol opt in here; the ack is already MessagePack
+            if (encoding === 'msgpack') {
+              useMsgpack(ws);
+            }
+            if (ice_batch === true && iceCoalescer.enabled) {
+              acceptIceBatches(ws);
+            }
             if (!address) {
               console.error(`[WebSocket] Register failed: no address provided from ${clientIp}`);
-              ws.send(JSON.stringify({ type: 'error', message: 'Address required' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Address required' } as WSMessage);
               return;
             }
             
@@ -7328,14 +7556,14 @@ export async function registerRoutes(
             // Check for existing connections from this address and close stale ones
             const existingConns = connections.get(address);
             if (existingConns && existingConns.length > 0) {
-              console.log(`[WebSocket] Found ${existingConns.length} existing connection(s) for ${address.slice(0, 12)}..., cleaning up stale ones`);
+              if (isEnabled('info', 'ws')) wsLog.info(`Found ${existingConns.length} existing connection(s) for ${address.slice(0, 12)}..., cleaning up stale ones`);
               for (const existing of existingConns) {
                 // Don't close connections that are actually alive
                 if (existing.ws.readyState !== WebSocket.OPEN) {
                   removeConnection(address, existing.connectionId);
                 } else if (isReconnection) {
                   // This is a reconnection, close the old connection
-                  console.log(`[WebSocket] Closing old connection ${existing.connectionId.slice(0, 8)}... for reconnection`);
+                  if (isEnabled('info', 'ws')) wsLog.info(`Closing old connection ${existing.connectionId.slice(0, 8)}... for reconnection`);
                   try {
                     existing.ws.close(1000, 'Reconnected from new client');
                   } catch (e) {
@@ -7349,22 +7577,24 @@ export async function registerRoutes(
             // Clear pending reconnect since we're now reconnected
             if (isReconnection) {
               pendingReconnects.delete(address);
-              console.log(`[WebSocket] Session resumed for ${address.slice(0, 12)}...`);
+              if (isEnabled('info', 'ws')) wsLog.info(`Session resumed for ${address.slice(0, 12)}...`);
             }
             
             addConnection(address, { ws, address, connectionId });
             const connCount = getConnectionCount();
             
             // Send registration success with session token for future reconnections
-            ws.send(JSON.stringify({ 
+            sendMessage(ws, { 
               type: 'success', 
               message: isReconnection ? 'Session resumed successfully' : 'Registered successfully',
               connections: connCount,
               session_token: connectionId,
-              resumed: isReconnection || false
-            } as WSMessage));
+              resumed: isReconnection || false,
+              worker: clusterNode?.workerId,
+              ice_batch: acceptsIceBatches(ws) || undefined
+            } as WSMessage);
             
-            console.log(`[WebSocket] Client registered: ${address} (connectionId: ${connectionId}, total connections: ${connCount}, reconnection: ${isReconnection})`);
+            if (isEnabled('info', 'ws')) wsLog.info(`Client registered: ${address} (connectionId: ${connectionId}, total connections: ${connCount}, reconnection: ${isReconnection})`);
             
             // Deliver any pending messages for this user (only if DB available)
             const { isDatabaseAvailable } = await import('./db');
@@ -7372,43 +7602,11 @@ export async function registerRoutes(
               console.warn(`[WebSocket] Database unavailable - ${address} won't receive pending messages`);
             }
             if (isDatabaseAvailable()) {
-              storage.getPendingMessages(address).then(async (pendingMsgs) => {
-                for (const pendingMsg of pendingMsgs) {
-                  try {
-                    ws.send(JSON.stringify({
-                      type: 'msg:incoming',
-                      message: {
-                        id: pendingMsg.id,
-                        convo_id: pendingMsg.convoId,
-                        from_address: pendingMsg.fromAddress,
-                        to_address: pendingMsg.toAddress,
-                        content: pendingMsg.content,
-                        type: pendingMsg.mediaType || 'text',
-                        timestamp: pendingMsg.createdAt.getTime(),
-                        status: 'delivered'
-                      },
-                      from_pubkey: '' // Pubkey not stored for pending messages
-                    } as WSMessage));
-                    
-                    // Mark as delivered
-                    await storage.markMessageDelivered(pendingMsg.id);
-                    console.log(`Delivered pending message ${pendingMsg.id} to ${address}`);
-                    
-                    // Notify sender if online
-                    broadcastToAddress(pendingMsg.fromAddress, {
-                        type: 'msg:delivered',
-                        message_id: pendingMsg.id,
-                        convo_id: pendingMsg.convoId,
-                        delivered_at: Date.now()
-                      });
-                  } catch (e) {
-                    console.error('Error delivering pending message:', e);
-                  }
-                }
-                if (pendingMsgs.length > 0) {
-                  console.log(`Delivered ${pendingMsgs.length} pending messages to ${address}`);
+              deliverPendingMessages(ws, address, last_seq, batch === true).then(delivered => {
+                if (delivered > 0) {
+                  if (isEnabled('info', 'ws')) wsLog.info(`Delivered ${delivered} pending messages to ${address}`);
                 }
-              }).catch(console.error);
+              }).catch(e => console.error('Error delivering pending messages:', e));
             }
             break;
           }
@@ -7419,28 +7617,28 @@ export async function registerRoutes(
             // Validate signedIntent structure before accessing properties
             if (!signedIntent || !signedIntent.intent) {
               console.error('[call:init] Invalid signedIntent structure:', JSON.stringify(signedIntent).slice(0, 200));
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid call data', reason: 'invalid_structure' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid call data', reason: 'invalid_structure' } as WSMessage);
               return;
             }
             
             if (!checkRateLimit(signedIntent.intent.from_address)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Rate limit exceeded' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Rate limit exceeded' } as WSMessage);
               return;
             }
             
-            const verifyResult = verifySignatureWithDetails(signedIntent);
+            const verifyResult = await inSocketOrder(ws, verifySignatureWithDetails(signedIntent));
             if (!verifyResult.valid) {
               console.log(`[call:init] Signature verification failed: ${verifyResult.reason} for ${signedIntent.intent.from_address?.slice(0, 20)}...`);
-              ws.send(JSON.stringify({ 
+              sendMessage(ws, { 
                 type: 'error', 
                 message: 'Invalid signature or expired timestamp',
                 reason: verifyResult.reason || 'verification_failed'
-              } as WSMessage));
+              } as WSMessage);
               return;
             }
             
             if (!isConnectionForAddress(signedIntent.intent.from_address, ws)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Address spoofing detected' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Address spoofing detected' } as WSMessage);
               return;
             }
             
@@ -7449,19 +7647,17 @@ export async function registerRoutes(
             const mediaObj = signedIntent.intent.media || { audio: true, video: false };
             const mediaType = mediaObj.video ? 'video' : 'audio';
             
-            console.log(`[call:init] ${callerAddr.slice(0, 12)}... calling ${recipientAddr.slice(0, 12)}... (${mediaType})`);
+            if (isEnabled('debug', 'call')) callLog.debug(`[call:init] ${callerAddr.slice(0, 12)}... calling ${recipientAddr.slice(0, 12)}... (${mediaType})`);
             
             // Check if recipient is online with an active connection
-            let targetConnection = getConnection(recipientAddr);
-            
-            if (!targetConnection) {
+            if (!isAddressOnline(recipientAddr)) {
               // Recipient not immediately available - tell caller we're connecting
               console.log(`[call:init] Recipient ${recipientAddr.slice(0, 12)}... not immediately online`);
-              ws.send(JSON.stringify({ 
+              sendMessage(ws, { 
                 type: 'call:connecting', 
                 message: 'Connecting to recipient...',
                 to_address: recipientAddr
-              } as WSMessage));
+              } as WSMessage);
               
               // Get caller's display name for notification
               const callerIdentity = await storage.getIdentity(callerAddr);
@@ -7495,33 +7691,32 @@ export async function registerRoutes(
                 waitTime += checkInterval;
                 
                 // Re-check for connection
-                targetConnection = getConnection(recipientAddr);
-                if (targetConnection) {
+                if (isAddressOnline(recipientAddr)) {
                   // Recipient came online! Forward the call
                   console.log(`[call:init] Recipient ${recipientAddr.slice(0, 12)}... came online after ${waitTime}ms`);
-                  targetConnection.ws.send(JSON.stringify({
+                  sendToAddress(recipientAddr, {
                     type: 'call:incoming',
                     from_address: callerAddr,
                     from_pubkey: signedIntent.intent.from_pubkey,
                     media: mediaObj
-                  } as WSMessage));
+                  } as WSMessage);
                   
                   // Tell caller the call is ringing
-                  ws.send(JSON.stringify({ 
+                  sendMessage(ws, { 
                     type: 'call:ringing', 
                     message: 'Ringing...',
                     to_address: recipientAddr
-                  } as WSMessage));
+                  } as WSMessage);
                   return;
                 }
                 
                 // Send periodic updates to caller (every 5 seconds)
                 if (waitTime % 5000 === 0 && waitTime < maxWait) {
-                  ws.send(JSON.stringify({ 
+                  sendMessage(ws, { 
                     type: 'call:connecting', 
                     message: 'Still connecting...',
                     to_address: recipientAddr
-                  } as WSMessage));
+                  } as WSMessage);
                 }
               }
               
@@ -7538,22 +7733,22 @@ export async function registerRoutes(
               console.log(`[call:init] Recipient ${recipientAddr.slice(0, 12)}... offline after ${maxWait}ms - recorded missed call`);
               
               // Tell caller the recipient is unavailable
-              ws.send(JSON.stringify({ 
+              sendMessage(ws, { 
                 type: 'call:unavailable', 
                 reason: 'Recipient is currently unavailable. They will see your missed call.',
                 to_address: recipientAddr
-              } as WSMessage));
+              } as WSMessage);
               return;
             }
             
-            console.log(`[call:init] Recipient ${recipientAddr.slice(0, 12)}... is online, processing call policies...`);
+            if (isEnabled('debug', 'call')) callLog.debug(`[call:init] Recipient ${recipientAddr.slice(0, 12)}... is online, processing call policies...`);
             
             // Send "ringing" status to caller - note: call may still be blocked by policies
-            ws.send(JSON.stringify({ 
+            sendMessage(ws, { 
               type: 'call:ringing', 
               message: 'Ringing...',
               to_address: recipientAddr
-            } as WSMessage));
+            } as WSMessage);
             
             const recipientAddress = signedIntent.intent.to_address;
             const callerAddress = signedIntent.intent.from_address;
@@ -7588,7 +7783,7 @@ export async function registerRoutes(
                 const isContact = !!callerContact;
                 const isPaidCall = !!pass_id; // has paid pass
                 
-                console.log(`[call:init] Contact check: callerHasRecipient=${!!callerContact}, recipientHasCaller=${!!calleeContact}, mutual=${isMutualContact}, either=${isEitherContact}`);
+                if (isEnabled('debug', 'call')) callLog.debug(`[call:init] Contact check: callerHasRecipient=${!!callerContact}, recipientHasCaller=${!!calleeContact}, mutual=${isMutualContact}, either=${isEitherContact}`);
                 
                 // Free Tier Shield: Check if caller can start this call
                 const shieldCheck = await FreeTierShield.canStartCall(callerAddress, recipientAddress, {
@@ -7604,11 +7799,11 @@ export async function registerRoutes(
                   // Record failed start
                   await FreeTierShield.recordFailedStart(callerAddress);
                   
-                  ws.send(JSON.stringify({
+                  sendMessage(ws, {
                     type: 'call:blocked',
                     reason: shieldCheck.message || 'Call blocked by free tier limits',
                     errorCode: shieldCheck.errorCode
-                  } as WSMessage));
+                  } as WSMessage);
                   console.log(`Free tier shield blocked call from ${callerAddress}: ${shieldCheck.errorCode}`);
                   return;
                 }
@@ -7620,11 +7815,11 @@ export async function registerRoutes(
                 });
                 
                 if (!calleeShieldCheck.allowed) {
-                  ws.send(JSON.stringify({
+                  sendMessage(ws, {
                     type: 'call:blocked',
                     reason: calleeShieldCheck.message || 'Recipient cannot receive this call',
                     errorCode: calleeShieldCheck.errorCode
-                  } as WSMessage));
+                  } as WSMessage);
                   console.log(`Free tier shield blocked inbound call to ${recipientAddress}: ${calleeShieldCheck.errorCode}`);
                   return;
                 }
@@ -7660,18 +7855,18 @@ export async function registerRoutes(
                         timestamp: Date.now(),
                         status: 'pending'
                       };
-                      policyStore.createCallRequest(request);
+                      await policyStore.createCallRequest(request);
                       
-                      targetConnection.ws.send(JSON.stringify({
+                      sendToAddress(recipientAddress, {
                         type: 'call:request',
                         request
-                      } as WSMessage));
+                      } as WSMessage);
                       
-                      ws.send(JSON.stringify({
+                      sendMessage(ws, {
                         type: 'call:blocked',
                         reason: 'Recipient has Freeze Mode enabled. Call request sent for approval.',
                         errorCode: 'FREEZE_MODE_REQUEST'
-                      } as WSMessage));
+                      } as WSMessage);
                       console.log(`Freeze Mode: ${callerAddress} → ${recipientAddress} converted to call request`);
                       return;
                     }
@@ -7729,13 +7924,13 @@ export async function registerRoutes(
                     }).catch(console.error);
                     
                     // Tell caller about DND - offer voicemail with clear error code
-                    ws.send(JSON.stringify({
+                    sendMessage(ws, {
                       type: 'call:blocked',
                       reason: 'Recipient has Do Not Disturb enabled. Your call has been sent to voicemail.',
                       errorCode: 'DND_ACTIVE',
                       to_address: recipientAddress,
                       voicemail_enabled: callIdSettings.voicemailEnabled !== false
-                    } as WSMessage));
+                    } as WSMessage);
                     
                     console.log(`DND: Call from ${callerAddress} to ${recipientAddress} blocked - routed to voicemail`);
                     return;
@@ -7743,24 +7938,24 @@ export async function registerRoutes(
                 }
                 
                 // Continue with existing policy evaluation
-                policyStore.recordCallAttempt(recipientAddress, callerAddress);
+                await policyStore.recordCallAttempt(recipientAddress, callerAddress);
                 
-                const decision = policyStore.evaluateCallPolicy(
+                const decision = await policyStore.evaluateCallPolicy(
                   recipientAddress,
                   callerAddress,
                   isContact,
                   pass_id
                 );
                 
-                console.log(`[call:init] Policy decision: action=${decision.action}, reason=${'reason' in decision ? decision.reason : 'none'}`);
+                if (isEnabled('debug', 'call')) callLog.debug(`[call:init] Policy decision: action=${decision.action}, reason=${'reason' in decision ? decision.reason : 'none'}`);
                 
                 switch (decision.action) {
                   case 'block':
                     await FreeTierShield.recordFailedStart(callerAddress);
-                    ws.send(JSON.stringify({
+                    sendMessage(ws, {
                       type: 'call:blocked',
                       reason: decision.reason
-                    } as WSMessage));
+                    } as WSMessage);
                     console.log(`Call blocked from ${callerAddress} to ${recipientAddress}: ${decision.reason}`);
                     break;
                     
@@ -7773,23 +7968,23 @@ export async function registerRoutes(
                       timestamp: Date.now(),
                       status: 'pending'
                     };
-                    policyStore.createCallRequest(request);
+                    await policyStore.createCallRequest(request);
                     
-                    targetConnection.ws.send(JSON.stringify({
+                    sendToAddress(recipientAddress, {
                       type: 'call:request',
                       request
-                    } as WSMessage));
+                    } as WSMessage);
                     
-                    ws.send(JSON.stringify({
+                    sendMessage(ws, {
                       type: 'success',
                       message: 'Call request sent. Waiting for recipient approval.'
-                    } as WSMessage));
+                    } as WSMessage);
                     console.log(`Call request sent from ${callerAddress} to ${recipientAddress}`);
                     break;
                   }
                   
                   case 'auto_reply': {
-                    const dmConvo = messageStore.getOrCreateDirectConversation(recipientAddress, callerAddress);
+                    const dmConvo = await messageStore.getOrCreateDirectConversation(recipientAddress, callerAddress);
                     const autoMsg: Message = {
                       id: `auto_${Date.now()}`,
                       convo_id: dmConvo.id,
@@ -7801,25 +7996,25 @@ export async function registerRoutes(
                       nonce: Math.random().toString(36).slice(2),
                       status: 'sent'
                     };
-                    messageStore.addMessage(autoMsg);
+                    await messageStore.addMessage(autoMsg);
                     
-                    ws.send(JSON.stringify({
+                    sendMessage(ws, {
                       type: 'msg:incoming',
                       message: autoMsg,
                       from_pubkey: ''
-                    } as WSMessage));
+                    } as WSMessage);
                     
-                    ws.send(JSON.stringify({
+                    sendMessage(ws, {
                       type: 'call:blocked',
                       reason: 'Auto-reply sent: ' + decision.message
-                    } as WSMessage));
+                    } as WSMessage);
                     console.log(`Auto-reply sent from ${recipientAddress} to ${callerAddress}`);
                     break;
                   }
                   
                   case 'ring': {
                     if (pass_id) {
-                      policyStore.consumePass(pass_id);
+                      await policyStore.consumePass(pass_id);
                     }
                     
                     // Create call record for tracking
@@ -7829,9 +8024,9 @@ export async function registerRoutes(
                     // Include max call duration for free tier users
                     const maxDuration = shieldCheck.maxDurationSeconds;
                     
-                    console.log(`[call:init] Sending call:incoming to recipient ${recipientAddress.slice(0, 12)}... (session: ${callSessionId.slice(0, 8)}...)`);
+                    if (isEnabled('debug', 'call')) callLog.debug(`[call:init] Sending call:incoming to recipient ${recipientAddress.slice(0, 12)}... (session: ${callSessionId.slice(0, 8)}...)`);
                     
-                    targetConnection.ws.send(JSON.stringify({
+                    sendToAddress(recipientAddress, {
                       type: 'call:incoming',
                       from_address: callerAddress,
                       from_pubkey: signedIntent.intent.from_pubkey,
@@ -7839,15 +8034,15 @@ export async function registerRoutes(
                       is_unknown: decision.is_unknown,
                       maxDurationSeconds: maxDuration,
                       callSessionId
-                    } as WSMessage));
+                    } as WSMessage);
                     
-                    console.log(`[call:init] SUCCESS - call:incoming sent to ${recipientAddress.slice(0, 12)}...`);
+                    if (isEnabled('debug', 'call')) callLog.debug(`[call:init] SUCCESS - call:incoming sent to ${recipientAddress.slice(0, 12)}...`);
                     break;
                   }
                 }
               } catch (error) {
                 console.error('Error in Free Tier Shield check:', error);
-                ws.send(JSON.stringify({ type: 'error', message: 'Failed to process call' } as WSMessage));
+                sendMessage(ws, { type: 'error', message: 'Failed to process call' } as WSMessage);
               }
             })();
             break;
@@ -7855,33 +8050,32 @@ export async function registerRoutes(
           
           case 'call:request_response': {
             const { request_id, accepted } = message;
-            const request = policyStore.getCallRequest(request_id);
+            const request = await policyStore.getCallRequest(request_id);
             
             if (!request) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Request not found' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Request not found' } as WSMessage);
               return;
             }
             
             if (request.to_address !== clientAddress) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Not authorized' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Not authorized' } as WSMessage);
               return;
             }
             
-            policyStore.updateCallRequest(request_id, accepted ? 'accepted' : 'declined');
+            await policyStore.updateCallRequest(request_id, accepted ? 'accepted' : 'declined');
             
-            const callerConnection = getConnection(request.from_address);
-            if (callerConnection) {
+            if (isAddressOnline(request.from_address)) {
               if (accepted) {
-                callerConnection.ws.send(JSON.stringify({
+                sendToAddress(request.from_address, {
                   type: 'success',
                   message: 'Call request accepted. You can now call.'
-                } as WSMessage));
+                } as WSMessage);
               } else {
-                policyStore.recordRejection(request.to_address, request.from_address);
-                callerConnection.ws.send(JSON.stringify({
+                await policyStore.recordRejection(request.to_address, request.from_address);
+                sendToAddress(request.from_address, {
                   type: 'call:blocked',
                   reason: 'Call request declined'
-                } as WSMessage));
+                } as WSMessage);
               }
             }
             break;
@@ -7896,11 +8090,11 @@ export async function registerRoutes(
               const call = acceptCall(clientAddress, message.to_address, callSessionId);
               if (!call) {
                 console.warn(`[call:accept] No active call found from ${message.to_address.slice(0, 12)}... to ${clientAddress.slice(0, 12)}...`);
-                ws.send(JSON.stringify({ 
+                sendMessage(ws, { 
                   type: 'error', 
                   message: 'No active call to accept',
                   errorCode: 'CALL_NOT_FOUND'
-                } as WSMessage));
+                } as WSMessage);
                 break;
               }
               
@@ -7911,11 +8105,12 @@ export async function registerRoutes(
               if (callSessionId) {
                 (async () => {
                   try {
-                    await FreeTierShield.recordCallStart(
+                    const record = await FreeTierShield.recordCallStart(
                       message.to_address!, // caller
                       clientAddress,       // callee (accepter)
                       callSessionId
                     );
+                    scheduleDurationLimit(call, record.startedAt, record.maxDurationSeconds);
                   } catch (error) {
                     console.error('Error recording call start:', error);
                   }
@@ -7923,17 +8118,15 @@ export async function registerRoutes(
               }
             }
             
-            const targetConnection = getConnection(message.to_address);
-            if (targetConnection) {
-              console.log(`[call:accept] Forwarding accept from ${clientAddress?.slice(0, 12)}... to ${message.to_address?.slice(0, 12)}...`);
-              targetConnection.ws.send(JSON.stringify(message));
+            if (sendToAddress(message.to_address, message)) {
+              if (isEnabled('debug', 'call')) callLog.debug(`[call:accept] Forwarding accept from ${clientAddress?.slice(0, 12)}... to ${message.to_address?.slice(0, 12)}...`);
             } else {
               console.warn(`[call:accept] Caller ${message.to_address?.slice(0, 12)}... not online`);
-              ws.send(JSON.stringify({ 
+              sendMessage(ws, { 
                 type: 'error', 
                 message: 'Caller is no longer online',
                 errorCode: 'PEER_OFFLINE'
-              } as WSMessage));
+              } as WSMessage);
               
               // End the call since caller is gone
               if (clientAddress && message.to_address) {
@@ -7944,17 +8137,14 @@ export async function registerRoutes(
           }
           
           case 'call:reject': {
-            console.log(`[call:reject] Call rejected by ${clientAddress?.slice(0, 12)}... to ${message.to_address?.slice(0, 12)}...`);
+            if (isEnabled('debug', 'call')) callLog.debug(`[call:reject] Call rejected by ${clientAddress?.slice(0, 12)}... to ${message.to_address?.slice(0, 12)}...`);
             
             // End the call
             if (clientAddress && message.to_address) {
               endCall(clientAddress, message.to_address, 'rejected');
             }
             
-            const targetConnection = getConnection(message.to_address);
-            if (targetConnection) {
-              targetConnection.ws.send(JSON.stringify(message));
-            }
+            sendToAddress(message.to_address, message);
             
             // Record as failed start for free tier
             if (clientAddress) {
@@ -7965,7 +8155,7 @@ export async function registerRoutes(
           
           case 'call:end': {
             const endMsg = message as any;
-            console.log(`[call:end] Call ended by ${clientAddress?.slice(0, 12)}... to ${message.to_address?.slice(0, 12)}...`);
+            if (isEnabled('debug', 'call')) callLog.debug(`[call:end] Call ended by ${clientAddress?.slice(0, 12)}... to ${message.to_address?.slice(0, 12)}...`);
             
             // End the call
             if (clientAddress && message.to_address) {
@@ -7973,10 +8163,7 @@ export async function registerRoutes(
               endCall(clientAddress, message.to_address, reason);
             }
             
-            const targetConnection = getConnection(message.to_address);
-            if (targetConnection) {
-              targetConnection.ws.send(JSON.stringify(message));
-            }
+            sendToAddress(message.to_address, message);
             
             // Record call end for Free Tier Shield tracking
             if (endMsg.callSessionId && endMsg.durationSeconds !== undefined) {
@@ -7991,11 +8178,11 @@ export async function registerRoutes(
             // Validate WebRTC messages against active call state
             if (!clientAddress || !message.to_address) {
               console.warn(`[WebRTC] ${message.type} missing sender or recipient`);
-              ws.send(JSON.stringify({ 
+              sendMessage(ws, { 
                 type: 'error', 
                 message: 'Missing sender or recipient',
                 errorCode: 'INVALID_MESSAGE'
-              } as WSMessage));
+              } as WSMessage);
               break;
             }
             
@@ -8003,22 +8190,22 @@ export async function registerRoutes(
             const call = getCall(clientAddress, message.to_address);
             if (!call) {
               console.warn(`[WebRTC] ${message.type} rejected: no active call between ${clientAddress.slice(0, 12)}... and ${message.to_address?.slice(0, 12)}...`);
-              ws.send(JSON.stringify({ 
+              sendMessage(ws, { 
                 type: 'error', 
                 message: 'No active call',
                 errorCode: 'CALL_NOT_FOUND'
-              } as WSMessage));
+              } as WSMessage);
               break;
             }
             
             // Validate call is in appropriate state for this message type
             if (call.state === 'ended' || call.state === 'idle') {
               console.warn(`[WebRTC] ${message.type} rejected: call is ${call.state}`);
-              ws.send(JSON.stringify({ 
+              sendMessage(ws, { 
                 type: 'error', 
                 message: 'Call has ended',
                 errorCode: 'CALL_ENDED'
-              } as WSMessage));
+              } as WSMessage);
               break;
             }
             
@@ -8027,10 +8214,10 @@ export async function registerRoutes(
               // Validate offer can be sent
               if (call.signalingState !== 'stable' && call.signalingState !== 'have-remote-offer') {
                 console.warn(`[WebRTC] Offer rejected: invalid state ${call.signalingState}`);
-                ws.send(JSON.stringify({ 
+                sendMessage(ws, { 
                   type: 'webrtc:glare', 
                   message: 'Signaling state conflict - offer already pending'
-                } as WSMessage));
+                } as WSMessage);
                 break;
               }
               
@@ -8055,65 +8242,67 @@ export async function registerRoutes(
               call.answerSent = true;
               
             } else if (message.type === 'webrtc:ice') {
+              const candidate = (message as any).candidate;
               // Buffer ICE candidates if call not yet fully connected
               if (call.state === 'ringing') {
-                console.log(`[WebRTC] Buffering ICE candidate (call still ringing)`);
-                bufferIceCandidate(call, clientAddress, (message as any).candidate);
+                if (isEnabled('debug', 'webrtc')) webrtcLog.debug(`Buffering ICE candidate (call still ringing)`);
+                if (!isEndOfCandidates(candidate)) bufferIceCandidate(call, clientAddress, candidate);
                 // Don't forward yet - will be sent when call connects
                 break;
               }
               
-              call.lastActivityAt = Date.now();
+              touchCall(call);
+              if (wantsIceBatches(message.to_address)) {
+                iceCoalescer.add(`${call.callId}|${clientAddress}`, 'webrtc:ice', message.to_address, { to_address: message.to_address }, candidate, ws);
+                break;
+              }
+              // End-of-candidates markers only go to clients that asked for batches
+              if (isEndOfCandidates(candidate)) break;
             }
             
-            const targetConnection = getConnection(message.to_address);
-            if (targetConnection) {
-              console.log(`[WebRTC] Forwarding ${message.type} to ${message.to_address?.slice(0, 12)}... (call: ${call.state}, sig: ${call.signalingState})`);
-              targetConnection.ws.send(JSON.stringify(message));
+            if (sendToAddress(message.to_address, message)) {
+              if (isEnabled('debug', 'webrtc')) webrtcLog.debug(`Forwarding ${message.type} to ${message.to_address?.slice(0, 12)}... (call: ${call.state}, sig: ${call.signalingState})`);
             } else {
-              console.log(`[WebRTC] Target ${message.to_address?.slice(0, 12)}... not online - ${message.type} not delivered`);
+              if (isEnabled('debug', 'webrtc')) webrtcLog.debug(`Target ${message.to_address?.slice(0, 12)}... not online - ${message.type} not delivered`);
               // Notify sender that recipient is offline
-              ws.send(JSON.stringify({
+              sendMessage(ws, {
                 type: 'webrtc:peer_offline',
                 to_address: message.to_address,
                 signalType: message.type
-              }));
+              });
             }
             break;
           }
 
           // Call Waiting (phone-like)
           case 'call:hold': {
-            const targetConnection = getConnection(message.to_address);
-            if (targetConnection && clientAddress) {
-              targetConnection.ws.send(JSON.stringify({
+            if (clientAddress) {
+              sendToAddress(message.to_address, {
                 type: 'call:held',
                 by_address: clientAddress
-              } as WSMessage));
+              } as WSMessage);
             }
             break;
           }
 
           case 'call:resume': {
-            const targetConnection = getConnection(message.to_address);
-            if (targetConnection && clientAddress) {
-              targetConnection.ws.send(JSON.stringify({
+            if (clientAddress) {
+              sendToAddress(message.to_address, {
                 type: 'call:resumed',
                 by_address: clientAddress
-              } as WSMessage));
+              } as WSMessage);
             }
             break;
           }
 
           case 'call:busy_waiting': {
-            const targetConnection = getConnection(message.to_address);
-            if (targetConnection && clientAddress) {
-              targetConnection.ws.send(JSON.stringify({
+            if (clientAddress) {
+              sendToAddress(message.to_address, {
                 type: 'call:waiting',
                 from_address: clientAddress,
                 from_pubkey: getConnection(clientAddress)?.pubkey || '',
                 media: { audio: true, video: false }
-              } as WSMessage));
+              } as WSMessage);
             }
             break;
           }
@@ -8121,7 +8310,7 @@ export async function registerRoutes(
           // Group Calls (room-based mesh WebRTC)
           case 'room:create': {
             if (!clientAddress) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Not authenticated' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Not authenticated' } as WSMessage);
               break;
             }
 
@@ -8129,7 +8318,7 @@ export async function registerRoutes(
             const identity = await storage.getIdentity(clientAddress);
             const plan = identity?.plan || 'free';
             if (plan === 'free') {
-              ws.send(JSON.stringify({ type: 'room:error', message: 'Upgrade to Pro to use group calls' } as WSMessage));
+              sendMessage(ws, { type: 'room:error', message: 'Upgrade to Pro to use group calls' } as WSMessage);
               break;
             }
 
@@ -8159,28 +8348,25 @@ export async function registerRoutes(
                 created_at: Date.now()
               };
 
-              ws.send(JSON.stringify({ type: 'room:created', room: roomData } as WSMessage));
-
-              // Send invites to participants
-              for (const addr of message.participant_addresses || []) {
-                broadcastToAddress(addr, {
-                    type: 'room:invite',
-                    room_id: room.id,
-                    to_address: addr,
-                    from_address: clientAddress,
-                    is_video: message.is_video
-                  });
-              }
+              sendMessage(ws, { type: 'room:created', room: roomData } as WSMessage);
+
+              // Send invites to participants (one frame for all of them, so no to_address)
+              fanOut(message.participant_addresses || [], {
+                type: 'room:invite',
+                room_id: room.id,
+                from_address: clientAddress,
+                is_video: message.is_video
+              }, clientAddress);
             } catch (error) {
               console.error('Error creating room:', error);
-              ws.send(JSON.stringify({ type: 'room:error', message: 'Failed to create room' } as WSMessage));
+              sendMessage(ws, { type: 'room:error', message: 'Failed to create room' } as WSMessage);
             }
             break;
           }
 
           case 'room:join': {
             if (!clientAddress) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Not authenticated' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Not authenticated' } as WSMessage);
               break;
             }
 
@@ -8189,29 +8375,29 @@ export async function registerRoutes(
               const joinerIdentity = await storage.getIdentity(clientAddress);
               const joinerPlan = joinerIdentity?.plan || 'free';
               if (joinerPlan === 'free') {
-                ws.send(JSON.stringify({ type: 'room:error', room_id: message.room_id, message: 'Upgrade to Pro to join group calls' } as WSMessage));
+                sendMessage(ws, { type: 'room:error', room_id: message.room_id, message: 'Upgrade to Pro to join group calls' } as WSMessage);
                 break;
               }
 
               const room = await storage.getCallRoom(message.room_id);
               if (!room) {
-                ws.send(JSON.stringify({ type: 'room:error', room_id: message.room_id, message: 'Room not found' } as WSMessage));
+                sendMessage(ws, { type: 'room:error', room_id: message.room_id, message: 'Room not found' } as WSMessage);
                 break;
               }
 
               if (room.status !== 'active') {
-                ws.send(JSON.stringify({ type: 'room:error', room_id: message.room_id, message: 'Room has ended' } as WSMessage));
+                sendMessage(ws, { type: 'room:error', room_id: message.room_id, message: 'Room has ended' } as WSMessage);
                 break;
               }
 
               if (room.isLocked) {
-                ws.send(JSON.stringify({ type: 'room:error', room_id: message.room_id, message: 'Room is locked', reason: 'locked' } as WSMessage));
+                sendMessage(ws, { type: 'room:error', room_id: message.room_id, message: 'Room is locked', reason: 'locked' } as WSMessage);
                 break;
               }
 
               const participantCount = await storage.getRoomParticipantCount(message.room_id);
               if (participantCount >= room.maxParticipants) {
-                ws.send(JSON.stringify({ type: 'room:error', room_id: message.room_id, message: 'Room is full', reason: 'full' } as WSMessage));
+                sendMessage(ws, { type: 'room:error', room_id: message.room_id, message: 'Room is full', reason: 'full' } as WSMessage);
                 break;
               }
 
@@ -8245,11 +8431,11 @@ export async function registerRoutes(
                 joined_at: p.joinedAt.getTime()
               }));
 
-              ws.send(JSON.stringify({
+              sendMessage(ws, {
                 type: 'room:joined',
                 room: roomData,
                 participants: participantData
-              } as WSMessage));
+              } as WSMessage);
 
               // Notify other participants
               const newParticipant: GroupCallParticipant = {
@@ -8260,18 +8446,14 @@ export async function registerRoutes(
                 joined_at: Date.now()
               };
 
-              for (const p of participants) {
-                if (p.userAddress !== clientAddress) {
-                  broadcastToAddress(p.userAddress, {
-                      type: 'room:participant_joined',
-                      room_id: message.room_id,
-                      participant: newParticipant
-                    });
-                }
-              }
+              fanOut(participants.map(p => p.userAddress), {
+                type: 'room:participant_joined',
+                room_id: message.room_id,
+                participant: newParticipant
+              }, clientAddress);
             } catch (error) {
               console.error('Error joining room:', error);
-              ws.send(JSON.stringify({ type: 'room:error', room_id: message.room_id, message: 'Failed to join room' } as WSMessage));
+              sendMessage(ws, { type: 'room:error', room_id: message.room_id, message: 'Failed to join room' } as WSMessage);
             }
             break;
           }
@@ -8284,13 +8466,11 @@ export async function registerRoutes(
 
               // Notify other participants
               const participants = await storage.getRoomParticipants(message.room_id);
-              for (const p of participants) {
-                broadcastToAddress(p.userAddress, {
-                    type: 'room:participant_left',
-                    room_id: message.room_id,
-                    user_address: message.from_address || clientAddress
-                  });
-              }
+              fanOut(participants.map(p => p.userAddress), {
+                type: 'room:participant_left',
+                room_id: message.room_id,
+                user_address: message.from_address || clientAddress
+              });
 
               // End room if empty
               if (participants.length === 0) {
@@ -8312,13 +8492,11 @@ export async function registerRoutes(
 
                 // Notify all participants
                 const participants = await storage.getRoomParticipants(message.room_id);
-                for (const p of participants) {
-                  broadcastToAddress(p.userAddress, {
-                      type: 'room:lock',
-                      room_id: message.room_id,
-                      locked: message.locked
-                    });
-                }
+                fanOut(participants.map(p => p.userAddress), {
+                  type: 'room:lock',
+                  room_id: message.room_id,
+                  locked: message.locked
+                });
               }
             } catch (error) {
               console.error('Error locking room:', error);
@@ -8338,11 +8516,11 @@ export async function registerRoutes(
                 const participants = await storage.getRoomParticipants(message.room_id);
                 for (const p of participants) {
                   await storage.removeRoomParticipant(message.room_id, p.userAddress);
-                  broadcastToAddress(p.userAddress, {
-                      type: 'room:ended',
-                      room_id: message.room_id
-                    });
                 }
+                fanOut(participants.map(p => p.userAddress), {
+                  type: 'room:ended',
+                  room_id: message.room_id
+                });
               }
             } catch (error) {
               console.error('Error ending room:', error);
@@ -8352,11 +8530,17 @@ export async function registerRoutes(
 
           // Mesh WebRTC signaling for group calls
           case 'mesh:offer':
-          case 'mesh:answer':
+          case 'mesh:answer': {
+            sendToAddress(message.to_peer, message);
+            break;
+          }
+          
           case 'mesh:ice': {
-            const targetConnection = getConnection(message.to_peer);
-            if (targetConnection) {
-              targetConnection.ws.send(JSON.stringify(message));
+            if (wantsIceBatches(message.to_peer)) {
+              const { room_id, to_peer, from_peer } = message;
+              iceCoalescer.add(`mesh|${room_id}|${from_peer}|${to_peer}`, 'mesh:ice', to_peer, { room_id, to_peer, from_peer }, message.candidate, ws);
+            } else if (!isEndOfCandidates(message.candidate)) {
+              sendToAddress(message.to_peer, message);
             }
             break;
           }
@@ -8364,7 +8548,7 @@ export async function registerRoutes(
           // Call Merge (merge 1:1 calls into group)
           case 'call:merge': {
             if (!clientAddress) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Not authenticated' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Not authenticated' } as WSMessage);
               break;
             }
 
@@ -8372,7 +8556,7 @@ export async function registerRoutes(
             const mergeIdentity = await storage.getIdentity(clientAddress);
             const mergePlan = mergeIdentity?.plan || 'free';
             if (mergePlan === 'free') {
-              ws.send(JSON.stringify({ type: 'room:error', message: 'Upgrade to Pro to use group calls' } as WSMessage));
+              sendMessage(ws, { type: 'room:error', message: 'Upgrade to Pro to use group calls' } as WSMessage);
               break;
             }
 
@@ -8410,22 +8594,18 @@ export async function registerRoutes(
               };
 
               // Notify all participants about the merge
-              ws.send(JSON.stringify({ type: 'call:merged', room: roomData } as WSMessage));
+              sendMessage(ws, { type: 'call:merged', room: roomData } as WSMessage);
 
-              for (const addr of message.call_addresses || []) {
-                if (addr !== clientAddress) {
-                  broadcastToAddress(addr, { type: 'call:merged', room: roomData });
-                }
-              }
+              fanOut(message.call_addresses || [], { type: 'call:merged', room: roomData }, clientAddress);
             } catch (error) {
               console.error('Error merging calls:', error);
-              ws.send(JSON.stringify({ type: 'room:error', message: 'Failed to merge calls' } as WSMessage));
+              sendMessage(ws, { type: 'room:error', message: 'Failed to merge calls' } as WSMessage);
             }
             break;
           }
 
           case 'msg:send': {
-            console.log(`[msg:send] Received message from ${clientAddress?.slice(0, 12)}...`);
+            if (isEnabled('debug', 'msg')) msgLog.debug(`[msg:send] Received message from ${clientAddress?.slice(0, 12)}...`);
             const { data: signedMsg } = message;
             
             // Validate signedMsg structure
@@ -8433,22 +8613,26 @@ export async function registerRoutes(
               console.error(`[msg:send] FAILED - Invalid message structure from ${clientAddress?.slice(0, 12)}...`);
               console.error('  Expected: { message, signature, from_pubkey }');
               console.error('  Received:', JSON.stringify(signedMsg).slice(0, 200));
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid message structure' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid message structure' } as WSMessage);
               return;
             }
             
-            if (!verifyMessageSignature(signedMsg)) {
-              console.log(`[msg:send] FAILED - Invalid signature from ${clientAddress?.slice(0, 12)}...`);
-              console.log(`  Clock check: client=${signedMsg.message.timestamp}, server=${Date.now()}, diff=${Math.abs(Date.now() - signedMsg.message.timestamp)}ms`);
-              console.log(`  Max clock skew: ${MAX_CLOCK_SKEW}ms`);
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid message signature - check your device clock' } as WSMessage));
+            if (!(await inSocketOrder(ws, verifyMessageSignature(signedMsg)))) {
+              if (isEnabled('warn', 'msg')) {
+                msgLog.warn(`[msg:send] FAILED - Invalid signature from ${clientAddress?.slice(0, 12)}...`, {
+                  clientTimestamp: signedMsg.message.timestamp,
+                  serverTimestamp: Date.now(),
+                  maxClockSkewMs: MAX_CLOCK_SKEW,
+                });
+              }
+              sendMessage(ws, { type: 'error', message: 'Invalid message signature - check your device clock' } as WSMessage);
               return;
             }
             
             if (!isConnectionForAddress(signedMsg.message.from_address, ws)) {
               console.error(`[msg:send] FAILED - Address spoofing detected from ${clientAddress?.slice(0, 12)}...`);
               console.error(`  Claims to be: ${signedMsg.message.from_address}`);
-              ws.send(JSON.stringify({ type: 'error', message: 'Address spoofing detected' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Address spoofing detected' } as WSMessage);
               return;
             }
             
@@ -8459,17 +8643,17 @@ export async function registerRoutes(
               console.error(`[msg:send] FAILED - Missing required fields`);
               console.error('  Required: id, to_address, convo_id');
               console.error('  Received:', Object.keys(msg).join(', '));
-              ws.send(JSON.stringify({ type: 'error', message: 'Missing required message fields' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Missing required message fields' } as WSMessage);
               return;
             }
             
-            if (messageStore.hasMessage(msg.id, msg.nonce)) {
-              console.log(`[msg:send] Duplicate message ${msg.id.slice(0, 8)}...`);
-              ws.send(JSON.stringify({
+            if (await messageStore.hasMessage(msg.id, msg.nonce)) {
+              if (isEnabled('debug', 'msg')) msgLog.debug(`[msg:send] Duplicate message ${msg.id.slice(0, 8)}...`);
+              sendMessage(ws, {
                 type: 'msg:ack',
                 message_id: msg.id,
                 status: 'duplicate' as const
-              } as WSMessage));
+              } as WSMessage);
               return;
             }
             
@@ -8479,7 +8663,7 @@ export async function registerRoutes(
             let serverSeq: number;
             let serverTimestamp: Date;
             try {
-              console.log(`[msg:send] Storing message to DB...`);
+              if (isEnabled('debug', 'msg')) msgLog.debug(`[msg:send] Storing message to DB...`);
               const dbResult = await storage.storeMessageWithSeq(
                 msg.from_address,
                 msg.to_address,
@@ -8499,7 +8683,7 @@ export async function registerRoutes(
               // Apply DB-assigned values to message for consistent broadcasting
               (msg as any).seq = serverSeq;
               (msg as any).server_timestamp = serverTimestamp.getTime();
-              console.log(`[msg:send] Message stored with seq=${serverSeq}`);
+              if (isEnabled('debug', 'msg')) msgLog.debug(`[msg:send] Message stored with seq=${serverSeq}`);
             } catch (dbError: any) {
               console.error('[msg:send] Failed to persist message to DB:', dbError.message);
               console.error('  Error code:', dbError.code);
@@ -8515,60 +8699,67 @@ export async function registerRoutes(
                 (msg as any).server_timestamp = serverTimestamp.getTime();
               } else {
                 // DB is configured but failed - this is a real error
-                ws.send(JSON.stringify({
+                sendMessage(ws, {
                   type: 'msg:ack',
                   message_id: msg.id,
                   status: 'error' as any,
                   error: 'Database error: ' + dbError.message
-                } as WSMessage));
+                } as WSMessage);
                 return;
               }
             }
             
             // Send acknowledgment with server-assigned seq for ordering
-            ws.send(JSON.stringify({
+            sendMessage(ws, {
               type: 'msg:ack',
               message_id: msg.id,
               status: 'received' as const,
               seq: serverSeq,
               server_timestamp: serverTimestamp.getTime()
-            } as WSMessage));
+            } as WSMessage);
             
-            let convo = messageStore.getConversation(msg.convo_id);
+            let convo = await messageStore.getConversation(msg.convo_id);
             
             // If conversation not in memory, ensure it's created (critical for message delivery)
             if (!convo) {
-              console.log(`[msg:send] Conversation ${msg.convo_id} not in memory, creating/loading...`);
+              if (isEnabled('debug', 'msg')) msgLog.debug(`[msg:send] Conversation ${msg.convo_id} not in memory, creating/loading...`);
               // For direct messages, create or get the conversation
-              convo = messageStore.getOrCreateDirectConversation(msg.from_address, msg.to_address);
-              console.log(`[msg:send] Conversation created/loaded with ${convo.participant_addresses.length} participants`);
+              convo = await messageStore.getOrCreateDirectConversation(msg.from_address, msg.to_address);
+              if (isEnabled('debug', 'msg')) msgLog.debug(`[msg:send] Conversation created/loaded with ${convo.participant_addresses.length} participants`);
             }
             
-            messageStore.addMessage(msg);
-            messageStore.updateConversationLastMessage(msg.convo_id, msg);
+            await messageStore.addMessage(msg);
+            await messageStore.updateConversationLastMessage(msg.convo_id, msg);
             
             const recipients = convo.participant_addresses.filter(a => a !== msg.from_address);
-            console.log(`[msg:send] Message ${msg.id.slice(0, 8)}... from ${msg.from_address.slice(0, 12)}... to ${recipients.length} recipient(s)`);
+            const online = recipients.filter(isAddressOnline);
+            if (isEnabled('debug', 'msg')) msgLog.debug(`[msg:send] Message ${msg.id.slice(0, 8)}... from ${msg.from_address.slice(0, 12)}... to ${recipients.length} recipient(s), ${online.length} online`);
+            
+            // A recipient counted online whose sockets all turned out dead
+            // reached nobody and takes the offline path below
+            let reached: string[] = [];
+            if (online.length > 0) {
+              const { delivered } = fanOut(online, {
+                type: 'msg:incoming',
+                message: msg,
+                from_pubkey: signedMsg.from_pubkey
+              }, msg.from_address);
+              reached = online.filter(addr => (delivered.get(addr) ?? 0) > 0);
+            }
+            
+            if (reached.length > 0) {
+              msg.status = 'delivered';
+              await messageStore.updateMessageStatus(msg.id, 'delivered');
+              sendMessage(ws, {
+                type: 'msg:delivered',
+                message_id: msg.id,
+                convo_id: msg.convo_id,
+                delivered_at: Date.now()
+              } as WSMessage);
+            }
             
             for (const recipientAddr of recipients) {
-              const recipientConnection = getConnection(recipientAddr);
-              if (recipientConnection) {
-                console.log(`[msg:send] Delivering to ${recipientAddr.slice(0, 12)}... (online)`);
-                broadcastToAddress(recipientAddr, {
-                  type: 'msg:incoming',
-                  message: msg,
-                  from_pubkey: signedMsg.from_pubkey
-                });
-                
-                msg.status = 'delivered';
-                messageStore.updateMessageStatus(msg.id, 'delivered');
-                ws.send(JSON.stringify({
-                  type: 'msg:delivered',
-                  message_id: msg.id,
-                  convo_id: msg.convo_id,
-                  delivered_at: Date.now()
-                } as WSMessage));
-              } else {
+              if (!reached.includes(recipientAddr)) {
                   // Recipient offline - store message for later delivery and send push notification
                   storage.storeMessage(
                     msg.from_address,
@@ -8578,7 +8769,7 @@ export async function registerRoutes(
                     msg.type,
                     undefined // media URL for future media support
                   ).then(async () => {
-                    console.log(`Stored message for offline delivery to ${recipientAddr}`);
+                    if (isEnabled('debug', 'msg')) msgLog.debug(`Stored message for offline delivery to ${recipientAddr}`);
                     
                     // Send push notification to alert the offline recipient
                     const senderIdentity = await storage.getIdentity(msg.from_address);
@@ -8602,57 +8793,48 @@ export async function registerRoutes(
                       url: `/app?chat=${encodeURIComponent(msg.convo_id)}`
                     });
                     
-                    ws.send(JSON.stringify({
+                    sendMessage(ws, {
                       type: 'msg:queued',
                       message_id: msg.id,
                       convo_id: msg.convo_id
-                    } as WSMessage));
+                    } as WSMessage);
                 }).catch(console.error);
               }
             }
             
-            console.log(`[msg:send] SUCCESS - Message sent from ${msg.from_address.slice(0, 12)}... in convo ${msg.convo_id}`);
+            if (isEnabled('debug', 'msg')) msgLog.debug(`[msg:send] SUCCESS - Message sent from ${msg.from_address.slice(0, 12)}... in convo ${msg.convo_id}`);
             break;
           }
 
           case 'msg:read': {
             const { message_ids, convo_id, reader_address } = message;
-            const convo = messageStore.getConversation(convo_id);
+            const convo = await messageStore.getConversation(convo_id);
             if (convo) {
               for (const msgId of message_ids) {
-                messageStore.updateMessageStatus(msgId, 'read');
+                await messageStore.updateMessageStatus(msgId, 'read');
               }
               
-              const read_at = Date.now();
-              for (const participantAddr of convo.participant_addresses) {
-                if (participantAddr !== reader_address) {
-                  broadcastToAddress(participantAddr, {
-                      type: 'msg:read',
-                      message_ids,
-                      convo_id,
-                      reader_address,
-                      read_at
-                    });
-                }
-              }
+              fanOut(convo.participant_addresses, {
+                type: 'msg:read',
+                message_ids,
+                convo_id,
+                reader_address,
+                read_at: Date.now()
+              }, reader_address);
             }
             break;
           }
 
           case 'msg:typing': {
             const { convo_id, from_address, is_typing } = message;
-            const convo = messageStore.getConversation(convo_id);
+            const convo = await messageStore.getConversation(convo_id);
             if (convo) {
-              for (const participantAddr of convo.participant_addresses) {
-                if (participantAddr !== from_address) {
-                  broadcastToAddress(participantAddr, {
-                      type: 'msg:typing',
-                      convo_id,
-                      from_address,
-                      is_typing
-                    });
-                }
-              }
+              fanOut(convo.participant_addresses, {
+                type: 'msg:typing',
+                convo_id,
+                from_address,
+                is_typing
+              }, from_address);
             }
             break;
           }
@@ -8661,27 +8843,23 @@ export async function registerRoutes(
             const { message_id, convo_id, emoji, from_address } = message;
             
             if (clientAddress !== from_address) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Address mismatch' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Address mismatch' } as WSMessage);
               return;
             }
             
-            const convo = messageStore.getConversation(convo_id);
+            const convo = await messageStore.getConversation(convo_id);
             if (!convo || !convo.participant_addresses.includes(from_address)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Not a participant' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Not a participant' } as WSMessage);
               return;
             }
             
-            for (const participantAddr of convo.participant_addresses) {
-              if (participantAddr !== from_address) {
-                broadcastToAddress(participantAddr, {
-                    type: 'msg:reaction',
-                    message_id,
-                    convo_id,
-                    emoji,
-                    from_address
-                  });
-              }
-            }
+            fanOut(convo.participant_addresses, {
+              type: 'msg:reaction',
+              message_id,
+              convo_id,
+              emoji,
+              from_address
+            }, from_address);
             break;
           }
 
@@ -8689,38 +8867,36 @@ export async function registerRoutes(
             const { message_id, convo_id, from_address } = message;
             
             if (clientAddress !== from_address) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Address mismatch' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Address mismatch' } as WSMessage);
               return;
             }
             
-            const msgToDelete = messageStore.getMessage(message_id);
+            const msgToDelete = await messageStore.getMessage(message_id);
             if (!msgToDelete) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Message not found' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Message not found' } as WSMessage);
               return;
             }
             
             if (msgToDelete.from_address !== from_address) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Cannot unsend messages you did not send' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Cannot unsend messages you did not send' } as WSMessage);
               return;
             }
             
-            const convo = messageStore.getConversation(convo_id);
+            const convo = await messageStore.getConversation(convo_id);
             if (!convo || !convo.participant_addresses.includes(from_address)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Not a participant' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Not a participant' } as WSMessage);
               return;
             }
             
-            const deleted = messageStore.deleteMessage(message_id, convo_id);
+            const deleted = await messageStore.deleteMessage(message_id, convo_id);
             if (deleted) {
               storage.deleteMessage(message_id).catch(console.error);
               
-              for (const participantAddr of convo.participant_addresses) {
-                broadcastToAddress(participantAddr, {
-                  type: 'msg:unsent',
-                  message_id,
-                  convo_id
-                });
-              }
+              fanOut(convo.participant_addresses, {
+                type: 'msg:unsent',
+                message_id,
+                convo_id
+              });
             }
             break;
           }
@@ -8729,45 +8905,43 @@ export async function registerRoutes(
             const { message_id, convo_id, from_address, new_content } = message;
             
             if (clientAddress !== from_address) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Address mismatch' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Address mismatch' } as WSMessage);
               return;
             }
             
-            const msgToEdit = messageStore.getMessage(message_id);
+            const msgToEdit = await messageStore.getMessage(message_id);
             if (!msgToEdit) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Message not found' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Message not found' } as WSMessage);
               return;
             }
             
             if (msgToEdit.from_address !== from_address) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Cannot edit messages you did not send' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Cannot edit messages you did not send' } as WSMessage);
               return;
             }
             
             if (msgToEdit.type !== 'text') {
-              ws.send(JSON.stringify({ type: 'error', message: 'Can only edit text messages' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Can only edit text messages' } as WSMessage);
               return;
             }
             
-            const convo = messageStore.getConversation(convo_id);
+            const convo = await messageStore.getConversation(convo_id);
             if (!convo || !convo.participant_addresses.includes(from_address)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Not a participant' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Not a participant' } as WSMessage);
               return;
             }
             
-            const { success, edited_at } = messageStore.updateMessageContent(message_id, new_content);
+            const { success, edited_at } = await messageStore.updateMessageContent(message_id, new_content);
             if (success) {
               storage.updateMessageContent(message_id, new_content).catch(console.error);
               
-              for (const participantAddr of convo.participant_addresses) {
-                broadcastToAddress(participantAddr, {
-                  type: 'msg:edited',
-                  message_id,
-                  convo_id,
-                  new_content,
-                  edited_at
-                });
-              }
+              fanOut(convo.participant_addresses, {
+                type: 'msg:edited',
+                message_id,
+                convo_id,
+                new_content,
+                edited_at
+              });
             }
             break;
           }
@@ -8778,36 +8952,39 @@ export async function registerRoutes(
             const now = Date.now();
             const timeDiff = Math.abs(now - timestamp);
             if (timeDiff > MAX_CLOCK_SKEW) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid timestamp' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid timestamp' } as WSMessage);
               return;
             }
             
             if (recentNonces.has(nonce)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Nonce already used' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Nonce already used' } as WSMessage);
               return;
             }
             
             const payload = { ...data, from_address, nonce, timestamp };
             const sortedPayload = JSON.stringify(payload, Object.keys(payload).sort());
             const msgBytes = new TextEncoder().encode(sortedPayload);
-            const sigBytes = bs58.decode(signature);
-            const pubKeyBytes = bs58.decode(from_pubkey);
             
-            if (!nacl.sign.detached.verify(msgBytes, sigBytes, pubKeyBytes)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid signature' } as WSMessage));
+            if (!verifyDetached(msgBytes, signature, from_pubkey)) {
+              sendMessage(ws, { type: 'error', message: 'Invalid signature' } as WSMessage);
               return;
             }
             
-            recentNonces.set(nonce, timestamp);
+            const refused = reserveNonce(nonce, timestamp, from_pubkey);
+            if (refused) {
+              sendMessage(ws, {
+                type: 'error',
+                message: refused === 'nonce_replay' ? 'Nonce already used' : 'Too many signed requests, try again later',
+              } as WSMessage);
+              return;
+            }
             
-            const group = messageStore.createGroup(data.name, from_address, data.participant_addresses, data.icon);
+            const group = await messageStore.createGroup(data.name, from_address, data.participant_addresses, data.icon);
             
-            for (const addr of group.participant_addresses) {
-              broadcastToAddress(addr, {
-                  type: 'group:created',
-                  convo: group
-                });
-            }
+            fanOut(group.participant_addresses, {
+              type: 'group:created',
+              convo: group
+            });
             
             console.log(`Group created: ${group.name} by ${from_address}`);
             break;
@@ -8816,26 +8993,24 @@ export async function registerRoutes(
           case 'group:leave': {
             const { group_id, from_address: leaverAddress } = message;
             if (clientAddress !== leaverAddress) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Address mismatch' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Address mismatch' } as WSMessage);
               return;
             }
             
-            const group = messageStore.getConversation(group_id);
+            const group = await messageStore.getConversation(group_id);
             if (!group || group.type !== 'group') {
-              ws.send(JSON.stringify({ type: 'error', message: 'Group not found' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Group not found' } as WSMessage);
               return;
             }
             
             const members = [...group.participant_addresses];
-            messageStore.removeGroupMember(group_id, leaverAddress);
+            await messageStore.removeGroupMember(group_id, leaverAddress);
             
-            for (const addr of members) {
-              broadcastToAddress(addr, {
-                  type: 'group:member_left',
-                  group_id,
-                  member_address: leaverAddress
-                });
-            }
+            fanOut(members, {
+              type: 'group:member_left',
+              group_id,
+              member_address: leaverAddress
+            });
             
             console.log(`Member ${leaverAddress} left group ${group_id}`);
             break;
@@ -8844,31 +9019,29 @@ export async function registerRoutes(
           case 'group:remove_member': {
             const { group_id, member_address, from_address: adminAddress } = message;
             if (clientAddress !== adminAddress) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Address mismatch' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Address mismatch' } as WSMessage);
               return;
             }
             
-            if (!messageStore.isGroupAdmin(group_id, adminAddress)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Not an admin' } as WSMessage));
+            if (!(await messageStore.isGroupAdmin(group_id, adminAddress))) {
+              sendMessage(ws, { type: 'error', message: 'Not an admin' } as WSMessage);
               return;
             }
             
-            const group = messageStore.getConversation(group_id);
+            const group = await messageStore.getConversation(group_id);
             if (!group) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Group not found' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Group not found' } as WSMessage);
               return;
             }
             
             const members = [...group.participant_addresses];
-            messageStore.removeGroupMember(group_id, member_address);
+            await messageStore.removeGroupMember(group_id, member_address);
             
-            for (const addr of members) {
-              broadcastToAddress(addr, {
-                  type: 'group:member_left',
-                  group_id,
-                  member_address
-                });
-            }
+            fanOut(members, {
+              type: 'group:member_left',
+              group_id,
+              member_address
+            });
             
             console.log(`Member ${member_address} removed from group ${group_id} by admin ${adminAddress}`);
             break;
@@ -8876,11 +9049,11 @@ export async function registerRoutes(
 
           case 'policy:get': {
             const { address } = message;
-            const policy = policyStore.getPolicy(address);
-            ws.send(JSON.stringify({
+            const policy = await policyStore.getPolicy(address);
+            sendMessage(ws, {
               type: 'policy:response',
               policy
-            } as WSMessage));
+            } as WSMessage);
             break;
           }
           
@@ -8888,15 +9061,15 @@ export async function registerRoutes(
             const { policy, signature, from_pubkey, nonce, timestamp } = message;
             
             if (!verifyGenericSignature({ policy, nonce, timestamp }, signature, from_pubkey, nonce, timestamp)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid signature' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid signature' } as WSMessage);
               return;
             }
             
-            policyStore.savePolicy(policy);
-            ws.send(JSON.stringify({
+            await policyStore.savePolicy(policy);
+            sendMessage(ws, {
               type: 'policy:updated',
               policy
-            } as WSMessage));
+            } as WSMessage);
             console.log(`Policy updated for ${policy.owner_address}`);
             break;
           }
@@ -8905,15 +9078,15 @@ export async function registerRoutes(
             const { override, signature, from_pubkey, nonce, timestamp } = message;
             
             if (!verifyGenericSignature({ override, nonce, timestamp }, signature, from_pubkey, nonce, timestamp)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid signature' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid signature' } as WSMessage);
               return;
             }
             
-            policyStore.saveOverride(override);
-            ws.send(JSON.stringify({
+            await policyStore.saveOverride(override);
+            sendMessage(ws, {
               type: 'override:updated',
               override
-            } as WSMessage));
+            } as WSMessage);
             console.log(`Override updated for ${override.owner_address} -> ${override.contact_address}`);
             break;
           }
@@ -8922,15 +9095,15 @@ export async function registerRoutes(
             const { pass, signature, from_pubkey, nonce, timestamp } = message;
             
             if (!verifyGenericSignature({ pass, nonce, timestamp }, signature, from_pubkey, nonce, timestamp)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid signature' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid signature' } as WSMessage);
               return;
             }
             
-            const createdPass = policyStore.createPass(pass);
-            ws.send(JSON.stringify({
+            const createdPass = await policyStore.createPass(pass);
+            sendMessage(ws, {
               type: 'pass:created',
               pass: createdPass
-            } as WSMessage));
+            } as WSMessage);
             console.log(`Pass created: ${createdPass.id} by ${pass.created_by}`);
             break;
           }
@@ -8939,32 +9112,32 @@ export async function registerRoutes(
             const { pass_id, signature, from_pubkey, from_address, nonce, timestamp } = message;
             
             if (!verifyGenericSignature({ pass_id, from_address, nonce, timestamp }, signature, from_pubkey, nonce, timestamp)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid signature' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid signature' } as WSMessage);
               return;
             }
             
-            const pass = policyStore.getPass(pass_id);
+            const pass = await policyStore.getPass(pass_id);
             if (!pass || pass.created_by !== from_address) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Pass not found or not authorized' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Pass not found or not authorized' } as WSMessage);
               return;
             }
             
-            policyStore.revokePass(pass_id);
-            ws.send(JSON.stringify({
+            await policyStore.revokePass(pass_id);
+            sendMessage(ws, {
               type: 'pass:revoked',
               pass_id
-            } as WSMessage));
+            } as WSMessage);
             console.log(`Pass revoked: ${pass_id}`);
             break;
           }
           
           case 'pass:list': {
             const { address } = message;
-            const passes = policyStore.getPassesCreatedBy(address);
-            ws.send(JSON.stringify({
+            const passes = await policyStore.getPassesCreatedBy(address);
+            sendMessage(ws, {
               type: 'pass:list_response',
               passes
-            } as WSMessage));
+            } as WSMessage);
             break;
           }
           
@@ -8972,15 +9145,15 @@ export async function registerRoutes(
             const { blocked, signature, from_pubkey, nonce, timestamp } = message;
             
             if (!verifyGenericSignature({ blocked, nonce, timestamp }, signature, from_pubkey, nonce, timestamp)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid signature' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid signature' } as WSMessage);
               return;
             }
             
-            policyStore.addToBlocklist(blocked);
-            ws.send(JSON.stringify({
+            await policyStore.addToBlocklist(blocked);
+            sendMessage(ws, {
               type: 'block:added',
               blocked
-            } as WSMessage));
+            } as WSMessage);
             console.log(`Blocked: ${blocked.blocked_address} by ${blocked.owner_address}`);
             break;
           }
@@ -8989,26 +9162,26 @@ export async function registerRoutes(
             const { blocked_address, signature, from_pubkey, from_address, nonce, timestamp } = message;
             
             if (!verifyGenericSignature({ blocked_address, from_address, nonce, timestamp }, signature, from_pubkey, nonce, timestamp)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid signature' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid signature' } as WSMessage);
               return;
             }
             
-            policyStore.removeFromBlocklist(from_address, blocked_address);
-            ws.send(JSON.stringify({
+            await policyStore.removeFromBlocklist(from_address, blocked_address);
+            sendMessage(ws, {
               type: 'block:removed',
               blocked_address
-            } as WSMessage));
+            } as WSMessage);
             console.log(`Unblocked: ${blocked_address} by ${from_address}`);
             break;
           }
           
           case 'block:list': {
             const { address } = message;
-            const blocked = policyStore.getBlocklist(address);
-            ws.send(JSON.stringify({
+            const blocked = await policyStore.getBlocklist(address);
+            sendMessage(ws, {
               type: 'block:list_response',
               blocked
-            } as WSMessage));
+            } as WSMessage);
             break;
           }
           
@@ -9016,15 +9189,15 @@ export async function registerRoutes(
             const { rules, signature, from_pubkey, from_address, nonce, timestamp } = message;
             
             if (!verifyGenericSignature({ rules, from_address, nonce, timestamp }, signature, from_pubkey, nonce, timestamp)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid signature' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid signature' } as WSMessage);
               return;
             }
             
-            policyStore.saveRoutingRules(from_address, rules);
-            ws.send(JSON.stringify({
+            await policyStore.saveRoutingRules(from_address, rules);
+            sendMessage(ws, {
               type: 'routing:updated',
               rules
-            } as WSMessage));
+            } as WSMessage);
             console.log(`Routing rules updated for ${from_address}`);
             break;
           }
@@ -9033,33 +9206,35 @@ export async function registerRoutes(
             const { verification, signature, from_pubkey, nonce, timestamp } = message;
             
             if (!verifyGenericSignature({ verification, nonce, timestamp }, signature, from_pubkey, nonce, timestamp)) {
-              ws.send(JSON.stringify({ type: 'error', message: 'Invalid signature' } as WSMessage));
+              sendMessage(ws, { type: 'error', message: 'Invalid signature' } as WSMessage);
               return;
             }
             
-            policyStore.saveWalletVerification(verification);
-            ws.send(JSON.stringify({
+            await policyStore.saveWalletVerification(verification);
+            sendMessage(ws, {
               type: 'wallet:verified',
               verification
-            } as WSMessage));
+            } as WSMessage);
             console.log(`Wallet verified: ${verification.wallet_address} for ${verification.call_address}`);
             break;
           }
           
           case 'wallet:get': {
             const { address } = message;
-            const verification = policyStore.getWalletVerification(address);
-            ws.send(JSON.stringify({
+            const verification = await policyStore.getWalletVerification(address);
+            sendMessage(ws, {
               type: 'wallet:response',
               verification
-            } as WSMessage));
+            } as WSMessage);
             break;
           }
           
           default:
-            ws.send(JSON.stringify({ type: 'error', message: 'Unknown message type' } as WSMessage));
+            messageType = 'unknown';
+            sendMessage(ws, { type: 'error', message: 'Unknown message type' } as WSMessage);
         }
       } catch (error) {
+        wsMessageErrors.inc({ type: messageType });
         const errorMessage = error instanceof Error ? error.message : String(error);
         logger.error('WebSocket message error', error instanceof Error ? error : new Error(errorMessage), {
           clientAddress: clientAddress || undefined,
@@ -9083,7 +9258,9 @@ export async function registerRoutes(
             connectionId
           }
         });
-        ws.send(JSON.stringify({ type: 'error', message: 'Invalid message format', errorCode: 'INVALID_MESSAGE' } as WSMessage));
+        sendMessage(ws, { type: 'error', message: 'Invalid message format', errorCode: 'INVALID_MESSAGE' } as WSMessage);
+      } finally {
+        wsMessageDuration.observeSince(handleStart, { type: messageType });
       }
     });
 
@@ -9102,6 +9279,19 @@ export async function registerRoutes(
     });
   });
 
+  onCollect(() => {
+    let total = 0;
+    let max = 0;
+    for (const client of Array.from(wss.clients)) {
+      total += client.bufferedAmount;
+      max = Math.max(max, client.bufferedAmount);
+    }
+    wsOpenSockets.set(wss.clients.size);
+    wsRegisteredConnections.set(getConnectionCount());
+    wsSendBuffer.set(total, { stat: 'total' });
+    wsSendBuffer.set(max, { stat: 'max' });
+  });
+
   console.log('WebSocket server initialized on /ws');
   return httpServer;
 }
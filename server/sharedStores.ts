@@ -0,0 +1,64 @@
+import type * as PolicyStoreModule from './policyStore';
+import type * as MessageStoreModule from './messageStore';
+import { getClusterNode } from './wsCluster';
+
+// Async access to the local JSON stores (policyStore, messageStore).
+//
+// The stores are synchronous, in-memory and backed by files in LOCAL_DATA_DIR,
+// so exactly one process may own them. In a single process that is the server
+// itself and calls run in-process. In cluster mode it is the primary: workers
+// never load the stores and send every call over the cluster bus instead, so a
+// block, policy or message written through one worker is seen by all of them.
+//
+// Arguments and results are copied as JSON on the way through the bus, so a
+// result is a snapshot: change store data through store methods, never by
+// mutating what a call returned.
+
+type StoreName = 'policy' | 'message';
+
+type AsyncStore<T> = {
+  [K in keyof T]: T[K] extends (...args: infer A) => infer R ? (...args: A) => Promise<Awaited<R>> : never;
+};
+
+const loaders = {
+  policy: () => import('./policyStore'),
+  message: () => import('./messageStore'),
+};
+
+const loaded: Partial<Record<StoreName, Record<string, unknown>>> = {};
+
+// Load both stores in this process (replaying the message WAL, if any)
+export async function loadLocalStores(): Promise<void> {
+  for (const store of Object.keys(loaders) as StoreName[]) {
+    loaded[store] ??= await loaders[store]();
+  }
+}
+
+// Run a store method in this process. Also answers store calls from cluster workers.
+export async function callLocalStore(store: string, method: string, args: unknown[]): Promise<unknown> {
+  if (!(store in loaders)) {
+    throw new Error(`Unknown store: ${store}`);
+  }
+  const name = store as StoreName;
+  const module = loaded[name] ??= await loaders[name]();
+  const fn = module[method];
+  if (typeof fn !== 'function') {
+    throw new Error(`Unknown ${store} store method: ${method}`);
+  }
+  return fn(...args);
+}
+
+function storeClient<T>(store: StoreName): AsyncStore<T> {
+  return new Proxy({} as AsyncStore<T>, {
+    get: (_target, method) => {
+      if (typeof method !== 'string') return undefined;
+      return (...args: unknown[]) => {
+        const node = getClusterNode();
+        return node ? node.callStore(store, method, args) : callLocalStore(store, method, args);
+      };
+    },
+  });
+}
+
+export const policyStore = storeClient<typeof PolicyStoreModule>('policy');
+export const messageStore = storeClient<typeof MessageStoreModule>('message');
@@ -0,0 +1,255 @@
+import crypto, { type KeyObject } from 'crypto';
+import os from 'os';
+import { Worker } from 'worker_threads';
+import bs58 from 'bs58';
+
+// Ed25519 signature checks for signed WebSocket frames and API payloads.
+//
+// Clients resend the same base58 public key on every frame, so decoded keys
+// are kept in a bounded LRU keyed by the base58 string. Verification uses
+// node:crypto's Ed25519 (OpenSSL) with the cached KeyObject.
+//
+// verifyDetached() checks inline. verifyQueued() is the optional pipeline
+// selected by SIGNATURE_VERIFY_MODE:
+//   inline   - verify immediately on the calling tick (default)
+//   batched  - verifications queued within one event-loop tick are run together
+//              on the next setImmediate
+//   workers  - the same batches are split across a worker_threads pool so
+//              signature checks don't block signaling for other sockets
+
+export type VerifyMode = 'inline' | 'batched' | 'workers';
+
+const ED25519_SPKI_PREFIX = Buffer.from('302a300506032b6570032100', 'hex');
+const PUBKEY_CACHE_SIZE = parseInt(process.env.PUBKEY_CACHE_SIZE || '10000', 10);
+const MIN_ITEMS_PER_WORKER = 16; // Smaller batches aren't worth splitting further
+
+const modeSetting = process.env.SIGNATURE_VERIFY_MODE;
+let verifyMode: VerifyMode = modeSetting === 'batched' || modeSetting === 'workers' ? modeSetting : 'inline';
+let workerCount = parseInt(process.env.SIGNATURE_VERIFY_WORKERS || String(Math.max(1, os.cpus().length - 1)), 10);
+
+interface CachedKey {
+  raw: Uint8Array;
+  key: KeyObject;
+}
+
+const keyCache = new Map<string, CachedKey>();
+
+const stats = {
+  cacheHits: 0,
+  cacheMisses: 0,
+  verified: 0,
+  batches: 0,
+  workerBatches: 0,
+};
+
+function cachedKey(publicKeyBase58: string): CachedKey {
+  const cached = keyCache.get(publicKeyBase58);
+  if (cached) {
+    // Re-insert so Map order tracks recency
+    keyCache.delete(publicKeyBase58);
+    keyCache.set(publicKeyBase58, cached);
+    stats.cacheHits++;
+    return cached;
+  }
+  stats.cacheMisses++;
+  const raw = bs58.decode(publicKeyBase58);
+  if (raw.length !== 32) {
+    throw new Error('bad public key size');
+  }
+  const entry = {
+    raw,
+    key: crypto.createPublicKey({ key: Buffer.concat([ED25519_SPKI_PREFIX, raw]), format: 'der', type: 'spki' }),
+  };
+  keyCache.set(publicKeyBase58, entry);
+  if (keyCache.size > PUBKEY_CACHE_SIZE) {
+    keyCache.delete(keyCache.keys().next().value!);
+  }
+  return entry;
+}
+
+// Decoded 32-byte public key for a base58 string (cached)
+export function decodePublicKey(publicKeyBase58: string): Uint8Array {
+  return cachedKey(publicKeyBase58).raw;
+}
+
+// Throws on a malformed key or signature encoding, like nacl.sign.detached.verify
+export function verifyDetached(message: Uint8Array, signatureBase58: string, publicKeyBase58: string): boolean {
+  const { key } = cachedKey(publicKeyBase58);
+  stats.verified++;
+  return crypto.verify(null, message, key, bs58.decode(signatureBase58));
+}
+
+// ============================================================================
+// Batched / worker pipeline
+// ============================================================================
+
+interface PendingVerify {
+  message: Uint8Array;
+  signature: Uint8Array;
+  publicKey: CachedKey;
+  resolve: (valid: boolean) => void;
+}
+
+let queue: PendingVerify[] = [];
+let flushScheduled = false;
+
+// Resolves false for malformed input instead of throwing
+export function verifyQueued(message: Uint8Array, signatureBase58: string, publicKeyBase58: string): Promise<boolean> {
+  let signature: Uint8Array;
+  let publicKey: CachedKey;
+  try {
+    if (verifyMode === 'inline') {
+      return Promise.resolve(verifyDetached(message, signatureBase58, publicKeyBase58));
+    }
+    signature = bs58.decode(signatureBase58);
+    publicKey = cachedKey(publicKeyBase58);
+  } catch {
+    return Promise.resolve(false);
+  }
+  return new Promise(resolve => {
+    queue.push({ message, signature, publicKey, resolve });
+    if (!flushScheduled) {
+      flushScheduled = true;
+      setImmediate(flushQueue);
+    }
+  });
+}
+
+function verifyInline(item: PendingVerify): boolean {
+  try {
+    return crypto.verify(null, item.message, item.publicKey.key, item.signature);
+  } catch {
+    return false;
+  }
+}
+
+function flushQueue() {
+  flushScheduled = false;
+  const batch = queue;
+  queue = [];
+  if (batch.length === 0) return;
+  stats.batches++;
+  stats.verified += batch.length;
+
+  if (verifyMode !== 'workers' || workerCount < 1) {
+    for (const item of batch) {
+      item.resolve(verifyInline(item));
+    }
+    return;
+  }
+
+  const pool = getPool();
+  const slices = Math.min(pool.length, Math.ceil(batch.length / MIN_ITEMS_PER_WORKER));
+  const sliceSize = Math.ceil(batch.length / slices);
+  for (let i = 0; i < slices; i++) {
+    const slice = batch.slice(i * sliceSize, (i + 1) * sliceSize);
+    pool[nextWorker++ % pool.length].submit(slice);
+  }
+}
+
+// Runs in each pool thread; only needs node built-ins
+const WORKER_SOURCE = `
+const { parentPort } = require('worker_threads');
+const crypto = require('crypto');
+const PREFIX = Buffer.from('302a300506032b6570032100', 'hex');
+const keys = new Map();
+function keyFor(raw) {
+  const id = Buffer.from(raw).toString('base64');
+  let key = keys.get(id);
+  if (!key) {
+    key = crypto.createPublicKey({ key: Buffer.concat([PREFIX, raw]), format: 'der', type: 'spki' });
+    if (keys.size >= 4096) keys.delete(keys.keys().next().value);
+    keys.set(id, key);
+  }
+  return key;
+}
+parentPort.on('message', ({ id, items }) => {
+  const results = new Uint8Array(items.length);
+  for (let i = 0; i < items.length; i++) {
+    try {
+      results[i] = crypto.verify(null, items[i].m, keyFor(items[i].k), items[i].s) ? 1 : 0;
+    } catch {
+      results[i] = 0;
+    }
+  }
+  parentPort.postMessage({ id, results }, [results.buffer]);
+});
+`;
+
+class VerifyWorker {
+  private worker: Worker | null = null;
+  private nextBatchId = 1;
+  private inFlight = new Map<number, PendingVerify[]>();
+
+  submit(items: PendingVerify[]): void {
+    const id = this.nextBatchId++;
+    const thread = this.thread();
+    // Only keep the process alive while a batch is outstanding
+    if (this.inFlight.size === 0) thread.ref();
+    this.inFlight.set(id, items);
+    stats.workerBatches++;
+    thread.postMessage({
+      id,
+      items: items.map(item => ({ m: item.message, s: item.signature, k: item.publicKey.raw })),
+    });
+  }
+
+  terminate(): void {
+    this.worker?.terminate();
+    this.worker = null;
+  }
+
+  private thread(): Worker {
+    if (this.worker) return this.worker;
+    const worker = new Worker(WORKER_SOURCE, { eval: true });
+    worker.unref();
+    worker.on('message', ({ id, results }: { id: number; results: Uint8Array }) => {
+      const items = this.inFlight.get(id);
+      this.inFlight.delete(id);
+      if (this.inFlight.size === 0) worker.unref();
+      items?.forEach((item, i) => item.resolve(results[i] === 1));
+    });
+    // A dead thread must not strand its callers: finish its batches inline
+    worker.on('error', (error: Error) => {
+      console.error('[signatureVerifier] Worker failed, verifying its batches inline:', error.message);
+      this.worker = null;
+      for (const items of Array.from(this.inFlight.values())) {
+        for (const item of items) item.resolve(verifyInline(item));
+      }
+      this.inFlight.clear();
+    });
+    this.worker = worker;
+    return worker;
+  }
+}
+
+let pool: VerifyWorker[] = [];
+let nextWorker = 0;
+
+function getPool(): VerifyWorker[] {
+  if (pool.length !== workerCount) {
+    pool.forEach(w => w.terminate());
+    pool = Array.from({ length: workerCount }, () => new VerifyWorker());
+  }
+  return pool;
+}
+
+// For benchmarks: switch pipeline mode at runtime
+export function configureVerifier(options: { mode?: VerifyMode; workers?: number }): void {
+  if (options.mode) verifyMode = options.mode;
+  if (options.workers !== undefined) workerCount = options.workers;
+}
+
+export function shutdownVerifier(): void {
+  pool.forEach(w => w.terminate());
+  pool = [];
+}
+
+export function getVerifierStats() {
+  return {
+    mode: verifyMode,
+    workers: verifyMode === 'workers' ? workerCount : 0,
+    pubkeyCacheSize: keyCache.size,
+    ...stats,
+  };
+}
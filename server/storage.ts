@@ -47,9 +47,52 @@ import {
 import type { UserMode, FeatureFlags } from "@shared/types";
 import { randomUUID, createHash } from "crypto";
 import { db } from "./db";
-import { eq, and, desc, asc, sql, gte, lte, lt, ilike, or, gt } from "drizzle-orm";
+import { ReadThroughCache } from "./readThroughCache";
+import { eq, and, desc, asc, sql, gte, lte, lt, ilike, or, gt, inArray } from "drizzle-orm";
+
+// Accumulated usage-counter increments for one address, applied in one batch
+// by applyUsageDeltas (see server/usageCache.ts)
+export interface UsageDelta {
+  userAddress: string;
+  callsStarted: number;
+  failedStarts: number;
+  callAttempts: number;
+  attemptHour: number; // Hour of day the attempts were made in
+  secondsUsed: number;
+  relayCalls: number;
+}
+
+export interface HeartbeatUpdate {
+  callSessionId: string;
+  lastHeartbeatCaller: Date | null;
+  lastHeartbeatCallee: Date | null;
+  relayUsed: boolean;
+}
+
+// A stateless call token, recorded in call_token_nonces after it was minted
+// (see server/callTokens.ts)
+export interface CallTokenIssue {
+  token: string;
+  nonce: string;
+  userAddress: string;
+  targetAddress?: string;
+  plan: string;
+  allowTurn: boolean;
+  allowVideo: boolean;
+  issuedAt: Date;
+  expiresAt: Date;
+}
+
+export interface CallTokenRedemption {
+  token: string;
+  usedAt: Date;
+  usedByIp?: string;
+}
 
 export interface IStorage {
+  // Called with the address after any write that can change its tier, plan or role
+  onIdentityChange(listener: (address: string) => void): void;
+
   getUser(id: string): Promise<User | undefined>;
   getUserByUsername(username: string): Promise<User | undefined>;
   createUser(user: InsertUser): Promise<User>;
@@ -192,6 +235,7 @@ export interface IStorage {
   incrementCallAttempts(userAddress: string): Promise<UsageCounter>;
   addSecondsUsed(userAddress: string, seconds: number): Promise<UsageCounter>;
   incrementRelayCalls(userAddress: string): Promise<UsageCounter>;
+  applyUsageDeltas(deltas: UsageDelta[]): Promise<void>;
 
   // Active calls (server-side call monitoring)
   getActiveCall(callSessionId: string): Promise<ActiveCall | undefined>;
@@ -201,6 +245,7 @@ export interface IStorage {
   deleteActiveCall(callSessionId: string): Promise<boolean>;
   getAllActiveCalls(): Promise<ActiveCall[]>;
   getStaleActiveCalls(heartbeatThresholdSeconds: number): Promise<ActiveCall[]>;
+  applyHeartbeats(updates: HeartbeatUpdate[]): Promise<void>;
 
   // User tier management
   getUserTier(address: string): Promise<'free' | 'paid' | 'admin'>;
@@ -293,11 +338,14 @@ export interface IStorage {
   createCallToken(userAddress: string, targetAddress?: string, plan?: string, allowTurn?: boolean, allowVideo?: boolean): Promise<{ token: string; nonce: string; issuedAt: Date; expiresAt: Date }>;
   verifyCallToken(token: string, markUsed?: boolean, usedByIp?: string): Promise<{ valid: boolean; reason?: string; data?: { userAddress: string; plan: string; allowTurn: boolean; allowVideo: boolean } }>;
   cleanupExpiredCallTokens(): Promise<number>;
+  recordCallTokenIssues(issues: CallTokenIssue[]): Promise<void>;
+  recordCallTokenRedemptions(redemptions: CallTokenRedemption[]): Promise<void>;
 
   // Persistent messages (offline delivery)
   storeMessage(fromAddress: string, toAddress: string, convoId: string, content: string, mediaType?: string, mediaUrl?: string): Promise<{ id: string; createdAt: Date }>;
-  getPendingMessages(toAddress: string): Promise<{ id: string; fromAddress: string; toAddress: string; convoId: string; content: string; mediaType: string | null; mediaUrl: string | null; createdAt: Date }[]>;
+  getPendingMessages(toAddress: string): Promise<{ id: string; fromAddress: string; toAddress: string; convoId: string; content: string; mediaType: string | null; mediaUrl: string | null; seq: number | null; createdAt: Date }[]>;
   markMessageDelivered(messageId: string): Promise<void>;
+  markMessagesDelivered(messageIds: string[]): Promise<void>;
   markMessageRead(messageId: string): Promise<void>;
 
   // Call Rooms (group calls)
@@ -332,7 +380,38 @@ export interface IStorage {
   updateSubscriptionPurchase(id: string, updates: Partial<SubscriptionPurchase>): Promise<SubscriptionPurchase | undefined>;
 }
 
+const STORAGE_CACHE_TTL_MS = parseInt(process.env.STORAGE_CACHE_TTL_MS || "30000", 10);
+const STORAGE_CACHE_NEGATIVE_TTL_MS = parseInt(process.env.STORAGE_CACHE_NEGATIVE_TTL_MS || "5000", 10);
+const STORAGE_CACHE_MAX_ENTRIES = parseInt(process.env.STORAGE_CACHE_MAX_ENTRIES || "50000", 10);
+
+function storageCache<V>(name: string): ReadThroughCache<V> {
+  return new ReadThroughCache<V>(name, {
+    ttlMs: STORAGE_CACHE_TTL_MS,
+    negativeTtlMs: STORAGE_CACHE_NEGATIVE_TTL_MS,
+    maxEntries: STORAGE_CACHE_MAX_ENTRIES,
+  });
+}
+
 export class DatabaseStorage implements IStorage {
+  // Read-through caches for hot lookups; every write below invalidates them.
+  // Public keys map to addresses so identity rows are only cached once.
+  private identityCache = storageCache<CryptoIdentityRecord>("identity");
+  private publicKeyCache = storageCache<string>("identity_by_public_key");
+  private contactCache = storageCache<Contact>("contact");
+  private contactListCache = storageCache<Contact[]>("contacts");
+  private identityListeners: ((address: string) => void)[] = [];
+
+  onIdentityChange(listener: (address: string) => void): void {
+    this.identityListeners.push(listener);
+  }
+
+  private identityChanged(address: string): void {
+    this.identityCache.invalidate(address);
+    for (const listener of this.identityListeners) {
+      listener(address);
+    }
+  }
+
   async getUser(id: string): Promise<User | undefined> {
     const [user] = await db.select().from(users).where(eq(users.id, id));
     return user || undefined;
@@ -349,51 +428,89 @@ export class DatabaseStorage implements IStorage {
   }
 
   async getIdentity(address: string): Promise<CryptoIdentityRecord | undefined> {
-    const [identity] = await db.select().from(cryptoIdentities).where(eq(cryptoIdentities.address, address));
-    return identity || undefined;
+    return this.identityCache.get(address, async () => {
+      const [identity] = await db.select().from(cryptoIdentities).where(eq(cryptoIdentities.address, address));
+      return identity || undefined;
+    });
   }
 
   async getIdentityByPublicKey(publicKeyBase58: string): Promise<CryptoIdentityRecord | undefined> {
-    const [identity] = await db.select().from(cryptoIdentities).where(eq(cryptoIdentities.publicKeyBase58, publicKeyBase58));
-    return identity || undefined;
+    const address = await this.publicKeyCache.get(publicKeyBase58, async () => {
+      const [identity] = await db.select({ address: cryptoIdentities.address })
+        .from(cryptoIdentities)
+        .where(eq(cryptoIdentities.publicKeyBase58, publicKeyBase58));
+      return identity?.address;
+    });
+    if (!address) return undefined;
+    const identity = await this.getIdentity(address);
+    if (identity?.publicKeyBase58 === publicKeyBase58) return identity;
+    // The key was moved to another identity since it was cached
+    this.publicKeyCache.invalidate(publicKeyBase58);
+    const [current] = await db.select().from(cryptoIdentities).where(eq(cryptoIdentities.publicKeyBase58, publicKeyBase58));
+    return current || undefined;
   }
 
   async createIdentity(identity: InsertCryptoIdentity): Promise<CryptoIdentityRecord> {
     const [created] = await db.insert(cryptoIdentities).values(identity).returning();
+    // Drop negative entries for the new identity
+    this.identityCache.invalidate(created.address);
+    this.publicKeyCache.invalidate(created.publicKeyBase58);
     return created;
   }
 
   async updateIdentity(address: string, updates: Partial<InsertCryptoIdentity>): Promise<CryptoIdentityRecord | undefined> {
     const [updated] = await db.update(cryptoIdentities).set(updates).where(eq(cryptoIdentities.address, address)).returning();
+    this.identityChanged(address);
+    if (updates.publicKeyBase58) this.publicKeyCache.invalidate(updates.publicKeyBase58);
     return updated || undefined;
   }
 
   async getContacts(ownerAddress: string): Promise<Contact[]> {
-    return db.select().from(contacts).where(eq(contacts.ownerAddress, ownerAddress)).orderBy(asc(contacts.name));
+    const list = await this.contactListCache.get(ownerAddress, () =>
+      db.select().from(contacts).where(eq(contacts.ownerAddress, ownerAddress)).orderBy(asc(contacts.name))
+    );
+    return list ?? [];
   }
 
   async getContact(ownerAddress: string, contactAddress: string): Promise<Contact | undefined> {
-    const [contact] = await db.select().from(contacts).where(
-      and(eq(contacts.ownerAddress, ownerAddress), eq(contacts.contactAddress, contactAddress))
-    );
-    return contact || undefined;
+    return this.contactCache.get(`${ownerAddress}\n${contactAddress}`, async () => {
+      const [contact] = await db.select().from(contacts).where(
+        and(eq(contacts.ownerAddress, ownerAddress), eq(contacts.contactAddress, contactAddress))
+      );
+      return contact || undefined;
+    });
+  }
+
+  private contactChanged(contact: { ownerAddress: string; contactAddress: string } | undefined): void {
+    if (!contact) return;
+    this.contactListCache.invalidate(contact.ownerAddress);
+    this.contactCache.invalidate(`${contact.ownerAddress}\n${contact.contactAddress}`);
   }
 
   async createContact(contact: InsertContact): Promise<Contact> {
     const [created] = await db.insert(contacts).values(contact).returning();
+    this.contactChanged(created);
     return created;
   }
 
   async updateContact(id: string, updates: Partial<InsertContact>): Promise<Contact | undefined> {
+    const [previous] = await db.select().from(contacts).where(eq(contacts.id, id));
     const [updated] = await db.update(contacts).set(updates).where(eq(contacts.id, id)).returning();
+    this.contactChanged(previous);
+    this.contactChanged(updated);
     return updated || undefined;
   }
 
   async deleteContact(id: string): Promise<boolean> {
     const result = await db.delete(contacts).where(eq(contacts.id, id)).returning();
+    result.forEach(contact => this.contactChanged(contact));
     return result.length > 0;
   }
 
+  getCacheStats() {
+    return [this.identityCache, this.publicKeyCache, this.contactCache, this.contactListCache].map(cache => cache.stats());
+  }
+
   async getCallSession(id: string): Promise<CallSession | undefined> {
     const [session] = await db.select().from(callSessions).where(eq(callSessions.id, id));
     return session || undefined;
@@ -581,6 +698,7 @@ export class DatabaseStorage implements IStorage {
       .set({ role })
       .where(eq(cryptoIdentities.address, address))
       .returning();
+    this.identityChanged(address);
     
     if (updated) {
       await this.createAuditLog({
@@ -599,6 +717,7 @@ export class DatabaseStorage implements IStorage {
       .set({ isDisabled: disabled })
       .where(eq(cryptoIdentities.address, address))
       .returning();
+    this.identityChanged(address);
     
     if (updated) {
       await this.createAuditLog({
@@ -633,6 +752,7 @@ export class DatabaseStorage implements IStorage {
       .set(updates)
       .where(eq(cryptoIdentities.address, address))
       .returning();
+    this.identityChanged(address);
     
     if (updated && actorAddress) {
       await this.createAuditLog({
@@ -663,6 +783,7 @@ export class DatabaseStorage implements IStorage {
       .set(updates)
       .where(eq(cryptoIdentities.address, address))
       .returning();
+    this.identityChanged(address);
     
     return updated || undefined;
   }
@@ -681,6 +802,7 @@ export class DatabaseStorage implements IStorage {
         await db.update(cryptoIdentities)
           .set({ trialStatus: 'expired' })
           .where(eq(cryptoIdentities.address, address));
+        this.identityChanged(address);
         return { hasAccess: false, reason: 'Trial expired' };
       }
       return { hasAccess: true };
@@ -733,6 +855,7 @@ export class DatabaseStorage implements IStorage {
           await db.update(cryptoIdentities)
             .set({ trialStatus: 'expired' })
             .where(eq(cryptoIdentities.address, address));
+          this.identityChanged(address);
           return { hasAccess: false, accessType: 'none', reason: 'Trial expired' };
         }
         const daysRemaining = Math.ceil((new Date(identity.trialEndAt).getTime() - Date.now()) / (1000 * 60 * 60 * 24));
@@ -772,6 +895,7 @@ export class DatabaseStorage implements IStorage {
       .set(updates)
       .where(eq(cryptoIdentities.address, address))
       .returning();
+    this.identityChanged(address);
     
     return updated || undefined;
   }
@@ -781,6 +905,7 @@ export class DatabaseStorage implements IStorage {
       .set({ stripeCustomerId })
       .where(eq(cryptoIdentities.address, address))
       .returning();
+    this.identityChanged(address);
     
     return updated || undefined;
   }
@@ -861,6 +986,7 @@ export class DatabaseStorage implements IStorage {
       })
       .where(eq(cryptoIdentities.address, address))
       .returning();
+    this.identityChanged(address);
     
     if (updated && actorAddress) {
       await this.createAuditLog({
@@ -914,6 +1040,7 @@ export class DatabaseStorage implements IStorage {
         .set({ name })
         .where(eq(contacts.id, existing.id))
         .returning();
+      this.contactChanged(updated);
       return updated;
     }
     
@@ -923,6 +1050,7 @@ export class DatabaseStorage implements IStorage {
       contactAddress,
       name,
     }).returning();
+    this.contactChanged(created);
     return created;
   }
 
@@ -1126,6 +1254,7 @@ export class DatabaseStorage implements IStorage {
         })
         .where(eq(cryptoIdentities.address, redeemerAddress));
     }
+    this.identityChanged(redeemerAddress);
     
     // Log the redemption
     await this.createAuditLog({
@@ -1392,6 +1521,40 @@ export class DatabaseStorage implements IStorage {
     return updated;
   }
 
+  // Apply buffered increments for many addresses in one statement. Day/month
+  // rollover is resolved here the same way getOrCreateUsageCounter does it, so
+  // increments made before a flush that lands after midnight aren't lost.
+  async applyUsageDeltas(deltas: UsageDelta[]): Promise<void> {
+    if (deltas.length === 0) return;
+    const dayKey = this.getDayKey();
+    const monthKey = this.getMonthKey();
+    const rows = sql.join(deltas.map(d => sql`(
+      ${d.userAddress}, ${d.callsStarted}::int, ${d.failedStarts}::int, ${d.callAttempts}::int,
+      ${d.attemptHour}::int, ${d.secondsUsed}::int, ${d.relayCalls}::int
+    )`), sql`, `);
+    await db.execute(sql`
+      UPDATE ${usageCounters} AS u SET
+        calls_started_today = CASE WHEN u.day_key = ${dayKey}
+          THEN COALESCE(u.calls_started_today, 0) + d.calls_started ELSE d.calls_started END,
+        failed_starts_today = CASE WHEN u.day_key = ${dayKey}
+          THEN COALESCE(u.failed_starts_today, 0) + d.failed_starts ELSE d.failed_starts END,
+        call_attempts_hour = CASE
+          WHEN d.call_attempts = 0 THEN CASE WHEN u.day_key = ${dayKey} THEN u.call_attempts_hour ELSE 0 END
+          WHEN u.day_key = ${dayKey} AND u.last_attempt_hour = d.attempt_hour
+            THEN COALESCE(u.call_attempts_hour, 0) + d.call_attempts
+          ELSE d.call_attempts END,
+        last_attempt_hour = CASE WHEN d.call_attempts = 0 THEN u.last_attempt_hour ELSE d.attempt_hour END,
+        seconds_used_month = CASE WHEN u.month_key = ${monthKey}
+          THEN COALESCE(u.seconds_used_month, 0) + d.seconds_used ELSE d.seconds_used END,
+        relay_calls_24h = COALESCE(u.relay_calls_24h, 0) + d.relay_calls,
+        day_key = ${dayKey},
+        month_key = ${monthKey},
+        updated_at = NOW()
+      FROM (VALUES ${rows}) AS d(user_address, calls_started, failed_starts, call_attempts, attempt_hour, seconds_used, relay_calls)
+      WHERE u.user_address = d.user_address
+    `);
+  }
+
   // Active call methods
   async getActiveCall(callSessionId: string): Promise<ActiveCall | undefined> {
     const [call] = await db.select().from(activeCalls).where(eq(activeCalls.callSessionId, callSessionId));
@@ -1445,6 +1608,23 @@ export class DatabaseStorage implements IStorage {
     );
   }
 
+  // Timestamps are sent as UTC ISO strings, matching how drizzle writes timestamp columns
+  async applyHeartbeats(updates: HeartbeatUpdate[]): Promise<void> {
+    if (updates.length === 0) return;
+    const rows = sql.join(updates.map(u => sql`(
+      ${u.callSessionId}, ${u.lastHeartbeatCaller?.toISOString() ?? null}::timestamp,
+      ${u.lastHeartbeatCallee?.toISOString() ?? null}::timestamp, ${u.relayUsed}::boolean
+    )`), sql`, `);
+    await db.execute(sql`
+      UPDATE ${activeCalls} AS a SET
+        last_heartbeat_caller = COALESCE(h.caller_at, a.last_heartbeat_caller),
+        last_heartbeat_callee = COALESCE(h.callee_at, a.last_heartbeat_callee),
+        relay_used = COALESCE(a.relay_used, false) OR h.relay_used
+      FROM (VALUES ${rows}) AS h(call_session_id, caller_at, callee_at, relay_used)
+      WHERE a.call_session_id = h.call_session_id
+    `);
+  }
+
   // User tier management
   async getUserTier(address: string): Promise<'free' | 'paid' | 'admin'> {
     const identity = await this.getIdentity(address);
@@ -1575,6 +1755,7 @@ export class DatabaseStorage implements IStorage {
       .set({ alwaysAllowed })
       .where(eq(contacts.id, contact.id))
       .returning();
+    this.contactChanged(contact);
     return updated || undefined;
   }
 
@@ -1899,6 +2080,8 @@ export class DatabaseStorage implements IStorage {
       linkedPublicKey,
       label: label || null,
     }).returning();
+    // A linked address inherits the primary's tier
+    this.identityChanged(linkedAddr);
     return created;
   }
 
@@ -1906,6 +2089,7 @@ export class DatabaseStorage implements IStorage {
     const [deleted] = await db.delete(linkedAddresses)
       .where(eq(linkedAddresses.linkedAddress, linkedAddr))
       .returning();
+    this.identityChanged(linkedAddr);
     return !!deleted;
   }
   
@@ -2234,6 +2418,38 @@ export class DatabaseStorage implements IStorage {
     return result.length;
   }
 
+  // Audit rows for stateless tokens, written in batches after the fact. A token
+  // already on record (a retried batch) is left as it is.
+  async recordCallTokenIssues(issues: CallTokenIssue[]): Promise<void> {
+    if (issues.length === 0) return;
+    await db.insert(callTokenNonces).values(issues.map(issue => ({
+      token: issue.token,
+      nonceHash: createHash('sha256').update(issue.nonce).digest('hex'),
+      userAddress: issue.userAddress,
+      targetAddress: issue.targetAddress || null,
+      plan: issue.plan,
+      allowTurn: issue.allowTurn,
+      allowVideo: issue.allowVideo,
+      issuedAt: issue.issuedAt,
+      expiresAt: issue.expiresAt,
+    }))).onConflictDoNothing();
+  }
+
+  // Timestamps are sent as UTC ISO strings, matching how drizzle writes timestamp columns
+  async recordCallTokenRedemptions(redemptions: CallTokenRedemption[]): Promise<void> {
+    if (redemptions.length === 0) return;
+    const rows = sql.join(redemptions.map(r => sql`(
+      ${r.token}, ${r.usedAt.toISOString()}::timestamp, ${r.usedByIp ?? null}::text
+    )`), sql`, `);
+    await db.execute(sql`
+      UPDATE ${callTokenNonces} AS c SET
+        used_at = r.used_at,
+        used_by_ip = r.used_by_ip
+      FROM (VALUES ${rows}) AS r(token, used_at, used_by_ip)
+      WHERE c.token = r.token AND c.used_at IS NULL
+    `);
+  }
+
   async storeMessage(
     fromAddress: string, 
     toAddress: string, 
@@ -2254,7 +2470,7 @@ export class DatabaseStorage implements IStorage {
     return { id: msg.id, createdAt: msg.createdAt };
   }
 
-  async getPendingMessages(toAddress: string): Promise<{ id: string; fromAddress: string; toAddress: string; convoId: string; content: string; mediaType: string | null; mediaUrl: string | null; createdAt: Date }[]> {
+  async getPendingMessages(toAddress: string): Promise<{ id: string; fromAddress: string; toAddress: string; convoId: string; content: string; mediaType: string | null; mediaUrl: string | null; seq: number | null; createdAt: Date }[]> {
     return db.select({
       id: persistentMessages.id,
       fromAddress: persistentMessages.fromAddress,
@@ -2263,6 +2479,7 @@ export class DatabaseStorage implements IStorage {
       content: persistentMessages.content,
       mediaType: persistentMessages.mediaType,
       mediaUrl: persistentMessages.mediaUrl,
+      seq: persistentMessages.seq,
       createdAt: persistentMessages.createdAt,
     }).from(persistentMessages).where(
       and(
@@ -2278,6 +2495,14 @@ export class DatabaseStorage implements IStorage {
       .where(eq(persistentMessages.id, messageId));
   }
 
+  // One UPDATE for a whole reconnect backlog instead of a round trip per message
+  async markMessagesDelivered(messageIds: string[]): Promise<void> {
+    if (messageIds.length === 0) return;
+    await db.update(persistentMessages)
+      .set({ status: 'delivered', deliveredAt: new Date() })
+      .where(inArray(persistentMessages.id, messageIds));
+  }
+
   async markMessageRead(messageId: string): Promise<void> {
     await db.update(persistentMessages)
       .set({ status: 'read', readAt: new Date() })
@@ -0,0 +1,388 @@
+import type { UsageCounter, ActiveCall } from '@shared/schema';
+import { storage, type UsageDelta, type HeartbeatUpdate } from './storage';
+import { ExpiringMap } from './expiringMap';
+import { counter, gauge, onCollect } from './metrics';
+
+// Per-address cache of tiers, free-tier usage counters and active-call records
+// for FreeTierShield, so admitting a call normally needs no database round trip.
+//
+// Tiers are read through with a TTL and dropped as soon as storage reports an
+// identity write (updatePlan, Stripe webhook updates, role/comp/trial changes,
+// address links). A linked address inherits its primary's tier, so a change to
+// the primary reaches its linked addresses when their entries expire.
+//
+// Usage counters are loaded once and then incremented in memory. Increments and
+// call heartbeats are written behind in one batched UPDATE each per
+// USAGE_FLUSH_INTERVAL_MS. The database applies them as relative increments, so
+// cluster workers can share a row. Each worker would otherwise enforce limits
+// against its own copy, giving a user the full allowance once per worker, so
+// cluster workers write increments through, reread the row for every limit
+// check and count concurrent calls from the database.
+
+export type UserTier = 'free' | 'paid' | 'admin';
+
+const TIER_TTL_MS = parseInt(process.env.TIER_CACHE_TTL_MS || '60000', 10);
+const USAGE_TTL_MS = parseInt(process.env.USAGE_CACHE_TTL_MS || '60000', 10);
+const FLUSH_INTERVAL_MS = parseInt(process.env.USAGE_FLUSH_INTERVAL_MS || '2000', 10);
+const MAX_CACHED_USERS = parseInt(process.env.USAGE_CACHE_MAX_USERS || '100000', 10);
+const CLUSTER_WORKER = !!process.env.WS_CLUSTER_SLOT;
+
+const tierLookups = counter('callvault_tier_cache_lookups_total', 'Tier cache lookups by result');
+const usageLookups = counter('callvault_usage_cache_lookups_total', 'Usage counter cache lookups by result');
+const flushedRows = counter('callvault_usage_flush_rows_total', 'Rows written by write-behind flushes');
+const flushErrors = counter('callvault_usage_flush_errors_total', 'Write-behind flushes that failed and were retried');
+const pendingGauge = gauge('callvault_usage_pending', 'Buffered writes waiting for the next flush');
+
+interface CachedUsage {
+  counter: UsageCounter;
+  pending: UsageDelta;
+  loadedAt: number;
+}
+
+// Same keys storage.getOrCreateUsageCounter resets on
+function currentDayKey(): string {
+  return new Date().toISOString().split('T')[0];
+}
+
+function currentMonthKey(): string {
+  const d = new Date();
+  return `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}`;
+}
+
+function emptyDelta(userAddress: string): UsageDelta {
+  return { userAddress, callsStarted: 0, failedStarts: 0, callAttempts: 0, attemptHour: new Date().getHours(), secondsUsed: 0, relayCalls: 0 };
+}
+
+function isDirty(delta: UsageDelta): boolean {
+  return delta.callsStarted > 0 || delta.failedStarts > 0 || delta.callAttempts > 0 ||
+    delta.secondsUsed > 0 || delta.relayCalls > 0;
+}
+
+export class UsageCache {
+  private tiers = new ExpiringMap<UserTier>({ ttlMs: TIER_TTL_MS, maxEntries: MAX_CACHED_USERS });
+  private tierLoads = new Map<string, Promise<UserTier>>();
+  private tierEpoch = 0; // Bumped on invalidation so a load that raced it isn't cached
+
+  private usage = new Map<string, CachedUsage>();
+  private usageLoads = new Map<string, Promise<CachedUsage>>();
+  private dirty = new Set<string>();
+  private retryDeltas: UsageDelta[] = []; // From a failed flush whose entry was evicted
+
+  private calls = new ExpiringMap<ActiveCall>({ ttlMs: USAGE_TTL_MS, maxEntries: MAX_CACHED_USERS });
+  private userCalls = new ExpiringMap<Set<string>>({ ttlMs: USAGE_TTL_MS, maxEntries: MAX_CACHED_USERS });
+  private heartbeats = new Map<string, HeartbeatUpdate>();
+
+  private flushing: Promise<void> | null = null;
+  private timer: NodeJS.Timeout;
+
+  constructor() {
+    this.timer = setInterval(() => void this.flush(), FLUSH_INTERVAL_MS);
+    this.timer.unref();
+  }
+
+  // ==========================================================================
+  // Tiers
+  // ==========================================================================
+
+  async getTier(address: string): Promise<UserTier> {
+    const cached = this.tiers.get(address);
+    if (cached) {
+      tierLookups.inc({ result: 'hit' });
+      return cached;
+    }
+    tierLookups.inc({ result: 'miss' });
+
+    const inFlight = this.tierLoads.get(address);
+    if (inFlight) return inFlight;
+    const epoch = this.tierEpoch;
+    const load = storage.getUserTier(address).then(tier => {
+      if (this.tierEpoch === epoch) this.tiers.set(address, tier);
+      return tier;
+    }).finally(() => {
+      if (this.tierLoads.get(address) === load) this.tierLoads.delete(address);
+    });
+    this.tierLoads.set(address, load);
+    return load;
+  }
+
+  invalidateTier(address: string): void {
+    this.tierEpoch++;
+    this.tiers.delete(address);
+    this.tierLoads.delete(address);
+  }
+
+  // ==========================================================================
+  // Usage counters
+  // ==========================================================================
+
+  async getCounter(address: string): Promise<UsageCounter> {
+    if (CLUSTER_WORKER) {
+      await this.flush();
+      const entry = this.usage.get(address);
+      if (entry && !isDirty(entry.pending)) this.usage.delete(address);
+    }
+    return (await this.usageEntry(address)).counter;
+  }
+
+  async incrementCallsStarted(address: string): Promise<UsageCounter> {
+    const entry = await this.usageEntry(address);
+    entry.counter.callsStartedToday = (entry.counter.callsStartedToday || 0) + 1;
+    entry.pending.callsStarted++;
+    await this.markDirty(address);
+    return entry.counter;
+  }
+
+  async incrementFailedStarts(address: string): Promise<UsageCounter> {
+    const entry = await this.usageEntry(address);
+    entry.counter.failedStartsToday = (entry.counter.failedStartsToday || 0) + 1;
+    entry.pending.failedStarts++;
+    await this.markDirty(address);
+    return entry.counter;
+  }
+
+  async incrementCallAttempts(address: string): Promise<UsageCounter> {
+    const entry = await this.usageEntry(address);
+    const currentHour = new Date().getHours();
+    // Reset hourly counter if hour changed
+    if (entry.counter.lastAttemptHour !== currentHour) {
+      entry.counter.callAttemptsHour = 0;
+      entry.counter.lastAttemptHour = currentHour;
+    }
+    if (entry.pending.attemptHour !== currentHour) {
+      entry.pending.attemptHour = currentHour;
+      entry.pending.callAttempts = 0;
+    }
+    entry.counter.callAttemptsHour = (entry.counter.callAttemptsHour || 0) + 1;
+    entry.pending.callAttempts++;
+    await this.markDirty(address);
+    return entry.counter;
+  }
+
+  async addSecondsUsed(address: string, seconds: number): Promise<UsageCounter> {
+    const entry = await this.usageEntry(address);
+    entry.counter.secondsUsedMonth = (entry.counter.secondsUsedMonth || 0) + seconds;
+    entry.pending.secondsUsed += seconds;
+    await this.markDirty(address);
+    return entry.counter;
+  }
+
+  async incrementRelayCalls(address: string): Promise<UsageCounter> {
+    const entry = await this.usageEntry(address);
+    entry.counter.relayCalls24h = (entry.counter.relayCalls24h || 0) + 1;
+    entry.pending.relayCalls++;
+    await this.markDirty(address);
+    return entry.counter;
+  }
+
+  private async markDirty(address: string): Promise<void> {
+    this.dirty.add(address);
+    if (CLUSTER_WORKER) await this.flush();
+  }
+
+  // Rare and must not be lost, so written through
+  async setRelayPenalty(address: string, until: Date): Promise<void> {
+    await storage.updateUsageCounter(address, { relayPenaltyUntil: until });
+    const entry = this.usage.get(address);
+    if (entry) entry.counter.relayPenaltyUntil = until;
+  }
+
+  private async usageEntry(address: string): Promise<CachedUsage> {
+    const entry = this.usage.get(address);
+    if (entry && (Date.now() - entry.loadedAt < USAGE_TTL_MS || isDirty(entry.pending))) {
+      usageLookups.inc({ result: 'hit' });
+      this.rollover(entry);
+      return entry;
+    }
+    usageLookups.inc({ result: 'miss' });
+
+    const inFlight = this.usageLoads.get(address);
+    if (inFlight) return inFlight;
+    const load = (async () => {
+      // A reload racing a flush could read the row before the increments land
+      if (this.flushing) await this.flushing;
+      const counter = await storage.getOrCreateUsageCounter(address);
+      const loaded = { counter, pending: emptyDelta(address), loadedAt: Date.now() };
+      this.usage.delete(address);
+      this.usage.set(address, loaded);
+      this.evictClean();
+      return loaded;
+    })().finally(() => this.usageLoads.delete(address));
+    this.usageLoads.set(address, load);
+    return load;
+  }
+
+  // Apply the day/month reset getOrCreateUsageCounter would do on its next read.
+  // Pending increments for the old period are dropped; the flush resets the row.
+  private rollover(entry: CachedUsage): void {
+    const dayKey = currentDayKey();
+    if (entry.counter.dayKey !== dayKey) {
+      entry.counter.dayKey = dayKey;
+      entry.counter.callsStartedToday = 0;
+      entry.counter.failedStartsToday = 0;
+      entry.counter.callAttemptsHour = 0;
+      entry.pending.callsStarted = 0;
+      entry.pending.failedStarts = 0;
+      entry.pending.callAttempts = 0;
+    }
+    const monthKey = currentMonthKey();
+    if (entry.counter.monthKey !== monthKey) {
+      entry.counter.monthKey = monthKey;
+      entry.counter.secondsUsedMonth = 0;
+      entry.pending.secondsUsed = 0;
+    }
+  }
+
+  // Drop the least recently loaded entries that have nothing left to flush
+  private evictClean(): void {
+    if (this.usage.size <= MAX_CACHED_USERS) return;
+    for (const [address, entry] of Array.from(this.usage)) {
+      if (this.usage.size <= MAX_CACHED_USERS) break;
+      if (!isDirty(entry.pending)) this.usage.delete(address);
+    }
+  }
+
+  // ==========================================================================
+  // Active calls
+  // ==========================================================================
+
+  async getActiveCall(callSessionId: string): Promise<ActiveCall | undefined> {
+    const cached = this.calls.get(callSessionId);
+    if (cached) return cached;
+    const call = await storage.getActiveCall(callSessionId);
+    if (call) this.calls.set(callSessionId, call);
+    return call;
+  }
+
+  async activeCallCount(address: string): Promise<number> {
+    if (CLUSTER_WORKER) return (await storage.getActiveCallsForUser(address)).length;
+    const cached = this.userCalls.get(address);
+    if (cached) return cached.size;
+    const calls = await storage.getActiveCallsForUser(address);
+    this.userCalls.set(address, new Set(calls.map(c => c.callSessionId)));
+    return calls.length;
+  }
+
+  callStarted(call: ActiveCall): void {
+    this.calls.set(call.callSessionId, call);
+    this.userCalls.get(call.callerAddress)?.add(call.callSessionId);
+    this.userCalls.get(call.calleeAddress)?.add(call.callSessionId);
+  }
+
+  callEnded(call: ActiveCall): void {
+    this.calls.delete(call.callSessionId);
+    this.heartbeats.delete(call.callSessionId);
+    this.userCalls.get(call.callerAddress)?.delete(call.callSessionId);
+    this.userCalls.get(call.calleeAddress)?.delete(call.callSessionId);
+  }
+
+  // Update the cached record now; the row is written on the next flush
+  recordHeartbeat(call: ActiveCall, isCaller: boolean, isRelay?: boolean): void {
+    const now = new Date();
+    const update = this.heartbeats.get(call.callSessionId) ??
+      { callSessionId: call.callSessionId, lastHeartbeatCaller: null, lastHeartbeatCallee: null, relayUsed: false };
+    if (isCaller) {
+      call.lastHeartbeatCaller = now;
+      update.lastHeartbeatCaller = now;
+    } else {
+      call.lastHeartbeatCallee = now;
+      update.lastHeartbeatCallee = now;
+    }
+    if (isRelay && !call.relayUsed) {
+      call.relayUsed = true;
+      update.relayUsed = true;
+    }
+    this.heartbeats.set(call.callSessionId, update);
+  }
+
+  // ==========================================================================
+  // Write-behind
+  // ==========================================================================
+
+  flush(): Promise<void> {
+    if (this.flushing) return this.flushing.then(() => this.flush());
+
+    const deltas = this.retryDeltas;
+    this.retryDeltas = [];
+    for (const address of Array.from(this.dirty)) {
+      const entry = this.usage.get(address);
+      if (entry && isDirty(entry.pending)) {
+        deltas.push(entry.pending);
+        entry.pending = emptyDelta(address);
+      }
+    }
+    this.dirty.clear();
+    const beats = Array.from(this.heartbeats.values());
+    this.heartbeats.clear();
+    if (deltas.length === 0 && beats.length === 0) return Promise.resolve();
+
+    this.flushing = (async () => {
+      try {
+        await storage.applyUsageDeltas(deltas);
+        flushedRows.inc({ kind: 'usage' }, deltas.length);
+      } catch (error) {
+        flushErrors.inc({ kind: 'usage' });
+        console.error('[usageCache] Usage flush failed, will retry:', error);
+        deltas.forEach(delta => this.requeue(delta));
+      }
+      try {
+        await storage.applyHeartbeats(beats);
+        flushedRows.inc({ kind: 'heartbeat' }, beats.length);
+      } catch (error) {
+        flushErrors.inc({ kind: 'heartbeat' });
+        console.error('[usageCache] Heartbeat flush failed, will retry:', error);
+        for (const beat of beats) {
+          if (!this.heartbeats.has(beat.callSessionId)) this.heartbeats.set(beat.callSessionId, beat);
+        }
+      }
+    })().finally(() => {
+      this.flushing = null;
+    });
+    return this.flushing;
+  }
+
+  private requeue(delta: UsageDelta): void {
+    const entry = this.usage.get(delta.userAddress);
+    if (!entry) {
+      this.retryDeltas.push(delta);
+      return;
+    }
+    const pending = entry.pending;
+    pending.callsStarted += delta.callsStarted;
+    pending.failedStarts += delta.failedStarts;
+    pending.secondsUsed += delta.secondsUsed;
+    pending.relayCalls += delta.relayCalls;
+    // Attempts from an earlier hour no longer count once a new hour has attempts
+    if (pending.callAttempts === 0 || pending.attemptHour === delta.attemptHour) {
+      pending.callAttempts += delta.callAttempts;
+      pending.attemptHour = delta.attemptHour;
+    }
+    this.dirty.add(delta.userAddress);
+  }
+
+  stats() {
+    return {
+      tiers: this.tiers.stats(),
+      usageEntries: this.usage.size,
+      dirtyUsers: this.dirty.size + this.retryDeltas.length,
+      pendingHeartbeats: this.heartbeats.size,
+      activeCalls: this.calls.size,
+    };
+  }
+
+  close(): void {
+    clearInterval(this.timer);
+    this.tiers.close();
+    this.calls.close();
+    this.userCalls.close();
+  }
+}
+
+export const usageCache = new UsageCache();
+
+storage.onIdentityChange(address => usageCache.invalidateTier(address));
+
+onCollect(() => {
+  const stats = usageCache.stats();
+  pendingGauge.set(stats.dirtyUsers, { kind: 'usage' });
+  pendingGauge.set(stats.pendingHeartbeats, { kind: 'heartbeat' });
+});
@@ -0,0 +1,266 @@
+// MessagePack framing for /ws clients that negotiate it.
+//
+// A client opts in with the "callvault.msgpack" subprotocol, or by sending
+// encoding: 'msgpack' in its register frame. After that, frames to it go out as
+// binary MessagePack. It may send either binary MessagePack or JSON text, and
+// the server picks the decoder by frame type. Clients that never opt in only
+// ever see JSON.
+//
+// encodeFrame() follows JSON.stringify's rules so a handler's object reaches a
+// MessagePack client with the same shape a JSON client sees:
+// - toJSON() is honoured, so Dates become ISO strings.
+// - Object properties that are undefined or functions are dropped; in arrays
+//   they become nil.
+// - NaN and Infinity become nil.
+// Buffers and Uint8Arrays are sent as bin.
+
+export const MSGPACK_SUBPROTOCOL = 'callvault.msgpack';
+
+const MAX_DEPTH = 64;
+
+let scratch = Buffer.allocUnsafe(64 * 1024);
+let pos = 0;
+
+function ensure(bytes: number) {
+  if (pos + bytes <= scratch.length) return;
+  const grown = Buffer.allocUnsafe(Math.max(scratch.length * 2, pos + bytes));
+  scratch.copy(grown, 0, 0, pos);
+  scratch = grown;
+}
+
+function writeHeader(small: number, smallLimit: number, codes: [number, number, number], length: number) {
+  if (length < smallLimit) {
+    ensure(1);
+    scratch[pos++] = small | length;
+  } else if (length < 0x100 && codes[0] !== 0) {
+    ensure(2);
+    scratch[pos++] = codes[0];
+    scratch[pos++] = length;
+  } else if (length < 0x10000) {
+    ensure(3);
+    scratch[pos++] = codes[1];
+    scratch.writeUInt16BE(length, pos);
+    pos += 2;
+  } else {
+    ensure(5);
+    scratch[pos++] = codes[2];
+    scratch.writeUInt32BE(length, pos);
+    pos += 4;
+  }
+}
+
+function writeNumber(value: number) {
+  if (!Number.isFinite(value)) {
+    ensure(1);
+    scratch[pos++] = 0xc0;
+    return;
+  }
+  if (!Number.isInteger(value) || !Number.isSafeInteger(value)) {
+    ensure(9);
+    scratch[pos++] = 0xcb;
+    scratch.writeDoubleBE(value, pos);
+    pos += 8;
+    return;
+  }
+  ensure(9);
+  if (value >= 0) {
+    if (value < 0x80) {
+      scratch[pos++] = value;
+    } else if (value < 0x100) {
+      scratch[pos++] = 0xcc;
+      scratch[pos++] = value;
+    } else if (value < 0x10000) {
+      scratch[pos++] = 0xcd;
+      scratch.writeUInt16BE(value, pos);
+      pos += 2;
+    } else if (value < 0x100000000) {
+      scratch[pos++] = 0xce;
+      scratch.writeUInt32BE(value, pos);
+      pos += 4;
+    } else {
+      scratch[pos++] = 0xcf;
+      scratch.writeUInt32BE(Math.floor(value / 0x100000000), pos);
+      scratch.writeUInt32BE(value >>> 0, pos + 4);
+      pos += 8;
+    }
+  } else if (value >= -0x20) {
+    scratch[pos++] = value & 0xff;
+  } else if (value >= -0x80) {
+    scratch[pos++] = 0xd0;
+    scratch.writeInt8(value, pos);
+    pos += 1;
+  } else if (value >= -0x8000) {
+    scratch[pos++] = 0xd1;
+    scratch.writeInt16BE(value, pos);
+    pos += 2;
+  } else if (value >= -0x80000000) {
+    scratch[pos++] = 0xd2;
+    scratch.writeInt32BE(value, pos);
+    pos += 4;
+  } else {
+    scratch[pos++] = 0xd3;
+    scratch.writeInt32BE(Math.floor(value / 0x100000000), pos);
+    scratch.writeUInt32BE(value >>> 0, pos + 4);
+    pos += 8;
+  }
+}
+
+function writeString(value: string) {
+  const length = Buffer.byteLength(value);
+  writeHeader(0xa0, 32, [0xd9, 0xda, 0xdb], length);
+  ensure(length);
+  pos += scratch.write(value, pos, 'utf8');
+}
+
+function isSkipped(value: unknown): boolean {
+  return value === undefined || typeof value === 'function' || typeof value === 'symbol';
+}
+
+function writeValue(value: any, depth: number) {
+  if (depth > MAX_DEPTH) throw new RangeError('frame nested too deeply');
+  if (value !== null && typeof value === 'object' && typeof value.toJSON === 'function') {
+    value = value.toJSON();
+  }
+  switch (typeof value) {
+    case 'string':
+      writeString(value);
+      return;
+    case 'number':
+      writeNumber(value);
+      return;
+    case 'boolean':
+      ensure(1);
+      scratch[pos++] = value ? 0xc3 : 0xc2;
+      return;
+    case 'bigint':
+      throw new TypeError('Do not know how to serialize a BigInt');
+    case 'object':
+      break;
+    default:
+      ensure(1);
+      scratch[pos++] = 0xc0;
+      return;
+  }
+  if (value === null) {
+    ensure(1);
+    scratch[pos++] = 0xc0;
+  } else if (value instanceof Uint8Array) {
+    writeHeader(0, 0, [0xc4, 0xc5, 0xc6], value.length);
+    ensure(value.length);
+    scratch.set(value, pos);
+    pos += value.length;
+  } else if (Array.isArray(value)) {
+    writeHeader(0x90, 16, [0, 0xdc, 0xdd], value.length);
+    for (const item of value) {
+      writeValue(isSkipped(item) ? null : item, depth + 1);
+    }
+  } else {
+    const keys = Object.keys(value).filter(key => !isSkipped(value[key]));
+    writeHeader(0x80, 16, [0, 0xde, 0xdf], keys.length);
+    for (const key of keys) {
+      writeString(key);
+      writeValue(value[key], depth + 1);
+    }
+  }
+}
+
+export function encodeFrame(value: unknown): Buffer {
+  pos = 0;
+  writeValue(value, 0);
+  const out = Buffer.allocUnsafe(pos);
+  scratch.copy(out, 0, 0, pos);
+  return out;
+}
+
+// ============================================================================
+// Decoding
+// ============================================================================
+
+class Reader {
+  private offset = 0;
+
+  constructor(private readonly buf: Buffer) {}
+
+  done(): boolean {
+    return this.offset === this.buf.length;
+  }
+
+  private take(bytes: number): number {
+    const at = this.offset;
+    if (at + bytes > this.buf.length) throw new RangeError('truncated MessagePack frame');
+    this.offset += bytes;
+    return at;
+  }
+
+  private str(length: number): string {
+    const at = this.take(length);
+    return this.buf.toString('utf8', at, at + length);
+  }
+
+  private array(length: number, depth: number): unknown[] {
+    const out = new Array(length);
+    for (let i = 0; i < length; i++) out[i] = this.value(depth + 1);
+    return out;
+  }
+
+  private map(length: number, depth: number): Record<string, unknown> {
+    const out: Record<string, unknown> = {};
+    for (let i = 0; i < length; i++) {
+      const key = String(this.value(depth + 1));
+      const item = this.value(depth + 1);
+      // Same as JSON.parse: "__proto__" is an ordinary own property
+      if (key === '__proto__') {
+        Object.defineProperty(out, key, { value: item, enumerable: true, writable: true, configurable: true });
+      } else {
+        out[key] = item;
+      }
+    }
+    return out;
+  }
+
+  value(depth = 0): unknown {
+    if (depth > MAX_DEPTH) throw new RangeError('frame nested too deeply');
+    const buf = this.buf;
+    const type = buf[this.take(1)];
+    if (type < 0x80) return type;
+    if (type < 0x90) return this.map(type & 0x0f, depth);
+    if (type < 0xa0) return this.array(type & 0x0f, depth);
+    if (type < 0xc0) return this.str(type & 0x1f);
+    if (type >= 0xe0) return type - 0x100;
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: { const n = buf[this.take(1)]; const at = this.take(n); return buf.subarray(at, at + n); }
+      case 0xc5: { const n = buf.readUInt16BE(this.take(2)); const at = this.take(n); return buf.subarray(at, at + n); }
+      case 0xc6: { const n = buf.readUInt32BE(this.take(4)); const at = this.take(n); return buf.subarray(at, at + n); }
+      case 0xca: return buf.readFloatBE(this.take(4));
+      case 0xcb: return buf.readDoubleBE(this.take(8));
+      case 0xcc: return buf[this.take(1)];
+      case 0xcd: return buf.readUInt16BE(this.take(2));
+      case 0xce: return buf.readUInt32BE(this.take(4));
+      case 0xcf: { const at = this.take(8); return buf.readUInt32BE(at) * 0x100000000 + buf.readUInt32BE(at + 4); }
+      case 0xd0: return buf.readInt8(this.take(1));
+      case 0xd1: return buf.readInt16BE(this.take(2));
+      case 0xd2: return buf.readInt32BE(this.take(4));
+      case 0xd3: { const at = this.take(8); return buf.readInt32BE(at) * 0x100000000 + buf.readUInt32BE(at + 4); }
+      case 0xd9: return this.str(buf[this.take(1)]);
+      case 0xda: return this.str(buf.readUInt16BE(this.take(2)));
+      case 0xdb: return this.str(buf.readUInt32BE(this.take(4)));
+      case 0xdc: return this.array(buf.readUInt16BE(this.take(2)), depth);
+      case 0xdd: return this.array(buf.readUInt32BE(this.take(4)), depth);
+      case 0xde: return this.map(buf.readUInt16BE(this.take(2)), depth);
+      case 0xdf: return this.map(buf.readUInt32BE(this.take(4)), depth);
+      default:
+        throw new TypeError(`unsupported MessagePack type 0x${type.toString(16)}`);
+    }
+  }
+}
+
+// Throws on malformed or trailing input, like JSON.parse
+export function decodeFrame(data: Buffer): any {
+  const reader = new Reader(data);
+  const value = reader.value();
+  if (!reader.done()) throw new SyntaxError('unexpected data after MessagePack frame');
+  return value;
+}
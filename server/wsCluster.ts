@@ -0,0 +1,463 @@
+import cluster from 'cluster';
+import fs from 'fs';
+import net from 'net';
+import os from 'os';
+import path from 'path';
+
+// Multi-worker mode for the /ws signaling server.
+//
+// With WS_CLUSTER_WORKERS > 1 the primary process only forks workers and runs
+// the bus hub; each worker runs the full HTTP + WebSocket server on the shared
+// port and owns the sockets the OS hands it. Workers keep a replicated presence
+// directory (address -> workers holding a live socket for it) so a relay to an
+// address with no local socket can be forwarded to the worker that has one.
+// Call state is mirrored the same way, since caller and callee may be served by
+// different workers.
+//
+// Policies, blocklists, passes, call requests and message history stay in the
+// primary: it loads the local JSON stores once and answers store calls from the
+// workers over the same bus (see server/sharedStores.ts).
+//
+// The bus is pluggable: "ipc" relays packets through the primary over the
+// cluster IPC channel, "unix" through a Unix domain socket the primary listens
+// on. Both hubs route a packet to one worker or fan it out to all others, and
+// hand packets addressed to worker id 0 to the primary itself.
+
+export type ClusterTransport = 'ipc' | 'unix';
+
+export type ClusterEnvelope =
+  | { kind: 'deliver'; address: string; frame: string; first: boolean }
+  | { kind: 'presence'; address: string; online: boolean }
+  | { kind: 'presence:sync' }
+  | { kind: 'call'; call: Record<string, unknown> }
+  | { kind: 'worker:exit'; worker: number }
+  | { kind: 'store:call'; id: number; store: string; method: string; args: unknown[] }
+  | { kind: 'store:result'; id: number; result?: unknown; error?: string };
+
+export interface BusPacket {
+  from: number; // Sending worker id (0 = primary)
+  to?: number; // Target worker id; omitted = every worker except the sender
+  envelope: ClusterEnvelope;
+}
+
+export interface ClusterBus {
+  send(packet: BusPacket): void;
+  onPacket(handler: (packet: BusPacket) => void): void;
+  close(): void;
+}
+
+// Runs a store method in the primary for a worker
+export type StoreCallHandler = (store: string, method: string, args: unknown[]) => Promise<unknown>;
+
+const IPC_CHANNEL = 'wsCluster';
+const RESTART_DELAY_MS = 1000;
+const STORE_CALL_TIMEOUT_MS = parseInt(process.env.WS_CLUSTER_STORE_TIMEOUT_MS || '10000', 10);
+
+export function clusterWorkerCount(): number {
+  const setting = (process.env.WS_CLUSTER_WORKERS || '').trim().toLowerCase();
+  if (setting === 'auto') {
+    return os.cpus().length;
+  }
+  const count = parseInt(setting, 10);
+  return Number.isFinite(count) && count > 1 ? count : 0;
+}
+
+export function clusterTransport(): ClusterTransport {
+  return process.env.WS_CLUSTER_BUS === 'unix' ? 'unix' : 'ipc';
+}
+
+function busSocketPath(): string {
+  return process.env.WS_CLUSTER_SOCKET || path.join(os.tmpdir(), `callvault-ws-${process.pid}.sock`);
+}
+
+// True in the primary process when cluster mode is on: it should fork instead of serving
+export function isClusterPrimary(): boolean {
+  return clusterWorkerCount() > 0 && cluster.isPrimary;
+}
+
+export function isClusterWorker(): boolean {
+  return clusterWorkerCount() > 0 && cluster.isWorker;
+}
+
+// ============================================================================
+// Hub (primary)
+// ============================================================================
+
+export class ClusterHub {
+  private workers = new Map<number, (packet: BusPacket) => void>();
+  private primary: (packet: BusPacket) => void = () => {};
+  routed = 0;
+
+  // Handler for packets sent to the primary (to: 0)
+  serve(handler: (packet: BusPacket) => void): void {
+    this.primary = handler;
+  }
+
+  attach(workerId: number, deliver: (packet: BusPacket) => void): void {
+    this.workers.set(workerId, deliver);
+  }
+
+  detach(workerId: number): void {
+    if (!this.workers.delete(workerId)) return;
+    this.route({ from: 0, envelope: { kind: 'worker:exit', worker: workerId } });
+  }
+
+  route(packet: BusPacket): void {
+    this.routed++;
+    if (packet.to === 0) {
+      this.primary(packet);
+      return;
+    }
+    if (packet.to !== undefined) {
+      this.workers.get(packet.to)?.(packet);
+      return;
+    }
+    for (const [workerId, deliver] of Array.from(this.workers.entries())) {
+      if (workerId !== packet.from) {
+        deliver(packet);
+      }
+    }
+  }
+}
+
+// Newline-delimited JSON framing for the Unix socket transport
+function readPackets(socket: net.Socket, onPacket: (packet: any) => void): void {
+  let buffered = '';
+  socket.setEncoding('utf8');
+  socket.on('data', (chunk: string) => {
+    buffered += chunk;
+    let newline = buffered.indexOf('\n');
+    while (newline >= 0) {
+      const line = buffered.slice(0, newline);
+      buffered = buffered.slice(newline + 1);
+      if (line) {
+        try {
+          onPacket(JSON.parse(line));
+        } catch (e: any) {
+          console.error('[wsCluster] Dropping malformed bus packet:', e.message);
+        }
+      }
+      newline = buffered.indexOf('\n');
+    }
+  });
+}
+
+function listenUnixHub(hub: ClusterHub, socketPath: string): net.Server {
+  fs.rmSync(socketPath, { force: true });
+  const server = net.createServer(socket => {
+    let workerId: number | null = null;
+    readPackets(socket, packet => {
+      if (workerId === null) {
+        workerId = Number(packet.hello);
+        hub.attach(workerId, p => socket.write(JSON.stringify(p) + '\n'));
+        return;
+      }
+      hub.route(packet);
+    });
+    socket.on('error', () => socket.destroy());
+    socket.on('close', () => {
+      if (workerId !== null) hub.detach(workerId);
+    });
+  });
+  server.listen(socketPath);
+  process.on('exit', () => fs.rmSync(socketPath, { force: true }));
+  return server;
+}
+
+// Fork the workers and run the bus hub. Call instead of starting the server.
+// Store calls from the workers are answered with `handleStoreCall`.
+export function startClusterPrimary(handleStoreCall: StoreCallHandler): void {
+  const workers = clusterWorkerCount();
+  const transport = clusterTransport();
+  const hub = new ClusterHub();
+  const socketPath = busSocketPath();
+  const slots = new Map<number, number>(); // cluster worker id -> slot
+  let shuttingDown = false;
+
+  hub.serve(packet => {
+    const envelope = packet.envelope;
+    if (envelope.kind !== 'store:call') return;
+    const reply = (result: { result?: unknown; error?: string }) =>
+      hub.route({ from: 0, to: packet.from, envelope: { kind: 'store:result', id: envelope.id, ...result } });
+    handleStoreCall(envelope.store, envelope.method, envelope.args).then(
+      result => reply({ result }),
+      (error: Error) => reply({ error: error?.message || String(error) })
+    );
+  });
+
+  if (transport === 'unix') {
+    listenUnixHub(hub, socketPath);
+  }
+
+  const fork = (slot: number) => {
+    const worker = cluster.fork({
+      WS_CLUSTER_SLOT: String(slot),
+      WS_CLUSTER_SOCKET: socketPath,
+    });
+    slots.set(worker.id, slot);
+    if (transport === 'ipc') {
+      hub.attach(worker.id, packet => {
+        if (worker.isConnected()) worker.send({ [IPC_CHANNEL]: packet });
+      });
+    }
+  };
+
+  cluster.on('message', (_worker, message: any) => {
+    if (message && message[IPC_CHANNEL]) {
+      hub.route(message[IPC_CHANNEL]);
+    }
+  });
+
+  cluster.on('exit', (worker, code, signal) => {
+    const slot = slots.get(worker.id)!;
+    slots.delete(worker.id);
+    hub.detach(worker.id);
+    if (shuttingDown) return;
+    console.error(`[wsCluster] Worker ${worker.id} (slot ${slot}) exited (code: ${code}, signal: ${signal}) - restarting`);
+    setTimeout(() => fork(slot), RESTART_DELAY_MS);
+  });
+
+  for (const signal of ['SIGTERM', 'SIGINT'] as const) {
+    process.on(signal, () => {
+      shuttingDown = true;
+      for (const worker of Object.values(cluster.workers || {})) {
+        worker?.process.kill(signal);
+      }
+      setTimeout(() => process.exit(0), 6000).unref();
+    });
+  }
+
+  console.log(`[wsCluster] Primary ${process.pid} starting ${workers} workers (bus: ${transport})`);
+  for (let slot = 1; slot <= workers; slot++) {
+    fork(slot);
+  }
+}
+
+// ============================================================================
+// Worker side
+// ============================================================================
+
+class IpcBus implements ClusterBus {
+  private listener?: (message: any) => void;
+
+  send(packet: BusPacket): void {
+    if (process.connected) process.send!({ [IPC_CHANNEL]: packet });
+  }
+
+  onPacket(handler: (packet: BusPacket) => void): void {
+    this.listener = (message: any) => {
+      if (message && message[IPC_CHANNEL]) handler(message[IPC_CHANNEL]);
+    };
+    process.on('message', this.listener);
+  }
+
+  close(): void {
+    if (this.listener) process.off('message', this.listener);
+  }
+}
+
+export class UnixSocketBus implements ClusterBus {
+  private socket: net.Socket;
+
+  constructor(socketPath: string, workerId: number) {
+    this.socket = net.connect(socketPath);
+    this.socket.on('error', (e: Error) => console.error('[wsCluster] Bus socket error:', e.message));
+    // net.Socket queues writes until the connection is up
+    this.socket.write(JSON.stringify({ hello: workerId }) + '\n');
+  }
+
+  send(packet: BusPacket): void {
+    this.socket.write(JSON.stringify(packet) + '\n');
+  }
+
+  onPacket(handler: (packet: BusPacket) => void): void {
+    readPackets(this.socket, handler);
+  }
+
+  close(): void {
+    this.socket.end();
+  }
+}
+
+// Which workers hold a live socket for an address
+export class PresenceDirectory {
+  private byAddress = new Map<string, Set<number>>();
+
+  set(address: string, workerId: number, online: boolean): void {
+    let workers = this.byAddress.get(address);
+    if (online) {
+      if (!workers) {
+        workers = new Set();
+        this.byAddress.set(address, workers);
+      }
+      workers.add(workerId);
+    } else if (workers) {
+      workers.delete(workerId);
+      if (workers.size === 0) this.byAddress.delete(address);
+    }
+  }
+
+  dropWorker(workerId: number): void {
+    for (const [address, workers] of Array.from(this.byAddress.entries())) {
+      workers.delete(workerId);
+      if (workers.size === 0) this.byAddress.delete(address);
+    }
+  }
+
+  workersFor(address: string): number[] {
+    const workers = this.byAddress.get(address);
+    return workers ? Array.from(workers) : [];
+  }
+
+  get size(): number {
+    return this.byAddress.size;
+  }
+}
+
+export class ClusterNode {
+  readonly presence = new PresenceDirectory();
+  private local = new Set<string>(); // Addresses with a live socket on this worker
+  private deliverHandler: (address: string, frame: string, first: boolean) => number = () => 0;
+  private callHandler: (call: Record<string, unknown>) => void = () => {};
+  private storeCalls = new Map<number, { resolve: (result: unknown) => void; reject: (error: Error) => void; timer: NodeJS.Timeout }>();
+  private nextStoreCallId = 1;
+  private storeCallsSent = 0;
+  private forwarded = 0;
+  private received = 0;
+  private undeliverable = 0;
+
+  constructor(readonly workerId: number, private bus: ClusterBus) {
+    bus.onPacket(packet => this.handle(packet));
+    // Ask the other workers who they are holding (matters after a restart)
+    bus.send({ from: workerId, envelope: { kind: 'presence:sync' } });
+  }
+
+  // Handler that writes a forwarded frame to this worker's sockets for an address
+  onDeliver(handler: (address: string, frame: string, first: boolean) => number): void {
+    this.deliverHandler = handler;
+  }
+
+  onCallState(handler: (call: Record<string, unknown>) => void): void {
+    this.callHandler = handler;
+  }
+
+  announce(address: string, online: boolean): void {
+    if (online === this.local.has(address)) return;
+    if (online) {
+      this.local.add(address);
+    } else {
+      this.local.delete(address);
+    }
+    this.bus.send({ from: this.workerId, envelope: { kind: 'presence', address, online } });
+  }
+
+  isOnlineElsewhere(address: string): boolean {
+    return this.presence.workersFor(address).length > 0;
+  }
+
+  // Forward a serialized frame to the other workers holding `address`.
+  // With `first` only one worker gets it (getConnection semantics). Returns the
+  // number of workers the frame was handed to.
+  forward(address: string, frame: string, first = false): number {
+    const workers = this.presence.workersFor(address);
+    const targets = first ? workers.slice(0, 1) : workers;
+    for (const to of targets) {
+      this.bus.send({ from: this.workerId, to, envelope: { kind: 'deliver', address, frame, first } });
+    }
+    this.forwarded += targets.length;
+    return targets.length;
+  }
+
+  publishCallState(call: Record<string, unknown>): void {
+    this.bus.send({ from: this.workerId, envelope: { kind: 'call', call } });
+  }
+
+  // Run a store method in the primary; resolves with its (JSON-copied) result
+  callStore(store: string, method: string, args: unknown[]): Promise<unknown> {
+    const id = this.nextStoreCallId++;
+    this.storeCallsSent++;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        this.storeCalls.delete(id);
+        reject(new Error(`Store call ${store}.${method} timed out`));
+      }, STORE_CALL_TIMEOUT_MS);
+      timer.unref();
+      this.storeCalls.set(id, { resolve, reject, timer });
+      this.bus.send({ from: this.workerId, to: 0, envelope: { kind: 'store:call', id, store, method, args } });
+    });
+  }
+
+  stats() {
+    return {
+      workerId: this.workerId,
+      localAddresses: this.local.size,
+      remoteAddresses: this.presence.size,
+      forwarded: this.forwarded,
+      received: this.received,
+      undeliverable: this.undeliverable,
+      storeCalls: this.storeCallsSent,
+      storeCallsPending: this.storeCalls.size,
+    };
+  }
+
+  close(): void {
+    this.bus.close();
+  }
+
+  private handle(packet: BusPacket): void {
+    const envelope = packet.envelope;
+    switch (envelope.kind) {
+      case 'deliver':
+        this.received++;
+        if (this.deliverHandler(envelope.address, envelope.frame, envelope.first) === 0) {
+          this.undeliverable++;
+        }
+        break;
+      case 'presence':
+        this.presence.set(envelope.address, packet.from, envelope.online);
+        break;
+      case 'presence:sync':
+        for (const address of Array.from(this.local)) {
+          this.bus.send({ from: this.workerId, to: packet.from, envelope: { kind: 'presence', address, online: true } });
+        }
+        break;
+      case 'call':
+        this.callHandler(envelope.call);
+        break;
+      case 'worker:exit':
+        this.presence.dropWorker(envelope.worker);
+        break;
+      case 'store:result': {
+        const pending = this.storeCalls.get(envelope.id);
+        if (!pending) break; // Timed out already
+        this.storeCalls.delete(envelope.id);
+        clearTimeout(pending.timer);
+        if (envelope.error !== undefined) {
+          pending.reject(new Error(envelope.error));
+        } else {
+          pending.resolve(envelope.result);
+        }
+        break;
+      }
+    }
+  }
+}
+
+let node: ClusterNode | null | undefined;
+
+// This worker's cluster node, or null when not running as a cluster worker
+export function getClusterNode(): ClusterNode | null {
+  if (node === undefined) {
+    if (isClusterWorker()) {
+      const workerId = cluster.worker!.id;
+      const bus = clusterTransport() === 'unix'
+        ? new UnixSocketBus(busSocketPath(), workerId)
+        : new IpcBus();
+      node = new ClusterNode(workerId, bus);
+      console.log(`[wsCluster] Worker ${workerId} (slot ${process.env.WS_CLUSTER_SLOT}) joined the bus`);
+    } else {
+      node = null;
+    }
+  }
+  return node;
+}
@@ -0,0 +1,101 @@
+import { WebSocket } from 'ws';
+import { encodeFrame } from './wireCodec';
+import logger, { isEnabled } from './logger';
+
+// Outgoing frame encoding and group fan-out for /ws.
+//
+// A frame is serialized at most once per wire encoding, however many sockets
+// it goes to: fanOut() writes the same JSON string (or MessagePack buffer) to
+// every open socket of every recipient, instead of each recipient getting a
+// freshly built and stringified copy.
+
+const broadcastLog = logger.category('broadcast');
+
+// Sockets that negotiated MessagePack framing (see server/wireCodec.ts)
+const msgpackSockets = new WeakSet<WebSocket>();
+
+// Switch a socket to MessagePack. Everything written to it must go through
+// sendMessage(), safeSend() or fanOut(), which encode per the socket's codec.
+export function useMsgpack(ws: WebSocket) {
+  msgpackSockets.add(ws);
+}
+
+// Send one message to one socket, encoded once for its wire format
+export function sendMessage(ws: WebSocket, message: any) {
+  ws.send(msgpackSockets.has(ws) ? encodeFrame(message) : JSON.stringify(message));
+}
+
+// An outgoing message, serialized at most once per wire encoding
+export function wireFrame(message: any) {
+  let text: string | undefined;
+  let packed: Buffer | undefined;
+  const json = () => (text ??= typeof message === 'string' ? message : JSON.stringify(message));
+  return {
+    json,
+    for(ws: WebSocket): string | Buffer {
+      if (!msgpackSockets.has(ws)) return json();
+      return (packed ??= encodeFrame(typeof message === 'string' ? JSON.parse(message) : message));
+    },
+  };
+}
+
+export interface FanOutConnection {
+  ws: WebSocket;
+  connectionId: string;
+}
+
+export interface FanOutHooks {
+  // This worker's sockets for an address
+  connectionsFor(address: string): readonly FanOutConnection[] | undefined;
+  // Relay to other cluster workers; returns how many sockets they hold
+  forward?(address: string, frame: string): number;
+  // A socket that was closed or whose send threw
+  onDead?(address: string, connectionId: string): void;
+}
+
+export interface FanOutResult {
+  delivered: Map<string, number>; // Sockets reached per recipient, 0 if none
+  sockets: number;
+}
+
+export type FanOut = (recipients: Iterable<string>, message: any, except?: string) => FanOutResult;
+
+// Build the fan-out primitive over a connection registry. `except` (normally
+// the sender) is skipped entirely, so none of its devices get the frame back.
+// Duplicate recipients are sent to once.
+export function createFanOut(hooks: FanOutHooks): FanOut {
+  return (recipients, message, except) => {
+    const frame = wireFrame(message);
+    const delivered = new Map<string, number>();
+    let sockets = 0;
+    let dead: [string, string][] | undefined;
+
+    for (const address of Array.from(recipients)) {
+      if (address === except || delivered.has(address)) continue;
+      let sent = hooks.forward ? hooks.forward(address, frame.json()) : 0;
+      for (const conn of hooks.connectionsFor(address) ?? []) {
+        try {
+          if (conn.ws.readyState === WebSocket.OPEN) {
+            conn.ws.send(frame.for(conn.ws));
+            sent++;
+            continue;
+          }
+        } catch (e: any) {
+          broadcastLog.error(`Failed to send to ${address}`, e);
+        }
+        (dead ??= []).push([address, conn.connectionId]);
+      }
+      delivered.set(address, sent);
+      sockets += sent;
+    }
+
+    if (dead && hooks.onDead) {
+      for (const [address, connectionId] of dead) hooks.onDead(address, connectionId);
+    }
+    if (isEnabled('debug', 'broadcast')) {
+      const msgType = typeof message === 'object' && message.type ? message.type : 'unknown';
+      broadcastLog.debug(`Fan-out ${msgType} to ${delivered.size} recipient(s), ${sockets} socket(s)`);
+    }
+    return { delivered, sockets };
+  };
+}
@@ -201,23 +201,26 @@ export interface GroupCallParticipant {
 }
 
 export type WSMessage =
-  | { type: 'register'; address: string }
+  | { type: 'register'; address: string; session_token?: string; last_seq?: Record<string, number>; batch?: boolean; encoding?: 'json' | 'msgpack'; ice_batch?: boolean }
   | { type: 'call:init'; data: SignedCallIntent; pass_id?: string }
   | { type: 'call:incoming'; from_address: string; from_pubkey: string; media: { audio: boolean; video: boolean }; is_unknown?: boolean }
   | { type: 'call:accept'; to_address: string }
   | { type: 'call:reject'; to_address: string }
-  | { type: 'call:end'; to_address: string }
+  | { type: 'call:end'; to_address: string; from_address?: string; reason?: string; callSessionId?: string }
   | { type: 'call:blocked'; reason: string }
   | { type: 'call:request'; request: CallRequest }
   | { type: 'call:request_response'; request_id: string; accepted: boolean }
   | { type: 'webrtc:offer'; to_address: string; offer: RTCSessionDescriptionInit }
   | { type: 'webrtc:answer'; to_address: string; answer: RTCSessionDescriptionInit }
-  | { type: 'webrtc:ice'; to_address: string; candidate: RTCIceCandidateInit }
+  | { type: 'webrtc:ice'; to_address: string; candidate: RTCIceCandidateInit | null } // null: end-of-candidates
+  | { type: 'webrtc:ice_batch'; to_address: string; candidates: RTCIceCandidateInit[]; complete?: boolean }
   | { type: 'webrtc:peer_offline'; signalType: string; to_address: string }
   // Messaging
   | { type: 'msg:send'; data: SignedMessage; idempotency_key?: string }
   | { type: 'msg:incoming'; message: Message; from_pubkey: string }
   | { type: 'msg:delivered'; message_id: string; convo_id: string; delivered_at?: number }
+  | { type: 'msg:delivered_batch'; receipts: { message_id: string; convo_id: string }[]; delivered_at: number }
+  | { type: 'msg:batch'; messages: Message[]; batch: number; batches: number }
   | { type: 'msg:queued'; message_id: string; convo_id: string }
   | { type: 'msg:read'; message_ids: string[]; convo_id: string; reader_address: string; read_at?: number }
   | { type: 'msg:typing'; convo_id: string; from_address: string; is_typing: boolean }
@@ -303,7 +306,7 @@ export type WSMessage =
   | { type: 'room:participant_joined'; room_id: string; participant: GroupCallParticipant }
   | { type: 'room:participant_left'; room_id: string; user_address: string }
   | { type: 'room:participants'; room_id: string; participants: GroupCallParticipant[] }
-  | { type: 'room:invite'; room_id: string; to_address: string; from_address: string; is_video: boolean }
+  | { type: 'room:invite'; room_id: string; from_address: string; is_video: boolean }
   | { type: 'room:lock'; room_id: string; locked: boolean }
   | { type: 'room:end'; room_id: string }
   | { type: 'room:ended'; room_id: string }
@@ -311,7 +314,8 @@ export type WSMessage =
   // Mesh WebRTC signaling for group calls
   | { type: 'mesh:offer'; room_id: string; to_peer: string; from_peer: string; offer: RTCSessionDescriptionInit }
   | { type: 'mesh:answer'; room_id: string; to_peer: string; from_peer: string; answer: RTCSessionDescriptionInit }
-  | { type: 'mesh:ice'; room_id: string; to_peer: string; from_peer: string; candidate: RTCIceCandidateInit }
+  | { type: 'mesh:ice'; room_id: string; to_peer: string; from_peer: string; candidate: RTCIceCandidateInit | null }
+  | { type: 'mesh:ice_batch'; room_id: string; to_peer: string; from_peer: string; candidates: RTCIceCandidateInit[]; complete?: boolean }
   // Call Merge (merge 1:1 calls into group)
   | { type: 'call:merge'; call_addresses: string[]; signature: string; from_pubkey: string; from_address: string; nonce: string; timestamp: number }
   | { type: 'call:merged'; room: GroupCallRoom };
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+CallVault Ed25519 signing client for the Python test harness
+
+Mirrors client/src/lib/crypto.ts so synthetic clients can produce msg:send,
+call:init and signed policy frames that pass the server's
+verifyMessageSignature / verifySignatureWithDetails / verifyGenericSignature.
+
+Requires PyNaCl (pip install pynacl), the Python binding of the same
+libsodium primitives tweetnacl implements.
+"""
+
+import json
+import os
+import time
+import uuid
+
+from nacl.signing import SigningKey
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE58_INDEX = {c: i for i, c in enumerate(BASE58_ALPHABET)}
+BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def b58encode(data):
+    """Base58 (bitcoin alphabet) encode, matching the bs58 package"""
+    n = int.from_bytes(data, "big")
+    out = ""
+    while n > 0:
+        n, rem = divmod(n, 58)
+        out = BASE58_ALPHABET[rem] + out
+    leading_zeros = len(data) - len(data.lstrip(b"\0"))
+    return "1" * leading_zeros + out
+
+
+def b58decode(text):
+    """Base58 decode, matching the bs58 package"""
+    n = 0
+    for c in text:
+        if c not in BASE58_INDEX:
+            raise ValueError(f"Invalid base58 character: {c!r}")
+        n = n * 58 + BASE58_INDEX[c]
+    body = n.to_bytes((n.bit_length() + 7) // 8, "big") if n else b""
+    leading_ones = len(text) - len(text.lstrip("1"))
+    return b"\0" * leading_ones + body
+
+
+def _to_base36(n):
+    if n == 0:
+        return "0"
+    out = ""
+    while n:
+        n, rem = divmod(n, 36)
+        out = BASE36_DIGITS[rem] + out
+    return out
+
+
+def _djb2(text, seed):
+    h = seed
+    units = text.encode("utf-16-le")
+    for i in range(0, len(units), 2):
+        h = ((h << 5) + h + int.from_bytes(units[i:i + 2], "little")) & 0xFFFFFFFF
+    return h
+
+
+def conversation_id(addr1, addr2):
+    """Port of shared/conversationId.ts generateConversationId"""
+    combined = "|".join(sorted([addr1, addr2]))
+    return "dm_" + "_".join(_to_base36(_djb2(combined, seed)) for seed in (5381, 33, 65599))
+
+
+def _js_value(value, keys):
+    if isinstance(value, dict):
+        return {k: _js_value(value[k], keys) for k in keys if k in value}
+    if isinstance(value, (list, tuple)):
+        return [_js_value(v, keys) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def sorted_stringify(payload):
+    """
+    Reproduce JSON.stringify(payload, Object.keys(payload).sort()).
+
+    The array replacer acts as a whitelist applied at every nesting level,
+    so nested objects only keep keys that also appear at the top level
+    (e.g. a call intent's media object serializes as {}).
+    """
+    keys = sorted(payload.keys())
+    return json.dumps(_js_value(payload, keys), separators=(",", ":"), ensure_ascii=False)
+
+
+def generate_nonce():
+    return b58encode(os.urandom(16))
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class SigningIdentity:
+    """An Ed25519 identity with a CallVault call address"""
+
+    def __init__(self, signing_key=None, address=None):
+        self.signing_key = signing_key or SigningKey.generate()
+        self.public_key = bytes(self.signing_key.verify_key)
+        self.public_key_b58 = b58encode(self.public_key)
+        self.address = address or f"call:{self.public_key_b58}:{b58encode(os.urandom(8))}"
+
+    def sign_payload(self, payload):
+        """Sign a payload the way signPayload/verifyGenericSignature expect; returns base58 signature"""
+        signed = self.signing_key.sign(sorted_stringify(payload).encode("utf-8"))
+        return b58encode(signed.signature)
+
+    def build_message(self, to_address, content, convo_id=None, msg_type="text", **extra):
+        message = {
+            "id": str(uuid.uuid4()),
+            "convo_id": convo_id or conversation_id(self.address, to_address),
+            "from_address": self.address,
+            "to_address": to_address,
+            "timestamp": now_ms(),
+            "type": msg_type,
+            "content": content,
+            "nonce": generate_nonce(),
+        }
+        message.update(extra)
+        return message
+
+    def sign_message(self, message):
+        """Return a SignedMessage ({message, signature, from_pubkey}) for msg:send"""
+        return {
+            "message": message,
+            "signature": self.sign_payload(message),
+            "from_pubkey": self.public_key_b58,
+        }
+
+    def msg_send_frame(self, to_address, content, convo_id=None, **extra):
+        signed = self.sign_message(self.build_message(to_address, content, convo_id, **extra))
+        return {"type": "msg:send", "data": signed}
+
+    def sign_call_intent(self, to_address, video=False):
+        """Return a SignedCallIntent ({intent, signature}) for call:init"""
+        intent = {
+            "from_pubkey": self.public_key_b58,
+            "from_address": self.address,
+            "to_address": to_address,
+            "timestamp": now_ms(),
+            "nonce": generate_nonce(),
+            "media": {"audio": True, "video": video},
+        }
+        return {"intent": intent, "signature": self.sign_payload(intent)}
+
+    def call_init_frame(self, to_address, video=False, call_session_id=None):
+        frame = {"type": "call:init", "data": self.sign_call_intent(to_address, video)}
+        if call_session_id:
+            frame["callSessionId"] = call_session_id
+        return frame
+
+    def policy_update_frame(self, **overrides):
+        """Return a signed policy:update frame for this identity's own call policy"""
+        policy = {
+            "owner_address": self.address,
+            "allow_calls_from": "contacts",
+            "unknown_caller_behavior": "request",
+            "max_rings_per_sender": 5,
+            "ring_window_minutes": 10,
+            "auto_block_after_rejections": 5,
+            "updated_at": now_ms(),
+        }
+        policy.update(overrides)
+        nonce = generate_nonce()
+        timestamp = now_ms()
+        return {
+            "type": "policy:update",
+            "policy": policy,
+            "nonce": nonce,
+            "timestamp": timestamp,
+            "signature": self.sign_payload({"policy": policy, "nonce": nonce, "timestamp": timestamp}),
+            "from_pubkey": self.public_key_b58,
+        }
+
+    def block_add_frame(self, blocked_address, reason=None):
+        """Return a signed block:add frame blocking blocked_address for this identity"""
+        blocked = {"owner_address": self.address, "blocked_address": blocked_address, "blocked_at": now_ms()}
+        if reason:
+            blocked["reason"] = reason
+        nonce = generate_nonce()
+        timestamp = now_ms()
+        return {
+            "type": "block:add",
+            "blocked": blocked,
+            "nonce": nonce,
+            "timestamp": timestamp,
+            "signature": self.sign_payload({"blocked": blocked, "nonce": nonce, "timestamp": timestamp}),
+            "from_pubkey": self.public_key_b58,
+        }
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+CallVault upload benchmark
+
+Uploads many files to /api/upload concurrently while sampling the server's
+resident memory, then checks the download path on one of the uploads:
+a Range request must return 206, and a conditional GET with the returned
+ETag must return 304. One deliberately oversized upload must be rejected
+with 413.
+
+RSS is read from /proc/<pid>/status, so pass --pid with the server's node
+process id (e.g. `pgrep -f server/index.ts`) when running on the same host.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_stats import latency_summary
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+
+def read_rss_mb(pid):
+    """Resident set size of a local process in MB, or None if unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            rss = read_rss_mb(self.pid)
+            if rss is not None:
+                self.samples.append(rss)
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def summary(self):
+        if not self.samples:
+            return None
+        return {
+            "start_mb": round(self.samples[0], 1),
+            "peak_mb": round(max(self.samples), 1),
+            "end_mb": round(self.samples[-1], 1),
+            "samples": len(self.samples),
+        }
+
+
+class UploadBenchmark:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def upload(self, index, size):
+        payload = os.urandom(1024) * (size // 1024) + os.urandom(size % 1024)
+        start = time.perf_counter()
+        response = self._session().post(
+            f"{self.base_url}/api/upload",
+            data=payload,
+            headers={"X-Filename": f"bench_{index}.webm", "Content-Type": "audio/webm"},
+            timeout=120,
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        return response, elapsed_ms
+
+    def check_downloads(self, url, size):
+        """Range, ETag and cache header checks against one uploaded file"""
+        full = requests.get(f"{self.base_url}{url}", timeout=30)
+        etag = full.headers.get("ETag")
+        ranged = requests.get(f"{self.base_url}{url}", headers={"Range": "bytes=1024-2047"}, timeout=30)
+        conditional = requests.get(f"{self.base_url}{url}", headers={"If-None-Match": etag or ""}, timeout=30)
+        return {
+            "full_status": full.status_code,
+            "full_bytes_ok": len(full.content) == size,
+            "cache_control": full.headers.get("Cache-Control"),
+            "etag": etag,
+            "range_status": ranged.status_code,
+            "content_range": ranged.headers.get("Content-Range"),
+            "range_bytes_ok": ranged.content == full.content[1024:2048],
+            "if_none_match_status": conditional.status_code,
+        }
+
+    def check_oversize(self):
+        """An upload over the limit must be refused with 413"""
+        def body():
+            chunk = b"\0" * (256 * 1024)
+            for _ in range((MAX_UPLOAD_BYTES // len(chunk)) + 8):
+                yield chunk
+        try:
+            # Chunked body: no Content-Length, so the server has to cut it off mid-stream
+            response = requests.post(f"{self.base_url}/api/upload", data=body(), timeout=60)
+            return response.status_code
+        except requests.RequestException as e:
+            return f"connection error: {type(e).__name__}"
+
+    def run(self, uploads, concurrency, size, pid):
+        sampler = RssSampler(pid) if pid else None
+        if sampler:
+            sampler.start()
+
+        latencies = []
+        failures = []
+        first_url = None
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(self.upload, i, size) for i in range(uploads)]
+            for future in futures:
+                try:
+                    response, elapsed_ms = future.result()
+                except requests.RequestException as e:
+                    failures.append(type(e).__name__)
+                    continue
+                if response.status_code == 200:
+                    latencies.append(elapsed_ms)
+                    first_url = first_url or response.json().get("url")
+                else:
+                    failures.append(f"HTTP {response.status_code}")
+        wall_s = time.perf_counter() - start
+
+        if sampler:
+            sampler.stop()
+
+        report = {
+            "benchmark": "upload",
+            "uploads": uploads,
+            "concurrency": concurrency,
+            "file_bytes": size,
+            "succeeded": len(latencies),
+            "failed": len(failures),
+            "failures": sorted(set(failures)),
+            "wall_seconds": round(wall_s, 3),
+            "throughput_mb_s": round(len(latencies) * size / (1024 * 1024) / wall_s, 2) if wall_s else None,
+            "latency_ms": latency_summary(latencies),
+            "server_rss": sampler.summary() if sampler else None,
+            "downloads": self.check_downloads(first_url, size) if first_url else None,
+            "oversize_status": self.check_oversize(),
+        }
+        return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CallVault concurrent upload benchmark")
+    parser.add_argument("--url", default="http://localhost:3000", help="Server base URL")
+    parser.add_argument("--uploads", type=int, default=200, help="Total files to upload")
+    parser.add_argument("--concurrency", type=int, default=32, help="Uploads in flight at once")
+    parser.add_argument("--size", type=int, default=4 * 1024 * 1024, help="Bytes per uploaded file")
+    parser.add_argument("--pid", type=int, default=None, help="Server process id to sample RSS from")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    report = UploadBenchmark(args.url).run(args.uploads, args.concurrency, args.size, args.pid)
+    output = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(output)
+        print(f"Report written to {args.report}")
+    else:
+        print(output)
+
+    downloads = report["downloads"] or {}
+    ok = (
+        report["failed"] == 0
+        and report["oversize_status"] == 413
+        and downloads.get("range_status") == 206
+        and downloads.get("if_none_match_status") == 304
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,20 +2,190 @@
 """
 CallVault WebSocket Testing Script
 Tests WebSocket messaging and calling functionality between two users
+
+Load mode (--load) ramps up many virtual users against /ws, each doing
+register followed by a steady ping/pong loop, and writes a JSON report with
+connect rate, round-trip latency percentiles and error counts per phase.
+
+Message benchmark mode (--bench-messages) drives N signed sender/receiver
+pairs through msg:send and reports messages/sec plus ack, msg:incoming and
+msg:delivered latency.
+
+Cluster mode (--cluster) targets a server started with WS_CLUSTER_WORKERS > 1:
+it registers two signed users on different workers, checks that msg:send,
+call:init/accept/end and webrtc:offer/answer relays cross between them and
+that a block set on one worker refuses the call on the other, then
+runs the message benchmark against the cluster and against --compare-url (a
+single-process server) and reports the throughput ratio.
+
+Reconnect benchmark mode (--bench-reconnect) needs a server with a database.
+A receiver first gets --seen messages live, then disconnects while the sender
+queues --backlog more. The receiver then re-registers twice, with fresh users
+each time:
+- "legacy": a plain register.
+- "batched": register with batch=true and the last_seq it already holds.
+The report shows time to drain the backlog, frames and messages received,
+messages replayed that the client already had, and delivery receipt frames
+seen by the sender.
+
+Encoding benchmark mode (--bench-encoding) sets up --rounds calls and relays
+--frames webrtc:ice and msg:typing frames plus one SDP offer/answer per call.
+It runs four ways: JSON and MessagePack, each with and without
+permessage-deflate. The report covers, per frame type:
+- payload and on-the-wire bytes (framing and compression included), sent
+  and received
+- client encode/decode time and total client CPU per frame
+- server CPU per frame, from /metrics when it is reachable
+MessagePack modes negotiate the caller through the "callvault.msgpack"
+subprotocol and the callee through register's encoding flag. They need the
+msgpack package (pip install msgpack).
+
+Ringing soak mode (--soak-ringing) places --calls signed calls that nobody
+answers. The call:init frames are spread over --spread seconds, so deadlines
+land on many different ticks. The server must end every call after its ringing
+timeout and send call:end (reason ringing_timeout) to both caller and callee.
+Start the server with a short CALL_RINGING_TIMEOUT_MS and pass the same value
+in seconds as --ringing-timeout. The report gives per-party lateness
+percentiles, measured from when call:init was sent. A call fails if call:end
+arrives early, is missing, or arrives more than --tolerance seconds late.
+
+ICE benchmark mode (--bench-ice) needs a server started with ICE_COALESCE_MS
+set. Each round trickles --candidates candidates --ice-gap-ms apart, then an
+end-of-candidates marker, in two setups:
+- "webrtc": both directions of an accepted 1:1 call
+- "mesh": between every pair of --mesh-peers peers in a room
+Every setup runs twice. In "legacy" the peers register without ice_batch and
+get one frame per candidate. In "batched" they opt in and get
+webrtc:ice_batch / mesh:ice_batch frames. The report gives frames received
+per round and time from the first candidate sent to the last one received.
+
+Call setup benchmark (--bench-call-setup) runs --calls signed calls,
+--concurrency at a time. Each call uses a fresh caller/callee pair and goes
+through these steps:
+- POST /api/call-session-token
+- call:init, then call:accept
+- webrtc:offer, then webrtc:answer
+- --candidates webrtc:ice frames each way (batched with --ice-batch)
+- call:end
+Each step is timed from when its frame is sent until the other side receives
+it. "setup" is call:init to the last ICE candidate, the number to track
+across releases; "total" adds the token request. When /metrics is reachable,
+the report also includes the server's own setup times from
+callvault_call_setup_seconds:
+- ring: init to accept
+- negotiate: accept to answer relayed
+- total
 """
 
+import argparse
 import asyncio
 import websockets
 import json
+import re
 import sys
 import time
+import urllib.request
 import uuid
 from datetime import datetime
 
+from bench_stats import PhaseStats, latency_summary
+from signing_client import SigningIdentity
+
+try:
+    import msgpack
+except ImportError:  # Only needed for --bench-encoding
+    msgpack = None
+
+MSGPACK_SUBPROTOCOL = "callvault.msgpack"
+
+
+def decode_frame(raw):
+    """A received /ws frame: binary frames are MessagePack, text frames JSON"""
+    if isinstance(raw, bytes):
+        return msgpack.unpackb(raw)
+    return json.loads(raw)
+
+
+class WireCodec:
+    """Encodes outgoing /ws frames as JSON text or MessagePack binary"""
+
+    def __init__(self, encoding):
+        if encoding == "msgpack" and msgpack is None:
+            raise RuntimeError("MessagePack mode needs the msgpack package (pip install msgpack)")
+        self.binary = encoding == "msgpack"
+
+    def encode(self, frame):
+        return msgpack.packb(frame) if self.binary else json.dumps(frame)
+
+
+class WireCounter:
+    """Counts the bytes a websockets connection writes to and reads from its socket"""
+
+    def __init__(self, ws):
+        self.sent = 0
+        self.received = 0
+        protocol = ws.protocol
+        receive_data, data_to_send = protocol.receive_data, protocol.data_to_send
+
+        def counting_receive(data):
+            self.received += len(data)
+            return receive_data(data)
+
+        def counting_send():
+            chunks = data_to_send()
+            self.sent += sum(len(chunk) for chunk in chunks)
+            return chunks
+
+        protocol.receive_data = counting_receive
+        protocol.data_to_send = counting_send
+
+    def reset(self):
+        self.sent = 0
+        self.received = 0
+
+
+def sample_sdp(kind):
+    """A browser-sized audio+video SDP offer/answer (~4 KB)"""
+    lines = ["v=0", f"o=- 4611731400430051336 2 IN IP4 127.0.0.1", "s=-", "t=0 0",
+             "a=group:BUNDLE 0 1", "a=extmap-allow-mixed", "a=msid-semantic: WMS stream"]
+    for mid, media, codecs in ((0, "audio", [(111, "opus/48000/2"), (63, "red/48000/2"), (9, "G722/8000"),
+                                             (0, "PCMU/8000"), (8, "PCMA/8000"), (13, "CN/8000"),
+                                             (110, "telephone-event/48000"), (126, "telephone-event/8000")]),
+                               (1, "video", [(96, "VP8/90000"), (97, "rtx/90000"), (98, "VP9/90000"),
+                                             (99, "rtx/90000"), (100, "H264/90000"), (101, "rtx/90000"),
+                                             (102, "AV1/90000"), (103, "rtx/90000"), (104, "red/90000"),
+                                             (105, "ulpfec/90000")])):
+        payloads = " ".join(str(pt) for pt, _ in codecs)
+        lines += [f"m={media} 9 UDP/TLS/RTP/SAVPF {payloads}", "c=IN IP4 0.0.0.0", "a=rtcp:9 IN IP4 0.0.0.0",
+                  "a=ice-ufrag:EsAw", "a=ice-pwd:bP+XJMM09aR8AiX1jdukzR6Y", "a=ice-options:trickle",
+                  "a=fingerprint:sha-256 " + ":".join(f"{(i * 37) % 256:02X}" for i in range(32)),
+                  f"a=setup:{'actpass' if kind == 'offer' else 'active'}", f"a=mid:{mid}",
+                  "a=extmap:1 urn:ietf:params:rtp-hdrext:ssrc-audio-level",
+                  "a=extmap:2 http://www.webrtc.org/experiments/rtp-hdrext/abs-send-time",
+                  "a=extmap:3 http://www.ietf.org/id/draft-holmer-rmcat-transport-wide-cc-extensions-01",
+                  "a=extmap:4 urn:ietf:params:rtp-hdrext:sdes:mid", "a=sendrecv",
+                  f"a=msid:stream track-{media}", "a=rtcp-mux"]
+        for pt, name in codecs:
+            lines.append(f"a=rtpmap:{pt} {name}")
+            lines += [f"a=rtcp-fb:{pt} {fb}" for fb in ("goog-remb", "transport-cc", "ccm fir", "nack", "nack pli")]
+        lines += [f"a=ssrc:{1000 + mid} cname:4TOk42mSjXCkVIa6", f"a=ssrc:{1000 + mid} msid:stream track-{media}"]
+    return "\r\n".join(lines) + "\r\n"
+
+
+SAMPLE_ICE_CANDIDATE = {
+    "candidate": "candidate:842163049 1 udp 1677729535 203.0.113.7 51234 typ srflx raddr 10.0.0.5 "
+                 "rport 51234 generation 0 ufrag EsAw network-cost 999",
+    "sdpMid": "0",
+    "sdpMLineIndex": 0,
+    "usernameFragment": "EsAw",
+}
+
+
 class WebSocketTester:
-    def __init__(self, base_url="ws://localhost:3000"):
+    def __init__(self, base_url="ws://localhost:3000", metrics_token=None):
         self.base_url = base_url
         self.ws_url = f"{base_url}/ws"
+        self.metrics_token = metrics_token
         self.tests_run = 0
         self.tests_passed = 0
         self.failed_tests = []
@@ -42,10 +212,9 @@ class WebSocketTester:
             # Test 2: Basic ping/pong functionality
             await self.test_ping_pong()
             
-            # Note: msg:send and call:init require cryptographic signatures
-            # These would need proper Ed25519 key pairs and signing
-            self.log("\n📝 Note: msg:send and call:init require cryptographic signatures")
-            self.log("   Full message/call testing would need Ed25519 keypairs")
+            # msg:send and call:init require Ed25519 signatures - see
+            # signing_client.SigningIdentity and --bench-messages
+            self.log("\n📝 Note: signed msg:send is exercised by --bench-messages (signing_client.py)")
             
         except Exception as e:
             self.log(f"❌ Test flow error: {str(e)}")
@@ -250,6 +419,1120 @@ class WebSocketTester:
             self.log(f"❌ WebSocket server availability error: {str(e)}")
             self.failed_tests.append(f"WebSocket server: {str(e)}")
     
+    async def _recv_type(self, ws, expected_type, timeout):
+        """Receive frames until one of the expected type arrives (other frames are skipped)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            data = decode_frame(await asyncio.wait_for(ws.recv(), timeout=remaining))
+            if data.get("type") == expected_type:
+                return data
+            if data.get("type") == "error":
+                raise RuntimeError(f"server error: {data.get('message')}")
+
+    async def _virtual_user(self, index, start_at, steady_until, ping_interval, phases, state):
+        """One virtual user: connect, register, then ping/pong until steady_until"""
+        await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+        address = f"load_user_{self.run_id}_{index}"
+        ws = None
+
+        started = time.perf_counter()
+        try:
+            ws = await websockets.connect(self.ws_url, open_timeout=10, ping_interval=None, close_timeout=2)
+            phases["connect"].record_success((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            phases["connect"].record_error(e)
+            return
+
+        state["open"] += 1
+        state["peak_open"] = max(state["peak_open"], state["open"])
+        try:
+            started = time.perf_counter()
+            try:
+                await ws.send(json.dumps({"type": "register", "address": address}))
+                await self._recv_type(ws, "success", timeout=10.0)
+                phases["register"].record_success((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                phases["register"].record_error(e)
+                return
+
+            while time.monotonic() < steady_until:
+                started = time.perf_counter()
+                try:
+                    await ws.send(json.dumps({"type": "ping"}))
+                    await self._recv_type(ws, "pong", timeout=5.0)
+                    phases["ping"].record_success((time.perf_counter() - started) * 1000)
+                except websockets.exceptions.ConnectionClosed as e:
+                    phases["ping"].record_error(e)
+                    return
+                except Exception as e:
+                    phases["ping"].record_error(e)
+                await asyncio.sleep(ping_interval)
+        finally:
+            state["open"] -= 1
+            try:
+                await ws.close()
+            except Exception:
+                pass
+
+    async def run_load_test(self, users=1000, ramp_seconds=30.0, duration_seconds=60.0,
+                            ping_interval=1.0, report_path=None):
+        """Ramp to `users` concurrent sockets and report per-phase latency/error stats as JSON"""
+        self.log("🚀 Starting CallVault WebSocket Load Test")
+        self.log(f"   WebSocket URL: {self.ws_url}")
+        self.log(f"   Virtual users: {users}, ramp: {ramp_seconds}s, steady: {duration_seconds}s, ping interval: {ping_interval}s")
+
+        raise_fd_limit()
+        self.run_id = f"{int(time.time())}_{uuid.uuid4().hex[:6]}"
+        phases = {name: PhaseStats(name) for name in ("connect", "register", "ping")}
+        state = {"open": 0, "peak_open": 0}
+
+        begin = time.monotonic()
+        steady_until = begin + ramp_seconds + duration_seconds
+        step = ramp_seconds / users if users > 0 else 0
+        tasks = [
+            asyncio.create_task(self._virtual_user(i, begin + i * step, steady_until, ping_interval, phases, state))
+            for i in range(users)
+        ]
+
+        async def progress():
+            while True:
+                await asyncio.sleep(5)
+                self.log(f"   open={state['open']} peak={state['peak_open']} "
+                         f"connected={phases['connect'].succeeded} registered={phases['register'].succeeded} "
+                         f"pongs={phases['ping'].succeeded} errors={sum(sum(p.errors.values()) for p in phases.values())}")
+
+        reporter = asyncio.create_task(progress())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            reporter.cancel()
+
+        report = {
+            "mode": "load",
+            "ws_url": self.ws_url,
+            "started_at": datetime.now().isoformat(),
+            "config": {
+                "users": users,
+                "ramp_seconds": ramp_seconds,
+                "duration_seconds": duration_seconds,
+                "ping_interval": ping_interval,
+            },
+            "elapsed_s": round(time.monotonic() - begin, 3),
+            "peak_concurrent": state["peak_open"],
+            "phases": {name: stats.report() for name, stats in phases.items()},
+        }
+
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"📄 Report written to {report_path}")
+        else:
+            print(output)
+
+        failed = sum(sum(p.errors.values()) for p in phases.values())
+        self.log(f"📊 Peak concurrent sockets: {state['peak_open']}, total errors: {failed}")
+        return 0 if phases["register"].succeeded == users and failed == 0 else 1
+
+    async def _register(self, address, **flags):
+        ws = await websockets.connect(self.ws_url, open_timeout=10, ping_interval=None, close_timeout=2)
+        await ws.send(json.dumps({"type": "register", "address": address, **flags}))
+        success = await self._recv_type(ws, "success", timeout=10.0)
+        if flags.get("ice_batch") and not success.get("ice_batch"):
+            await ws.close()
+            raise RuntimeError("server did not accept ice_batch - start it with ICE_COALESCE_MS > 0")
+        return ws
+
+    async def _message_pair(self, pair_index, messages, inflight, content_size, stats):
+        """One sender/receiver pair exchanging signed msg:send frames"""
+        sender = SigningIdentity()
+        receiver = SigningIdentity()
+        try:
+            sender_ws = await self._register(sender.address)
+            receiver_ws = await self._register(receiver.address)
+        except Exception as e:
+            stats["send"].record_error(e)
+            return
+
+        sent_at = {}
+        pending_acks = {}
+        window = asyncio.Semaphore(inflight)
+        done = asyncio.Event()
+        outstanding = {"incoming": messages, "delivered": messages}
+
+        def maybe_done():
+            if outstanding["incoming"] <= 0 and outstanding["delivered"] <= 0:
+                done.set()
+
+        async def sender_reader():
+            async for raw in sender_ws:
+                data = json.loads(raw)
+                msg_id = data.get("message_id")
+                if msg_id not in sent_at:
+                    continue
+                elapsed = (time.perf_counter() - sent_at[msg_id]) * 1000
+                if data.get("type") == "msg:ack":
+                    if data.get("status") == "received":
+                        stats["ack"].record_success(elapsed)
+                    else:
+                        stats["ack"].record_error(f"ack_{data.get('status')}")
+                        outstanding["incoming"] -= 1
+                        outstanding["delivered"] -= 1
+                        maybe_done()
+                    if msg_id in pending_acks:
+                        pending_acks.pop(msg_id).release()
+                elif data.get("type") == "msg:delivered":
+                    stats["delivered"].record_success(elapsed)
+                    outstanding["delivered"] -= 1
+                    maybe_done()
+                elif data.get("type") == "msg:queued":
+                    stats["delivered"].record_error("queued_offline")
+                    outstanding["delivered"] -= 1
+                    maybe_done()
+
+        async def receiver_reader():
+            async for raw in receiver_ws:
+                data = json.loads(raw)
+                if data.get("type") != "msg:incoming":
+                    continue
+                msg_id = (data.get("message") or {}).get("id")
+                if msg_id in sent_at:
+                    stats["incoming"].record_success((time.perf_counter() - sent_at[msg_id]) * 1000)
+                    outstanding["incoming"] -= 1
+                    maybe_done()
+
+        readers = [asyncio.create_task(sender_reader()), asyncio.create_task(receiver_reader())]
+        convo_id = None
+        padding = "x" * max(0, content_size - 16)
+        try:
+            for n in range(messages):
+                await window.acquire()
+                sign_start = time.perf_counter()
+                frame = sender.msg_send_frame(receiver.address, f"bench {pair_index}:{n} {padding}", convo_id)
+                convo_id = frame["data"]["message"]["convo_id"]
+                stats["sign"].record_success((time.perf_counter() - sign_start) * 1000)
+                msg_id = frame["data"]["message"]["id"]
+                pending_acks[msg_id] = window
+                sent_at[msg_id] = time.perf_counter()
+                try:
+                    await sender_ws.send(json.dumps(frame))
+                    stats["send"].record_success(0.0)
+                except Exception as e:
+                    stats["send"].record_error(e)
+                    window.release()
+                    break
+            try:
+                await asyncio.wait_for(done.wait(), timeout=30.0)
+            except asyncio.TimeoutError:
+                if outstanding["incoming"] > 0:
+                    stats["incoming"].record_error("timeout")
+                if outstanding["delivered"] > 0:
+                    stats["delivered"].record_error("timeout")
+        finally:
+            for task in readers:
+                task.cancel()
+            await sender_ws.close()
+            await receiver_ws.close()
+
+    async def _run_message_pairs(self, pairs, messages_per_pair, inflight, content_size):
+        """Run all message pairs concurrently; returns (stats, elapsed seconds)"""
+        stats = {name: PhaseStats(name) for name in ("sign", "send", "ack", "incoming", "delivered")}
+        begin = time.monotonic()
+        await asyncio.gather(*[
+            self._message_pair(i, messages_per_pair, inflight, content_size, stats)
+            for i in range(pairs)
+        ])
+        return stats, time.monotonic() - begin
+
+    async def run_message_benchmark(self, pairs=10, messages_per_pair=200, inflight=10,
+                                    content_size=64, report_path=None):
+        """Signed msg:send throughput with send->ack, send->msg:incoming and send->msg:delivered latency"""
+        self.log("🚀 Starting CallVault Signed Message Benchmark")
+        self.log(f"   WebSocket URL: {self.ws_url}")
+        self.log(f"   Pairs: {pairs}, messages/pair: {messages_per_pair}, in-flight window: {inflight}")
+
+        raise_fd_limit()
+        stats, elapsed = await self._run_message_pairs(pairs, messages_per_pair, inflight, content_size)
+
+        report = {
+            "mode": "bench-messages",
+            "ws_url": self.ws_url,
+            "started_at": datetime.now().isoformat(),
+            "config": {
+                "pairs": pairs,
+                "messages_per_pair": messages_per_pair,
+                "inflight": inflight,
+                "content_size": content_size,
+            },
+            "elapsed_s": round(elapsed, 3),
+            "messages_per_s": round(stats["incoming"].succeeded / elapsed, 2) if elapsed > 0 else None,
+            "phases": {name: phase.report() for name, phase in stats.items()},
+        }
+
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"📄 Report written to {report_path}")
+        else:
+            print(output)
+
+        expected = pairs * messages_per_pair
+        self.log(f"📊 Delivered {stats['incoming'].succeeded}/{expected} messages, {report['messages_per_s']} msg/s")
+        return 0 if stats["incoming"].succeeded == expected else 1
+
+    async def _register_on_worker(self, address, avoid_worker=None, attempts=10):
+        """Register `address`, reconnecting until the server reports a worker other than avoid_worker"""
+        for _ in range(attempts):
+            ws = await websockets.connect(self.ws_url, open_timeout=10, ping_interval=None, close_timeout=2)
+            await ws.send(json.dumps({"type": "register", "address": address}))
+            success = await self._recv_type(ws, "success", timeout=10.0)
+            worker = success.get("worker")
+            if worker is None:
+                await ws.close()
+                raise RuntimeError("server did not report a worker id - is WS_CLUSTER_WORKERS set?")
+            if worker != avoid_worker:
+                return ws, worker
+            await ws.close()
+        raise RuntimeError(f"could not land on a worker other than {avoid_worker} after {attempts} connects")
+
+    async def test_cross_worker_relay(self):
+        """Two users on different workers: message, call setup and WebRTC signaling must cross the bus"""
+        self.log("\n=== CLUSTER: Cross-worker relay ===")
+        caller = SigningIdentity()
+        callee = SigningIdentity()
+        ws_a, worker_a = await self._register_on_worker(caller.address)
+        ws_b, worker_b = await self._register_on_worker(callee.address, avoid_worker=worker_a)
+        self.log(f"   Caller on worker {worker_a}, callee on worker {worker_b}")
+        steps = {}
+
+        async def check(name, coro):
+            self.tests_run += 1
+            started = time.perf_counter()
+            try:
+                result = await coro
+                steps[name] = round((time.perf_counter() - started) * 1000, 2)
+                self.tests_passed += 1
+                self.log(f"✅ {name} ({steps[name]}ms)")
+                return result
+            except Exception as e:
+                steps[name] = None
+                self.failed_tests.append(f"Cluster {name}: {type(e).__name__} {e}")
+                self.log(f"❌ {name}: {type(e).__name__} {e}")
+                return None
+
+        try:
+            frame = caller.msg_send_frame(callee.address, "hello from another worker")
+            await ws_a.send(json.dumps(frame))
+            await check("msg:send -> msg:incoming", self._recv_type(ws_b, "msg:incoming", 10.0))
+            await check("msg:delivered receipt", self._recv_type(ws_a, "msg:delivered", 10.0))
+
+            await ws_b.send(json.dumps(callee.policy_update_frame(allow_calls_from="anyone")))
+            await self._recv_type(ws_b, "policy:updated", 10.0)
+
+            await ws_a.send(json.dumps(caller.call_init_frame(callee.address)))
+            incoming = await check("call:init -> call:incoming", self._recv_type(ws_b, "call:incoming", 15.0))
+            if incoming is None:
+                return
+            await ws_b.send(json.dumps({
+                "type": "call:accept",
+                "to_address": caller.address,
+                "callSessionId": incoming.get("callSessionId"),
+            }))
+            await check("call:accept", self._recv_type(ws_a, "call:accept", 10.0))
+            await ws_a.send(json.dumps({
+                "type": "webrtc:offer",
+                "to_address": callee.address,
+                "offer": {"type": "offer", "sdp": "v=0 cluster-test"},
+            }))
+            await check("webrtc:offer", self._recv_type(ws_b, "webrtc:offer", 10.0))
+            await ws_b.send(json.dumps({
+                "type": "webrtc:answer",
+                "to_address": caller.address,
+                "answer": {"type": "answer", "sdp": "v=0 cluster-test"},
+            }))
+            await check("webrtc:answer", self._recv_type(ws_a, "webrtc:answer", 10.0))
+            await ws_a.send(json.dumps({"type": "call:end", "to_address": callee.address, "reason": "completed"}))
+            await check("call:end", self._recv_type(ws_b, "call:end", 10.0))
+
+            # Policies and blocklists are held by the primary, so a block set
+            # through the callee's worker applies on the caller's
+            await ws_b.send(json.dumps(callee.block_add_frame(caller.address)))
+            await check("block:add", self._recv_type(ws_b, "block:added", 10.0))
+            await ws_a.send(json.dumps(caller.call_init_frame(callee.address)))
+            await check("call:init blocked across workers", self._recv_type(ws_a, "call:blocked", 15.0))
+        finally:
+            await ws_a.close()
+            await ws_b.close()
+        return {"workers": [worker_a, worker_b], "steps_ms": steps}
+
+    async def run_cluster_test(self, compare_url=None, pairs=10, messages_per_pair=200, inflight=10,
+                               content_size=64, report_path=None):
+        """Cross-worker relay checks plus msg:send throughput against a single-process server"""
+        self.log("🚀 Starting CallVault Cluster Test")
+        self.log(f"   Cluster URL: {self.ws_url}")
+        raise_fd_limit()
+
+        try:
+            relay = await self.test_cross_worker_relay()
+        except Exception as e:
+            self.failed_tests.append(f"Cluster relay: {type(e).__name__} {e}")
+            self.log(f"❌ Cross-worker relay error: {e}")
+            relay = None
+
+        targets = [("cluster", self)]
+        if compare_url:
+            targets.append(("single", WebSocketTester(compare_url)))
+        throughput = {}
+        for name, tester in targets:
+            self.log(f"   Benchmarking {name}: {tester.ws_url} ({pairs} pairs x {messages_per_pair} messages)")
+            stats, elapsed = await tester._run_message_pairs(pairs, messages_per_pair, inflight, content_size)
+            throughput[name] = {
+                "ws_url": tester.ws_url,
+                "elapsed_s": round(elapsed, 3),
+                "delivered": stats["incoming"].succeeded,
+                "messages_per_s": round(stats["incoming"].succeeded / elapsed, 2) if elapsed > 0 else None,
+                "incoming_latency_ms": latency_summary(stats["incoming"].latencies_ms),
+            }
+            self.log(f"📊 {name}: {throughput[name]['messages_per_s']} msg/s")
+
+        report = {
+            "mode": "cluster",
+            "started_at": datetime.now().isoformat(),
+            "config": {
+                "pairs": pairs,
+                "messages_per_pair": messages_per_pair,
+                "inflight": inflight,
+                "content_size": content_size,
+            },
+            "relay": relay,
+            "throughput": throughput,
+        }
+        if "single" in throughput and throughput["single"]["messages_per_s"]:
+            report["speedup"] = round(throughput["cluster"]["messages_per_s"] / throughput["single"]["messages_per_s"], 2)
+            self.log(f"📊 Cluster vs single-process: {report['speedup']}x")
+
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"📄 Report written to {report_path}")
+        else:
+            print(output)
+
+        expected = pairs * messages_per_pair
+        delivered_ok = all(t["delivered"] == expected for t in throughput.values())
+        return 0 if not self.failed_tests and delivered_ok else 1
+
+    async def _reconnect_run(self, batched, backlog, seen, idle_timeout=2.0):
+        """Queue a backlog for an offline receiver, then time its replay on re-register"""
+        sender = SigningIdentity()
+        receiver = SigningIdentity()
+        sender_ws = await self._register(sender.address)
+        receiver_ws = await self._register(receiver.address)
+
+        # Messages the receiver gets live and keeps locally before going offline
+        convo_id = None
+        last_seq = 0
+        for n in range(seen):
+            frame = sender.msg_send_frame(receiver.address, f"seen {n}", convo_id)
+            convo_id = frame["data"]["message"]["convo_id"]
+            await sender_ws.send(json.dumps(frame))
+            data = await self._recv_type(receiver_ws, "msg:incoming", 10.0)
+            last_seq = max(last_seq, data["message"].get("seq") or 0)
+        await receiver_ws.close()
+        await asyncio.sleep(0.5)
+
+        for n in range(backlog):
+            frame = sender.msg_send_frame(receiver.address, f"queued {n}", convo_id)
+            convo_id = frame["data"]["message"]["convo_id"]
+            await sender_ws.send(json.dumps(frame))
+        for _ in range(backlog):
+            await self._recv_type(sender_ws, "msg:ack", 10.0)
+        await asyncio.sleep(1.0)  # Offline copies are stored after the ack
+
+        receipts = {"frames": 0, "receipts": 0}
+
+        async def sender_reader():
+            async for raw in sender_ws:
+                data = json.loads(raw)
+                if data.get("type") == "msg:delivered":
+                    receipts["frames"] += 1
+                    receipts["receipts"] += 1
+                elif data.get("type") == "msg:delivered_batch":
+                    receipts["frames"] += 1
+                    receipts["receipts"] += len(data.get("receipts") or [])
+
+        reader = asyncio.create_task(sender_reader())
+        register = {"type": "register", "address": receiver.address}
+        if batched:
+            register.update(batch=True, last_seq={convo_id: last_seq})
+        frames = messages = already_seen = 0
+        started = time.perf_counter()
+        last_message_at = None
+        ws = await websockets.connect(self.ws_url, open_timeout=10, ping_interval=None, close_timeout=2)
+        try:
+            await ws.send(json.dumps(register))
+            while True:
+                try:
+                    data = json.loads(await asyncio.wait_for(ws.recv(), timeout=idle_timeout))
+                except asyncio.TimeoutError:
+                    break
+                if data.get("type") == "msg:batch":
+                    batch = data.get("messages") or []
+                elif data.get("type") == "msg:incoming":
+                    batch = [data.get("message") or {}]
+                else:
+                    continue
+                frames += 1
+                messages += len(batch)
+                already_seen += sum(1 for m in batch if m.get("seq") and m["seq"] <= last_seq)
+                last_message_at = time.perf_counter()
+            await asyncio.sleep(0.5)
+        finally:
+            reader.cancel()
+            await ws.close()
+            await sender_ws.close()
+
+        return {
+            "batched": batched,
+            "drain_ms": round((last_message_at - started) * 1000, 2) if last_message_at else None,
+            "frames": frames,
+            "messages": messages,
+            "already_seen_replayed": already_seen,
+            "receipt_frames": receipts["frames"],
+            "receipts": receipts["receipts"],
+        }
+
+    async def run_reconnect_benchmark(self, backlog=500, seen=50, rounds=3, report_path=None):
+        """Pending-message replay on register: per-message frames vs msg:batch + last_seq"""
+        self.log("🚀 Starting CallVault Reconnect Benchmark")
+        self.log(f"   WebSocket URL: {self.ws_url}")
+        self.log(f"   Backlog: {backlog} queued, {seen} already held by the client, {rounds} round(s)")
+
+        results = {"legacy": [], "batched": []}
+        for _ in range(rounds):
+            for mode in ("legacy", "batched"):
+                try:
+                    results[mode].append(await self._reconnect_run(mode == "batched", backlog, seen))
+                except Exception as e:
+                    self.failed_tests.append(f"Reconnect {mode}: {type(e).__name__} {e}")
+                    self.log(f"❌ {mode} round failed: {type(e).__name__} {e}")
+
+        summary = {}
+        for mode, runs in results.items():
+            drains = [r["drain_ms"] for r in runs if r["drain_ms"] is not None]
+            summary[mode] = {
+                "drain_ms": latency_summary(drains),
+                "frames": runs[-1]["frames"] if runs else None,
+                "messages": runs[-1]["messages"] if runs else None,
+                "already_seen_replayed": runs[-1]["already_seen_replayed"] if runs else None,
+                "receipt_frames": runs[-1]["receipt_frames"] if runs else None,
+            }
+            self.log(f"📊 {mode}: drain p50={summary[mode]['drain_ms']['p50']}ms "
+                     f"frames={summary[mode]['frames']} messages={summary[mode]['messages']} "
+                     f"receipt frames={summary[mode]['receipt_frames']}")
+
+        report = {
+            "mode": "bench-reconnect",
+            "ws_url": self.ws_url,
+            "started_at": datetime.now().isoformat(),
+            "config": {"backlog": backlog, "seen": seen, "rounds": rounds},
+            "summary": summary,
+            "runs": results,
+        }
+        legacy_p50 = summary["legacy"]["drain_ms"]["p50"]
+        batched_p50 = summary["batched"]["drain_ms"]["p50"]
+        if legacy_p50 and batched_p50:
+            report["speedup"] = round(legacy_p50 / batched_p50, 2)
+            self.log(f"📊 Batched vs legacy drain: {report['speedup']}x")
+
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"📄 Report written to {report_path}")
+        else:
+            print(output)
+
+        batched_ok = all(r["already_seen_replayed"] == 0 and r["messages"] >= backlog for r in results["batched"])
+        return 0 if not self.failed_tests and batched_ok else 1
+
+    def _http_url(self, path):
+        return self.base_url.replace("ws://", "http://", 1).replace("wss://", "https://", 1) + path
+
+    def _scrape_metrics(self):
+        """/metrics text, or None if it can't be scraped"""
+        request = urllib.request.Request(self._http_url("/metrics"))
+        if self.metrics_token:
+            request.add_header("Authorization", f"Bearer {self.metrics_token}")
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.read().decode()
+        except OSError:
+            return None
+
+    def _server_cpu_seconds(self):
+        """Server CPU time from /metrics, or None if it can't be scraped"""
+        text = self._scrape_metrics()
+        if text is None:
+            return None
+        total = None
+        for line in text.splitlines():
+            if line.startswith("callvault_process_cpu_seconds_total"):
+                total = (total or 0.0) + float(line.rsplit(" ", 1)[1])
+        return total
+
+    async def _encoding_call(self, encoding, deflate):
+        """Register a caller/callee pair in `encoding` and bring a call up to the connecting state"""
+        codec = WireCodec(encoding)
+        compression = "deflate" if deflate else None
+        caller = SigningIdentity()
+        callee = SigningIdentity()
+        # Caller negotiates by subprotocol, callee with register's encoding flag
+        ws_a = await websockets.connect(self.ws_url, open_timeout=10, ping_interval=None, close_timeout=2,
+                                        compression=compression,
+                                        subprotocols=[MSGPACK_SUBPROTOCOL] if codec.binary else None)
+        ws_b = await websockets.connect(self.ws_url, open_timeout=10, ping_interval=None, close_timeout=2,
+                                        compression=compression)
+        if codec.binary and ws_a.subprotocol != MSGPACK_SUBPROTOCOL:
+            raise RuntimeError("server did not accept the callvault.msgpack subprotocol")
+        await ws_a.send(codec.encode({"type": "register", "address": caller.address}))
+        await self._recv_type(ws_a, "success", 10.0)
+        callee_register = {"type": "register", "address": callee.address}
+        if codec.binary:
+            callee_register["encoding"] = "msgpack"
+        await ws_b.send(json.dumps(callee_register))
+        await self._recv_type(ws_b, "success", 10.0)
+
+        await ws_a.send(codec.encode(caller.msg_send_frame(callee.address, "encoding benchmark")))
+        incoming = await self._recv_type(ws_b, "msg:incoming", 10.0)
+        convo_id = incoming["message"]["convo_id"]
+
+        await ws_b.send(codec.encode(callee.policy_update_frame(allow_calls_from="anyone")))
+        await self._recv_type(ws_b, "policy:updated", 10.0)
+        await ws_a.send(codec.encode(caller.call_init_frame(callee.address)))
+        ringing = await self._recv_type(ws_b, "call:incoming", 15.0)
+        await ws_b.send(codec.encode({
+            "type": "call:accept",
+            "to_address": caller.address,
+            "callSessionId": ringing.get("callSessionId"),
+        }))
+        await self._recv_type(ws_a, "call:accept", 10.0)
+        return codec, caller, callee, ws_a, ws_b, convo_id
+
+    async def _measure_frames(self, codec, sender_ws, receiver_ws, frames, counters):
+        """Relay `frames` from sender to receiver; bytes and CPU spent on them"""
+        kind = frames[0]["type"]
+        for counter in counters:
+            counter.reset()
+        server_before = self._server_cpu_seconds()
+        cpu_before = time.process_time()
+        encode_ns = decode_ns = payload_bytes = 0
+        received = 0
+
+        async def reader():
+            nonlocal decode_ns, received
+            while received < len(frames):
+                raw = await asyncio.wait_for(receiver_ws.recv(), timeout=10.0)
+                started = time.perf_counter_ns()
+                data = decode_frame(raw)
+                decode_ns += time.perf_counter_ns() - started
+                if data.get("type") == kind:
+                    received += 1
+                elif data.get("type") == "error":
+                    raise RuntimeError(f"server error: {data.get('message')}")
+
+        task = asyncio.create_task(reader())
+        for frame in frames:
+            started = time.perf_counter_ns()
+            payload = codec.encode(frame)
+            encode_ns += time.perf_counter_ns() - started
+            payload_bytes += len(payload)
+            await sender_ws.send(payload)
+        await task
+        cpu_seconds = time.process_time() - cpu_before
+        server_after = self._server_cpu_seconds()
+        return {
+            "frames": len(frames),
+            "payload_bytes": payload_bytes,
+            "wire_bytes_sent": counters[0].sent,
+            "wire_bytes_received": counters[1].received,
+            "encode_ns": encode_ns,
+            "decode_ns": decode_ns,
+            "client_cpu_s": cpu_seconds,
+            "server_cpu_s": server_after - server_before if None not in (server_before, server_after) else None,
+        }
+
+    async def run_encoding_benchmark(self, frames=500, rounds=3, report_path=None):
+        """Bytes on the wire and CPU per frame for JSON vs MessagePack, with and without permessage-deflate"""
+        self.log("🚀 Starting CallVault Wire Encoding Benchmark")
+        self.log(f"   WebSocket URL: {self.ws_url}")
+        self.log(f"   {rounds} call(s) per mode, {frames} ICE and typing frames per call")
+        offer_sdp, answer_sdp = sample_sdp("offer"), sample_sdp("answer")
+
+        modes = {}
+        for name, encoding, deflate in (("json", "json", False), ("msgpack", "msgpack", False),
+                                        ("json+deflate", "json", True), ("msgpack+deflate", "msgpack", True)):
+            totals = {}
+            try:
+                for _ in range(rounds):
+                    codec, caller, callee, ws_a, ws_b, convo_id = await self._encoding_call(encoding, deflate)
+                    counters = (WireCounter(ws_a), WireCounter(ws_b))
+                    batches = {
+                        "webrtc:ice": [{"type": "webrtc:ice", "to_address": callee.address,
+                                        "candidate": dict(SAMPLE_ICE_CANDIDATE, sdpMLineIndex=i % 2)}
+                                       for i in range(frames)],
+                        "msg:typing": [{"type": "msg:typing", "convo_id": convo_id, "from_address": caller.address,
+                                        "is_typing": i % 2 == 0} for i in range(frames)],
+                        "webrtc:offer": [{"type": "webrtc:offer", "to_address": callee.address,
+                                          "offer": {"type": "offer", "sdp": offer_sdp}}],
+                    }
+                    try:
+                        for kind, batch in batches.items():
+                            result = await self._measure_frames(codec, ws_a, ws_b, batch, counters)
+                            self._add_encoding_totals(totals, kind, result)
+                        answer = [{"type": "webrtc:answer", "to_address": caller.address,
+                                   "answer": {"type": "answer", "sdp": answer_sdp}}]
+                        result = await self._measure_frames(codec, ws_b, ws_a, answer, counters[::-1])
+                        self._add_encoding_totals(totals, "webrtc:answer", result)
+                        await ws_a.send(codec.encode({"type": "call:end", "to_address": callee.address,
+                                                      "reason": "completed"}))
+                    finally:
+                        await ws_a.close()
+                        await ws_b.close()
+            except Exception as e:
+                self.failed_tests.append(f"Encoding {name}: {type(e).__name__} {e}")
+                self.log(f"❌ {name} failed: {type(e).__name__} {e}")
+                continue
+            modes[name] = {kind: self._per_frame(t) for kind, t in totals.items()}
+            for kind, stats in modes[name].items():
+                self.log(f"📊 {name:<16} {kind:<14} payload={stats['payload_bytes']}B "
+                         f"wire={stats['wire_bytes_received']}B encode={stats['encode_us']}us "
+                         f"decode={stats['decode_us']}us client_cpu={stats['client_cpu_us']}us "
+                         f"server_cpu={stats['server_cpu_us']}us")
+
+        report = {
+            "mode": "bench-encoding",
+            "ws_url": self.ws_url,
+            "started_at": datetime.now().isoformat(),
+            "config": {"frames": frames, "rounds": rounds},
+            "per_frame": modes,
+        }
+        if "json" in modes and "msgpack" in modes:
+            report["wire_ratio_msgpack_vs_json"] = {
+                kind: round(modes["msgpack"][kind]["wire_bytes_received"] / modes["json"][kind]["wire_bytes_received"], 3)
+                for kind in modes["json"] if modes["json"][kind]["wire_bytes_received"]
+            }
+
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"📄 Report written to {report_path}")
+        else:
+            print(output)
+        return 0 if not self.failed_tests else 1
+
+    @staticmethod
+    def _add_encoding_totals(totals, kind, result):
+        entry = totals.setdefault(kind, {key: 0 for key in result})
+        for key, value in result.items():
+            entry[key] = None if value is None or entry[key] is None else entry[key] + value
+
+    @staticmethod
+    def _per_frame(totals):
+        n = totals["frames"]
+        return {
+            "frames": n,
+            "payload_bytes": round(totals["payload_bytes"] / n, 1),
+            "wire_bytes_sent": round(totals["wire_bytes_sent"] / n, 1),
+            "wire_bytes_received": round(totals["wire_bytes_received"] / n, 1),
+            "encode_us": round(totals["encode_ns"] / n / 1000, 2),
+            "decode_us": round(totals["decode_ns"] / n / 1000, 2),
+            "client_cpu_us": round(totals["client_cpu_s"] / n * 1e6, 2),
+            "server_cpu_us": round(totals["server_cpu_s"] / n * 1e6, 2) if totals["server_cpu_s"] is not None else None,
+        }
+
+    async def _receive_candidates(self, ws, expected, kind):
+        """Read until `expected` candidates of `kind` arrived, single or batched; (frames, last arrival)"""
+        frames = candidates = 0
+        last_at = None
+        while candidates < expected:
+            data = decode_frame(await asyncio.wait_for(ws.recv(), timeout=10.0))
+            if data.get("type") == kind:
+                frames += 1
+                candidates += 1
+            elif data.get("type") == f"{kind}_batch":
+                frames += 1
+                candidates += len(data["candidates"])
+            else:
+                continue
+            last_at = time.perf_counter()
+        return frames, last_at
+
+    async def _trickle(self, ws, frame_for, candidates, gap_s):
+        """Send `candidates` ICE frames `gap_s` apart, then the end-of-candidates marker"""
+        for i in range(candidates):
+            await ws.send(json.dumps(frame_for(dict(SAMPLE_ICE_CANDIDATE, sdpMLineIndex=i % 2))))
+            if gap_s:
+                await asyncio.sleep(gap_s)
+        await ws.send(json.dumps(frame_for(None)))
+
+    async def _exchange_ice(self, ws_a, ws_b, caller, callee, candidates, gap_s):
+        """Trickle webrtc:ice both ways across a call; (frames, last arrival) per receiving side"""
+        readers = [asyncio.ensure_future(self._receive_candidates(ws, candidates, "webrtc:ice"))
+                   for ws in (ws_a, ws_b)]
+        await asyncio.gather(
+            self._trickle(ws_a, lambda c: {"type": "webrtc:ice", "to_address": callee.address, "candidate": c},
+                          candidates, gap_s),
+            self._trickle(ws_b, lambda c: {"type": "webrtc:ice", "to_address": caller.address, "candidate": c},
+                          candidates, gap_s),
+        )
+        return await asyncio.gather(*readers)
+
+    async def _ice_webrtc_round(self, ice_batch, candidates, gap_s):
+        """Trickle both ways across an accepted call; frames received and ms to the last candidate"""
+        flags = {"ice_batch": True} if ice_batch else {}
+        caller = SigningIdentity()
+        callee = SigningIdentity()
+        ws_a = await self._register(caller.address, **flags)
+        ws_b = await self._register(callee.address, **flags)
+        try:
+            await ws_b.send(json.dumps(callee.policy_update_frame(allow_calls_from="anyone")))
+            await self._recv_type(ws_b, "policy:updated", 10.0)
+            await ws_a.send(json.dumps(caller.call_init_frame(callee.address)))
+            ringing = await self._recv_type(ws_b, "call:incoming", 15.0)
+            await ws_b.send(json.dumps({"type": "call:accept", "to_address": caller.address,
+                                        "callSessionId": ringing.get("callSessionId")}))
+            await self._recv_type(ws_a, "call:accept", 10.0)
+
+            started = time.perf_counter()
+            results = await self._exchange_ice(ws_a, ws_b, caller, callee, candidates, gap_s)
+            await ws_a.send(json.dumps({"type": "call:end", "to_address": callee.address, "reason": "completed"}))
+        finally:
+            await ws_a.close()
+            await ws_b.close()
+        return sum(frames for frames, _ in results), (max(at for _, at in results) - started) * 1000
+
+    async def _ice_mesh_round(self, ice_batch, candidates, gap_s, peers):
+        """Every peer trickles to every other peer in one room; frames received and ms to the last candidate"""
+        flags = {"ice_batch": True} if ice_batch else {}
+        identities = [SigningIdentity() for _ in range(peers)]
+        sockets = []
+        try:
+            for identity in identities:
+                sockets.append(await self._register(identity.address, **flags))
+            room_id = f"bench-{uuid.uuid4()}"
+
+            def mesh_frame(sender, receiver):
+                return lambda c: {"type": "mesh:ice", "room_id": room_id, "to_peer": receiver.address,
+                                  "from_peer": sender.address, "candidate": c}
+
+            readers = [asyncio.ensure_future(self._receive_candidates(ws, candidates * (peers - 1), "mesh:ice"))
+                       for ws in sockets]
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                self._trickle(sockets[i], mesh_frame(sender, receiver), candidates, gap_s)
+                for i, sender in enumerate(identities)
+                for receiver in identities if receiver is not sender
+            ))
+            results = await asyncio.gather(*readers)
+        finally:
+            for ws in sockets:
+                await ws.close()
+        return sum(frames for frames, _ in results), (max(at for _, at in results) - started) * 1000
+
+    async def run_ice_benchmark(self, candidates=12, gap_ms=1.0, mesh_peers=4, rounds=3, report_path=None):
+        """Frames and time-to-last-candidate for per-candidate vs coalesced ICE relays"""
+        self.log("🚀 Starting CallVault ICE Coalescing Benchmark")
+        self.log(f"   WebSocket URL: {self.ws_url}")
+        self.log(f"   {candidates} candidates per direction, {gap_ms}ms apart, {mesh_peers} mesh peers, {rounds} round(s)")
+        gap_s = gap_ms / 1000.0
+
+        results = {}
+        for setup in ("webrtc", "mesh"):
+            for mode in ("legacy", "batched"):
+                frames, times = [], []
+                try:
+                    for _ in range(rounds):
+                        if setup == "webrtc":
+                            n_frames, elapsed = await self._ice_webrtc_round(mode == "batched", candidates, gap_s)
+                        else:
+                            n_frames, elapsed = await self._ice_mesh_round(mode == "batched", candidates, gap_s,
+                                                                           mesh_peers)
+                        frames.append(n_frames)
+                        times.append(elapsed)
+                except Exception as e:
+                    self.failed_tests.append(f"ICE {setup}/{mode}: {type(e).__name__} {e}")
+                    self.log(f"❌ {setup}/{mode} failed: {type(e).__name__} {e}")
+                    continue
+                results.setdefault(setup, {})[mode] = {
+                    "frames_per_round": round(sum(frames) / len(frames), 1),
+                    "time_to_last_candidate_ms": latency_summary(times),
+                }
+                self.log(f"📊 {setup:<7} {mode:<8} frames/round={results[setup][mode]['frames_per_round']} "
+                         f"time-to-last p50={results[setup][mode]['time_to_last_candidate_ms']['p50']}ms")
+
+        report = {
+            "mode": "bench-ice",
+            "ws_url": self.ws_url,
+            "started_at": datetime.now().isoformat(),
+            "config": {"candidates": candidates, "gap_ms": gap_ms, "mesh_peers": mesh_peers, "rounds": rounds},
+            "results": results,
+            "frame_ratio_batched_vs_legacy": {
+                setup: round(modes["batched"]["frames_per_round"] / modes["legacy"]["frames_per_round"], 3)
+                for setup, modes in results.items() if "batched" in modes and "legacy" in modes
+            },
+        }
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"📄 Report written to {report_path}")
+        else:
+            print(output)
+        return 0 if not self.failed_tests else 1
+
+    def _call_session_token(self, address, target_address):
+        """POST /api/call-session-token (blocking; run it in a thread)"""
+        request = urllib.request.Request(
+            self._http_url("/api/call-session-token"),
+            data=json.dumps({"address": address, "targetAddress": target_address}).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            body = json.loads(response.read())
+        if not body.get("token"):
+            raise RuntimeError("call-session-token response has no token")
+        return body
+
+    def _server_setup_seconds(self):
+        """{phase: [sum, count]} of callvault_call_setup_seconds from /metrics, or None"""
+        text = self._scrape_metrics()
+        if text is None:
+            return None
+        totals = {}
+        for line in text.splitlines():
+            match = re.match(r'callvault_call_setup_seconds_(sum|count)\{phase="(\w+)"\} (\S+)$', line)
+            if match:
+                field, phase, value = match.groups()
+                totals.setdefault(phase, [0.0, 0])[0 if field == "sum" else 1] = float(value)
+        return totals
+
+    async def _send_and_wait(self, sender, frame, receiver, expected_type):
+        await sender.send(json.dumps(frame))
+        return await self._recv_type(receiver, expected_type, 15.0)
+
+    async def _timed_call_setup(self, candidates, ice_batch, stats):
+        """One call from token to call:end with fresh identities; each step's latency goes to stats"""
+        flags = {"ice_batch": True} if ice_batch else {}
+        caller = SigningIdentity()
+        callee = SigningIdentity()
+        ws_a = ws_b = None
+        step = "register"
+
+        async def timed(name, coro):
+            nonlocal step
+            step = name
+            started = time.perf_counter()
+            result = await coro
+            stats[name].record_success((time.perf_counter() - started) * 1000)
+            return result
+
+        try:
+            started = time.perf_counter()
+            ws_a = await self._register(caller.address, **flags)
+            ws_b = await self._register(callee.address, **flags)
+            await self._send_and_wait(ws_b, callee.policy_update_frame(allow_calls_from="anyone"), ws_b, "policy:updated")
+            stats["register"].record_success((time.perf_counter() - started) * 1000)
+
+            call_started = time.perf_counter()
+            await timed("token", asyncio.to_thread(self._call_session_token, caller.address, callee.address))
+            setup_started = time.perf_counter()
+            ringing = await timed("init", self._send_and_wait(
+                ws_a, caller.call_init_frame(callee.address), ws_b, "call:incoming"))
+            await timed("accept", self._send_and_wait(ws_b, {
+                "type": "call:accept",
+                "to_address": caller.address,
+                "callSessionId": ringing.get("callSessionId"),
+            }, ws_a, "call:accept"))
+            await timed("offer", self._send_and_wait(ws_a, {
+                "type": "webrtc:offer",
+                "to_address": callee.address,
+                "offer": {"type": "offer", "sdp": sample_sdp("offer")},
+            }, ws_b, "webrtc:offer"))
+            await timed("answer", self._send_and_wait(ws_b, {
+                "type": "webrtc:answer",
+                "to_address": caller.address,
+                "answer": {"type": "answer", "sdp": sample_sdp("answer")},
+            }, ws_a, "webrtc:answer"))
+            await timed("ice", self._exchange_ice(ws_a, ws_b, caller, callee, candidates, 0))
+            stats["setup"].record_success((time.perf_counter() - setup_started) * 1000)
+            stats["total"].record_success((time.perf_counter() - call_started) * 1000)
+            await timed("end", self._send_and_wait(
+                ws_a, {"type": "call:end", "to_address": callee.address, "reason": "completed"}, ws_b, "call:end"))
+        except Exception as e:
+            stats[step].record_error(e)
+        finally:
+            for ws in (ws_a, ws_b):
+                if ws is not None:
+                    await ws.close()
+
+    async def run_call_setup_benchmark(self, calls=100, concurrency=10, candidates=8, ice_batch=False,
+                                       report_path=None):
+        """End-to-end call setup latency, per step and overall, at a fixed concurrency"""
+        self.log("🚀 Starting CallVault Call Setup Benchmark")
+        self.log(f"   WebSocket URL: {self.ws_url}")
+        self.log(f"   {calls} calls, {concurrency} at a time, {candidates} ICE candidates each way"
+                 f"{' (batched)' if ice_batch else ''}")
+        raise_fd_limit()
+
+        steps = ("register", "token", "init", "accept", "offer", "answer", "ice", "setup", "total", "end")
+        stats = {name: PhaseStats(name) for name in steps}
+        server_before = self._server_setup_seconds()
+        queue = iter(range(calls))
+
+        async def worker():
+            for _ in queue:
+                await self._timed_call_setup(candidates, ice_batch, stats)
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+        server_after = self._server_setup_seconds()
+
+        server_setup = None
+        if server_before is not None and server_after is not None:
+            server_setup = {}
+            for phase, (total, count) in server_after.items():
+                before_total, before_count = server_before.get(phase, [0.0, 0])
+                if count > before_count:
+                    server_setup[phase] = {
+                        "calls": int(count - before_count),
+                        "mean_ms": round((total - before_total) / (count - before_count) * 1000, 3),
+                    }
+
+        report = {
+            "mode": "bench-call-setup",
+            "ws_url": self.ws_url,
+            "started_at": datetime.now().isoformat(),
+            "duration_s": round(elapsed, 2),
+            "config": {"calls": calls, "concurrency": concurrency, "candidates": candidates, "ice_batch": ice_batch},
+            "calls_per_s": round(stats["end"].succeeded / elapsed, 2) if elapsed > 0 else None,
+            # Milliseconds from call:init to the last ICE candidate, the headline number
+            "setup_ms": latency_summary(stats["setup"].latencies_ms),
+            "steps": {name: s.report() for name, s in stats.items()},
+            "server_setup": server_setup,
+        }
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"📄 Report written to {report_path}")
+        else:
+            print(output)
+
+        for name in steps:
+            summary = latency_summary(stats[name].latencies_ms)
+            self.log(f"📊 {name:<9} p50={summary['p50']}ms p95={summary['p95']}ms p99={summary['p99']}ms "
+                     f"errors={dict(stats[name].errors)}")
+        if server_setup:
+            self.log("📊 server    " + " ".join(f"{phase}={v['mean_ms']}ms" for phase, v in sorted(server_setup.items())))
+        return 0 if stats["end"].succeeded == calls else 1
+
+    async def _ringing_call(self, ringing_timeout, tolerance, start_at, connect_slots, stats):
+        """One unanswered call: both parties must get call:end within `tolerance` of the ringing timeout"""
+        caller = SigningIdentity()
+        callee = SigningIdentity()
+        ws_a = ws_b = None
+        try:
+            async with connect_slots:
+                ws_a = await self._register(caller.address)
+                ws_b = await self._register(callee.address)
+            await ws_b.send(json.dumps(callee.policy_update_frame(allow_calls_from="anyone")))
+            await self._recv_type(ws_b, "policy:updated", 10.0)
+            await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+
+            sent = time.monotonic()
+            await ws_a.send(json.dumps(caller.call_init_frame(callee.address)))
+            await self._recv_type(ws_b, "call:incoming", 15.0)
+            stats["ring"].record_success((time.monotonic() - sent) * 1000)
+
+            async def wait_end(ws, party):
+                try:
+                    frame = await self._recv_type(ws, "call:end", ringing_timeout + tolerance + 10.0)
+                except Exception as e:
+                    stats[party].record_error(e)
+                    return
+                # The server starts the clock after call:init arrives, so this
+                # overstates lateness by one relay and never understates it
+                late_s = time.monotonic() - sent - ringing_timeout
+                if frame.get("reason") != "ringing_timeout":
+                    stats[party].record_error(f"reason:{frame.get('reason')}")
+                elif late_s < -0.05:
+                    stats[party].record_error("early")
+                elif late_s > tolerance:
+                    stats[party].record_error("late")
+                else:
+                    stats[party].record_success(late_s * 1000)
+
+            await asyncio.gather(wait_end(ws_a, "caller_end"), wait_end(ws_b, "callee_end"))
+        except Exception as e:
+            stats["ring"].record_error(e)
+        finally:
+            for ws in (ws_a, ws_b):
+                if ws is not None:
+                    await ws.close()
+
+    async def run_ringing_soak(self, calls=500, ringing_timeout=5.0, spread=10.0, tolerance=1.0,
+                               report_path=None):
+        """Many unanswered calls at once: every ringing timeout must fire on time, for both parties"""
+        self.log("🚀 Starting CallVault Ringing Timeout Soak")
+        self.log(f"   WebSocket URL: {self.ws_url}")
+        self.log(f"   {calls} calls over {spread}s, server ringing timeout {ringing_timeout}s, tolerance {tolerance}s")
+        raise_fd_limit()
+
+        stats = {name: PhaseStats(name) for name in ("ring", "caller_end", "callee_end")}
+        connect_slots = asyncio.Semaphore(100)
+        # Leave time for everyone to register before the first call:init
+        first_at = time.monotonic() + 5.0 + calls / 200.0
+        started = time.monotonic()
+        await asyncio.gather(*(
+            self._ringing_call(ringing_timeout, tolerance, first_at + spread * i / max(1, calls),
+                               connect_slots, stats)
+            for i in range(calls)
+        ))
+
+        report = {
+            "mode": "soak-ringing",
+            "ws_url": self.ws_url,
+            "started_at": datetime.now().isoformat(),
+            "duration_s": round(time.monotonic() - started, 1),
+            "config": {"calls": calls, "ringing_timeout_s": ringing_timeout, "spread_s": spread,
+                       "tolerance_s": tolerance},
+            # latency_ms is lateness past the ringing timeout for the *_end phases
+            "phases": {name: s.report() for name, s in stats.items()},
+        }
+        output = json.dumps(report, indent=2)
+        if report_path:
+            with open(report_path, "w") as f:
+                f.write(output)
+            self.log(f"📄 Report written to {report_path}")
+        else:
+            print(output)
+
+        on_time = min(stats["caller_end"].succeeded, stats["callee_end"].succeeded)
+        for name in ("caller_end", "callee_end"):
+            lateness = latency_summary(stats[name].latencies_ms)
+            self.log(f"📊 {name}: {stats[name].succeeded}/{calls} on time, late by p50={lateness['p50']}ms "
+                     f"p99={lateness['p99']}ms max={lateness['max']}ms, errors {dict(stats[name].errors)}")
+        return 0 if on_time == calls else 1
+
     async def run_all_tests(self):
         """Run all WebSocket tests"""
         self.log("🚀 Starting CallVault WebSocket Tests")
@@ -284,9 +1567,120 @@ class WebSocketTester:
             self.log("💥 WebSocket tests FAILED!")
             return 1
 
+def raise_fd_limit():
+    """Raise the open file limit to the hard maximum so thousands of sockets fit"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CallVault WebSocket tests")
+    parser.add_argument("--url", default="ws://localhost:3000", help="Base WebSocket URL (without /ws)")
+    parser.add_argument("--load", action="store_true", help="Run the concurrent load generator instead of functional tests")
+    parser.add_argument("--users", type=int, default=1000, help="Virtual users to ramp up to")
+    parser.add_argument("--ramp", type=float, default=30.0, help="Seconds to spread connection starts over")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of steady ping/pong after the ramp")
+    parser.add_argument("--ping-interval", type=float, default=1.0, help="Seconds between pings per user")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("--bench-messages", action="store_true", help="Run the signed msg:send throughput benchmark")
+    parser.add_argument("--pairs", type=int, default=10, help="Sender/receiver pairs for --bench-messages")
+    parser.add_argument("--messages", type=int, default=200, help="Messages per pair for --bench-messages")
+    parser.add_argument("--inflight", type=int, default=10, help="Unacknowledged messages allowed per sender")
+    parser.add_argument("--content-size", type=int, default=64, help="Approximate message body size in bytes")
+    parser.add_argument("--cluster", action="store_true", help="Run cross-worker relay checks against a clustered server")
+    parser.add_argument("--compare-url", default=None, help="Single-process server to compare --cluster throughput against")
+    parser.add_argument("--bench-reconnect", action="store_true", help="Run the pending-message reconnect benchmark (needs a database)")
+    parser.add_argument("--backlog", type=int, default=500, help="Messages queued while offline for --bench-reconnect")
+    parser.add_argument("--seen", type=int, default=50, help="Messages the client already holds for --bench-reconnect")
+    parser.add_argument("--rounds", type=int, default=3, help="Reconnects (--bench-reconnect), calls (--bench-encoding) or trickle rounds (--bench-ice) per mode")
+    parser.add_argument("--bench-encoding", action="store_true", help="Compare JSON and MessagePack framing, with and without deflate")
+    parser.add_argument("--frames", type=int, default=500, help="ICE and typing frames per call for --bench-encoding")
+    parser.add_argument("--metrics-token", default=None, help="Bearer token for /metrics (server CPU in --bench-encoding)")
+    parser.add_argument("--bench-ice", action="store_true", help="Compare per-candidate and coalesced ICE relays (needs ICE_COALESCE_MS)")
+    parser.add_argument("--candidates", type=int, default=12, help="ICE candidates per direction for --bench-ice and --bench-call-setup")
+    parser.add_argument("--ice-gap-ms", type=float, default=1.0, help="Milliseconds between trickled candidates for --bench-ice")
+    parser.add_argument("--mesh-peers", type=int, default=4, help="Peers in the mesh room for --bench-ice")
+    parser.add_argument("--bench-call-setup", action="store_true", help="Time signed calls from call-session-token to call:end, step by step")
+    parser.add_argument("--concurrency", type=int, default=10, help="Calls in flight at once for --bench-call-setup")
+    parser.add_argument("--ice-batch", action="store_true", help="Register with ice_batch for --bench-call-setup")
+    parser.add_argument("--soak-ringing", action="store_true", help="Check that ringing timeouts fire on time for many unanswered calls")
+    parser.add_argument("--calls", type=int, default=500, help="Calls for --soak-ringing and --bench-call-setup")
+    parser.add_argument("--ringing-timeout", type=float, default=5.0, help="The server's CALL_RINGING_TIMEOUT_MS, in seconds")
+    parser.add_argument("--spread", type=float, default=10.0, help="Seconds to spread call:init frames over for --soak-ringing")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="Seconds a call:end may arrive after the ringing timeout")
+    return parser.parse_args(argv)
+
 async def main():
     """Main test runner"""
-    tester = WebSocketTester()
+    args = parse_args()
+    tester = WebSocketTester(args.url, metrics_token=args.metrics_token)
+    if args.load:
+        return await tester.run_load_test(
+            users=args.users,
+            ramp_seconds=args.ramp,
+            duration_seconds=args.duration,
+            ping_interval=args.ping_interval,
+            report_path=args.report,
+        )
+    if args.bench_messages:
+        return await tester.run_message_benchmark(
+            pairs=args.pairs,
+            messages_per_pair=args.messages,
+            inflight=args.inflight,
+            content_size=args.content_size,
+            report_path=args.report,
+        )
+    if args.bench_reconnect:
+        return await tester.run_reconnect_benchmark(
+            backlog=args.backlog,
+            seen=args.seen,
+            rounds=args.rounds,
+            report_path=args.report,
+        )
+    if args.bench_encoding:
+        return await tester.run_encoding_benchmark(
+            frames=args.frames,
+            rounds=args.rounds,
+            report_path=args.report,
+        )
+    if args.bench_call_setup:
+        return await tester.run_call_setup_benchmark(
+            calls=args.calls,
+            concurrency=args.concurrency,
+            candidates=args.candidates,
+            ice_batch=args.ice_batch,
+            report_path=args.report,
+        )
+    if args.bench_ice:
+        return await tester.run_ice_benchmark(
+            candidates=args.candidates,
+            gap_ms=args.ice_gap_ms,
+            mesh_peers=args.mesh_peers,
+            rounds=args.rounds,
+            report_path=args.report,
+        )
+    if args.soak_ringing:
+        return await tester.run_ringing_soak(
+            calls=args.calls,
+            ringing_timeout=args.ringing_timeout,
+            spread=args.spread,
+            tolerance=args.tolerance,
+            report_path=args.report,
+        )
+    if args.cluster:
+        return await tester.run_cluster_test(
+            compare_url=args.compare_url,
+            pairs=args.pairs,
+            messages_per_pair=args.messages,
+            inflight=args.inflight,
+            content_size=args.content_size,
+            report_path=args.report,
+        )
     return await tester.run_all_tests()
 
 if __name__ == "__main__":